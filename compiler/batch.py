@@ -0,0 +1,213 @@
+import os
+import shutil
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from cache import CacheEntry, CompilationCache
+from errors.base import CompilerError
+from errors.formatter import ErrorFormatter
+from phases import phase
+from toolchain import Toolchain, CompileResult, assemble_il
+
+SOURCE_SUFFIX = ".imgl"
+
+@dataclass
+class BatchStats:
+    """Сводка по пакетной компиляции"""
+    files: int = 0
+    failed: int = 0
+    cached: int = 0
+    tokens: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.elapsed if self.elapsed else 0.0
+
+def collect_sources(paths: List[str]) -> List[Tuple[Path, Path]]:
+    """
+    Разворачивает аргументы --batch в список (исходный файл, относительное имя результата).
+    Каталоги обходятся рекурсивно, '@file' читает список путей из файла.
+    """
+    sources = []
+    for raw in paths:
+        if raw.startswith("@"):
+            listed = Path(raw[1:]).read_text(encoding="utf-8").split()
+            sources.extend(collect_sources(listed))
+            continue
+
+        path = Path(raw)
+        if path.is_dir():
+            for src in sorted(path.rglob(f"*{SOURCE_SUFFIX}")):
+                sources.append((src, src.relative_to(path).with_suffix("")))
+        else:
+            sources.append((path, Path(path.stem)))
+    return sources
+
+def print_result(source: Path, result: CompileResult, source_code: str):
+    if result.success:
+        print(f"✅ {source}")
+        return
+
+    print(f"❌ {source} ({result.failed_stage})")
+    formatter = ErrorFormatter(source_code)
+    print(formatter.format_all(result.errors))
+
+def print_summary(stats: BatchStats):
+    print(f"📊 Пакетная компиляция: {stats.files} файлов за {stats.elapsed:.2f} с")
+    print(f"   Успешно: {stats.files - stats.failed}, с ошибками: {stats.failed}")
+    if stats.cached:
+        print(f"   Из кэша: {stats.cached}")
+    print(f"   Производительность: {stats.files_per_second:.1f} файлов/с, "
+          f"{stats.tokens_per_second:.0f} токенов/с")
+
+_worker_toolchain = None
+
+def _init_worker(options: dict = None):
+    """Инициализатор процесса-воркера: один прогретый тулчейн на процесс"""
+    global _worker_toolchain
+    # Весь вывод делает родительский процесс, иначе порядок строк зависит от планировщика
+    sys.stdout = open(os.devnull, "w")
+    _worker_toolchain = Toolchain(options=options)
+    _worker_toolchain.warm_up()
+
+def _compile_in_worker(source: str) -> dict:
+    source_code = Path(source).read_text(encoding="utf-8")
+    return _worker_toolchain.compile_source(source_code).to_dict()
+
+def resolve_jobs(jobs: int) -> int:
+    """-j 0 означает «по числу ядер»"""
+    return jobs if jobs > 0 else (os.cpu_count() or 1)
+
+def iter_results(sources: List[Tuple[Path, Path]], jobs: int = 1,
+                 options: dict = None) -> Iterator[CompileResult]:
+    """
+    Компилирует файлы и выдаёт результаты строго в порядке sources,
+    независимо от того, в каком порядке их закончили воркеры.
+    """
+    if jobs <= 1:
+        toolchain = Toolchain(options=options)
+        for source, _ in sources:
+            yield toolchain.compile_source(source.read_text(encoding="utf-8"))
+        return
+
+    paths = [str(source) for source, _ in sources]
+    chunksize = max(1, len(paths) // (jobs * 4))
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(options,)) as pool:
+        for payload in pool.map(_compile_in_worker, paths, chunksize=chunksize):
+            yield CompileResult.from_dict(payload)
+
+def _entry_from_result(result: CompileResult) -> CacheEntry:
+    return CacheEntry(
+        il_code=result.il_code,
+        diagnostics=[e.to_dict() for e in result.errors],
+        failed_stage=result.failed_stage,
+        token_count=result.token_count,
+    )
+
+def _result_from_entry(entry: CacheEntry) -> CompileResult:
+    return CompileResult(
+        il_code=entry.il_code,
+        errors=[CompilerError.from_dict(d) for d in entry.diagnostics],
+        failed_stage=entry.failed_stage,
+        token_count=entry.token_count,
+    )
+
+def iter_cached_results(sources: List[Tuple[Path, Path]], jobs: int = 1,
+                        cache: CompilationCache = None,
+                        options: dict = None) -> Iterator[Tuple[CompileResult, Optional[CacheEntry], str]]:
+    """
+    Как iter_results, но сначала ищет каждый файл в кэше: компилируются только промахи.
+    Выдаёт (результат, запись кэша или None, ключ кэша) в порядке sources.
+    """
+    if cache is None:
+        for result in iter_results(sources, jobs, options):
+            yield result, None, None
+        return
+
+    keys = [cache.key(source.read_text(encoding="utf-8"), options) for source, _ in sources]
+    entries = [cache.get(key) for key in keys]
+    misses = [src for src, entry in zip(sources, entries) if entry is None]
+    compiled = iter_results(misses, jobs, options)
+
+    for key, entry in zip(keys, entries):
+        if entry is not None:
+            yield _result_from_entry(entry), entry, key
+            continue
+        result = next(compiled)
+        entry = _entry_from_result(result)
+        cache.put(key, entry)
+        yield result, None, key
+
+def run_batch(paths: List[str], output_dir: str = ".", jobs: int = 1,
+              verbose: bool = True, cache: CompilationCache = None,
+              options: dict = None) -> BatchStats:
+    """Компилирует набор файлов и записывает IL (и .exe, если доступен ilasm)"""
+    sources = collect_sources(paths)
+    out_root = Path(output_dir)
+    has_ilasm = shutil.which("ilasm") is not None
+    if verbose and sources and not has_ilasm:
+        print("⚠️  ilasm не найден: будут сгенерированы только IL файлы")
+
+    stats = BatchStats()
+    start = time.perf_counter()
+
+    for (source, rel_name), (result, cached, key) in zip(
+            sources, iter_cached_results(sources, jobs, cache, options)):
+        stats.files += 1
+        stats.tokens += result.token_count
+        if cached is not None:
+            stats.cached += 1
+
+        if result.success:
+            il_file = out_root / rel_name.with_suffix(".il")
+            exe_file = il_file.with_suffix(".exe")
+            il_file.parent.mkdir(parents=True, exist_ok=True)
+            with phase("write") as record:
+                il_file.write_text(result.il_code, encoding="utf-8")
+                record.count(bytes=len(result.il_code))
+
+            if cached is not None and cached.exe_bytes is not None:
+                exe_file.write_bytes(cached.exe_bytes)
+            elif has_ilasm:
+                asm = assemble_il(str(il_file), str(exe_file))
+                if asm.returncode != 0:
+                    stats.failed += 1
+                    if verbose:
+                        print(f"❌ {source} (ilasm)")
+                        print(asm.stdout)
+                        print(asm.stderr)
+                    continue
+                if cache is not None:
+                    entry = cached or _entry_from_result(result)
+                    entry.exe_bytes = exe_file.read_bytes()
+                    cache.put(key, entry)
+        else:
+            stats.failed += 1
+
+        if verbose:
+            source_code = "" if result.success else source.read_text(encoding="utf-8")
+            print_result(source, result, source_code)
+
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+def compile_batch(paths: List[str], output_dir: str = ".", jobs: int = 1,
+                  cache: CompilationCache = None, options: dict = None) -> bool:
+    """Компилирует набор файлов в одном процессе или в пуле из jobs процессов"""
+    stats = run_batch(paths, output_dir, resolve_jobs(jobs), cache=cache, options=options)
+    if not stats.files:
+        print("❌ Не найдено ни одного файла .imgl")
+        return False
+
+    print_summary(stats)
+    return stats.failed == 0
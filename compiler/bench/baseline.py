@@ -0,0 +1,66 @@
+"""
+JSON-базлайны бенчмарков: сохранение результатов и сравнение с прошлым запуском.
+
+Файл - {"meta": {...}, "results": {ключ: {метрика: число}}}. Ключ описывает
+вход (например "procs=40"), метрики - замеры на нём. Сравниваются только ключи
+и метрики, которые есть в обоих файлах.
+"""
+import json
+import platform
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List
+
+def environment() -> dict:
+    """Где и чем получены замеры: без этого сравнение базлайнов ничего не значит"""
+    from version import compiler_fingerprint
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "compiler": compiler_fingerprint(),
+    }
+
+def save_baseline(path, results: Dict[str, Dict[str, float]], **meta):
+    data = {"meta": {**environment(), **meta}, "results": results}
+    Path(path).write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+def load_baseline(path) -> dict:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+@dataclass
+class Change:
+    key: str
+    metric: str
+    before: float
+    after: float
+
+    @property
+    def ratio(self) -> float:
+        return self.after / self.before if self.before else float("inf")
+
+def compare(before: Dict[str, Dict[str, float]], after: Dict[str, Dict[str, float]]) -> List[Change]:
+    changes = []
+    for key, metrics in after.items():
+        for metric, value in metrics.items():
+            old = before.get(key, {}).get(metric)
+            if isinstance(old, (int, float)) and isinstance(value, (int, float)):
+                changes.append(Change(key, metric, old, value))
+    return changes
+
+def print_comparison(changes: List[Change], threshold: float) -> bool:
+    """
+    Печатает изменения метрик «меньше - лучше»; возвращает False, если хоть одна
+    выросла больше чем на threshold (доля: 0.1 - на 10%)
+    """
+    ok = True
+    print(f"{'вход':<24} {'метрика':<22} {'было':>12} {'стало':>12} {'изменение':>10}")
+    for change in changes:
+        regressed = change.ratio > 1 + threshold
+        improved = change.ratio < 1 - threshold
+        mark = "❌" if regressed else "✅" if improved else "  "
+        ok &= not regressed
+        print(f"{change.key:<24} {change.metric:<22} {change.before:>12.4g} {change.after:>12.4g} "
+              f"{(change.ratio - 1) * 100:>+9.1f}% {mark}")
+    return ok
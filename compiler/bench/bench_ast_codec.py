@@ -0,0 +1,55 @@
+"""
+Скорость круговой записи AST (parser.ast_codec) в сравнении с pickle и повторным разбором.
+Правильность записи проверяет tests/test_ast_codec.py.
+
+Запуск из каталога compiler/:
+    python -m bench.bench_ast_codec --repeat 20
+"""
+import argparse
+import pickle
+import time
+
+from bench.generator import generate_program
+from parser.ast_codec import encode_ast, decode_ast
+from toolchain import Toolchain
+
+def parse(toolchain: Toolchain, source: str):
+    toolchain.lexer.reset(source)
+    toolchain.lexer.tokenize()
+    toolchain.parser.reset(toolchain.lexer.get_token_stream())
+    ast, errors = toolchain.parser.parse()
+    return None if errors else ast
+
+def best_of(repeat: int, func) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    arg_parser.add_argument("--procs", type=int, nargs="+", default=[5, 20, 80])
+    args = arg_parser.parse_args()
+
+    toolchain = Toolchain()
+    print(f"{'процедур':>9} {'AST, байт':>10} {'pickle, байт':>13} {'encode':>10} {'decode':>10} "
+          f"{'pickle.loads':>13} {'разбор':>11}")
+    for procs in args.procs:
+        source = generate_program(seed=procs, procs=procs)
+        ast = parse(toolchain, source)
+        data = encode_ast(ast)
+        pickled = pickle.dumps(ast, protocol=pickle.HIGHEST_PROTOCOL)
+
+        encode_ms = best_of(args.repeat, lambda: encode_ast(ast))
+        decode_ms = best_of(args.repeat, lambda: decode_ast(data))
+        unpickle_ms = best_of(args.repeat, lambda: pickle.loads(pickled))
+        parse_ms = best_of(max(1, args.repeat // 10), lambda: parse(toolchain, source))
+        print(f"{procs:>9} {len(data):>10} {len(pickled):>13} {encode_ms:>7.2f} мс {decode_ms:>7.2f} мс "
+              f"{unpickle_ms:>10.2f} мс {parse_ms:>8.1f} мс")
+
+if __name__ == "__main__":
+    main()
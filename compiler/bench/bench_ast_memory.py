@@ -0,0 +1,114 @@
+"""
+Память, которую занимает AST: байт на строку исходника и на узел.
+
+Для сгенерированных программ растущего размера AST строится выбранным парсером,
+после чего считается его полный размер: сумма sys.getsizeof по всем объектам,
+достижимым из корня (узлы, списки, строки, числа, позиции, типы), каждый объект
+один раз. Перечисления и классы не считаются - они общие для всех программ.
+Отдельно печатается пик tracemalloc во время разбора (токены + AST).
+
+    python -m bench.bench_ast_memory --sizes 10 40 160 --save ast_memory.json
+    python -m bench.bench_ast_memory --compare ast_memory.json
+
+Запуск из каталога compiler/.
+"""
+import argparse
+import sys
+import tracemalloc
+from enum import Enum
+
+from bench.baseline import compare, load_baseline, print_comparison, save_baseline
+from bench.generator import generate_program
+from parser import PARSER_ENGINES, DEFAULT_PARSER_ENGINE
+from phases import count_ast_nodes
+from toolchain import Toolchain
+
+def _slot_names(cls) -> list:
+    names = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get("__slots__", ())
+        names.extend((slots,) if isinstance(slots, str) else slots)
+    return names
+
+def deep_size(root) -> int:
+    """Размер всех объектов, достижимых из root (каждый объект учитывается один раз)"""
+    seen, stack, total = set(), [root], 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, Enum)) or obj is None or obj is True or obj is False:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif not isinstance(obj, (str, int, float, bytes)):
+            d = getattr(obj, "__dict__", None)
+            if d is not None:
+                stack.append(d)
+            for name in _slot_names(type(obj)):
+                if name not in ("__dict__", "__weakref__") and hasattr(obj, name):
+                    stack.append(getattr(obj, name))
+    return total
+
+def measure(toolchain: Toolchain, source: str) -> dict:
+    lexer, parser = toolchain.lexer, toolchain.parser
+    tracemalloc.start()
+    lexer.reset(source)
+    lexer.tokenize()
+    parser.reset(lexer.get_token_stream())
+    ast, errors = parser.parse()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert not errors and ast is not None, errors
+    lines = source.count("\n") + 1
+    size = deep_size(ast)
+    nodes = count_ast_nodes(ast)
+    return {"lines": lines, "nodes": nodes, "ast_bytes": size, "bytes_per_line": size / lines,
+            "bytes_per_node": size / nodes, "parse_peak_bytes": peak}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 40, 160],
+                            help="число процедур в программе")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--structs-ratio", type=float, default=0.25, help="структур на одну процедуру")
+    arg_parser.add_argument("--parser", choices=PARSER_ENGINES, default=DEFAULT_PARSER_ENGINE)
+    arg_parser.add_argument("--save", metavar="FILE", help="сохранить результаты как JSON-базлайн")
+    arg_parser.add_argument("--compare", metavar="FILE", help="сравнить с сохранённым базлайном")
+    arg_parser.add_argument("--threshold", type=float, default=0.02,
+                            help="допустимый рост памяти при --compare (доля)")
+    args = arg_parser.parse_args()
+
+    toolchain = Toolchain(incremental=False, options={"parser": args.parser})
+    toolchain.warm_up()
+
+    print(f"{'процедур':>9} {'строк':>7} {'узлов':>8} {'AST, КБ':>9} {'байт/строку':>12} "
+          f"{'байт/узел':>10} {'пик разбора, КБ':>16}")
+    results = {}
+    for size in args.sizes:
+        source = generate_program(seed=args.seed + size, procs=size, structs=round(size * args.structs_ratio),
+                                  inheritance=2)
+        row = measure(toolchain, source)
+        print(f"{size:>9} {row['lines']:>7} {row['nodes']:>8} {row['ast_bytes'] / 1024:>9.0f} "
+              f"{row['bytes_per_line']:>12.0f} {row['bytes_per_node']:>10.1f} "
+              f"{row['parse_peak_bytes'] / 1024:>16.0f}")
+        results[f"procs={size}"] = row
+
+    if args.save:
+        save_baseline(args.save, results, seed=args.seed, structs_ratio=args.structs_ratio, parser=args.parser)
+        print(f"\n✓ Базлайн сохранён: {args.save}")
+
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        print()
+        changes = [c for c in compare(baseline["results"], results)
+                   if c.metric in ("bytes_per_line", "bytes_per_node", "parse_peak_bytes")]
+        if not print_comparison(changes, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Динамические метрики сгенерированного IL: сколько инструкций реально выполняется.
+
+Каждая программа корпуса (корректные примеры из examples/ и небольшие
+сгенерированные программы) компилируется и выполняется симулятором CIL
+(bench/cil_sim.py) на синтетических картинках фиксированного размера.
+Печатается число выполненных инструкций, вызовов методов и вызовов рантайма;
+--opcodes добавляет самые частые коды операций по всему корпусу.
+
+В базлайн кроме счётчиков записывается хэш вывода программы и сохранённых
+картинок: при --compare расхождение хэша означает, что правка генератора
+изменила поведение программы, и считается ошибкой независимо от счётчиков.
+
+    python -m bench.bench_dynamic --compare
+    python -m bench.bench_dynamic --save
+    python -m bench.bench_dynamic -O1 --compare bench/baselines/dynamic.json
+
+С -O1 базлайн свой (dynamic_O1.json); сравнение с базлайном без оптимизаций
+проверяет, что оптимизации не меняют поведение программ.
+
+Запуск из каталога compiler/.
+"""
+import argparse
+import hashlib
+import sys
+from collections import Counter
+from pathlib import Path
+
+from bench.baseline import compare, load_baseline, print_comparison, save_baseline
+from bench.cil_sim import SimulationError, simulate_source
+from bench.generator import generate_program
+from bench.sim_runtime import Runtime, RuntimeFault
+from codegen import OPT_LEVELS, DEFAULT_OPT_LEVEL
+from toolchain import Toolchain
+
+EXAMPLES_DIR = Path(__file__).resolve().parent.parent.parent / "examples"
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+def baseline_file(opt_level: int) -> Path:
+    return BASELINE_DIR / ("dynamic.json" if opt_level == 0 else f"dynamic_O{opt_level}.json")
+
+# Ввод для примеров с read_int/read_float
+STDIN = ("5", "2.5", "3", "1.5")
+
+# Примеры, которым нужны картинки не меньше заданного размера (координаты зашиты в коде)
+IMAGE_SIZES = {"struct_correct_Brighten_In_BB": (100, 100)}
+
+COLUMNS = (("steps", "инструкций"), ("calls", "вызовов"), ("runtime_calls", "рантайм"))
+
+def corpus(size: int):
+    """(имя, исходник): примеры из examples/ и небольшие сгенерированные программы"""
+    for path in sorted((EXAMPLES_DIR / "correct_examples").rglob("*.imgl")):
+        yield path.stem, path.read_text(encoding="utf-8")
+    for seed in range(size):
+        yield f"gen_{seed:03d}", generate_program(seed=seed, procs=4, statements=6, filters=1,
+                                                  structs=3, inheritance=2)
+
+def behaviour_digest(result) -> str:
+    """Хэш наблюдаемого поведения: вывод и сохранённые картинки"""
+    digest = hashlib.sha1(result.output.encode("utf-8"))
+    for path in sorted(result.saved_images):
+        digest.update(path.encode("utf-8"))
+        digest.update(result.saved_images[path].tobytes())
+    return digest.hexdigest()[:16]
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--corpus", type=int, default=20, help="сгенерированных программ")
+    arg_parser.add_argument("--image-size", type=int, nargs=2, default=[32, 32], metavar=("W", "H"))
+    arg_parser.add_argument("--max-steps", type=int, default=2_000_000,
+                            help="программы дороже лимита пропускаются")
+    arg_parser.add_argument("--opcodes", type=int, default=0, metavar="N",
+                            help="напечатать N самых частых кодов операций")
+    arg_parser.add_argument("-O", dest="opt_level", type=int, choices=OPT_LEVELS, default=DEFAULT_OPT_LEVEL,
+                            help="уровень оптимизации IL")
+    arg_parser.add_argument("--save", metavar="FILE", nargs="?", const="",
+                            help="сохранить счётчики и хэши как базлайн (по умолчанию - базлайн уровня -O)")
+    arg_parser.add_argument("--compare", metavar="FILE", nargs="?", const="",
+                            help="сравнить с сохранённым базлайном (по умолчанию - базлайн уровня -O)")
+    args = arg_parser.parse_args()
+
+    toolchain = Toolchain(incremental=False, options={"opt_level": args.opt_level})
+    results, digests, opcodes = {}, {}, Counter()
+    print(f"{'программа':<36} " + " ".join(f"{title:>12}" for _, title in COLUMNS))
+    for name, source in corpus(args.corpus):
+        runtime = Runtime(default_size=IMAGE_SIZES.get(name, tuple(args.image_size)), stdin=STDIN)
+        try:
+            compiled, result = simulate_source(source, toolchain, runtime, args.max_steps)
+        except (SimulationError, RuntimeFault) as e:
+            print(f"❌ {name}: {type(e).__name__}: {e}")
+            continue
+        if result is None:
+            print(f"❌ {name}: {compiled.failed_stage}")
+            continue
+        row = {"steps": result.steps, "calls": sum(result.call_counts.values()),
+               "runtime_calls": sum(result.runtime_calls.values())}
+        results[name] = row
+        digests[name] = behaviour_digest(result)
+        opcodes.update(result.opcode_counts)
+        print(f"{name:<36} " + " ".join(f"{row[key]:>12}" for key, _ in COLUMNS))
+
+    total = {key: sum(row[key] for row in results.values()) for key, _ in COLUMNS}
+    results["total"] = total
+    print(f"{'итого':<36} " + " ".join(f"{total[key]:>12}" for key, _ in COLUMNS))
+
+    if args.opcodes:
+        print()
+        steps = total["steps"] or 1
+        for opcode, count in opcodes.most_common(args.opcodes):
+            print(f"  {opcode:<16} {count:>12} {count / steps:>7.1%}")
+
+    if args.save is not None:
+        path = Path(args.save or baseline_file(args.opt_level))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        save_baseline(path, results, corpus=args.corpus, image_size=args.image_size,
+                      max_steps=args.max_steps, opt_level=args.opt_level, digests=digests)
+        print(f"\n✓ Базлайн сохранён: {path}")
+
+    if args.compare is not None:
+        baseline = load_baseline(args.compare or baseline_file(args.opt_level))
+        print()
+        ok = True
+        for name, digest in baseline["meta"].get("digests", {}).items():
+            if name in digests and digests[name] != digest:
+                print(f"❌ {name}: поведение программы изменилось")
+                ok = False
+        changes = [c for c in compare(baseline["results"], results) if c.before != c.after]
+        if not changes:
+            print("✅ Счётчики не изменились")
+        elif not print_comparison(changes, threshold=0.0):
+            ok = False
+        if not ok:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Скорость генерации CIL: построение инструкций и вывод текста IL.
+
+Для каждой программы разбор и семантический анализ выполняются один раз, затем
+CILGenerator.generate повторяется --repeat раз и берётся лучшее время. Вывод
+текста (emitter.generate_code) замеряется отдельно, остальное - построение
+инструкций. «Память» - размер инструкций всех методов (deep_size), «тело, байт» -
+размер тел методов в сборке по кодировке ECMA-335 (code_size).
+
+    python -m bench.bench_emission --sizes 10 40 160 --save emission.json
+    python -m bench.bench_emission --compare emission.json
+
+Запуск из каталога compiler/.
+"""
+import argparse
+import sys
+import time
+
+from bench.baseline import compare, load_baseline, print_comparison, save_baseline
+from bench.bench_ast_memory import deep_size
+from bench.generator import generate_program
+from codegen.cil_generator import CILGenerator
+from codegen.cil_instructions import code_size
+from semantic.analyzer import SemanticAnalyzer
+from toolchain import Toolchain
+
+def best_time(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def measure(toolchain: Toolchain, source: str, repeat: int) -> dict:
+    lexer, parser = toolchain.lexer, toolchain.parser
+    lexer.reset(source)
+    lexer.tokenize()
+    parser.reset(lexer.get_token_stream())
+    ast, errors = parser.parse()
+    assert not errors and ast is not None, errors
+    analyzer = SemanticAnalyzer()
+    assert not analyzer.analyze(ast)
+
+    generator = CILGenerator(analyzer.symbol_table)
+    def generate():
+        generator.reset(analyzer.symbol_table)
+        return generator.generate(ast)
+
+    total = best_time(generate, repeat)
+    emitter = generator.emitter
+    render = best_time(emitter.generate_code, repeat)
+    instructions = [method.instructions for method in emitter.methods]
+    # позиции в исходнике принадлежат AST, инструкции только ссылаются на них
+    sources = list({id(ins.source): ins.source for body in instructions for ins in body}.values())
+    return {
+        "instructions": sum(len(body) for body in instructions),
+        "emit_ms": (total - render) * 1000,
+        "render_ms": render * 1000,
+        "instructions_bytes": deep_size(instructions) - deep_size(sources),
+        "code_bytes": sum(code_size(body) for body in instructions),
+    }
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 40, 160],
+                            help="число процедур в программе")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--save", metavar="FILE", help="сохранить результаты как JSON-базлайн")
+    arg_parser.add_argument("--compare", metavar="FILE", help="сравнить с сохранённым базлайном")
+    arg_parser.add_argument("--threshold", type=float, default=0.1,
+                            help="допустимое замедление при --compare (доля)")
+    args = arg_parser.parse_args()
+
+    toolchain = Toolchain(incremental=False)
+    toolchain.warm_up()
+
+    print(f"{'процедур':>9} {'инструкций':>11} {'генерация, мс':>14} {'вывод, мс':>10} "
+          f"{'мкс/инстр':>10} {'память, КБ':>11} {'тело, байт':>11}")
+    results = {}
+    for size in args.sizes:
+        source = generate_program(seed=args.seed + size, procs=size, structs=size // 4, inheritance=2)
+        row = measure(toolchain, source, args.repeat)
+        per_instruction = (row["emit_ms"] + row["render_ms"]) * 1000 / row["instructions"]
+        print(f"{size:>9} {row['instructions']:>11} {row['emit_ms']:>14.1f} {row['render_ms']:>10.1f} "
+              f"{per_instruction:>10.2f} {row['instructions_bytes'] / 1024:>11.0f} {row['code_bytes']:>11}")
+        results[f"procs={size}"] = row
+
+    if args.save:
+        save_baseline(args.save, results, seed=args.seed, repeat=args.repeat)
+        print(f"\n✓ Базлайн сохранён: {args.save}")
+
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        print()
+        changes = [c for c in compare(baseline["results"], results)
+                   if c.metric in ("emit_ms", "render_ms", "instructions_bytes")]
+        if not print_comparison(changes, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
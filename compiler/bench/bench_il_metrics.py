@@ -0,0 +1,109 @@
+"""
+Качество генерируемого IL: метрики bench/il_metrics.py по программам и методам.
+
+Компилируются корректные примеры из examples/ и сгенерированный корпус (с
+процедурами попиксельной обработки и структурами). Таблица показывает сумму по
+программе; --methods печатает каждый метод. Метрики детерминированы, поэтому
+базлайн сравнивается точно: любой рост метрики - регрессия генератора кода.
+Базлайн текущего генератора лежит в bench/baselines/il_metrics.json (с -O1 -
+il_metrics_O1.json); правка генератора кода, меняющая IL, обновляет его вместе
+с собой. Сравнение -O1 с базлайном без оптимизаций показывает, что даёт peephole.
+
+    python -m bench.bench_il_metrics --compare
+    python -m bench.bench_il_metrics --save
+    python -m bench.bench_il_metrics -O1 --compare bench/baselines/il_metrics.json
+
+Запуск из каталога compiler/.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from bench.baseline import compare, load_baseline, print_comparison, save_baseline
+from bench.generator import generate_program
+from codegen import OPT_LEVELS, DEFAULT_OPT_LEVEL
+from bench.il_metrics import program_metrics
+from toolchain import Toolchain
+
+EXAMPLES_DIR = Path(__file__).resolve().parent.parent.parent / "examples"
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+def baseline_file(opt_level: int) -> Path:
+    return BASELINE_DIR / ("il_metrics.json" if opt_level == 0 else f"il_metrics_O{opt_level}.json")
+
+COLUMNS = (
+    ("methods", "методов"), ("instructions", "инструкций"), ("code_bytes", "байт кода"), ("locals", "локальных"),
+    ("maxstack_declared", "maxstack"), ("maxstack_needed", "нужно"),
+    ("loop_instructions", "в циклах"), ("runtime_calls_in_loops", "вызовов в циклах"),
+    ("callvirt", "callvirt"),
+)
+
+def corpus(size: int):
+    """(имя, исходник): примеры из examples/ и сгенерированные программы"""
+    for path in sorted((EXAMPLES_DIR / "correct_examples").rglob("*.imgl")):
+        yield path.stem, path.read_text(encoding="utf-8")
+    for seed in range(size):
+        yield f"gen_{seed:03d}", generate_program(seed=seed, procs=6, filters=2, structs=4, inheritance=2)
+
+def print_row(name: str, metrics: dict, width: int):
+    print(f"{name:<{width}} " + " ".join(f"{metrics.get(key, ''):>{len(title)}}" for key, title in COLUMNS))
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--corpus", type=int, default=10, help="сгенерированных программ")
+    arg_parser.add_argument("--methods", action="store_true", help="печатать метрики каждого метода")
+    arg_parser.add_argument("-O", dest="opt_level", type=int, choices=OPT_LEVELS, default=DEFAULT_OPT_LEVEL,
+                            help="уровень оптимизации IL")
+    arg_parser.add_argument("--save", metavar="FILE", nargs="?", const="",
+                            help="сохранить метрики как базлайн (по умолчанию - базлайн уровня -O)")
+    arg_parser.add_argument("--compare", metavar="FILE", nargs="?", const="",
+                            help="сравнить с сохранённым базлайном (по умолчанию - базлайн уровня -O)")
+    args = arg_parser.parse_args()
+
+    toolchain = Toolchain(incremental=False, options={"opt_level": args.opt_level})
+    results, programs = {}, []
+    for name, source in corpus(args.corpus):
+        result = toolchain.compile_source(source)
+        if not result.success:
+            print(f"❌ {name}: {result.failed_stage}")
+            continue
+        totals, per_method = program_metrics(result.il_code)
+        programs.append((name, totals, per_method))
+        results[name] = totals
+        for method, metrics in per_method.items():
+            results[f"{name}/{method}"] = metrics
+
+    names = [name for name, _, _ in programs]
+    if args.methods:
+        names += [f"  {method}" for _, _, per_method in programs for method in per_method]
+    width = max([28] + [len(name) for name in names])
+    print(f"{'программа':<{width}} " + " ".join(title for _, title in COLUMNS))
+    summary = {}
+    for name, totals, per_method in programs:
+        print_row(name, totals, width)
+        if args.methods:
+            for method, metrics in per_method.items():
+                print_row(f"  {method}", metrics, width)
+        for key, value in totals.items():
+            summary[key] = max(summary.get(key, 0), value) if key.startswith("maxstack") else summary.get(key, 0) + value
+    print_row("итого", summary, width)
+    results["total"] = summary
+
+    if args.save is not None:
+        path = Path(args.save or baseline_file(args.opt_level))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        save_baseline(path, results, corpus=args.corpus, opt_level=args.opt_level)
+        print(f"\n✓ Базлайн сохранён: {path}")
+
+    if args.compare is not None:
+        baseline = load_baseline(args.compare or baseline_file(args.opt_level))
+        changes = [c for c in compare(baseline["results"], results) if c.before != c.after]
+        print()
+        if not changes:
+            print("✅ Метрики IL не изменились")
+        elif not print_comparison(changes, threshold=0.0):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Задержка перекомпиляции после правки одной функции при росте размера программы.
+
+Для каждого размера программа компилируется на прогретом тулчейне, затем в тело
+одной функции добавляется оператор и программа компилируется снова.
+Генерация кода с кэшем объявлений сравнивается с полной перегенерацией.
+
+Запуск из каталога compiler/:
+    python -m bench.bench_incremental --sizes 10 40 160 --repeat 5
+"""
+import argparse
+import time
+
+from bench.generator import generate_program
+from toolchain import Toolchain
+
+def edit_proc(source: str, index: int, serial: int) -> str:
+    """Добавляет оператор в начало тела proc_<index>, не меняя её сигнатуру"""
+    header = f"proc proc_{index}("
+    start = source.index(header)
+    body = source.index("{\n", start) + 2
+    return source[:body] + f"    write({serial});\n" + source[body:]
+
+def front_end(toolchain: Toolchain, source: str):
+    toolchain.lexer.reset(source)
+    toolchain.lexer.tokenize()
+    toolchain.parser.reset(toolchain.lexer.get_token_stream())
+    ast, errors = toolchain.parser.parse()
+    assert not errors, errors
+    toolchain.analyzer.reset()
+    assert not toolchain.analyzer.analyze(ast)
+    return ast
+
+def timed_recompile(toolchain: Toolchain, source: str):
+    """Возвращает (полное время, время генерации кода) в миллисекундах и IL"""
+    start = time.perf_counter()
+    ast = front_end(toolchain, source)
+    codegen_start = time.perf_counter()
+    toolchain.generator.reset(toolchain.analyzer.symbol_table)
+    il_code = toolchain.generator.generate(ast)
+    end = time.perf_counter()
+    return (end - start) * 1000, (end - codegen_start) * 1000, il_code
+
+def measure(procs: int, repeat: int, incremental: bool):
+    toolchain = Toolchain(incremental=incremental)
+    source = generate_program(seed=procs, procs=procs, statements=8)
+    timed_recompile(toolchain, source)
+
+    totals, codegens, outputs = [], [], []
+    for serial in range(repeat):
+        edited = edit_proc(source, procs // 2, serial)
+        total, codegen, il_code = timed_recompile(toolchain, edited)
+        totals.append(total)
+        codegens.append(codegen)
+        outputs.append(il_code)
+    return min(totals), min(codegens), outputs
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 40, 160])
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    print(f"{'процедур':>9} {'codegen полный':>15} {'codegen инкр.':>14} {'всего полный':>13} {'всего инкр.':>12}")
+    for procs in args.sizes:
+        full_total, full_codegen, full_il = measure(procs, args.repeat, incremental=False)
+        inc_total, inc_codegen, inc_il = measure(procs, args.repeat, incremental=True)
+        assert full_il == inc_il, "incremental codegen differs from full regeneration"
+        print(f"{procs:>9} {full_codegen:>12.2f} мс {inc_codegen:>11.2f} мс "
+              f"{full_total:>10.1f} мс {inc_total:>9.1f} мс")
+
+if __name__ == "__main__":
+    main()
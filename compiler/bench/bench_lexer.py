@@ -0,0 +1,39 @@
+"""
+Пропускная способность (токенов/с) табличного лексера (lexer/fast_lexer.py) и ImgLangLexer
+на сгенерированных программах разного размера. Совпадение токенов и ошибок обоих лексеров
+проверяет tests/test_lexer.py.
+
+Запуск из каталога compiler/:
+    python -m bench.bench_lexer --procs 10 40 160
+"""
+import argparse
+import time
+
+from bench.generator import generate_program
+from lexer.lexer import ImgLexer
+
+def throughput(source: str, engine: str, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens, _ = ImgLexer(source, engine).tokenize()
+        best = min(best, time.perf_counter() - start)
+    return len(tokens), best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--procs", type=int, nargs="+", default=[10, 40, 160])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    print(f"{'процедур':>9} {'токенов':>8} {'ANTLR, ток/с':>13} {'fast, ток/с':>12} {'ускорение':>10}")
+    for procs in args.procs:
+        source = generate_program(seed=procs, procs=procs)
+        count, antlr_time = throughput(source, "antlr", args.repeat)
+        _, fast_time = throughput(source, "fast", args.repeat)
+        print(f"{procs:>9} {count:>8} {count / antlr_time:>13.0f} {count / fast_time:>12.0f} "
+              f"{antlr_time / fast_time:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
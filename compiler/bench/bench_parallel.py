@@ -0,0 +1,47 @@
+"""
+Масштабирование пакетной компиляции (-j N) на сгенерированном корпусе.
+
+Запуск из каталога compiler/:
+    python -m bench.bench_parallel --files 64 --procs 40
+"""
+import argparse
+import os
+import tempfile
+
+from batch import run_batch
+from bench.generator import write_corpus
+
+def job_counts(max_jobs: int):
+    jobs = 1
+    while jobs < max_jobs:
+        yield jobs
+        jobs *= 2
+    yield max_jobs
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--files", type=int, default=64)
+    arg_parser.add_argument("--procs", type=int, default=40)
+    arg_parser.add_argument("--statements", type=int, default=8)
+    arg_parser.add_argument("--max-jobs", type=int, default=os.cpu_count() or 1)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, "corpus")
+        write_corpus(corpus, args.files, procs=args.procs, statements=args.statements)
+
+        print(f"Корпус: {args.files} файлов, {args.procs} процедур в каждом")
+        print(f"{'jobs':>5} {'время, с':>10} {'файлов/с':>10} {'токенов/с':>12} {'ускорение':>10}")
+
+        baseline = None
+        for jobs in job_counts(args.max_jobs):
+            stats = run_batch([corpus], os.path.join(tmp, f"out_{jobs}"), jobs, verbose=False)
+            if stats.failed:
+                print(f"⚠️  {stats.failed} файлов не скомпилировано при -j {jobs}")
+            baseline = baseline or stats.elapsed
+            print(f"{jobs:>5} {stats.elapsed:>10.2f} {stats.files_per_second:>10.1f} "
+                  f"{stats.tokens_per_second:>12.0f} {baseline / stats.elapsed:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
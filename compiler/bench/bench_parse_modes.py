@@ -0,0 +1,63 @@
+"""
+Скорость разбора в режимах two-stage (SLL + откат на LL), sll и ll на больших
+сгенерированных программах. Для каждого режима проверяется, что AST совпадает
+с AST полного LL-разбора.
+
+Запуск из каталога compiler/:
+    python -m bench.bench_parse_modes --procs 10 40 160 --repeat 3
+"""
+import argparse
+import sys
+import time
+
+from bench.generator import generate_program
+from lexer.lexer import ImgLexer
+from parser.parser import ImgParser, PARSE_MODES
+
+def timed_parse(lexer: ImgLexer, parser: ImgParser, source: str):
+    lexer.reset(source)
+    lexer.tokenize()
+    parser.reset(lexer.get_token_stream())
+    start = time.perf_counter()
+    ast, errors = parser.parse()
+    elapsed = time.perf_counter() - start
+    assert not errors, errors
+    return elapsed, ast
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--procs", type=int, nargs="+", default=[10, 40, 160])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    print(f"{'процедур':>9} {'токенов':>8} {'режим':>10} {'первый':>10} {'лучший':>10} "
+          f"{'токенов/с':>10} {'откатов':>8} {'ускорение':>10}")
+    identical = True
+    for procs in args.procs:
+        source = generate_program(seed=procs, procs=procs)
+        reference_ast, reference_time = None, None
+
+        for mode in ("ll",) + tuple(m for m in PARSE_MODES if m != "ll"):
+            lexer = ImgLexer(source)
+            tokens, _ = lexer.tokenize()
+            parser = ImgParser(lexer.get_token_stream(), mode, engine="antlr")
+
+            first, ast = timed_parse(lexer, parser, source)
+            best = min([first] + [timed_parse(lexer, parser, source)[0] for _ in range(args.repeat - 1)])
+
+            if mode == "ll":
+                reference_ast, reference_time = ast, best
+            elif ast != reference_ast:
+                identical = False
+                print(f"❌ AST в режиме {mode} отличается от LL ({procs} процедур)")
+
+            print(f"{procs:>9} {len(tokens):>8} {mode:>10} {first * 1000:>7.0f} мс {best * 1000:>7.0f} мс "
+                  f"{len(tokens) / best:>10.0f} {parser.fallbacks:>8} {reference_time / best:>9.1f}x")
+
+    if not identical:
+        sys.exit(1)
+    print("✅ AST во всех режимах совпадают с полным LL")
+
+if __name__ == "__main__":
+    main()
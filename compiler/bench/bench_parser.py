@@ -0,0 +1,51 @@
+"""
+Скорость рукописного парсера (parser/direct_parser.py) против ANTLR + ASTBuilder: время
+от готового потока токенов до AST на сгенерированных программах. Эквивалентность AST и
+диагностики проверяет tests/test_parser.py.
+
+Запуск из каталога compiler/:
+    python -m bench.bench_parser --procs 10 40 160
+"""
+import argparse
+import time
+
+from bench.generator import generate_program
+from lexer.lexer import ImgLexer
+from parser.direct_parser import parse_tokens
+from parser.parser import ImgParser
+
+def best_of(repeat: int, func) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--procs", type=int, nargs="+", default=[10, 40, 160])
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    print(f"{'процедур':>9} {'токенов':>8} {'ANTLR+ASTBuilder':>17} {'direct':>10} {'ускорение':>10}")
+    lexer = ImgLexer()
+    parser = ImgParser(lexer.get_token_stream(), engine="antlr")
+    for procs in args.procs:
+        lexer.reset(generate_program(seed=procs, procs=procs))
+        tokens, _ = lexer.tokenize()
+        stream = lexer.get_token_stream()
+
+        def antlr():
+            stream.seek(0)
+            parser.reset(stream)
+            parser.parse()
+
+        antlr_time = best_of(args.repeat, antlr)
+        direct_time = best_of(args.repeat, lambda: parse_tokens(tokens))
+        print(f"{procs:>9} {len(tokens):>8} {antlr_time * 1000:>14.0f} мс {direct_time * 1000:>7.1f} мс "
+              f"{antlr_time / direct_time:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
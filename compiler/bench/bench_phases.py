@@ -0,0 +1,161 @@
+"""
+Пропускная способность фаз компилятора на сгенерированных программах растущего размера.
+
+Для каждого размера N генерируется программа с N процедурами (и структурами, если
+задано --structs-ratio) и отдельно замеряются ImgLexer.tokenize, ImgParser.parse,
+SemanticAnalyzer.analyze и CILGenerator.generate. Кроме времени печатается
+время на токен и показатель роста k между соседними размерами (время ~ токены^k):
+k заметно больше 1 означает сверхлинейное поведение фазы.
+
+Результаты можно сохранить как JSON-базлайн и сравнить со следующим запуском:
+    python -m bench.bench_phases --sizes 10 40 160 --save phases.json
+    python -m bench.bench_phases --sizes 10 40 160 --compare phases.json --threshold 0.15
+
+Запуск из каталога compiler/.
+"""
+import argparse
+import math
+import statistics
+import sys
+import time
+
+from bench.baseline import compare, load_baseline, print_comparison, save_baseline
+from bench.generator import generate_program
+from lexer import LEXER_ENGINES, DEFAULT_LEXER_ENGINE
+from parser import PARSER_ENGINES, DEFAULT_PARSER_ENGINE
+from parser.ast_codec import decode_ast, encode_ast
+from phases import count_ast_nodes
+from toolchain import Toolchain
+
+PHASES = ("lex", "parse", "semantic", "codegen")
+
+def timed(repeat: int, prepare, run) -> list:
+    """Время run(prepare()) в секундах для каждого повтора; prepare в замер не входит"""
+    samples = []
+    for _ in range(repeat):
+        state = prepare()
+        start = time.perf_counter()
+        run(state)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def measure(toolchain: Toolchain, source: str, repeat: int) -> dict:
+    lexer, parser = toolchain.lexer, toolchain.parser
+    analyzer, generator = toolchain.analyzer, toolchain.generator
+
+    def lex(_):
+        lexer.reset(source)
+        return lexer.tokenize()
+
+    def fresh_stream():
+        lex(None)
+        return lexer.get_token_stream()
+
+    def parse(stream):
+        parser.reset(stream)
+        return parser.parse()
+
+    ast, errors = parse(fresh_stream())
+    assert not errors and ast is not None, errors
+    tokens = len(lexer.get_token_stream().tokens)
+    # Анализатор и генератор дописывают в AST типы и параметр this: каждый повтор на свежей копии
+    encoded = encode_ast(ast)
+
+    def analyze(program):
+        analyzer.reset()
+        assert not analyzer.analyze(program)
+        return program
+
+    il_lines = 0
+
+    def generate(program):
+        nonlocal il_lines
+        generator.reset(analyzer.symbol_table)
+        il_lines = generator.generate(program).count("\n") + 1
+
+    samples = {
+        "lex": timed(repeat, lambda: None, lex),
+        "parse": timed(repeat, fresh_stream, parse),
+        "semantic": timed(repeat, lambda: decode_ast(encoded), analyze),
+        "codegen": timed(repeat, lambda: analyze(decode_ast(encoded)), generate),
+    }
+    return {
+        "tokens": tokens,
+        "ast_nodes": count_ast_nodes(ast),
+        "il_lines": il_lines,
+        "samples": samples,
+    }
+
+def growth(prev: dict, cur: dict, phase: str) -> float:
+    """Показатель k в time ~ tokens^k между двумя размерами"""
+    ratio = cur["tokens"] / prev["tokens"]
+    if ratio <= 1:
+        return float("nan")
+    return math.log(min(cur["samples"][phase]) / min(prev["samples"][phase])) / math.log(ratio)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 40, 160],
+                            help="число процедур в программе")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--statements", type=int, default=8)
+    arg_parser.add_argument("--depth", type=int, default=2, help="вложенность управляющих конструкций")
+    arg_parser.add_argument("--expr-depth", type=int, default=2, help="глубина выражений")
+    arg_parser.add_argument("--structs-ratio", type=float, default=0.25,
+                            help="структур на одну процедуру")
+    arg_parser.add_argument("--inheritance", type=int, default=2, help="длина цепочек наследования")
+    arg_parser.add_argument("--lexer", choices=LEXER_ENGINES, default=DEFAULT_LEXER_ENGINE)
+    arg_parser.add_argument("--parser", choices=PARSER_ENGINES, default=DEFAULT_PARSER_ENGINE)
+    arg_parser.add_argument("--save", metavar="FILE", help="сохранить результаты как JSON-базлайн")
+    arg_parser.add_argument("--compare", metavar="FILE", help="сравнить с сохранённым базлайном")
+    arg_parser.add_argument("--threshold", type=float, default=0.1,
+                            help="допустимое замедление при --compare (доля)")
+    args = arg_parser.parse_args()
+
+    knobs = {"statements": args.statements, "depth": args.depth, "expr_depth": args.expr_depth,
+             "inheritance": args.inheritance}
+    toolchain = Toolchain(incremental=False, options={"lexer": args.lexer, "parser": args.parser})
+    toolchain.warm_up()
+
+    print(f"{'процедур':>9} {'токенов':>8} {'узлов AST':>10} {'строк IL':>9}  "
+          + "  ".join(f"{phase + ', мс':>12} {'мкс/ток':>8} {'k':>5}" for phase in PHASES))
+    measured, results = [], {}
+    for size in args.sizes:
+        source = generate_program(seed=args.seed + size, procs=size,
+                                  structs=round(size * args.structs_ratio), **knobs)
+        cur = measure(toolchain, source, args.repeat)
+        cells = []
+        for phase in PHASES:
+            best = min(cur["samples"][phase])
+            k = growth(measured[-1], cur, phase) if measured else float("nan")
+            cells.append(f"{best * 1000:>12.2f} {best * 1e6 / cur['tokens']:>8.2f} "
+                         f"{'' if math.isnan(k) else f'{k:.2f}':>5}")
+        print(f"{size:>9} {cur['tokens']:>8} {cur['ast_nodes']:>10} {cur['il_lines']:>9}  " + "  ".join(cells))
+        measured.append(cur)
+
+        row = {"tokens": cur["tokens"], "ast_nodes": cur["ast_nodes"], "il_lines": cur["il_lines"]}
+        for phase in PHASES:
+            row[f"{phase}_min_s"] = min(cur["samples"][phase])
+            row[f"{phase}_median_s"] = statistics.median(cur["samples"][phase])
+        results[f"procs={size}"] = row
+
+    meta = {"knobs": knobs, "structs_ratio": args.structs_ratio, "seed": args.seed,
+            "repeat": args.repeat, "lexer": args.lexer, "parser": args.parser}
+    if args.save:
+        save_baseline(args.save, results, **meta)
+        print(f"\n✓ Базлайн сохранён: {args.save}")
+
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        if baseline["meta"].get("knobs") != knobs or baseline["meta"].get("seed") != args.seed:
+            print("\n⚠️  Базлайн снят с другими параметрами генератора: программы не совпадают")
+        print()
+        # Сравниваются лучшие времена: медиана на зашумлённой машине скачет сильнее
+        changes = [c for c in compare(baseline["results"], results) if c.metric.endswith("_min_s")]
+        if not print_comparison(changes, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
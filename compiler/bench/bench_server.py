@@ -0,0 +1,88 @@
+"""
+Задержка запросов к серверу компиляции в сравнении с холодным запуском main.py.
+
+Запуск из каталога compiler/:
+    python -m bench.bench_server --requests 200 --cold-runs 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.generator import write_corpus
+from client import CompileClient
+from server import percentile
+
+COMPILER_DIR = Path(__file__).resolve().parent.parent
+
+def wait_for_socket(path: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Server did not start: {path}")
+        time.sleep(0.05)
+
+def report(title: str, samples):
+    print(f"{title:<28} n={len(samples):<5} p50={percentile(samples, 50):8.1f} мс "
+          f"p99={percentile(samples, 99):8.1f} мс")
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--requests", type=int, default=200)
+    arg_parser.add_argument("--cold-runs", type=int, default=5)
+    arg_parser.add_argument("--files", type=int, default=20)
+    arg_parser.add_argument("--procs", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = write_corpus(tmp, args.files, procs=args.procs, statements=6)
+        socket_path = os.path.join(tmp, "bench.sock")
+
+        server = subprocess.Popen(
+            [sys.executable, "server.py", "--socket", socket_path],
+            cwd=COMPILER_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_for_socket(socket_path)
+            client = CompileClient(socket_path)
+
+            round_trips = []
+            for i in range(args.requests):
+                source = sources[i % len(sources)]
+                start = time.perf_counter()
+                response = client.request({
+                    "command": "compile",
+                    "source_file": str(source),
+                    "output_file": str(Path(tmp) / f"{source.stem}.exe"),
+                })
+                round_trips.append((time.perf_counter() - start) * 1000)
+                if response.get("failed_stage") not in (None, "ilasm"):
+                    print(f"⚠️  {source.name}: {response['failed_stage']}")
+
+            stats = client.request({"command": "stats"})
+            client.request({"command": "shutdown"})
+            client.close()
+        finally:
+            server.wait(timeout=30)
+
+        cold = []
+        for i in range(args.cold_runs):
+            source = sources[i % len(sources)]
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, "main.py", str(source), str(Path(tmp) / f"cold_{i}.exe")],
+                cwd=COMPILER_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            cold.append((time.perf_counter() - start) * 1000)
+
+    print(f"{'сервер (обработка)':<28} n={stats['requests']:<5} p50={stats['p50_ms']:8.1f} мс "
+          f"p99={stats['p99_ms']:8.1f} мс")
+    report("сервер (round-trip клиента)", round_trips)
+    report("холодный python main.py", cold)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Холодный старт компилятора: время импорта и задержка первой компиляции.
+
+Каждый замер - отдельный процесс python (лучший из --repeat):
+  * import main                      - только импорт модуля main.py;
+  * main.py --version                - весь путь до выхода без компиляции;
+  * попадание в кэш                  - повторная компиляция с --cache-dir;
+  * первая компиляция                - по умолчанию (fast + direct) и через ANTLR
+                                       (--lexer antlr --parser antlr) без файла DFA
+                                       и с заранее сохранённым --dfa-cache.
+Дополнительно проверяется, что --version и попадание в кэш не загружают ANTLR.
+
+Запуск из каталога compiler/:
+    python -m bench.bench_startup --repeat 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+COMPILER_DIR = Path(__file__).resolve().parent.parent
+EXAMPLE = COMPILER_DIR.parent / "examples" / "correct_examples" / "correct_Composite.imgl"
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+ANTLR_CHECK = ("import runpy, sys; sys.argv = {argv!r}\n"
+               "try:\n    runpy.run_path('main.py', run_name='__main__')\n"
+               "except SystemExit:\n    pass\n"
+               "print('ANTLR', any(m == 'antlr4' or m.startswith(('antlr4.', 'antlr.')) for m in sys.modules),"
+               " file=sys.stderr)")
+
+def run(args, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=COMPILER_DIR, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def import_time(repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=COMPILER_DIR,
+                             capture_output=True, text=True).stdout
+        samples.append(float(out))
+    return min(samples) * 1000
+
+def loads_antlr(argv) -> bool:
+    result = subprocess.run([sys.executable, "-c", ANTLR_CHECK.format(argv=["main.py"] + argv)],
+                            cwd=COMPILER_DIR, capture_output=True, text=True)
+    return "ANTLR True" in result.stderr
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--source", default=str(EXAMPLE))
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exe = os.path.join(tmp, "out.exe")
+        cache_dir = os.path.join(tmp, "cache")
+        dfa_file = os.path.join(tmp, "parser.dfa")
+        compile_args = ["main.py", args.source, exe]
+        antlr_args = compile_args + ["--lexer", "antlr", "--parser", "antlr"]
+
+        # Заполняем кэш компиляции и файл DFA
+        run(compile_args + ["--cache-dir", cache_dir], 1)
+        run(antlr_args + ["--dfa-cache", dfa_file], 1)
+
+        rows = [
+            ("import main", import_time(args.repeat)),
+            ("main.py --version", run(["main.py", "--version"], args.repeat)),
+            ("попадание в кэш", run(compile_args + ["--cache-dir", cache_dir], args.repeat)),
+            ("первая компиляция (fast + direct)", run(compile_args, args.repeat)),
+            ("первая компиляция ANTLR, без DFA", run(antlr_args, args.repeat)),
+            ("первая компиляция ANTLR, с --dfa-cache", run(antlr_args + ["--dfa-cache", dfa_file], args.repeat)),
+        ]
+        for name, ms in rows:
+            print(f"{name:<40} {ms:>8.1f} мс")
+
+        print()
+        ok = True
+        for name, argv in (("--version", ["--version"]),
+                           ("попадание в кэш", [args.source, exe, "--cache-dir", cache_dir])):
+            loaded = loads_antlr(argv)
+            ok &= not loaded
+            print(f"{'❌' if loaded else '✅'} {name}: ANTLR {'загружен' if loaded else 'не загружается'}")
+        print(f"   файл DFA: {os.path.getsize(dfa_file)} байт")
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Потоковая компиляция (streaming.py) против обычной: пик памяти и совпадение IL.
+
+Для сгенерированных программ растущего размера обе компиляции пишут IL в файл
+под tracemalloc. В обычном режиме пик растёт вместе с AST и IL всей программы,
+в потоковом - только с текстом исходника и сигнатурами; колонка «сверх текста»
+показывает пик потока без самого текста исходника.
+
+IL потока сравнивается с обычным после разбора bench/il_metrics.py: методы
+(сигнатуры, .locals, инструкции без комментариев) и поля структур должны совпасть,
+порядок методов не важен. Расхождение - ошибка.
+
+    python -m bench.bench_streaming --sizes 50 200 800
+    python -m bench.bench_streaming --compare streaming.json
+
+Запуск из каталога compiler/.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from bench.baseline import compare, load_baseline, print_comparison, save_baseline
+from bench.generator import generate_program
+from bench.il_metrics import parse_il
+from streaming import compile_streaming
+from toolchain import Toolchain
+
+def normalized(il_code: str):
+    """Методы и поля программы без порядка и комментариев"""
+    methods = {m.full_name: (m.return_type, m.parameters, m.is_static, m.locals, m.body)
+               for m in parse_il(il_code)}
+    fields = sorted(line.strip() for line in il_code.splitlines() if line.strip().startswith(".field"))
+    return methods, fields
+
+def peak_of(func) -> int:
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def measure(toolchain: Toolchain, source: str, workdir: str) -> dict:
+    source_file = os.path.join(workdir, "program.imgl")
+    normal_file = os.path.join(workdir, "normal.il")
+    stream_file = os.path.join(workdir, "stream.il")
+    with open(source_file, 'w', encoding='utf-8') as f:
+        f.write(source)
+
+    def normal():
+        result = toolchain.compile_source(source)
+        assert result.success, result.failed_stage
+        with open(normal_file, 'w', encoding='utf-8') as f:
+            f.write(result.il_code)
+
+    normal_peak = peak_of(normal)
+    stream_peak = peak_of(lambda: compile_streaming(source_file, stream_file))
+
+    with open(normal_file, encoding='utf-8') as f:
+        normal_il = f.read()
+    with open(stream_file, encoding='utf-8') as f:
+        stream_il = f.read()
+    text_bytes = sys.getsizeof(source)
+    return {"lines": source.count("\n") + 1, "normal_peak_bytes": normal_peak,
+            "stream_peak_bytes": stream_peak, "stream_over_text_bytes": stream_peak - text_bytes,
+            "same_il": normalized(normal_il) == normalized(stream_il)}
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 800],
+                            help="число процедур в программе")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--structs-ratio", type=float, default=0.25, help="структур на одну процедуру")
+    arg_parser.add_argument("--save", metavar="FILE", help="сохранить результаты как JSON-базлайн")
+    arg_parser.add_argument("--compare", metavar="FILE", help="сравнить с сохранённым базлайном")
+    arg_parser.add_argument("--threshold", type=float, default=0.05,
+                            help="допустимый рост пика потока при --compare (доля)")
+    args = arg_parser.parse_args()
+
+    toolchain = Toolchain(incremental=False)
+    toolchain.warm_up()
+
+    print(f"{'процедур':>9} {'строк':>7} {'обычный пик, КБ':>16} {'поток, КБ':>10} "
+          f"{'сверх текста, КБ':>17}  IL")
+    results, ok = {}, True
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            source = generate_program(seed=args.seed + size, procs=size,
+                                      structs=round(size * args.structs_ratio), inheritance=2)
+            row = measure(toolchain, source, workdir)
+            same = row.pop("same_il")
+            ok = ok and same
+            print(f"{size:>9} {row['lines']:>7} {row['normal_peak_bytes'] / 1024:>16.0f} "
+                  f"{row['stream_peak_bytes'] / 1024:>10.0f} {row['stream_over_text_bytes'] / 1024:>17.0f}  "
+                  f"{'совпадает' if same else '❌ расходится'}")
+            results[f"procs={size}"] = row
+
+    if args.save:
+        save_baseline(args.save, results, seed=args.seed, structs_ratio=args.structs_ratio)
+        print(f"\n✓ Базлайн сохранён: {args.save}")
+
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        print()
+        changes = [c for c in compare(baseline["results"], results) if c.metric == "stream_peak_bytes"]
+        if not print_comparison(changes, args.threshold):
+            ok = False
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
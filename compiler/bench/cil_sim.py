@@ -0,0 +1,645 @@
+"""
+Интерпретатор подмножества CIL, которое выдаёт CILEmitter: позволяет выполнить
+сгенерированный IL без ilasm и CLR, проверить его поведение и посчитать, сколько
+инструкций реально выполняется (по методам и по кодам операций).
+
+Поддерживаются локальные переменные и аргументы (в том числе адреса ldloca/ldarga
+и ldind/stind), арифметика и сравнения int32/float64, переходы, call/callvirt к
+методам Program, newobj/ldfld/stfld, статические поля и .cctor. Вызовы
+[ImgLangRuntime]Runtime выполняет bench/sim_runtime.py (изображения на NumPy).
+
+CILEmitter не записывает наследование в IL (все структуры extends System.Object),
+поэтому для виртуальных вызовов симулятору передаётся карта родителей структур
+(simulate_source берёт её из AST).
+
+Запуск из каталога compiler/:
+    python -m bench.cil_sim ../examples/correct_examples/correct_Threshold.imgl --image-size 32 32
+"""
+import argparse
+import math
+import re
+import struct
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from bench.il_metrics import ILMethod, call_signature, parse_il
+from bench.sim_runtime import EMPTY_COLOR, Runtime, RuntimeFault
+
+class SimulationError(Exception):
+    """IL нельзя выполнить: неизвестная инструкция, нарушение стека, исключение .NET"""
+
+class SimObject:
+    """Экземпляр структуры ImgLang (ссылочный тип Program/<имя>)"""
+    __slots__ = ("cls", "fields")
+
+    def __init__(self, cls: str):
+        self.cls = cls
+        self.fields: Dict[str, object] = {}
+
+    def __str__(self) -> str:
+        return self.cls.replace("/", "+")
+
+class Ref:
+    """Управляемый указатель: адрес локальной переменной, аргумента или поля"""
+    __slots__ = ("container", "key")
+
+    def __init__(self, container, key):
+        self.container = container
+        self.key = key
+
+    def get(self):
+        return self.container[self.key]
+
+    def set(self, value):
+        self.container[self.key] = value
+
+# Виды декодированных инструкций: цепочка сравнений в цикле интерпретатора идёт в этом порядке
+(LDLOC, LDC, STLOC, LDARG, BINARY, BRFALSE, BR, CALL, BRTRUE, BCMP, UNARY, RET, LDFLD, STFLD,
+ LDLOCA, LDARGA, LDIND, STIND, DUP, POP, NEWOBJ, STARG, LDSFLD, STSFLD, LDFLDA, NOP, END) = range(27)
+
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+def i4(value: int) -> int:
+    return ((value + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+def u4(value: int) -> int:
+    return value & 0xFFFFFFFF
+
+def _arith(int_op, float_op):
+    def op(a, b):
+        if type(a) is int and type(b) is int:
+            return int_op(a, b)
+        return float_op(a, b)
+    return op
+
+def _int_div(a: int, b: int) -> int:
+    if b == 0:
+        raise RuntimeFault("DivideByZeroException")
+    if a == INT_MIN and b == -1:
+        raise RuntimeFault("ArithmeticException: overflow in div")
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+def _int_rem(a: int, b: int) -> int:
+    if b == 0:
+        raise RuntimeFault("DivideByZeroException")
+    return 0 if b == -1 else a - b * _int_div(a, b)
+
+def _float_div(a: float, b: float) -> float:
+    if b == 0:
+        if a == 0 or math.isnan(a):
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+def _float_rem(a: float, b: float) -> float:
+    return math.nan if b == 0 or math.isinf(a) else math.fmod(a, b)
+
+def _unordered(a, b) -> bool:
+    return isinstance(a, float) and math.isnan(a) or isinstance(b, float) and math.isnan(b)
+
+def _un(compare):
+    """Сравнение .un: беззнаковое для целых, «истина при NaN» для вещественных"""
+    def op(a, b):
+        if type(a) is int and type(b) is int:
+            return compare(u4(a), u4(b))
+        return _unordered(a, b) or compare(a, b)
+    return op
+
+BINARY_OPS = {
+    "add": _arith(lambda a, b: i4(a + b), lambda a, b: a + b),
+    "sub": _arith(lambda a, b: i4(a - b), lambda a, b: a - b),
+    "mul": _arith(lambda a, b: i4(a * b), lambda a, b: a * b),
+    "div": _arith(_int_div, _float_div),
+    "rem": _arith(_int_rem, _float_rem),
+    "and": lambda a, b: a & b,
+    "or": lambda a, b: a | b,
+    "xor": lambda a, b: a ^ b,
+    "shl": lambda a, b: i4(a << (b & 31)),
+    "shr": lambda a, b: a >> (b & 31),
+    "shr.un": lambda a, b: i4(u4(a) >> (b & 31)),
+    "ceq": lambda a, b: int(a == b),
+    "cgt": lambda a, b: int(a > b),
+    "clt": lambda a, b: int(a < b),
+    "cgt.un": lambda a, b: int(_un(lambda x, y: x > y)(a, b)),
+    "clt.un": lambda a, b: int(_un(lambda x, y: x < y)(a, b)),
+}
+
+BRANCH_COMPARE = {
+    "beq": lambda a, b: a == b,
+    "bge": lambda a, b: a >= b,
+    "bgt": lambda a, b: a > b,
+    "ble": lambda a, b: a <= b,
+    "blt": lambda a, b: a < b,
+    "bne.un": lambda a, b: _unordered(a, b) or a != b,
+    "bge.un": _un(lambda a, b: a >= b),
+    "bgt.un": _un(lambda a, b: a > b),
+    "ble.un": _un(lambda a, b: a <= b),
+    "blt.un": _un(lambda a, b: a < b),
+}
+
+def _to_int(value, bits: int, signed: bool) -> int:
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            return -2 ** (bits - 1) if signed else 0
+        value = int(value)
+    mask = (1 << bits) - 1
+    value &= mask
+    if signed and value >> (bits - 1):
+        value -= 1 << bits
+    return value
+
+def _pow(x: float, y: float) -> float:
+    """Math.Pow: вместо исключений Python - NaN и бесконечности, как в .NET"""
+    try:
+        return math.pow(x, y)
+    except ZeroDivisionError:
+        return math.inf
+    except (OverflowError, ValueError):
+        return math.nan if x < 0 else math.inf
+
+def _neg(value):
+    return i4(-value) if type(value) is int else -value
+
+UNARY_OPS = {
+    "neg": _neg,
+    "not": lambda a: i4(~a),
+    "conv.i4": lambda a: _to_int(a, 32, True),
+    "conv.i": lambda a: _to_int(a, 32, True),
+    "conv.u4": lambda a: i4(_to_int(a, 32, False)),
+    "conv.i1": lambda a: _to_int(a, 8, True),
+    "conv.u1": lambda a: _to_int(a, 8, False),
+    "conv.i2": lambda a: _to_int(a, 16, True),
+    "conv.u2": lambda a: _to_int(a, 16, False),
+    "conv.i8": lambda a: _to_int(a, 64, True),
+    "conv.r8": float,
+    "conv.r4": lambda a: struct.unpack("f", struct.pack("f", float(a)))[0],
+    "conv.r.un": lambda a: float(u4(a)) if type(a) is int else float(a),
+}
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "0": "\0", '"': '"', "\\": "\\", "'": "'"}
+
+def decode_string(operand: str) -> str:
+    body = operand.strip()
+    if len(body) >= 2 and body[0] == body[-1] == '"':
+        body = body[1:-1]
+    return re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1), m.group(1)), body)
+
+def default_value(type_name: str):
+    """Значение по умолчанию для .locals init и неинициализированных полей"""
+    type_name = type_name.strip()
+    if type_name.endswith("&"):
+        return None
+    if type_name in ("int32", "bool", "uint8", "int16", "int64", "char", "uint32"):
+        return 0
+    if type_name in ("float64", "float32"):
+        return 0.0
+    if type_name.endswith("System.Drawing.Color"):
+        return EMPTY_COLOR
+    return None
+
+def _index(operand: str) -> int:
+    operand = operand.strip()
+    return int(operand[2:] if operand.startswith("V_") else operand)
+
+@dataclass
+class PreparedMethod:
+    method: ILMethod
+    code: List[Tuple[int, object]]
+    opcodes: List[str]
+    local_defaults: List[object]
+    returns_value: bool
+    hits: List[int] = field(default_factory=list)
+    calls: int = 0
+
+    @property
+    def full_name(self) -> str:
+        return self.method.full_name
+
+@dataclass
+class SimulationResult:
+    output: str
+    steps: int
+    elapsed: float
+    method_counts: Counter
+    opcode_counts: Counter
+    call_counts: Counter
+    runtime_calls: Counter
+    saved_images: dict
+    return_value: object = None
+
+class CILSimulator:
+    def __init__(self, il_code: str, runtime: Runtime = None, parents: Dict[str, str] = None,
+                 max_steps: int = None, strict_stack: bool = True):
+        self.runtime = runtime or Runtime()
+        self.parents = dict(parents or {})
+        self.max_steps = max_steps
+        self.strict_stack = strict_stack
+        self.methods: Dict[Tuple[str, str], PreparedMethod] = {}
+        for method in parse_il(il_code):
+            self.methods[(method.owner, method.name)] = self._prepare(method)
+        self.static_fields: Dict[str, object] = {}
+        self._ticks = 0
+        self.runtime_calls = Counter()
+        self._external = self._external_handlers()
+
+    # Декодирование
+
+    def _prepare(self, method: ILMethod) -> PreparedMethod:
+        labels, pc = {}, 0
+        for item in method.body:
+            if isinstance(item, str):
+                labels[item] = pc
+            else:
+                pc += 1
+
+        code, opcodes = [], []
+        for item in method.body:
+            if isinstance(item, str):
+                continue
+            op, operand = item.opcode, item.operand
+            try:
+                code.append(self._decode(op, operand, labels))
+            except (KeyError, ValueError) as e:
+                raise SimulationError(f"{method.full_name}: cannot decode '{op} {operand}': {e}") from None
+            opcodes.append(op)
+        # Страж за последней инструкцией: выполнение, дошедшее до конца метода без ret
+        code.append((END, None))
+        opcodes.append("<end>")
+
+        local_defaults = [default_value(" ".join(local.split()[:-1]) if local.split()[-1].startswith("V_")
+                                        else local) for local in method.locals]
+        return PreparedMethod(method, code, opcodes, local_defaults, method.return_type != "void",
+                              hits=[0] * len(code))
+
+    def _decode(self, op: str, operand: str, labels: Dict[str, int]) -> Tuple[int, object]:
+        base, _, suffix = op.partition(".")
+        if op.startswith("ldloca"):
+            return LDLOCA, _index(operand)
+        if op.startswith("ldarga"):
+            return LDARGA, _index(operand)
+        if base == "ldloc":
+            return LDLOC, int(suffix) if suffix.isdigit() else _index(operand)
+        if base == "stloc":
+            return STLOC, int(suffix) if suffix.isdigit() else _index(operand)
+        if base == "ldarg":
+            return LDARG, int(suffix) if suffix.isdigit() else _index(operand)
+        if base == "starg":
+            return STARG, _index(operand)
+        if op.startswith("ldc.i4"):
+            if suffix in ("i4", "i4.s"):
+                return LDC, i4(int(operand, 0))
+            return LDC, -1 if op == "ldc.i4.m1" else int(op.rsplit(".", 1)[1])
+        if op in ("ldc.r8", "ldc.r4"):
+            return LDC, float(operand)
+        if op == "ldstr":
+            return LDC, decode_string(operand)
+        if op == "ldnull":
+            return LDC, None
+        if op in BINARY_OPS:
+            return BINARY, BINARY_OPS[op]
+        if op in UNARY_OPS:
+            return UNARY, UNARY_OPS[op]
+        branch = op[:-2] if op.endswith(".s") else op
+        if branch in ("br", "leave"):
+            return BR, labels[operand]
+        if branch in ("brfalse", "brzero", "brnull"):
+            return BRFALSE, labels[operand]
+        if branch in ("brtrue", "brinst"):
+            return BRTRUE, labels[operand]
+        if branch in BRANCH_COMPARE:
+            return BCMP, (BRANCH_COMPARE[branch], labels[operand])
+        if op in ("call", "callvirt"):
+            instance, return_type, target, params = call_signature(operand)
+            owner, _, name = target.rpartition("::")
+            return CALL, (op == "callvirt", instance, owner, name, len(params) + instance,
+                          return_type != "void", params)
+        if op == "newobj":
+            _, _, target, params = call_signature(operand)
+            owner, _, name = target.rpartition("::")
+            return NEWOBJ, (owner, name, len(params))
+        if op == "ret":
+            return RET, None
+        if op in ("ldfld", "ldsfld", "stfld", "stsfld", "ldflda"):
+            field_type, _, target = operand.rpartition(" ")
+            owner, _, name = target.rpartition("::")
+            kind = {"ldfld": LDFLD, "ldsfld": LDSFLD, "stfld": STFLD, "stsfld": STSFLD, "ldflda": LDFLDA}[op]
+            if kind == STSFLD:
+                return kind, target
+            if kind == LDSFLD:
+                return kind, (target, default_value(field_type))
+            return kind, (name, default_value(field_type))
+        if base == "ldind" or op == "ldobj":
+            return LDIND, None
+        if base == "stind" or op == "stobj":
+            return STIND, None
+        if op == "dup":
+            return DUP, None
+        if op == "pop":
+            return POP, None
+        if op == "nop":
+            return NOP, None
+        raise ValueError("unsupported instruction")
+
+    # Внешние вызовы: Runtime, System.Drawing.Color, System.Object
+
+    def _external_handlers(self):
+        runtime = self.runtime
+
+        def write(args, params):
+            runtime.Write(args[0], params[0] if params else "object")
+
+        def color_component(index):
+            def get(args, params):
+                receiver = args[0]
+                if isinstance(receiver, Ref):
+                    receiver = receiver.get()
+                return receiver[index]
+            return get
+
+        handlers = {
+            "[ImgLangRuntime]Runtime::Write": write,
+            "[System.Drawing]System.Drawing.Color::get_A": color_component(0),
+            "[System.Drawing]System.Drawing.Color::get_R": color_component(1),
+            "[System.Drawing]System.Drawing.Color::get_G": color_component(2),
+            "[System.Drawing]System.Drawing.Color::get_B": color_component(3),
+            "[mscorlib]System.Object::.ctor": lambda args, params: None,
+            "[mscorlib]System.Math::Pow": lambda args, params: _pow(float(args[0]), float(args[1])),
+        }
+        for name in ("LoadImage", "SaveImage", "CreateImage", "GetWidth", "GetHeight", "ToColor",
+                     "GetPixel", "SetPixel", "Clamp", "ReadInt", "ReadFloat"):
+            method = getattr(runtime, name)
+            handlers[f"[ImgLangRuntime]Runtime::{name}"] = lambda args, params, method=method: method(*args)
+        return handlers
+
+    def _call_external(self, owner: str, name: str, args: list, params: list):
+        target = f"{owner}::{name}"
+        handler = self._external.get(target)
+        if handler is None:
+            raise SimulationError(f"Call to unknown external method {target}")
+        self.runtime_calls[target] += 1
+        # Верификатор .NET отверг бы float64 на месте int32: такой IL - ошибка генератора
+        for value, param in zip(args[len(args) - len(params):], params):
+            if param in ("int32", "bool") and isinstance(value, float):
+                raise SimulationError(f"float64 passed as {param} to {target}")
+        return handler(args, params)
+
+    # Выполнение
+
+    def _resolve_virtual(self, receiver, owner: str, name: str) -> Optional[PreparedMethod]:
+        cls = receiver.cls if isinstance(receiver, SimObject) else owner
+        while cls:
+            method = self.methods.get((cls, name))
+            if method is not None:
+                return method
+            cls = self.parents.get(cls)
+        return self.methods.get((owner, name))
+
+    def _construct(self, owner: str, name: str, args: list):
+        obj = SimObject(owner)
+        ctor = self.methods.get((owner, name))
+        if ctor is not None:
+            self.invoke(ctor, [obj] + args)
+        elif not owner.startswith("["):
+            raise SimulationError(f"Constructor {owner}::{name} not found")
+        return obj
+
+    def invoke(self, pm: PreparedMethod, args: list):
+        pm.calls += 1
+        code, hits = pm.code, pm.hits
+        local_vars = list(pm.local_defaults)
+        stack: list = []
+        push, pop = stack.append, stack.pop
+        pc = 0
+        max_steps = self.max_steps
+        try:
+            while True:
+                kind, arg = code[pc]
+                hits[pc] += 1
+                pc += 1
+                if kind == LDLOC:
+                    push(local_vars[arg])
+                elif kind == LDC:
+                    push(arg)
+                elif kind == STLOC:
+                    local_vars[arg] = pop()
+                elif kind == LDARG:
+                    push(args[arg])
+                elif kind == BINARY:
+                    b = pop()
+                    stack[-1] = arg(stack[-1], b)
+                elif kind == BRFALSE:
+                    if not pop():
+                        pc = arg
+                        if max_steps is not None:
+                            self._check_steps()
+                elif kind == BR:
+                    pc = arg
+                    if max_steps is not None:
+                        self._check_steps()
+                elif kind == CALL:
+                    virtual, instance, owner, name, argc, returns, params = arg
+                    call_args = stack[len(stack) - argc:] if argc else []
+                    del stack[len(stack) - argc:]
+                    if owner.startswith("["):
+                        result = self._call_external(owner, name, call_args, params)
+                    else:
+                        if instance and call_args[0] is None:
+                            raise RuntimeFault(f"NullReferenceException: call to {owner}::{name}")
+                        target = (self._resolve_virtual(call_args[0], owner, name) if virtual
+                                  else self.methods.get((owner, name)))
+                        if target is None:
+                            raise SimulationError(f"Method {owner}::{name} not found")
+                        result = self.invoke(target, call_args)
+                    if returns:
+                        push(result)
+                elif kind == BRTRUE:
+                    if pop():
+                        pc = arg
+                        if max_steps is not None:
+                            self._check_steps()
+                elif kind == BCMP:
+                    compare, target = arg
+                    b = pop()
+                    if compare(pop(), b):
+                        pc = target
+                        if max_steps is not None:
+                            self._check_steps()
+                elif kind == UNARY:
+                    stack[-1] = arg(stack[-1])
+                elif kind == RET:
+                    result = pop() if pm.returns_value else None
+                    if stack and self.strict_stack:
+                        raise SimulationError(f"{len(stack)} value(s) left on the stack at ret")
+                    return result
+                elif kind == LDFLD:
+                    obj = pop()
+                    if isinstance(obj, Ref):
+                        obj = obj.get()
+                    if obj is None:
+                        raise RuntimeFault(f"NullReferenceException: ldfld {arg[0]}")
+                    push(obj.fields.get(arg[0], arg[1]))
+                elif kind == STFLD:
+                    value = pop()
+                    obj = pop()
+                    if isinstance(obj, Ref):
+                        obj = obj.get()
+                    if obj is None:
+                        raise RuntimeFault(f"NullReferenceException: stfld {arg[0]}")
+                    obj.fields[arg[0]] = value
+                elif kind == LDLOCA:
+                    push(Ref(local_vars, arg))
+                elif kind == LDARGA:
+                    push(Ref(args, arg))
+                elif kind == LDIND:
+                    push(pop().get())
+                elif kind == STIND:
+                    value = pop()
+                    pop().set(value)
+                elif kind == DUP:
+                    push(stack[-1])
+                elif kind == POP:
+                    pop()
+                elif kind == NEWOBJ:
+                    owner, name, argc = arg
+                    ctor_args = stack[len(stack) - argc:] if argc else []
+                    del stack[len(stack) - argc:]
+                    push(self._construct(owner, name, ctor_args))
+                elif kind == STARG:
+                    args[arg] = pop()
+                elif kind == LDSFLD:
+                    push(self.static_fields.get(arg[0], arg[1]))
+                elif kind == STSFLD:
+                    self.static_fields[arg] = pop()
+                elif kind == LDFLDA:
+                    obj = pop()
+                    obj.fields.setdefault(arg[0], arg[1])
+                    push(Ref(obj.fields, arg[0]))
+                elif kind == NOP:
+                    pass
+                elif kind == END:
+                    raise SimulationError(f"{pm.full_name}: control falls off the end of the method")
+        except IndexError:
+            raise SimulationError(f"{pm.full_name}: stack underflow or bad local/argument index "
+                                  f"at instruction {pc - 1} ({pm.opcodes[pc - 1]})") from None
+
+    def _check_steps(self):
+        # Точная сумма дорогая: пересчитывается раз в 4096 переходов
+        self._ticks += 1
+        if self._ticks & 0xFFF:
+            return
+        steps = sum(sum(pm.hits) for pm in self.methods.values())
+        if steps > self.max_steps:
+            raise SimulationError(f"Step limit exceeded ({self.max_steps} instructions)")
+
+    def run(self, entry: Tuple[str, str] = ("Program", "Main")) -> SimulationResult:
+        start = time.perf_counter()
+        # Статические конструкторы (beforefieldinit): до точки входа
+        for (owner, name), pm in list(self.methods.items()):
+            if name == ".cctor":
+                self.invoke(pm, [])
+        main = self.methods.get(entry)
+        if main is None:
+            raise SimulationError(f"Entry point {entry[0]}::{entry[1]} not found")
+        value = self.invoke(main, [])
+        elapsed = time.perf_counter() - start
+        return self._result(value, elapsed)
+
+    def _result(self, value, elapsed: float) -> SimulationResult:
+        method_counts, opcode_counts, call_counts = Counter(), Counter(), Counter()
+        for pm in self.methods.values():
+            total = sum(pm.hits)
+            if total:
+                method_counts[pm.full_name] = total
+                call_counts[pm.full_name] = pm.calls
+            for opcode, hits in zip(pm.opcodes, pm.hits):
+                if hits:
+                    opcode_counts[opcode] += hits
+        return SimulationResult(
+            output=self.runtime.text,
+            steps=sum(method_counts.values()),
+            elapsed=elapsed,
+            method_counts=method_counts,
+            opcode_counts=opcode_counts,
+            call_counts=call_counts,
+            runtime_calls=Counter(self.runtime_calls),
+            saved_images=dict(self.runtime.saved),
+            return_value=value,
+        )
+
+def struct_parents(ast) -> Dict[str, str]:
+    """Родители структур в именах IL: Program/<структура> -> Program/<родитель>"""
+    from parser.ast import StructDecl
+    return {f"Program/{decl.name}": f"Program/{decl.parent}"
+            for decl in ast.declarations if isinstance(decl, StructDecl) and decl.parent}
+
+def simulate_il(il_code: str, runtime: Runtime = None, parents: Dict[str, str] = None,
+                max_steps: int = None) -> SimulationResult:
+    return CILSimulator(il_code, runtime, parents, max_steps).run()
+
+def simulate_source(source: str, toolchain=None, runtime: Runtime = None,
+                    max_steps: int = None) -> Tuple[object, Optional[SimulationResult]]:
+    """
+    Компилирует исходник на тулчейне и выполняет IL; возвращает (CompileResult,
+    SimulationResult или None при ошибке компиляции)
+    """
+    from toolchain import Toolchain
+    toolchain = toolchain or Toolchain(incremental=False)
+    result = toolchain.compile_source(source)
+    if not result.success:
+        return result, None
+    toolchain.lexer.reset(source)
+    toolchain.lexer.tokenize()
+    toolchain.parser.reset(toolchain.lexer.get_token_stream())
+    ast, _ = toolchain.parser.parse()
+    return result, simulate_il(result.il_code, runtime, struct_parents(ast), max_steps)
+
+def format_counts(result: SimulationResult, top: int) -> str:
+    lines = [f"Выполнено инструкций: {result.steps} за {result.elapsed:.2f} с", "", "По методам:"]
+    for name, count in result.method_counts.most_common(top):
+        lines.append(f"  {name:<48} {count:>12} ({result.call_counts[name]} вызовов)")
+    lines += ["", "По кодам операций:"]
+    for opcode, count in result.opcode_counts.most_common(top):
+        lines.append(f"  {opcode:<16} {count:>12} {count / result.steps:>7.1%}")
+    if result.runtime_calls:
+        lines += ["", "Вызовы рантайма:"]
+        for target, count in result.runtime_calls.most_common(top):
+            lines.append(f"  {target:<48} {count:>12}")
+    return "\n".join(lines)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__,
+                                         formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("file", help="исходник .imgl или готовый .il")
+    arg_parser.add_argument("--image-size", type=int, nargs=2, default=[100, 100], metavar=("W", "H"),
+                            help="размер картинок, которые возвращает load_image")
+    arg_parser.add_argument("--input", action="append", default=[], metavar="LINE",
+                            help="строка стандартного ввода для read_int/read_float (можно повторять)")
+    arg_parser.add_argument("--max-steps", type=int, default=100_000_000)
+    arg_parser.add_argument("--top", type=int, default=15)
+    args = arg_parser.parse_args()
+
+    path = Path(args.file)
+    runtime = Runtime(default_size=tuple(args.image_size), stdin=args.input, echo=True)
+    try:
+        if path.suffix == ".il":
+            result = simulate_il(path.read_text(encoding="utf-8"), runtime, max_steps=args.max_steps)
+        else:
+            compiled, result = simulate_source(path.read_text(encoding="utf-8"), runtime=runtime,
+                                               max_steps=args.max_steps)
+            if result is None:
+                print(f"❌ Ошибка компиляции ({compiled.failed_stage})")
+                sys.exit(1)
+    except (SimulationError, RuntimeFault) as e:
+        print(f"\n❌ {type(e).__name__}: {e}")
+        sys.exit(1)
+
+    print()
+    print(format_counts(result, args.top))
+
+if __name__ == "__main__":
+    main()
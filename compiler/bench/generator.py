@@ -0,0 +1,322 @@
+import random
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+@dataclass
+class ProcInfo:
+    name: str
+    params: List[Tuple[str, str, str]]
+    return_type: Optional[str]
+
+@dataclass
+class StructInfo:
+    name: str
+    parent: Optional[str]
+    fields: List[Tuple[str, str]]
+    methods: List[Tuple[str, str]]
+
+@dataclass
+class FunctionScope:
+    """Видимые переменные внутри генерируемой функции"""
+    scopes: List[List[Tuple[str, str]]] = field(default_factory=lambda: [[]])
+    readonly: set = field(default_factory=set)
+    counter: int = 0
+
+    def fresh(self, prefix: str) -> str:
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def declare(self, name: str, type_name: str):
+        self.scopes[-1].append((name, type_name))
+
+    def visible(self, type_name: str, writable: bool = False) -> List[str]:
+        return [
+            name for scope in self.scopes for name, t in scope
+            if t == type_name and not (writable and name in self.readonly)
+        ]
+
+class ProgramGenerator:
+    """
+    Детерминированный (по seed) генератор корректных программ ImgLang
+    для бенчмарков компилятора.
+
+    procs/filters - число обычных процедур и процедур попиксельной обработки,
+    statements - операторов в теле, depth - вложенность управляющих конструкций,
+    expr_depth - глубина дерева выражений, structs - число структур,
+    inheritance - длина цепочек наследования (структуры идут цепочками
+    S<i>_0 <- S<i>_1 <- ..., каждая добавляет поле и виртуальный метод
+    и переопределяет методы предков).
+    """
+
+    def __init__(self, seed: int = 0, procs: int = 10, statements: int = 8,
+                 depth: int = 2, filters: int = 1, structs: int = 0,
+                 inheritance: int = 0, expr_depth: int = 2):
+        self.rng = random.Random(seed)
+        self.num_procs = procs
+        self.num_statements = statements
+        self.max_depth = depth
+        self.num_filters = filters
+        self.num_structs = structs
+        self.inheritance = inheritance
+        self.expr_depth = expr_depth
+        self.procs: List[ProcInfo] = []
+        self.structs: List[StructInfo] = []
+        self.lines: List[str] = []
+        self.indent = 0
+
+    def generate(self) -> str:
+        for i in range(self.num_structs):
+            chain, level = divmod(i, self.inheritance + 1)
+            parent = self.structs[-1] if level else None
+            self._struct(f"S{chain}_{level}", parent)
+        for i in range(self.num_filters):
+            self._filter_proc(f"filter_{i}")
+        for i in range(self.num_procs):
+            self._proc(f"proc_{i}")
+        self._main()
+        return "\n".join(self.lines) + "\n"
+
+    def _line(self, text: str):
+        self.lines.append("    " * self.indent + text)
+
+    # Объявления
+
+    def _struct(self, name: str, parent: Optional[StructInfo]):
+        rng = self.rng
+        level = len(parent.methods) if parent else 0
+        field = (f"f{level}", rng.choice(["int", "float"]))
+        method = (f"m{level}", rng.choice(["int", "float"]))
+        info = StructInfo(name, parent.name if parent else None,
+                          (parent.fields if parent else []) + [field],
+                          (parent.methods if parent else []) + [method])
+
+        self._line(f"struct {name}" + (f" extends {parent.name}" if parent else "") + " {")
+        self.indent += 1
+        self._line(f"public {field[1]} {field[0]};")
+        self._line("")
+        self._line(f"public proc {name}(int a) {{")
+        self._line(f"    this.{field[0]} = " + ("a" if field[1] == "int" else "(float) a") + ";")
+        self._line("}")
+        for method_name, return_type in info.methods:
+            modifier = "virtual" if (method_name, return_type) == method else "override"
+            self._line("")
+            self._method(info, modifier, method_name, return_type)
+        self.indent -= 1
+        self._line("}")
+        self._line("")
+        self.structs.append(info)
+
+    def _method(self, info: StructInfo, modifier: str, name: str, return_type: str):
+        scope = FunctionScope()
+        scope.declare("a", "int")
+        # Только собственное поле: SemanticAnalyzer пока не ищет поля в базовых структурах
+        field_name, field_type = info.fields[-1]
+        scope.declare(f"this.{field_name}", field_type)
+        self._line(f"public {modifier} proc {name}(int a) -> {return_type} {{")
+        self.indent += 1
+        self._statements(scope, max(1, self.num_statements // 2), 1)
+        self._line(f"return {self._expr(scope, return_type, self.expr_depth)};")
+        self.indent -= 1
+        self._line("}")
+
+    def _proc(self, name: str):
+        rng = self.rng
+        params = [(f"a{i}", rng.choice(["int", "int", "float"]), "value")
+                  for i in range(rng.randint(1, 3))]
+        return_type = rng.choice(["int", "float", None])
+
+        scope = FunctionScope()
+        for p_name, p_type, _ in params:
+            scope.declare(p_name, p_type)
+
+        params_str = ", ".join(f"value {t} {n}" for n, t, _ in params)
+        arrow = f" -> {return_type}" if return_type else ""
+        self._line(f"proc {name}({params_str}){arrow} {{")
+        self.indent += 1
+        self._statements(scope, self.num_statements, 0)
+        if return_type:
+            self._line(f"return {self._expr(scope, return_type, self.expr_depth)};")
+        self.indent -= 1
+        self._line("}")
+        self._line("")
+        self.procs.append(ProcInfo(name, params, return_type))
+
+    def _filter_proc(self, name: str):
+        """Процедура попиксельной обработки, как в примерах из examples/"""
+        self._line(f"proc {name}(value image src, value int k, result image dst) {{")
+        self.indent += 1
+        self._line("int w = get_width(src);")
+        self._line("int h = get_height(src);")
+        self._line("dst = create_image(w, h);")
+        self._line("for (int x = 0; x < w; x = x + 1) {")
+        self._line("    for (int y = 0; y < h; y = y + 1) {")
+        self._line("        color c = (color) get_pixel(src, x, y);")
+        self._line("        int r = clamp(c.r + k, 0, 255);")
+        self._line("        int g = clamp(c.g * 2 - k, 0, 255);")
+        self._line("        int b = clamp((c.r + c.g + c.b) / 3, 0, 255);")
+        self._line("        set_pixel(dst, x, y, (pixel) to_color(r, g, b));")
+        self._line("    }")
+        self._line("}")
+        self.indent -= 1
+        self._line("}")
+        self._line("")
+
+    def _main(self):
+        scope = FunctionScope()
+        self._line("int seed = 7;")
+        scope.declare("seed", "int")
+        self._line("image img = create_image(4, 3);")
+        for i in range(self.num_filters):
+            self._line(f"image out{i};")
+            self._line(f"filter_{i}(img, {i + 1}, out{i});")
+        self._statements(scope, self.num_statements, 0)
+        for i, struct in enumerate(self.structs):
+            # Переменная типа корня иерархии: вызовы идут через виртуальную диспетчеризацию
+            root = struct
+            while root.parent:
+                root = next(s for s in self.structs if s.name == root.parent)
+            self._line(f"{root.name} o{i} = new {struct.name}({self._expr(scope, 'int', 1)});")
+            for method_name, _ in root.methods:
+                self._line(f"write(o{i}.{method_name}({self._expr(scope, 'int', 1)}));")
+        for proc in self.procs:
+            args = ", ".join(self._expr(scope, t, self.expr_depth - 1) for _, t, _ in proc.params)
+            if proc.return_type:
+                self._line(f"write({proc.name}({args}));")
+            else:
+                self._line(f"{proc.name}({args});")
+
+    # Операторы
+
+    def _statements(self, scope: FunctionScope, count: int, depth: int):
+        for _ in range(count):
+            self._statement(scope, depth)
+
+    def _statement(self, scope: FunctionScope, depth: int):
+        rng = self.rng
+        choices = ["decl", "decl", "assign", "write", "call"]
+        if depth < self.max_depth:
+            choices += ["if", "for", "while", "do"]
+        kind = rng.choice(choices)
+
+        if kind == "assign" and not (scope.visible("int", True) or scope.visible("float", True)):
+            kind = "decl"
+        if kind == "call" and not [p for p in self.procs if p.return_type is None]:
+            kind = "write"
+
+        if kind == "decl":
+            type_name = rng.choice(["int", "int", "float", "bool"])
+            name = scope.fresh("v")
+            self._line(f"{type_name} {name} = {self._expr(scope, type_name, self.expr_depth)};")
+            scope.declare(name, type_name)
+        elif kind == "assign":
+            type_name = "int" if scope.visible("int", True) else "float"
+            if scope.visible("float", True) and rng.random() < 0.3:
+                type_name = "float"
+            name = rng.choice(scope.visible(type_name, True))
+            self._line(f"{name} = {self._expr(scope, type_name, self.expr_depth)};")
+        elif kind == "write":
+            self._line(f"write({self._expr(scope, rng.choice(['int', 'float']), self.expr_depth)});")
+        elif kind == "call":
+            proc = rng.choice([p for p in self.procs if p.return_type is None])
+            args = ", ".join(self._expr(scope, t, self.expr_depth - 1) for _, t, _ in proc.params)
+            self._line(f"{proc.name}({args});")
+        elif kind == "if":
+            self._line(f"if ({self._expr(scope, 'bool', self.expr_depth)}) {{")
+            self._block(scope, depth)
+            self._line("} else {")
+            self._block(scope, depth)
+            self._line("}")
+        elif kind == "for":
+            var = scope.fresh("i")
+            self._line(f"for (int {var} = 0; {var} < {rng.randint(2, 5)}; {var} = {var} + 1) {{")
+            scope.scopes.append([(var, "int")])
+            scope.readonly.add(var)
+            self._block(scope, depth)
+            scope.scopes.pop()
+            self._line("}")
+        elif kind == "while":
+            var = scope.fresh("w")
+            self._line(f"int {var} = 0;")
+            scope.declare(var, "int")
+            scope.readonly.add(var)
+            self._line(f"while ({var} < {rng.randint(2, 5)}) {{")
+            self._block(scope, depth, tail=f"{var} = {var} + 1;")
+            self._line("}")
+        elif kind == "do":
+            var = scope.fresh("d")
+            self._line(f"int {var} = 0;")
+            scope.declare(var, "int")
+            scope.readonly.add(var)
+            self._line("do {")
+            self._block(scope, depth, tail=f"{var} = {var} + 1;")
+            self._line(f"}} until ({var} >= {rng.randint(2, 5)});")
+
+    def _block(self, scope: FunctionScope, depth: int, tail: str = None):
+        self.indent += 1
+        scope.scopes.append([])
+        self._statements(scope, max(1, self.num_statements // 3), depth + 1)
+        if tail:
+            self._line(tail)
+        scope.scopes.pop()
+        self.indent -= 1
+
+    # Выражения
+
+    def _expr(self, scope: FunctionScope, type_name: str, depth: int) -> str:
+        rng = self.rng
+        if type_name == "bool":
+            if depth > 0 and rng.random() < 0.3:
+                op = rng.choice(["&&", "||"])
+                return f"({self._expr(scope, 'bool', depth - 1)} {op} {self._expr(scope, 'bool', depth - 1)})"
+            operand = rng.choice(["int", "float"])
+            op = rng.choice(["<", ">", "<=", ">=", "==", "!="])
+            return f"{self._expr(scope, operand, depth - 1)} {op} {self._expr(scope, operand, depth - 1)}"
+
+        if depth <= 0 or rng.random() < 0.3:
+            return self._atom(scope, type_name)
+
+        roll = rng.random()
+        if roll < 0.55:
+            op = rng.choice(["+", "-", "*"])
+            return f"({self._expr(scope, type_name, depth - 1)} {op} {self._expr(scope, type_name, depth - 1)})"
+        if roll < 0.65:
+            divisor = rng.randint(1, 9)
+            literal = str(divisor) if type_name == "int" else f"{divisor}.0"
+            return f"({self._expr(scope, type_name, depth - 1)} / {literal})"
+        if roll < 0.75 and type_name == "int":
+            return f"clamp({self._expr(scope, 'int', depth - 1)}, 0, 255)"
+        if roll < 0.85:
+            other = "float" if type_name == "int" else "int"
+            return f"(({type_name}) {self._expr(scope, other, depth - 1)})"
+
+        callees = [p for p in self.procs if p.return_type == type_name]
+        if callees:
+            proc = rng.choice(callees)
+            args = ", ".join(self._expr(scope, t, depth - 1) for _, t, _ in proc.params)
+            return f"{proc.name}({args})"
+        return self._atom(scope, type_name)
+
+    def _atom(self, scope: FunctionScope, type_name: str) -> str:
+        rng = self.rng
+        names = scope.visible(type_name)
+        if names and rng.random() < 0.6:
+            return rng.choice(names)
+        if type_name == "int":
+            return str(rng.randint(0, 100))
+        return f"{rng.randint(0, 99)}.{rng.randint(0, 9)}"
+
+def generate_program(seed: int = 0, **knobs) -> str:
+    """Удобная обёртка: одна программа по seed и параметрам генератора"""
+    return ProgramGenerator(seed=seed, **knobs).generate()
+
+def write_corpus(directory, count: int, **knobs) -> list:
+    """Записывает count программ в каталог и возвращает список путей"""
+    from pathlib import Path
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for seed in range(count):
+        path = root / f"gen_{seed:04d}.imgl"
+        path.write_text(generate_program(seed, **knobs), encoding="utf-8")
+        paths.append(path)
+    return paths
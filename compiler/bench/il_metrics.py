@@ -0,0 +1,265 @@
+"""
+Разбор текстового IL, который выдаёт CILEmitter, и метрики качества кода по методам.
+
+parse_il() восстанавливает методы (класс, имя, сигнатура, .maxstack, .locals,
+инструкции без комментариев), method_metrics() считает по методу:
+  * instructions       - число инструкций (без меток);
+  * code_bytes         - размер тела метода в байтах в кодировке ECMA-335;
+  * locals             - размер .locals init;
+  * maxstack_declared  - объявленный .maxstack;
+  * maxstack_needed    - реально достигаемая глубина стека (поток данных по переходам);
+  * loop_instructions  - инструкций внутри циклов (между меткой и обратным переходом на неё);
+  * runtime_calls_in_loops - вызовов внешних сборок (ImgLangRuntime, System.Drawing,
+                         mscorlib) внутри циклов - главная цена пиксельных циклов;
+  * callvirt           - число callvirt.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from codegen.cil_instructions import OPCODES_BY_MNEMONIC
+
+@dataclass
+class ILInstruction:
+    opcode: str
+    operand: str = ""
+
+@dataclass
+class ILMethod:
+    owner: str
+    name: str
+    return_type: str
+    parameters: List[str]
+    is_static: bool
+    max_stack: int = 8
+    locals: List[str] = field(default_factory=list)
+    # Элементы - ILInstruction или имя метки (str)
+    body: list = field(default_factory=list)
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.owner}::{self.name}"
+
+    @property
+    def instructions(self) -> List[ILInstruction]:
+        return [item for item in self.body if isinstance(item, ILInstruction)]
+
+_METHOD_HEADER = re.compile(r"\.method\b(?P<flags>.*?)\s(?P<name>[^\s(]+)\((?P<params>.*?)\)\s+cil managed")
+_CLASS_HEADER = re.compile(r"\.class\b.*?\s(?P<name>[^\s]+)\s+extends\b")
+_LABEL = re.compile(r"^(?P<label>[A-Za-z_][\w.]*):$")
+
+def split_top_level(text: str, sep: str = ",") -> List[str]:
+    """Делит список типов по запятым верхнего уровня"""
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch in "(<[":
+            depth += 1
+        elif ch in ")>]":
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    tail = text[start:].strip()
+    if tail:
+        parts.append(tail)
+    return parts
+
+def _strip_comment(line: str) -> str:
+    # '//' внутри строкового литерала ldstr комментарием не является
+    in_string = False
+    for i, ch in enumerate(line):
+        if ch == '"' and (i == 0 or line[i - 1] != "\\"):
+            in_string = not in_string
+        elif not in_string and line.startswith("//", i):
+            return line[:i].rstrip()
+    return line.rstrip()
+
+def _instruction(text: str) -> ILInstruction:
+    opcode, _, operand = text.strip().partition(" ")
+    return ILInstruction(opcode, operand.strip())
+
+def _method_from_header(line: str, owner: str) -> Optional[ILMethod]:
+    match = _METHOD_HEADER.search(line)
+    if not match:
+        return None
+    flags = match.group("flags").split()
+    is_static = "static" in flags
+    # Тип результата - всё после соглашения о вызове (static/instance)
+    marker = "static" if is_static else "instance"
+    return_type = " ".join(flags[flags.index(marker) + 1:]) if marker in flags else "void"
+    return ILMethod(owner, match.group("name"), return_type,
+                    split_top_level(match.group("params")), is_static)
+
+def parse_il(il_code: str) -> List[ILMethod]:
+    methods: List[ILMethod] = []
+    classes: List[str] = []
+    method: Optional[ILMethod] = None
+
+    for raw in il_code.splitlines():
+        line = _strip_comment(raw).strip()
+        if not line:
+            continue
+
+        if method is not None:
+            if line == "}":
+                methods.append(method)
+                method = None
+            elif line.startswith(".maxstack"):
+                method.max_stack = int(line.split()[1])
+            elif line.startswith(".locals"):
+                inner = line[line.index("(") + 1:line.rindex(")")]
+                method.locals = split_top_level(inner)
+            elif line.startswith("."):
+                continue
+            elif _LABEL.match(line):
+                method.body.append(_LABEL.match(line).group("label"))
+            else:
+                method.body.append(_instruction(line))
+            continue
+
+        if line.startswith(".class"):
+            match = _CLASS_HEADER.search(line)
+            classes.append(match.group("name") if match else "?")
+        elif line.startswith(".method"):
+            owner = "/".join(classes) or "<module>"
+            current = _method_from_header(line, owner)
+            if current is None:
+                continue
+            if line.endswith("}"):
+                # Однострочный метод: .ctor() { ldarg.0; call ...; ret }
+                body = line[line.index("{") + 1:line.rindex("}")]
+                current.body = [_instruction(part) for part in body.split(";") if part.strip()]
+                methods.append(current)
+            else:
+                method = current
+        elif line == "}" and classes:
+            classes.pop()
+    return methods
+
+# Влияние на стек: (снимает, кладёт) для инструкций без сигнатуры в операнде
+_PUSH = {"ldnull", "ldstr", "ldc.i4", "ldc.i4.s", "ldc.i4.m1", "ldc.i8", "ldc.r4", "ldc.r8",
+         "ldarg", "ldarg.s", "ldarga", "ldarga.s", "ldloc", "ldloc.s", "ldloca", "ldloca.s",
+         "ldsfld", "ldsflda", "ldftn", "sizeof", "ldtoken"}
+_UNARY = {"neg", "not", "ldfld", "ldflda", "ldlen", "box", "unbox", "unbox.any", "castclass", "isinst",
+          "ldobj", "newarr", "ckfinite", "localloc"}
+_BINARY = {"add", "sub", "mul", "div", "div.un", "rem", "rem.un", "and", "or", "xor", "shl", "shr", "shr.un",
+           "ceq", "cgt", "cgt.un", "clt", "clt.un", "add.ovf", "add.ovf.un", "sub.ovf", "sub.ovf.un",
+           "mul.ovf", "mul.ovf.un", "ldelem", "ldelema"}
+_POP1 = {"pop", "stloc", "stloc.s", "starg", "starg.s", "stsfld", "brfalse", "brfalse.s", "brtrue",
+         "brtrue.s", "brnull", "brzero", "brinst", "switch", "throw", "initobj"}
+_POP2 = {"stfld", "stobj", "beq", "beq.s", "bne.un", "bne.un.s", "bge", "bge.s", "bge.un", "bge.un.s",
+         "bgt", "bgt.s", "bgt.un", "bgt.un.s", "ble", "ble.s", "ble.un", "ble.un.s", "blt", "blt.s",
+         "blt.un", "blt.un.s", "cpobj"}
+_POP3 = {"stelem", "stelem.i4", "stelem.ref", "stelem.r8", "cpblk", "initblk"}
+
+BRANCHES = {"br", "br.s", "leave", "leave.s"} | {op for op in _POP1 | _POP2 if op.startswith("b")}
+UNCONDITIONAL = {"br", "br.s", "leave", "leave.s", "ret", "throw", "jmp"}
+
+def call_signature(operand: str) -> Tuple[bool, str, str, List[str]]:
+    """call-операнд -> (instance, тип результата, цель 'Класс::метод', типы параметров)"""
+    head, _, params = operand.partition("(")
+    params = params[:params.rindex(")")] if ")" in params else params
+    words = head.split()
+    instance = bool(words) and words[0] == "instance"
+    if instance:
+        words = words[1:]
+    target = words[-1] if words else ""
+    return instance, " ".join(words[:-1]), target, split_top_level(params)
+
+def stack_effect(ins: ILInstruction, method: ILMethod) -> Tuple[int, int]:
+    """(сколько снимает, сколько кладёт) инструкция"""
+    op = ins.opcode
+    if op in ("call", "callvirt", "newobj"):
+        instance, return_type, _, params = call_signature(ins.operand)
+        if op == "newobj":
+            return len(params), 1
+        return len(params) + instance, 0 if return_type == "void" else 1
+    if op == "ret":
+        return (0 if method.return_type == "void" else 1), 0
+    if op == "dup":
+        return 1, 2
+    if op in _PUSH or op.startswith(("ldarg.", "ldloc.", "ldc.i4.")):
+        return 0, 1
+    if op in _UNARY or op.startswith(("conv.", "ldind.", "ldelem.")):
+        return 1, 1
+    if op in _BINARY:
+        return 2, 1
+    if op in _POP1 or op.startswith("stloc."):
+        return 1, 0
+    if op in _POP2 or op.startswith("stind."):
+        return 2, 0
+    if op in _POP3 or op.startswith("stelem."):
+        return 3, 0
+    if op in ("br", "br.s", "leave", "leave.s", "nop", "break"):
+        return 0, 0
+    raise ValueError(f"Unknown stack effect for {op}")
+
+def needed_max_stack(method: ILMethod) -> int:
+    """Максимальная глубина стека по всем достижимым путям"""
+    body = method.body
+    labels = {item: i for i, item in enumerate(body) if isinstance(item, str)}
+    depth_at: Dict[int, int] = {}
+    work, best = [(0, 0)], 0
+    while work:
+        pc, depth = work.pop()
+        while pc < len(body):
+            if depth_at.get(pc, -1) >= depth:
+                break
+            depth_at[pc] = depth
+            item = body[pc]
+            if isinstance(item, str):
+                pc += 1
+                continue
+            pops, pushes = stack_effect(item, method)
+            best = max(best, depth - pops + pushes, depth)
+            depth = depth - pops + pushes
+            if item.opcode in BRANCHES and item.operand in labels:
+                work.append((labels[item.operand], depth))
+            if item.opcode in UNCONDITIONAL:
+                break
+            pc += 1
+    return best
+
+def loop_ranges(method: ILMethod) -> List[Tuple[int, int]]:
+    """Циклы как отрезки body: от метки до обратного перехода на неё"""
+    labels = {item: i for i, item in enumerate(method.body) if isinstance(item, str)}
+    ranges = []
+    for i, item in enumerate(method.body):
+        if isinstance(item, ILInstruction) and item.opcode in BRANCHES:
+            target = labels.get(item.operand)
+            if target is not None and target <= i:
+                ranges.append((target, i))
+    return ranges
+
+def is_runtime_call(ins: ILInstruction) -> bool:
+    if ins.opcode not in ("call", "callvirt", "newobj"):
+        return False
+    return call_signature(ins.operand)[2].startswith("[")
+
+def method_metrics(method: ILMethod) -> Dict[str, int]:
+    loops = loop_ranges(method)
+    in_loop = [any(start <= i <= end for start, end in loops) for i in range(len(method.body))]
+    instructions = [(i, item) for i, item in enumerate(method.body) if isinstance(item, ILInstruction)]
+    return {
+        "instructions": len(instructions),
+        "code_bytes": sum(OPCODES_BY_MNEMONIC[ins.opcode].size for _, ins in instructions),
+        "locals": len(method.locals),
+        "maxstack_declared": method.max_stack,
+        "maxstack_needed": needed_max_stack(method),
+        "loop_instructions": sum(in_loop[i] for i, _ in instructions),
+        "runtime_calls_in_loops": sum(in_loop[i] and is_runtime_call(ins) for i, ins in instructions),
+        "callvirt": sum(ins.opcode == "callvirt" for _, ins in instructions),
+    }
+
+def program_metrics(il_code: str) -> Tuple[Dict[str, int], Dict[str, Dict[str, int]]]:
+    """(сумма по программе, метрики по методам); .maxstack суммируется как максимум"""
+    per_method = {method.full_name: method_metrics(method) for method in parse_il(il_code)}
+    totals: Dict[str, int] = {}
+    for metrics in per_method.values():
+        for key, value in metrics.items():
+            if key.startswith("maxstack"):
+                totals[key] = max(totals.get(key, 0), value)
+            else:
+                totals[key] = totals.get(key, 0) + value
+    totals["methods"] = len(per_method)
+    return totals, per_method
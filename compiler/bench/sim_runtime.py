@@ -0,0 +1,181 @@
+"""
+Заглушка [ImgLangRuntime]Runtime для симулятора CIL (bench/cil_sim.py).
+
+Повторяет ImgLangRuntime.cs: изображения - массивы NumPy (высота, ширина, ARGB),
+цвет - Color(a, r, g, b). Файлы изображений без Pillow не читаются, поэтому
+load_image отдаёт детерминированную картинку (градиент, зависящий от пути) или
+изображение из словаря images; save_image ничего не пишет на диск, а сохраняет
+массив в saved. Исключения .NET (выход за границы, неверный цвет, null)
+становятся RuntimeFault.
+"""
+import hashlib
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # симулятор без NumPy работает, пока программа не трогает изображения
+    np = None
+
+class RuntimeFault(Exception):
+    """Исключение, которое выбросил бы рантайм .NET"""
+
+class Color(NamedTuple):
+    a: int
+    r: int
+    g: int
+    b: int
+
+EMPTY_COLOR = Color(0, 0, 0, 0)
+
+class Bitmap:
+    __slots__ = ("pixels",)
+
+    def __init__(self, pixels):
+        self.pixels = pixels
+
+    @property
+    def width(self) -> int:
+        return self.pixels.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.pixels.shape[0]
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeFault("NumPy is required to simulate image operations (pip install numpy)")
+
+def format_double(value: float) -> str:
+    """Console.Write(double): кратчайшее точное представление, как в .NET Core"""
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "Infinity" if value > 0 else "-Infinity"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    text = repr(value)
+    if "e" in text:
+        mantissa, exponent = text.split("e")
+        sign = "-" if exponent.startswith("-") else "+"
+        text = f"{mantissa}E{sign}{exponent.lstrip('+-').zfill(2)}"
+    return text
+
+class Runtime:
+    """Реализация методов Runtime; вызывается симулятором по имени метода"""
+
+    def __init__(self, images: Dict[str, object] = None, default_size: Tuple[int, int] = (100, 100),
+                 stdin: Iterable[str] = (), echo: bool = False):
+        self.images = dict(images or {})
+        self.default_size = default_size
+        self.stdin = iter(stdin)
+        self.echo = echo
+        self.output: List[str] = []
+        self.saved: Dict[str, object] = {}
+
+    @property
+    def text(self) -> str:
+        return "".join(self.output)
+
+    def _write(self, text: str):
+        self.output.append(text)
+        if self.echo:
+            print(text, end="")
+
+    def _readline(self) -> Optional[str]:
+        return next(self.stdin, None)
+
+    def _synthetic(self, path: str):
+        """Детерминированная картинка вместо файла: градиент со смещением по хэшу пути"""
+        _require_numpy()
+        width, height = self.default_size
+        seed = int.from_bytes(hashlib.sha1(path.encode("utf-8")).digest()[:2], "little")
+        ys, xs = np.mgrid[0:height, 0:width]
+        pixels = np.empty((height, width, 4), dtype=np.uint8)
+        pixels[..., 0] = 255
+        pixels[..., 1] = (xs * 255 // max(1, width - 1) + seed) % 256
+        pixels[..., 2] = (ys * 255 // max(1, height - 1) + seed // 7) % 256
+        pixels[..., 3] = (xs + ys + seed) % 256
+        return pixels
+
+    @staticmethod
+    def _bitmap(bmp) -> Bitmap:
+        if bmp is None:
+            raise RuntimeFault("NullReferenceException: image is null")
+        return bmp
+
+    # Методы Runtime (имена как в ImgLangRuntime.cs)
+
+    def LoadImage(self, path: str) -> Bitmap:
+        if path in self.images:
+            return Bitmap(np.array(self.images[path], dtype=np.uint8, copy=True))
+        return Bitmap(self._synthetic(path))
+
+    def SaveImage(self, bmp, path: str):
+        if bmp is not None:
+            self.saved[path] = bmp.pixels.copy()
+
+    def CreateImage(self, w: int, h: int) -> Bitmap:
+        _require_numpy()
+        if w <= 0 or h <= 0:
+            raise RuntimeFault(f"ArgumentException: invalid image size {w}x{h}")
+        return Bitmap(np.zeros((h, w, 4), dtype=np.uint8))
+
+    def GetWidth(self, bmp) -> int:
+        return 0 if bmp is None else bmp.width
+
+    def GetHeight(self, bmp) -> int:
+        return 0 if bmp is None else bmp.height
+
+    def ToColor(self, r: int, g: int, b: int) -> Color:
+        if not (0 <= r <= 255 and 0 <= g <= 255 and 0 <= b <= 255):
+            raise RuntimeFault(f"ArgumentException: color component out of range ({r}, {g}, {b})")
+        return Color(255, r, g, b)
+
+    def GetPixel(self, bmp, x: int, y: int) -> Color:
+        bmp = self._bitmap(bmp)
+        if not (0 <= x < bmp.width and 0 <= y < bmp.height):
+            raise RuntimeFault(f"ArgumentOutOfRangeException: pixel ({x}, {y})")
+        a, r, g, b = bmp.pixels[y, x].tolist()
+        return Color(a, r, g, b)
+
+    def SetPixel(self, bmp, x: int, y: int, color: Color):
+        bmp = self._bitmap(bmp)
+        if not (0 <= x < bmp.width and 0 <= y < bmp.height):
+            raise RuntimeFault(f"ArgumentOutOfRangeException: pixel ({x}, {y})")
+        bmp.pixels[y, x] = color
+
+    def Clamp(self, value: int, low: int, high: int) -> int:
+        if value < low:
+            return low
+        if value > high:
+            return high
+        return value
+
+    def ReadInt(self) -> int:
+        line = self._readline()
+        try:
+            return int(line.strip())
+        except (AttributeError, ValueError):
+            self._write("Invalid number, defaulting to 0\n")
+            return 0
+
+    def ReadFloat(self) -> float:
+        line = self._readline()
+        try:
+            return float(line.strip())
+        except (AttributeError, ValueError):
+            self._write("Invalid float number, defaulting to 0.0\n")
+            return 0.0
+
+    def Write(self, value, param_type: str = "object"):
+        if param_type == "float64":
+            self._write(format_double(float(value)))
+        elif param_type == "bool":
+            self._write("True" if value else "False")
+        elif value is None:
+            self._write("")
+        elif isinstance(value, Color):
+            self._write(f"Color [A={value.a}, R={value.r}, G={value.g}, B={value.b}]")
+        else:
+            self._write(str(value))
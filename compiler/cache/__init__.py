@@ -0,0 +1,7 @@
+from .backends import CacheBackend, DirectoryBackend, HttpBackend, make_backend
+from .store import CacheEntry, CompilationCache
+
+__all__ = [
+    'CacheBackend', 'DirectoryBackend', 'HttpBackend', 'make_backend',
+    'CacheEntry', 'CompilationCache',
+]
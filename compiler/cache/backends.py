@@ -0,0 +1,133 @@
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+class CacheBackend:
+    """Хранилище «ключ → байты» для кэша компиляции"""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def put(self, key: str, data: bytes):
+        raise NotImplementedError
+
+class DirectoryBackend(CacheBackend):
+    """
+    Кэш в обычном (в том числе общем сетевом) каталоге.
+    Порядок LRU хранится во времени модификации файлов: чтение обновляет mtime,
+    при превышении max_size удаляются записи с самым старым mtime - до LOW_WATER
+    от max_size, чтобы следующие записи не упирались в предел сразу же.
+
+    Размер кэша считается нарастающим итогом: каталог целиком обходится при первой
+    записи, при превышении max_size и раз в RESCAN_EVERY записей - так в итог
+    попадают и записи других процессов, работающих с тем же каталогом.
+    """
+
+    RESCAN_EVERY = 256
+    LOW_WATER = 0.9
+
+    def __init__(self, root: str, max_size: int = 256 * 1024 * 1024):
+        self.root = Path(root)
+        self.max_size = max_size
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Размер каталога (None - ещё не обходился) и записи с последнего обхода
+        self._total: Optional[int] = None
+        self._puts = 0
+        # http_server пишет из нескольких потоков
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+
+        # Запись через временный файл: параллельные читатели не увидят половину записи
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_name, path)
+
+        with self._lock:
+            self._puts += 1
+            if self._total is not None:
+                self._total += len(data) - replaced
+            if self._total is None or self._total > self.max_size or self._puts >= self.RESCAN_EVERY:
+                self.evict()
+
+    def evict(self):
+        """Если кэш больше max_size, удаляет самые давно использованные записи до LOW_WATER от него"""
+        entries = []
+        total = 0
+        for path in self.root.glob("*/*"):
+            if path.name.startswith(".tmp-"):
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        if total > self.max_size:
+            target = int(self.max_size * self.LOW_WATER)
+            for _, size, path in sorted(entries, key=lambda e: e[0]):
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= size
+                if total <= target:
+                    break
+        self._total, self._puts = total, 0
+
+class HttpBackend(CacheBackend):
+    """Командный кэш поверх HTTP: GET/PUT <url>/<key> (см. cache/http_server.py)"""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def get(self, key: str) -> Optional[bytes]:
+        # urllib (вместе с http.client и email) загружается только для HTTP-кэша
+        import urllib.error
+        import urllib.request
+        try:
+            with urllib.request.urlopen(f"{self.url}/{key}", timeout=self.timeout) as response:
+                return response.read()
+        except (urllib.error.URLError, OSError):
+            return None
+
+    def put(self, key: str, data: bytes):
+        import urllib.error
+        import urllib.request
+        request = urllib.request.Request(f"{self.url}/{key}", data=data, method="PUT")
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except (urllib.error.URLError, OSError):
+            pass
+
+def make_backend(location: str, max_size: int = 256 * 1024 * 1024) -> CacheBackend:
+    """URL http(s):// выбирает HttpBackend, любой другой путь — DirectoryBackend"""
+    if location.startswith(("http://", "https://")):
+        return HttpBackend(location)
+    return DirectoryBackend(location, max_size)
@@ -0,0 +1,75 @@
+"""
+Локальный HTTP-сервер кэша компиляции для команды (замена настоящему удалённому кэшу).
+
+Запуск из каталога compiler/:
+    python -m cache.http_server --port 8765 --dir /srv/imglang-cache --max-size-mb 1024
+
+Клиенты используют его через --cache-dir http://host:8765
+"""
+import argparse
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cache.backends import DirectoryBackend
+
+_KEY_RE = re.compile(r"^/([0-9a-f]{64})$")
+
+class _CacheRequestHandler(BaseHTTPRequestHandler):
+    def _key(self):
+        match = _KEY_RE.match(self.path)
+        if not match:
+            self.send_error(400, "Expected /<sha256>")
+            return None
+        return match.group(1)
+
+    def do_GET(self):
+        key = self._key()
+        if key is None:
+            return
+        data = self.server.backend.get(key)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_PUT(self):
+        key = self._key()
+        if key is None:
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        self.server.backend.put(key, self.rfile.read(length))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class CacheHTTPServer(ThreadingHTTPServer):
+    def __init__(self, address, backend: DirectoryBackend):
+        self.backend = backend
+        super().__init__(address, _CacheRequestHandler)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="HTTP-сервер кэша компиляции ImgLang")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--dir", default=".imglang-cache-server")
+    arg_parser.add_argument("--max-size-mb", type=int, default=1024)
+    args = arg_parser.parse_args()
+
+    backend = DirectoryBackend(args.dir, args.max_size_mb * 1024 * 1024)
+    server = CacheHTTPServer((args.host, args.port), backend)
+    print(f"🗄️  Кэш компиляции: http://{args.host}:{args.port} -> {args.dir}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
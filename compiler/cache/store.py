@@ -0,0 +1,127 @@
+import hashlib
+import json
+import struct
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from cache.backends import CacheBackend
+from codegen import DEFAULT_OPT_LEVEL
+from version import compiler_fingerprint, frontend_fingerprint
+
+_MAGIC = b"IMGC"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sBI")
+
+# Запись кэша AST: магия, версия, число токенов исходника, затем AST в формате parser.ast_codec
+_AST_MAGIC = b"IMGT"
+_AST_HEADER = struct.Struct("<4sBI")
+
+@dataclass
+class CacheEntry:
+    """Сохранённый результат компиляции: IL, собранный .exe и диагностика"""
+    il_code: Optional[str] = None
+    exe_bytes: Optional[bytes] = None
+    diagnostics: List[dict] = field(default_factory=list)
+    failed_stage: Optional[str] = None
+    token_count: int = 0
+
+    def encode(self) -> bytes:
+        meta = json.dumps({
+            "il_code": self.il_code,
+            "diagnostics": self.diagnostics,
+            "failed_stage": self.failed_stage,
+            "token_count": self.token_count,
+            "has_exe": self.exe_bytes is not None,
+        }).encode("utf-8")
+        return _HEADER.pack(_MAGIC, _FORMAT_VERSION, len(meta)) + meta + (self.exe_bytes or b"")
+
+    @classmethod
+    def decode(cls, data: bytes) -> Optional['CacheEntry']:
+        if len(data) < _HEADER.size:
+            return None
+        magic, version, meta_len = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            return None
+
+        offset = _HEADER.size
+        meta = json.loads(data[offset:offset + meta_len].decode("utf-8"))
+        exe_bytes = data[offset + meta_len:] if meta["has_exe"] else None
+        return cls(
+            il_code=meta["il_code"],
+            exe_bytes=exe_bytes,
+            diagnostics=meta["diagnostics"],
+            failed_stage=meta["failed_stage"],
+            token_count=meta["token_count"],
+        )
+
+class CompilationCache:
+    """
+    Контентно-адресуемый кэш компиляции.
+    Ключ — SHA-256 от исходного текста, версии (отпечатка) компилятора и параметров генерации кода.
+    Лексер, парсер и режим разбора (lexer, parser, parse_mode) на IL и диагностику не влияют:
+    компиляции с разными движками фронтенда делят записи.
+    """
+
+    # Параметры, от которых зависит результат, и их значения по умолчанию
+    OUTPUT_OPTIONS = {"opt_level": DEFAULT_OPT_LEVEL}
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(source_code: str, options: dict = None) -> str:
+        digest = hashlib.sha256()
+        digest.update(compiler_fingerprint().encode("utf-8"))
+        digest.update(b"\0")
+        options = options or {}
+        output_options = {name: options.get(name, default)
+                          for name, default in CompilationCache.OUTPUT_OPTIONS.items()}
+        digest.update(json.dumps(output_options, sort_keys=True).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(source_code.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        data = self.backend.get(key)
+        entry = CacheEntry.decode(data) if data else None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: CacheEntry):
+        self.backend.put(key, entry.encode())
+
+    @staticmethod
+    def ast_key(source_code: str) -> str:
+        """Ключ AST зависит только от исходника и фронтенда компилятора"""
+        digest = hashlib.sha256()
+        digest.update(b"ast\0")
+        digest.update(frontend_fingerprint().encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(source_code.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_ast(self, key: str) -> Optional[Tuple[object, int]]:
+        """Возвращает (AST до семантического анализа, число токенов) или None"""
+        from parser.ast_codec import decode_ast, ASTDecodeError
+
+        data = self.backend.get(key)
+        if not data or len(data) < _AST_HEADER.size:
+            return None
+        magic, version, token_count = _AST_HEADER.unpack_from(data)
+        if magic != _AST_MAGIC or version != _FORMAT_VERSION:
+            return None
+        try:
+            return decode_ast(data[_AST_HEADER.size:]), token_count
+        except ASTDecodeError:
+            return None
+
+    def put_ast(self, key: str, ast, token_count: int):
+        from parser.ast_codec import encode_ast
+
+        header = _AST_HEADER.pack(_AST_MAGIC, _FORMAT_VERSION, token_count)
+        self.backend.put(key, header + encode_ast(ast))
@@ -0,0 +1,119 @@
+"""
+Тонкий клиент сервера компиляции: те же аргументы и вывод, что у main.py,
+но без загрузки ANTLR в каждом запуске. Если сервер не запущен,
+компилирует в текущем процессе.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+from errors.base import CompilerError
+from errors.formatter import ErrorFormatter, STAGE_HEADERS
+
+def default_socket_path() -> str:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"imglang-{os.getuid()}.sock")
+
+class CompileClient:
+    """Соединение с сервером компиляции; несколько запросов на одно соединение"""
+
+    def __init__(self, socket_path: str = None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path or default_socket_path())
+        self.stream = self.sock.makefile("rwb")
+
+    def request(self, payload: dict) -> dict:
+        self.stream.write(json.dumps(payload).encode("utf-8") + b"\n")
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError("Server closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+def print_response(response: dict, source_file: str):
+    if response.get("error"):
+        print(f"❌ {response['error']}")
+        return
+
+    stage = response.get("failed_stage")
+    if stage in STAGE_HEADERS:
+        print(STAGE_HEADERS[stage])
+        with open(source_file, 'r', encoding='utf-8') as f:
+            formatter = ErrorFormatter(f.read())
+        errors = [CompilerError.from_dict(d) for d in response["diagnostics"]]
+        print(formatter.format_all(errors))
+        return
+
+    if response.get("il_file"):
+        print(f"✓ Сгенерирован IL файл: {response['il_file']}")
+
+    if stage == "ilasm":
+        print("❌ Ошибка компиляции IL:")
+        print(response.get("ilasm_output", ""))
+        print(f"IL файл сохранён: {response['il_file']}")
+    elif response.get("exe_file"):
+        print(f"✅ Успешно скомпилировано: {response['exe_file']}")
+    else:
+        print("✅ Ошибок не найдено")
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Клиент сервера компиляции ImgLang")
+    arg_parser.add_argument("input_file", nargs="?")
+    arg_parser.add_argument("output_file", nargs="?")
+    arg_parser.add_argument("--check", action="store_true", help="только анализ, без генерации файлов")
+    arg_parser.add_argument("--stats", action="store_true", help="показать задержки сервера (p50/p99)")
+    arg_parser.add_argument("--shutdown", action="store_true", help="остановить сервер")
+    arg_parser.add_argument("--socket", default=None)
+    args = arg_parser.parse_args()
+
+    if not (args.input_file or args.stats or args.shutdown):
+        print("Usage: python client.py <input_file> [output_file] [--check]")
+        sys.exit(1)
+
+    try:
+        client = CompileClient(args.socket)
+    except OSError:
+        if not args.input_file:
+            print("❌ Сервер компиляции не запущен")
+            sys.exit(1)
+        print("⚠️  Сервер компиляции не запущен, компиляция в текущем процессе")
+        from main import compile_program
+        sys.exit(0 if compile_program(args.input_file, args.output_file) else 1)
+
+    try:
+        if args.stats:
+            stats = client.request({"command": "stats"})
+            print(f"Запросов: {stats['requests']}, p50: {stats['p50_ms']:.1f} мс, "
+                  f"p99: {stats['p99_ms']:.1f} мс")
+            print(f"Кэш объявлений: попаданий {stats['decl_cache_hits']}, "
+                  f"промахов {stats['decl_cache_misses']}")
+        if args.shutdown:
+            client.request({"command": "shutdown"})
+            return
+        if not args.input_file:
+            return
+
+        if not os.path.exists(args.input_file):
+            print(f"File not found: {args.input_file}")
+            sys.exit(1)
+
+        response = client.request({
+            "command": "check" if args.check else "compile",
+            "source_file": os.path.abspath(args.input_file),
+            "output_file": args.output_file,
+            "cwd": os.getcwd(),
+        })
+        print_response(response, args.input_file)
+        sys.exit(0 if response.get("ok") else 1)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    main()
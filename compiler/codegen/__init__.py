@@ -0,0 +1,7 @@
+# Уровни оптимизации: 0 - IL как есть, 1 - свёртка констант в AST (semantic/constant_folding.py),
+# удаление мёртвого кода (semantic/dead_code.py), вынос инвариантов из циклов
+# (semantic/loop_invariant.py), проход «через глазок» (peephole.py) и распределение
+# локальных по слотам (local_slots.py).
+# Константы живут здесь, чтобы main.py мог построить --help без загрузки генератора.
+OPT_LEVELS = (0, 1)
+DEFAULT_OPT_LEVEL = 0
@@ -1,5 +1,6 @@
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Tuple
 from dataclasses import dataclass, field
+from codegen.cil_instructions import FieldRef, Instruction, MethodRef, OpCode, Operand, render
 from codegen.cil_types import CILTypeSystem
 from parser.ast import Type, TypeKind
 
@@ -23,10 +24,21 @@ class CILMethod:
     is_public: bool = True
     is_virtual: bool = False
     owner_class: str = None
-    max_stack: int = 50
+    max_stack: int = 50  # точное значение ставит codegen/stack_depth.py
     locals: List[CILVariable] = field(default_factory=list)
-    instructions: List[str] = field(default_factory=list)
+    instructions: List[Instruction] = field(default_factory=list)
     labels: Dict[str, str] = field(default_factory=dict) 
+    # Статические поля-константы, которые читает метод: имя -> (r, g, b)
+    constants: Dict[str, Tuple[int, int, int]] = field(default_factory=dict)
+
+# Instruction без вызова __new__ именованного кортежа: emit - самый частый вызов генератора
+_new_instruction = tuple.__new__
+_TOKEN = Operand.TOKEN
+
+_LDC_I4_SHORT = (OpCode.LDC_I4_0, OpCode.LDC_I4_1, OpCode.LDC_I4_2, OpCode.LDC_I4_3, OpCode.LDC_I4_4,
+                 OpCode.LDC_I4_5, OpCode.LDC_I4_6, OpCode.LDC_I4_7, OpCode.LDC_I4_8)
+_LDARG_SHORT = (OpCode.LDARG_0, OpCode.LDARG_1, OpCode.LDARG_2, OpCode.LDARG_3)
+_STLOC_SHORT = (OpCode.STLOC_0, OpCode.STLOC_1, OpCode.STLOC_2, OpCode.STLOC_3)
 
 class CILEmitter:
     """Низкоуровневый генератор инструкций CIL"""
@@ -39,9 +51,13 @@ class CILEmitter:
         self.assembly_refs: List[str] = []
         
         self.struct_definitions: Dict[str, List[Tuple[str, str]]] = {}
+        self.static_fields: List[Tuple[str, str]] = []
         
         self._label_counter: int = 0
         self._local_counter: int = 0
+        # SourceInfo оператора, который сейчас генерируется: попадает в Instruction.source
+        self.source = None
+        self._refs: Dict[Any, Any] = {}
         
         self.add_assembly_ref("mscorlib", 
                              "B7 7A 5C 56 19 34 E0 89", 
@@ -91,6 +107,10 @@ class CILEmitter:
 
     def register_struct(self, name: str, fields: List[Tuple[str, str]]):
         self.struct_definitions[name] = fields
+
+    def register_static_field(self, cil_type: str, name: str):
+        """Статическое поле класса Program (только для чтения: пишет его лишь .cctor)"""
+        self.static_fields.append((cil_type, name))
     
     def declare_local(self, name: str, var_type: Type, is_ref: bool = False) -> int:
         """Объявляет локальную переменную и возвращает её индекс"""
@@ -111,21 +131,22 @@ class CILEmitter:
         self._local_counter += 1
         return var.index
     
-    def emit(self, instruction: str, comment: str = ""):
+    def emit(self, opcode: OpCode, operand: Any = None, label: Optional[str] = None):
         """Добавляет инструкцию CIL"""
         if not self.current_method:
             return
         
-        if comment:
-            instruction = f"{instruction} // {comment}"
-        self.current_method.instructions.append(instruction)
+        if operand is not None and opcode.operand is _TOKEN:
+            # одинаковые ссылки на методы и поля хранятся один раз на программу
+            operand = self._refs.setdefault(operand, operand)
+        self.current_method.instructions.append(_new_instruction(Instruction, (opcode, operand, label, self.source)))
     
     def emit_label(self, label: str):
         """Добавляет метку"""
         if not self.current_method:
             return
         
-        self.current_method.instructions.append(f"{label}:")
+        self.current_method.instructions.append(Instruction(OpCode.LABEL, label=label))
         self.current_method.labels[label] = label
     
     def new_label(self, prefix: str = "L") -> str:
@@ -136,177 +157,142 @@ class CILEmitter:
     def load_constant(self, value: Any, value_type: TypeKind):
         """Загружает константу на стек"""
         if value_type == TypeKind.INT:
-            if value == 0:
-                self.emit("ldc.i4.0", f"load {value}")
-            elif value == 1:
-                self.emit("ldc.i4.1", f"load {value}")
-            elif value == 2:
-                self.emit("ldc.i4.2", f"load {value}")
-            elif value == 3:
-                self.emit("ldc.i4.3", f"load {value}")
-            elif value == 4:
-                self.emit("ldc.i4.4", f"load {value}")
-            elif value == 5:
-                self.emit("ldc.i4.5", f"load {value}")
-            elif value == 6:
-                self.emit("ldc.i4.6", f"load {value}")
-            elif value == 7:
-                self.emit("ldc.i4.7", f"load {value}")
-            elif value == 8:
-                self.emit("ldc.i4.8", f"load {value}")
+            if 0 <= value <= 8:
+                self.emit(_LDC_I4_SHORT[value])
             elif -128 <= value <= 127:
-                self.emit(f"ldc.i4.s {value}", f"load {value}")
+                self.emit(OpCode.LDC_I4_S, value)
             else:
-                self.emit(f"ldc.i4 {value}", f"load {value}")
+                self.emit(OpCode.LDC_I4, value)
         
         elif value_type == TypeKind.FLOAT:
-            float_val = float(value)
-            self.emit(f"ldc.r8 {float_val}", f"load {value}")
+            self.emit(OpCode.LDC_R8, float(value))
         
         elif value_type == TypeKind.BOOL:
-            if value:
-                self.emit("ldc.i4.1", "load true")
-            else:
-                self.emit("ldc.i4.0", "load false")
+            self.emit(OpCode.LDC_I4_1 if value else OpCode.LDC_I4_0)
         
         elif value_type == TypeKind.STRING:
-            self.emit(f'ldstr "{value}"', f'load "{value}"')
+            self.emit(OpCode.LDSTR, value)
+
+        elif value_type in (TypeKind.COLOR, TypeKind.PIXEL):
+            self.emit(OpCode.LDSFLD, self.color_field(value))
+
+    def color_field(self, value: Tuple[int, int, int]) -> FieldRef:
+        """Поле с цветом (r, g, b); метод запоминает его, чтобы .cctor его заполнил"""
+        name = "color_{}_{}_{}".format(*value)
+        if self.current_method:
+            self.current_method.constants[name] = value
+        return FieldRef(CILTypeSystem.TYPE_MAPPINGS[TypeKind.COLOR][0], self.class_name, name)
     
     def load_argument(self, index: int):
         if index <= 3:
-            instruction = f"ldarg.{index}"
+            self.emit(_LDARG_SHORT[index])
         else:
-            instruction = f"ldarg.s {index}"
-        self.emit(instruction, f"load arg {index}")
+            self.emit(OpCode.LDARG_S, index)
     
     def load_local(self, index: int):
         """Загружает локальную переменную на стек"""
-        instruction = CILTypeSystem.get_ldloc_instruction(index)
-        self.emit(instruction, f"load local {index}")
+        self.emit(*CILTypeSystem.get_ldloc_instruction(index))
     
     def load_local_address(self, index: int):
         """Загружает адрес локальной переменной на стек"""
-        self.emit(f"ldloca {index}", f"load address of local {index}")
+        self.emit(OpCode.LDLOCA, index)
     
     def load_argument_address(self, index: int):
         """Загружает адрес аргумента на стек"""
-        self.emit(f"ldarga {index}", f"load address of arg {index}")
+        self.emit(OpCode.LDARGA, index)
     
     def store_local(self, index: int):
         if index <= 3:
-            instruction = f"stloc.{index}"
+            self.emit(_STLOC_SHORT[index])
+        elif index <= 255:
+            self.emit(OpCode.STLOC_S, index)
         else:
-            instruction = f"stloc.s {index}"
-        self.emit(instruction, f"store to local {index}")
+            self.emit(OpCode.STLOC, index)
     
     def store_indirect(self, cil_type: str):
         """Сохраняет значение по адресу (для ref параметров)"""
         if "class" in cil_type or "Bitmap" in cil_type:
-            self.emit("stind.ref", "store indirect (ref)")
+            self.emit(OpCode.STIND_REF)
         elif "int32" in cil_type:
-            self.emit("stind.i4", "store indirect (int32)")
+            self.emit(OpCode.STIND_I4)
         elif "float64" in cil_type:
-            self.emit("stind.r8", "store indirect (float64)")
+            self.emit(OpCode.STIND_R8)
         elif "bool" in cil_type:
-            self.emit("stind.i1", "store indirect (bool)")
+            self.emit(OpCode.STIND_I1)
         else:
-            self.emit(f"stobj {cil_type.replace('&', '')}", f"store indirect ({cil_type})")
+            self.emit(OpCode.STOBJ, cil_type.replace('&', ''))
     
     def load_indirect(self, cil_type: str):
         """Загружает значение по адресу (для ref параметров)"""
         if "class" in cil_type or "Bitmap" in cil_type:
-            self.emit("ldind.ref", "load indirect (ref)")
+            self.emit(OpCode.LDIND_REF)
         elif "int32" in cil_type:
-            self.emit("ldind.i4", "load indirect (int32)")
+            self.emit(OpCode.LDIND_I4)
         elif "float64" in cil_type:
-            self.emit("ldind.r8", "load indirect (float64)")
+            self.emit(OpCode.LDIND_R8)
         elif "bool" in cil_type:
-            self.emit("ldind.i1", "load indirect (bool)")
+            self.emit(OpCode.LDIND_I1)
         else:
-            self.emit(f"ldobj {cil_type.replace('&', '')}", f"load indirect ({cil_type})")
+            self.emit(OpCode.LDOBJ, cil_type.replace('&', ''))
     
     def arithmetic_operation(self, operator: str, left_kind: TypeKind, right_kind: TypeKind):
         """Генерирует арифметическую операцию без дублирования"""
         instruction = CILTypeSystem.get_arithmetic_instruction(operator)
         if instruction:
-            self.emit(instruction, f"arithmetic {operator}")
+            self.emit(*instruction)
 
 
     def comparison_operation(self, operator: str):
         """Генерирует операцию сравнения"""
-        instruction = CILTypeSystem.get_comparison_instruction(operator)
-        
-        if callable(instruction):
-            for instr in instruction():
-                self.emit(instr)
-        else:
-            self.emit(instruction, f"compare {operator}")
+        for opcode in CILTypeSystem.get_comparison_instruction(operator):
+            self.emit(opcode)
     
     def convert_to_float(self, type_kind: TypeKind):
         """Конвертирует значение на стеке в float64 если нужно"""
         if CILTypeSystem.is_integer(type_kind):
-            self.emit("conv.r8", "convert int to float")
+            self.emit(OpCode.CONV_R8)
     
     def convert_to_int(self, type_kind: TypeKind):
         """Конвертирует значение на стеке в int32 если нужно"""
         if CILTypeSystem.is_floating_point(type_kind):
-            self.emit("conv.i4", "convert float to int")
+            self.emit(OpCode.CONV_I4)
     
     def call_method(self, method_name: str, return_type: str, 
                     class_name: str = None, is_instance: bool = False):
         """Генерирует вызов метода"""
-        if class_name:
-            if is_instance:
-                self.emit(f"call instance {return_type} {class_name}::{method_name}()", 
-                         f"call instance method {method_name}")
-            else:
-                self.emit(f"call {return_type} {class_name}::{method_name}()", 
-                         f"call static method {method_name}")
-        else:
-            self.emit(f"call {return_type} {method_name}()", 
-                     f"call method {method_name}")
+        self.emit(OpCode.CALL, MethodRef(return_type, class_name or "", method_name,
+                                         instance=bool(class_name and is_instance)))
     
     def new_object(self, class_name: str):
         """Создаёт новый объект"""
-        self.emit(f"newobj instance void {class_name}::.ctor()", 
-                 f"new {class_name}")
+        self.emit(OpCode.NEWOBJ, MethodRef("void", class_name, ".ctor", instance=True))
     
     def return_instruction(self, has_value: bool = False):
         """Генерирует инструкцию возврата"""
-        if has_value:
-            self.emit("ret", "return with value")
-        else:
-            self.emit("ret", "return")
+        self.emit(OpCode.RET)
     
     def branch_if_false(self, label: str):
         """Переход если false (0)"""
-        self.emit(f"brfalse {label}", f"branch if false to {label}")
+        self.emit(OpCode.BRFALSE, label=label)
     
     def branch_if_true(self, label: str):
         """Переход если true (не 0)"""
-        self.emit(f"brtrue {label}", f"branch if true to {label}")
+        self.emit(OpCode.BRTRUE, label=label)
     
+    def compare_and_branch(self, operator: str, label: str, jump_if: bool, is_float: bool):
+        """Переход, если сравнение двух значений на стеке дало jump_if (blt, bge.un, ...)"""
+        self.emit(CILTypeSystem.get_branch_instruction(operator, jump_if, is_float), label=label)
+
     def unconditional_branch(self, label: str):
         """Безусловный переход"""
-        self.emit(f"br {label}", f"branch to {label}")
+        self.emit(OpCode.BR, label=label)
     
     def generate_code(self) -> str:
-        code_lines = []
-        code_lines.extend(self.assembly_refs)
-        code_lines.append('.assembly Program {}')
-        code_lines.append(f'.class public auto ansi beforefieldinit {self.class_name} extends [mscorlib]System.Object {{')
-        code_lines.append('  .method public hidebysig specialname rtspecialname instance void .ctor() cil managed { ldarg.0; call instance void [mscorlib]System.Object::.ctor(); ret }')
-
-        for struct_name, fields in self.struct_definitions.items():
-            code_lines.append(f'  .class nested public auto ansi beforefieldinit {struct_name} extends [mscorlib]System.Object {{')
-            for f_type, f_name in fields:
-                code_lines.append(f'    .field public {f_type} {f_name}')
-            code_lines.append('    .method public hidebysig specialname rtspecialname instance void .ctor() cil managed { ldarg.0; call instance void [mscorlib]System.Object::.ctor(); ret }')
-            
+        code_lines = self.header_lines()
+        code_lines.extend(self.static_field_lines())
+        for struct_name in self.struct_definitions:
             struct_methods = [m for m in self.methods if m.owner_class == struct_name]
-            for m in struct_methods:
-                self._emit_method_body(code_lines, m, indent="    ")
-            code_lines.append('  }')
+            code_lines.extend(self.struct_lines(struct_name, struct_methods))
 
         global_methods = [m for m in self.methods if m.owner_class is None]
         for m in global_methods:
@@ -314,22 +300,53 @@ class CILEmitter:
         
         code_lines.append('}')
         return '\n'.join(code_lines)
-    
-    def _emit_method_body(self, code_lines, method, indent):
+
+    def header_lines(self) -> List[str]:
+        """Ссылки на сборки и начало класса Program (до вложенных классов и методов)"""
+        code_lines = []
+        code_lines.extend(self.assembly_refs)
+        code_lines.append('.assembly Program {}')
+        code_lines.append(f'.class public auto ansi beforefieldinit {self.class_name} extends [mscorlib]System.Object {{')
+        code_lines.append('  .method public hidebysig specialname rtspecialname instance void .ctor() cil managed { ldarg.0; call instance void [mscorlib]System.Object::.ctor(); ret }')
+        return code_lines
+
+    def static_field_lines(self) -> List[str]:
+        return [f'  .field private static initonly {f_type} {f_name}' for f_type, f_name in self.static_fields]
+
+    def struct_lines(self, struct_name: str, methods: List[CILMethod]) -> List[str]:
+        """Вложенный класс структуры с полями из register_struct и методами methods"""
+        code_lines = [f'  .class nested public auto ansi beforefieldinit {struct_name} extends [mscorlib]System.Object {{']
+        for f_type, f_name in self.struct_definitions[struct_name]:
+            code_lines.append(f'    .field public {f_type} {f_name}')
+        code_lines.append('    .method public hidebysig specialname rtspecialname instance void .ctor() cil managed { ldarg.0; call instance void [mscorlib]System.Object::.ctor(); ret }')
+        for m in methods:
+            self._emit_method_body(code_lines, m, indent="    ")
+        code_lines.append('  }')
+        return code_lines
+
+    def method_lines(self, method: CILMethod, indent: str = "  ",
+                     instructions: Iterable[str] = None) -> Iterator[str]:
+        """Строки метода; instructions - готовый текст тела вместо method.instructions (сброшенный на диск)"""
         params_str = ', '.join([p[0] for p in method.parameters])
         static_str = "static" if method.is_static else "instance"
         virt_str = "virtual hidebysig" if method.is_virtual else ""
         
-        code_lines.append(f'{indent}.method public {virt_str} {static_str} {method.return_type} {method.name}({params_str}) cil managed {{')
+        if method.name == ".cctor":
+            yield f'{indent}.method private hidebysig specialname rtspecialname static void .cctor() cil managed {{'
+        else:
+            yield f'{indent}.method public {virt_str} {static_str} {method.return_type} {method.name}({params_str}) cil managed {{'
         if method.name == "Main":
-            code_lines.append(f'{indent}  .entrypoint')
-        code_lines.append(f'{indent}  .maxstack {method.max_stack}')
+            yield f'{indent}  .entrypoint'
+        yield f'{indent}  .maxstack {method.max_stack}'
         if method.locals:
             locals_str = ', '.join([f'{var.cil_type} V_{var.index}' for var in method.locals])
-            code_lines.append(f'{indent}  .locals init ({locals_str})')
-        for instr in method.instructions:
-            code_lines.append(f'{indent}  {instr}')
-        code_lines.append(f'{indent}}}')
+            yield f'{indent}  .locals init ({locals_str})'
+        for instr in (map(render, method.instructions) if instructions is None else instructions):
+            yield f'{indent}  {instr}'
+        yield f'{indent}}}'
+
+    def _emit_method_body(self, code_lines, method, indent):
+        code_lines.extend(self.method_lines(method, indent))
     
     def _write_method_body(self, code_lines, method, is_nested=False):
         params_str = ', '.join([p[0] for p in method.parameters])
@@ -350,9 +367,9 @@ class CILEmitter:
             code_lines.append(f'{indent}  .locals init ({locals_str})')
         
         for instr in method.instructions:
-            code_lines.append(f'{indent}  {instr}')
+            code_lines.append(f'{indent}  {render(instr)}')
         code_lines.append(f'{indent}}}')
     
     def load_null(self):
         """Загружает null на стек для ссылочных типов"""
-        self.emit("ldnull")
\ No newline at end of file
+        self.emit(OpCode.LDNULL)
\ No newline at end of file
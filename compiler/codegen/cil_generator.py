@@ -1,15 +1,31 @@
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Iterable, Optional, Any, Set
 from codegen.cil_emitter import CILEmitter, CILVariable
+from codegen.cil_instructions import FieldRef, MethodRef, OpCode, relax_branches
 from codegen.cil_runtime import RuntimeCodeGenerator
 from codegen.cil_types import CILTypeSystem
+from codegen.incremental import DeclarationCache, ProgramInterface, declaration_key
+from codegen.local_slots import allocate_locals
+from codegen.peephole import optimize_method
+from codegen.stack_depth import max_stack
 from parser.ast import *
+from semantic.constant_folding import ConstantFolder
+from semantic.dead_code import CallGraph, eliminate_dead_code, is_pure
+from semantic.loop_invariant import LoopInvariantMotion
 from semantic.symbols import SymbolTable, SymbolKind
 from errors.semantic import SemanticError
 
 class CILGenerator:
     """Главный генератор CIL кода из AST"""
     
-    def __init__(self, symbol_table: SymbolTable):
+    def __init__(self, symbol_table: SymbolTable, decl_cache: DeclarationCache = None,
+                 opt_level: int = 0):
+        self.decl_cache = decl_cache
+        self.opt_level = opt_level
+        self.folder = ConstantFolder()
+        self.reset(symbol_table)
+
+    def reset(self, symbol_table: SymbolTable):
+        """Готовит генератор к новой программе с новой таблицей символов"""
         self.symbol_table = symbol_table
         self.emitter = CILEmitter()
         self.current_scope = None
@@ -18,10 +34,31 @@ class CILGenerator:
         
         self.variable_map: Dict[str, CILVariable] = {}
         self.method_map: Dict[str, Dict] = {}
+        self.interface: Optional[ProgramInterface] = None
+        # Процедуры и методы, достижимые из Main (при -O1; None - генерировать все)
+        self.live_units: Optional[Set[str]] = None
         
     def generate(self, program: Program) -> str:
+        self.declare(program)
+        if self.opt_level >= 1:
+            self.live_units = CallGraph(program).reachable(self.optimize_body)
+        if self.decl_cache is not None:
+            struct_names = [d.name for d in program.declarations if isinstance(d, StructDecl)]
+            self.interface = ProgramInterface(self.method_map, self.symbol_table, struct_names)
+
+        for decl in program.declarations:
+            self.generate_declaration(decl)
+
+        self._generate_cached("Main", program.statements, None, self.generate_entry_point, program.statements)
+        constants = {}
+        for method in self.emitter.methods:
+            constants.update(method.constants)
+        self.generate_static_constructor(constants)
+        return self.emitter.generate_code()
+
+    def declare(self, program: Program):
+        """Сигнатуры процедур и методов и поля структур: всё, что нужно для генерации вызовов"""
         self._collect_function_info(program)
-        
         for decl in program.declarations:
             if isinstance(decl, StructDecl):
                 struct_sym = self.symbol_table.resolve_struct(decl.name)
@@ -31,30 +68,74 @@ class CILGenerator:
                     fields_for_emitter.append((cil_type, field_name))
                 self.emitter.register_struct(decl.name, fields_for_emitter)
 
-        for decl in program.declarations:
-            if isinstance(decl, FunctionDecl) and not isinstance(decl, MethodDecl):
-                self._generate_function(decl)
-            elif isinstance(decl, StructDecl):
-                for member in decl.members:
-                    if isinstance(member.decl, MethodDecl):
-                        method = member.decl
-                        orig_name = method.name
-
-                        has_this = any(p.name == "this" for p in method.params)
-                        if not has_this:
-                            this_param = Parameter(
-                                name="this", 
-                                param_type=Type(kind=TypeKind.STRUCT, struct_name=decl.name),
-                                source_info=None
-                            )
-                            method.params.insert(0, this_param)
-                        
-                        self._generate_function(method, owner_struct=decl.name)
-                        
-                        method.name = orig_name
-
-        self._generate_entry_point(program)
-        return self.emitter.generate_code()
+    def optimize_body(self, node):
+        """
+        Свёртка констант, удаление мёртвого кода и вынос инвариантов из циклов в теле
+        процедуры или метода (FunctionDecl) или Main (список операторов)
+        """
+        if isinstance(node, list):
+            self.folder.fold_statements(node)
+            eliminate_dead_code(node)
+            LoopInvariantMotion().run(node)
+        else:
+            self.folder.fold_function(node)
+            # res читает возврат по умолчанию (_generate_default_return)
+            eliminate_dead_code(node.body.statements, ("res",) if node.return_type.kind != TypeKind.VOID else ())
+            LoopInvariantMotion(node.params).run(node.body.statements)
+
+    def _is_live(self, unit: str) -> bool:
+        return self.live_units is None or unit in self.live_units
+
+    def generate_declaration(self, decl: Declaration):
+        """Генерирует процедуру или методы структуры в emitter.methods"""
+        if isinstance(decl, FunctionDecl) and not isinstance(decl, MethodDecl):
+            if self._is_live(decl.name):
+                self._generate_cached(decl.name, decl, None, self._generate_function, decl)
+        elif isinstance(decl, StructDecl):
+            for member in decl.members:
+                if isinstance(member.decl, MethodDecl):
+                    method = member.decl
+                    orig_name = method.name
+                    full_name = f"{decl.name}::{orig_name}"
+                    if not self._is_live(full_name):
+                        continue
+
+                    has_this = any(p.name == "this" for p in method.params)
+                    if not has_this:
+                        this_param = Parameter(
+                            name="this", 
+                            param_type=Type(kind=TypeKind.STRUCT, struct_name=decl.name),
+                            source_info=None
+                        )
+                        method.params.insert(0, this_param)
+                    # В потоковом режиме method - новый экземпляр AST, а method_map
+                    # хранит параметры из прохода сигнатур
+                    self.method_map[full_name]['params'] = method.params
+                    
+                    self._generate_cached(full_name, method, decl.name,
+                                          self._generate_function, method, owner_struct=decl.name)
+                    
+                    method.name = orig_name
+
+    def _generate_cached(self, unit: str, node, owner: Optional[str], generate, *args, **kwargs):
+        """Берёт готовый метод из кэша объявлений или генерирует (и оптимизирует) его и запоминает"""
+        key = None
+        if self.decl_cache is not None:
+            key = declaration_key(unit, node, self.interface, owner)
+            method = self.decl_cache.get(key)
+            if method is not None:
+                self.emitter.methods.append(method)
+                return
+
+        generate(*args, **kwargs)
+        method = self.emitter.methods[-1]
+        if self.opt_level >= 1:
+            optimize_method(method)
+            allocate_locals(method)
+        relax_branches(method.instructions)
+        method.max_stack = max_stack(method)
+        if key is not None:
+            self.decl_cache.put(key, self.emitter.methods[-1])
     
     def _collect_function_info(self, program: Program):
         for decl in program.declarations:
@@ -76,18 +157,46 @@ class CILGenerator:
                             'struct_name': decl.name
                         }
         
-    def _generate_entry_point(self, program: Program):
-        """Генерирует точку входа Main"""
+    def generate_static_constructor(self, constants: Dict[str, tuple]):
+        """Статические поля для констант цветов (CILMethod.constants) и .cctor, заполняющий их"""
+        if not constants:
+            return
+
+        self.emitter.begin_method(".cctor", Type(TypeKind.VOID))
+        for name in sorted(constants):
+            for component in constants[name]:
+                self.emitter.load_constant(component, TypeKind.INT)
+            RuntimeCodeGenerator.generate_builtin_call(self.emitter, "to_color")
+            field_ref = self.emitter.color_field(constants[name])
+            self.emitter.register_static_field(field_ref.type, field_ref.name)
+            self.emitter.emit(OpCode.STSFLD, field_ref)
+        self.emitter.return_instruction()
+        self.emitter.end_method()
+        self.emitter.methods[-1].max_stack = max_stack(self.emitter.methods[-1])
+
+    def generate_entry_point(self, statements: Iterable[Statement]):
+        """Генерирует точку входа Main из операторов верхнего уровня"""
+        if self.opt_level >= 1 and self.live_units is None:
+            # Потоковый режим: операторы приходят по одному, их можно только свернуть
+            # и вынести инварианты из циклов внутри оператора
+            statements = self._optimize_streamed(statements)
         self.emitter.begin_method("Main", Type(TypeKind.VOID))
         
-        for stmt in program.statements:
+        for stmt in statements:
             self._generate_statement(stmt)
         
         self.emitter.return_instruction()
         self.emitter.end_method()
     
+    def _optimize_streamed(self, statements: Iterable[Statement]) -> Iterable[Statement]:
+        motion = LoopInvariantMotion()
+        for stmt in statements:
+            yield from motion.run([self.folder.fold_statement(stmt)])
+
     def _generate_function(self, func: FunctionDecl, owner_struct: str = None):
         old_variable_map = self.variable_map.copy()
+        if self.opt_level >= 1 and self.live_units is None:
+            self.optimize_body(func)
         
         is_virtual = "virtual" in func.modifiers or "override" in func.modifiers
         is_static = (owner_struct is None)
@@ -173,6 +282,8 @@ class CILGenerator:
     
     def _generate_statement(self, stmt: Statement):
         """Генерирует код для оператора"""
+        outer_source = self.emitter.source
+        self.emitter.source = stmt.source_info or outer_source
         if isinstance(stmt, VariableDecl):
             self._generate_variable_declaration(stmt)
         elif isinstance(stmt, Assignment):
@@ -190,9 +301,10 @@ class CILGenerator:
         elif isinstance(stmt, ExpressionStatement):
             self._generate_expression(stmt.expr)
             if stmt.expr.type and stmt.expr.type.kind != TypeKind.VOID:
-                self.emitter.emit("pop", "discard expression value")
+                self.emitter.emit(OpCode.POP)
         else:
             raise NotImplementedError(f"Unsupported statement type: {type(stmt)}")
+        self.emitter.source = outer_source
     
     def _generate_variable_declaration(self, decl: VariableDecl):
         for var_entry in decl.variables:
@@ -233,7 +345,7 @@ class CILGenerator:
             field_sym = struct_sym.fields[assign.target.member]
             field_cil_type, _ = CILTypeSystem.map_type(field_sym.type)
             
-            self.emitter.emit(f"stfld {field_cil_type} Program/{struct_name}::{assign.target.member}")
+            self.emitter.emit(OpCode.STFLD, FieldRef(field_cil_type, f"Program/{struct_name}", assign.target.member))
             return
 
         var = None
@@ -256,9 +368,7 @@ class CILGenerator:
         else_label = self.emitter.new_label("else")
         end_label = self.emitter.new_label("endif")
         
-        self._generate_expression(stmt.condition)
-        
-        self.emitter.branch_if_false(else_label)
+        self._generate_condition(stmt.condition, else_label, False)
         
         self._generate_block(stmt.then_block)
         self.emitter.unconditional_branch(end_label)
@@ -276,8 +386,7 @@ class CILGenerator:
         
         self.emitter.emit_label(start_label)
         
-        self._generate_expression(stmt.condition)
-        self.emitter.branch_if_false(end_label)
+        self._generate_condition(stmt.condition, end_label, False)
         
         self._generate_block(stmt.body)
         self.emitter.unconditional_branch(start_label)
@@ -295,8 +404,7 @@ class CILGenerator:
         self.emitter.emit_label(start_label)
         
         if stmt.condition:
-            self._generate_expression(stmt.condition)
-            self.emitter.branch_if_false(end_label)
+            self._generate_condition(stmt.condition, end_label, False)
         
         self._generate_block(stmt.body)
         
@@ -344,11 +452,11 @@ class CILGenerator:
         target_kind = expr.target_type.kind
         
         if target_kind == TypeKind.INT:
-            self.emitter.emit("conv.i4", "explicit cast to int32")
+            self.emitter.emit(OpCode.CONV_I4)
         elif target_kind == TypeKind.FLOAT:
-            self.emitter.emit("conv.r8", "explicit cast to float64")
+            self.emitter.emit(OpCode.CONV_R8)
         elif target_kind == TypeKind.BOOL:
-            self.emitter.emit("conv.i4", "cast to bool")
+            self.emitter.emit(OpCode.CONV_I4)
             
         return CILTypeSystem.map_type(expr.target_type)[0]
     
@@ -382,34 +490,86 @@ class CILGenerator:
         
         self._generate_block(stmt.body)
         
-        self._generate_expression(stmt.condition)
-        
-        self.emitter.branch_if_false(start_label)
+        self._generate_condition(stmt.condition, start_label, False)
     
-    def _generate_binary_expression(self, expr: BinaryExpr) -> str:
-        left_kind = expr.left.type.kind if expr.left.type else TypeKind.INT
-        right_kind = expr.right.type.kind if expr.right.type else TypeKind.INT
-        
-        is_float_op = (left_kind == TypeKind.FLOAT or right_kind == TypeKind.FLOAT)
+    def _generate_condition(self, condition: Expression, label: str, jump_if: bool):
+        """
+        Переход на label, если condition равно jump_if, иначе проход дальше.
+        && и || вычисляются сокращённо: правый операнд - только если от него зависит результат
+        """
+        if isinstance(condition, BinaryExpr) and condition.op in ('&&', '||'):
+            # a && b ложно, как только ложно a; a || b истинно, как только истинно a
+            decided_by = condition.op == '||'
+            if jump_if == decided_by:
+                self._generate_condition(condition.left, label, jump_if)
+                self._generate_condition(condition.right, label, jump_if)
+            else:
+                skip_label = self.emitter.new_label("skip")
+                self._generate_condition(condition.left, skip_label, decided_by)
+                self._generate_condition(condition.right, label, jump_if)
+                self.emitter.emit_label(skip_label)
+            return
+        if isinstance(condition, UnaryExpr) and condition.op == '!':
+            self._generate_condition(condition.expr, label, not jump_if)
+            return
+        if isinstance(condition, BinaryExpr) and condition.op in CILTypeSystem.BRANCH_INSTRUCTIONS:
+            # Сравнение и переход одной инструкцией: blt вместо clt; brtrue, bgt вместо cgt; ldc.i4.0; ceq; brtrue
+            is_float = self._generate_operands(condition)
+            self.emitter.compare_and_branch(condition.op, label, jump_if, is_float)
+            return
 
-        self._generate_expression(expr.left)
-        if is_float_op and left_kind == TypeKind.INT:
-            self.emitter.emit("conv.r8", "promote left to float")
+        self._generate_expression(condition)
+        if jump_if:
+            self.emitter.branch_if_true(label)
+        else:
+            self.emitter.branch_if_false(label)
 
-        self._generate_expression(expr.right)
-        if is_float_op and right_kind == TypeKind.INT:
-            self.emitter.emit("conv.r8", "promote right to float")
+    def _generate_logical_expression(self, expr: BinaryExpr) -> str:
+        """Значение && или || (0 или 1) через переходы _generate_condition"""
+        false_label = self.emitter.new_label("false")
+        end_label = self.emitter.new_label("bool_end")
+        self._generate_condition(expr, false_label, False)
+        self.emitter.load_constant(True, TypeKind.BOOL)
+        self.emitter.unconditional_branch(end_label)
+        self.emitter.emit_label(false_label)
+        self.emitter.load_constant(False, TypeKind.BOOL)
+        self.emitter.emit_label(end_label)
+        return "bool"
+
+    def _generate_binary_expression(self, expr: BinaryExpr) -> str:
+        # Правый операнд без побочных эффектов дешевле вычислить всегда (and/or), чем обходить
+        if expr.op in ('&&', '||') and not is_pure(expr.right):
+            return self._generate_logical_expression(expr)
+
+        is_float_op = self._generate_operands(expr)
 
         if expr.op in ['==', '!=', '>', '<', '>=', '<=']:
             self.emitter.comparison_operation(expr.op)
             return "bool"
         elif expr.op in ['&&', '||']:
-            instr = "and" if expr.op == '&&' else "or"
-            self.emitter.emit(instr)
+            self.emitter.emit(OpCode.AND if expr.op == '&&' else OpCode.OR)
             return "bool"
         else:
+            left_kind = expr.left.type.kind if expr.left.type else TypeKind.INT
+            right_kind = expr.right.type.kind if expr.right.type else TypeKind.INT
             self.emitter.arithmetic_operation(expr.op, left_kind, right_kind)
             return "float64" if is_float_op else "int32"
+
+    def _generate_operands(self, expr: BinaryExpr) -> bool:
+        """Оба операнда на стек (int приводится к float64, если другой float); True - операция над float64"""
+        left_kind = expr.left.type.kind if expr.left.type else TypeKind.INT
+        right_kind = expr.right.type.kind if expr.right.type else TypeKind.INT
+        
+        is_float_op = (left_kind == TypeKind.FLOAT or right_kind == TypeKind.FLOAT)
+
+        self._generate_expression(expr.left)
+        if is_float_op and left_kind == TypeKind.INT:
+            self.emitter.emit(OpCode.CONV_R8)
+
+        self._generate_expression(expr.right)
+        if is_float_op and right_kind == TypeKind.INT:
+            self.emitter.emit(OpCode.CONV_R8)
+        return is_float_op
     
     def _generate_unary_expression(self, expr: UnaryExpr) -> str:
         """Генерирует код для унарного выражения"""
@@ -419,12 +579,12 @@ class CILGenerator:
             self.emitter.load_constant(0, TypeKind.INT)
             if expr.expr.type and CILTypeSystem.is_floating_point(expr.expr.type.kind):
                 self.emitter.convert_to_float(TypeKind.INT)
-                self.emitter.emit("sub", "unary minus")
+                self.emitter.emit(OpCode.SUB)
             else:
-                self.emitter.emit("sub", "unary minus")
+                self.emitter.emit(OpCode.SUB)
         elif expr.op == '!':
             self.emitter.load_constant(1, TypeKind.INT)
-            self.emitter.emit("xor", "logical not")
+            self.emitter.emit(OpCode.XOR)
         
         return expr_type
     
@@ -488,13 +648,13 @@ class CILGenerator:
             sig_params.append(cil_t)
 
         ret_type = CILTypeSystem.map_type(func_info['return_type'])[0]
-        params_sig = ", ".join(sig_params)
         
         if is_instance:
             struct_name = func_info['struct_name']
-            self.emitter.emit(f"callvirt instance {ret_type} Program/{struct_name}::{expr.func_name}({params_sig})")
+            self.emitter.emit(OpCode.CALLVIRT, MethodRef(ret_type, f"Program/{struct_name}", expr.func_name,
+                                                         tuple(sig_params), instance=True))
         else:
-            self.emitter.emit(f"call {ret_type} Program::{expr.func_name}({params_sig})")
+            self.emitter.emit(OpCode.CALL, MethodRef(ret_type, "Program", expr.func_name, tuple(sig_params)))
 
         return ret_type
         
@@ -507,10 +667,10 @@ class CILGenerator:
             self.emitter.load_local_address(temp_idx)
             
             member = expr.member.lower()
-            if member == 'r': self.emitter.emit("call instance uint8 [System.Drawing]System.Drawing.Color::get_R()")
-            elif member == 'g': self.emitter.emit("call instance uint8 [System.Drawing]System.Drawing.Color::get_G()")
-            elif member == 'b': self.emitter.emit("call instance uint8 [System.Drawing]System.Drawing.Color::get_B()")
-            self.emitter.emit("conv.i4")
+            if member in ('r', 'g', 'b'):
+                self.emitter.emit(OpCode.CALL, MethodRef("uint8", RuntimeCodeGenerator.COLOR_CLASS,
+                                                         f"get_{member.upper()}", instance=True))
+            self.emitter.emit(OpCode.CONV_I4)
             return "int32"
         
         if expr.obj.type and expr.obj.type.kind == TypeKind.STRUCT:
@@ -521,10 +681,10 @@ class CILGenerator:
                 field_sym = struct_sym.fields[expr.member]
                 field_cil_type, _ = CILTypeSystem.map_type(field_sym.type)
                 
-                self.emitter.emit(f"ldfld {field_cil_type} Program/{struct_name}::{expr.member}")
+                self.emitter.emit(OpCode.LDFLD, FieldRef(field_cil_type, f"Program/{struct_name}", expr.member))
                 return field_cil_type
             else:
-                self.emitter.emit(f"ldfld int32 Program/{struct_name}::{expr.member}")
+                self.emitter.emit(OpCode.LDFLD, FieldRef("int32", f"Program/{struct_name}", expr.member))
                 return "int32"
 
         return "int32"
@@ -532,9 +692,9 @@ class CILGenerator:
     def _generate_constructor(self, expr: ConstructorExpr) -> str:
         struct_name = expr.struct_name
         
-        self.emitter.emit(f"newobj instance void Program/{struct_name}::.ctor()")
+        self.emitter.emit(OpCode.NEWOBJ, MethodRef("void", f"Program/{struct_name}", ".ctor", instance=True))
         
-        self.emitter.emit("dup")
+        self.emitter.emit(OpCode.DUP)
         
         target_full_name = f"{struct_name}::{struct_name}"
         func_info = self.method_map.get(target_full_name)
@@ -555,10 +715,9 @@ class CILGenerator:
                     cil_t, _ = CILTypeSystem.map_type(p.param_type, p.kind == "result")
                     params_cil.append(cil_t)
             
-            sig = ", ".join(params_cil)
-            
-            self.emitter.emit(f"call instance void Program/{struct_name}::{struct_name}({sig})")
+            self.emitter.emit(OpCode.CALL, MethodRef("void", f"Program/{struct_name}", struct_name,
+                                                     tuple(params_cil), instance=True))
         else:
-            self.emitter.emit("pop")
+            self.emitter.emit(OpCode.POP)
             
         return f"class Program/{struct_name}"
\ No newline at end of file
@@ -0,0 +1,331 @@
+"""
+Инструкции CIL как записи: код операции, операнд, метка и позиция в исходнике.
+
+Генератор строит списки Instruction, текст IL появляется только при выводе
+(CILEmitter.generate_code, render). Для проходов по коду и учёта размера есть
+компактная форма Bytecode - байты в кодировке ECMA-335 (коды операций, операнды,
+смещения переходов) и таблица ссылок на методы, поля, типы и строки вместо
+токенов метаданных. Её длина - настоящий размер тела метода в сборке.
+"""
+import struct
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+class Operand(Enum):
+    """Вид операнда и его размер в байтах в теле метода"""
+    NONE = ("none", 0)
+    INT8 = ("int8", 1)              # ldc.i4.s
+    UINT8 = ("uint8", 1)            # короткие ldarg/ldloc/stloc: номер аргумента или локальной
+    UINT16 = ("uint16", 2)          # длинные ldarg/ldloc/stloc
+    INT32 = ("int32", 4)            # ldc.i4
+    FLOAT64 = ("float64", 8)        # ldc.r8
+    SHORT_BRANCH = ("int8 offset", 1)
+    BRANCH = ("int32 offset", 4)
+    TOKEN = ("token", 4)            # метод, поле, тип или строка (ldstr)
+
+    def __init__(self, title: str, size: int):
+        self.size = size
+
+class OpCode(Enum):
+    """Коды операций, которые выдаёт генератор: мнемоника, код ECMA-335, вид операнда"""
+    LABEL = (":", None, Operand.NONE)  # псевдоинструкция: метка, в байты не попадает
+    NOP = ("nop", 0x00, Operand.NONE)
+    LDARG_0 = ("ldarg.0", 0x02, Operand.NONE)
+    LDARG_1 = ("ldarg.1", 0x03, Operand.NONE)
+    LDARG_2 = ("ldarg.2", 0x04, Operand.NONE)
+    LDARG_3 = ("ldarg.3", 0x05, Operand.NONE)
+    LDLOC_0 = ("ldloc.0", 0x06, Operand.NONE)
+    LDLOC_1 = ("ldloc.1", 0x07, Operand.NONE)
+    LDLOC_2 = ("ldloc.2", 0x08, Operand.NONE)
+    LDLOC_3 = ("ldloc.3", 0x09, Operand.NONE)
+    STLOC_0 = ("stloc.0", 0x0A, Operand.NONE)
+    STLOC_1 = ("stloc.1", 0x0B, Operand.NONE)
+    STLOC_2 = ("stloc.2", 0x0C, Operand.NONE)
+    STLOC_3 = ("stloc.3", 0x0D, Operand.NONE)
+    LDARG_S = ("ldarg.s", 0x0E, Operand.UINT8)
+    LDARGA_S = ("ldarga.s", 0x0F, Operand.UINT8)
+    STARG_S = ("starg.s", 0x10, Operand.UINT8)
+    LDLOC_S = ("ldloc.s", 0x11, Operand.UINT8)
+    LDLOCA_S = ("ldloca.s", 0x12, Operand.UINT8)
+    STLOC_S = ("stloc.s", 0x13, Operand.UINT8)
+    LDNULL = ("ldnull", 0x14, Operand.NONE)
+    LDC_I4_M1 = ("ldc.i4.m1", 0x15, Operand.NONE)
+    LDC_I4_0 = ("ldc.i4.0", 0x16, Operand.NONE)
+    LDC_I4_1 = ("ldc.i4.1", 0x17, Operand.NONE)
+    LDC_I4_2 = ("ldc.i4.2", 0x18, Operand.NONE)
+    LDC_I4_3 = ("ldc.i4.3", 0x19, Operand.NONE)
+    LDC_I4_4 = ("ldc.i4.4", 0x1A, Operand.NONE)
+    LDC_I4_5 = ("ldc.i4.5", 0x1B, Operand.NONE)
+    LDC_I4_6 = ("ldc.i4.6", 0x1C, Operand.NONE)
+    LDC_I4_7 = ("ldc.i4.7", 0x1D, Operand.NONE)
+    LDC_I4_8 = ("ldc.i4.8", 0x1E, Operand.NONE)
+    LDC_I4_S = ("ldc.i4.s", 0x1F, Operand.INT8)
+    LDC_I4 = ("ldc.i4", 0x20, Operand.INT32)
+    LDC_R8 = ("ldc.r8", 0x23, Operand.FLOAT64)
+    DUP = ("dup", 0x25, Operand.NONE)
+    POP = ("pop", 0x26, Operand.NONE)
+    CALL = ("call", 0x28, Operand.TOKEN)
+    RET = ("ret", 0x2A, Operand.NONE)
+    BR_S = ("br.s", 0x2B, Operand.SHORT_BRANCH)
+    BRFALSE_S = ("brfalse.s", 0x2C, Operand.SHORT_BRANCH)
+    BRTRUE_S = ("brtrue.s", 0x2D, Operand.SHORT_BRANCH)
+    BEQ_S = ("beq.s", 0x2E, Operand.SHORT_BRANCH)
+    BGE_S = ("bge.s", 0x2F, Operand.SHORT_BRANCH)
+    BGT_S = ("bgt.s", 0x30, Operand.SHORT_BRANCH)
+    BLE_S = ("ble.s", 0x31, Operand.SHORT_BRANCH)
+    BLT_S = ("blt.s", 0x32, Operand.SHORT_BRANCH)
+    BNE_UN_S = ("bne.un.s", 0x33, Operand.SHORT_BRANCH)
+    BGE_UN_S = ("bge.un.s", 0x34, Operand.SHORT_BRANCH)
+    BGT_UN_S = ("bgt.un.s", 0x35, Operand.SHORT_BRANCH)
+    BLE_UN_S = ("ble.un.s", 0x36, Operand.SHORT_BRANCH)
+    BLT_UN_S = ("blt.un.s", 0x37, Operand.SHORT_BRANCH)
+    BR = ("br", 0x38, Operand.BRANCH)
+    BRFALSE = ("brfalse", 0x39, Operand.BRANCH)
+    BRTRUE = ("brtrue", 0x3A, Operand.BRANCH)
+    BEQ = ("beq", 0x3B, Operand.BRANCH)
+    BGE = ("bge", 0x3C, Operand.BRANCH)
+    BGT = ("bgt", 0x3D, Operand.BRANCH)
+    BLE = ("ble", 0x3E, Operand.BRANCH)
+    BLT = ("blt", 0x3F, Operand.BRANCH)
+    BNE_UN = ("bne.un", 0x40, Operand.BRANCH)
+    BGE_UN = ("bge.un", 0x41, Operand.BRANCH)
+    BGT_UN = ("bgt.un", 0x42, Operand.BRANCH)
+    BLE_UN = ("ble.un", 0x43, Operand.BRANCH)
+    BLT_UN = ("blt.un", 0x44, Operand.BRANCH)
+    LDIND_I1 = ("ldind.i1", 0x46, Operand.NONE)
+    LDIND_I4 = ("ldind.i4", 0x4A, Operand.NONE)
+    LDIND_R8 = ("ldind.r8", 0x4F, Operand.NONE)
+    LDIND_REF = ("ldind.ref", 0x50, Operand.NONE)
+    STIND_REF = ("stind.ref", 0x51, Operand.NONE)
+    STIND_I1 = ("stind.i1", 0x52, Operand.NONE)
+    STIND_I4 = ("stind.i4", 0x54, Operand.NONE)
+    STIND_R8 = ("stind.r8", 0x56, Operand.NONE)
+    ADD = ("add", 0x58, Operand.NONE)
+    SUB = ("sub", 0x59, Operand.NONE)
+    MUL = ("mul", 0x5A, Operand.NONE)
+    DIV = ("div", 0x5B, Operand.NONE)
+    REM = ("rem", 0x5D, Operand.NONE)
+    AND = ("and", 0x5F, Operand.NONE)
+    OR = ("or", 0x60, Operand.NONE)
+    XOR = ("xor", 0x61, Operand.NONE)
+    SHL = ("shl", 0x62, Operand.NONE)
+    SHR = ("shr", 0x63, Operand.NONE)
+    NEG = ("neg", 0x65, Operand.NONE)
+    NOT = ("not", 0x66, Operand.NONE)
+    CONV_I4 = ("conv.i4", 0x69, Operand.NONE)
+    CONV_R8 = ("conv.r8", 0x6C, Operand.NONE)
+    CALLVIRT = ("callvirt", 0x6F, Operand.TOKEN)
+    LDOBJ = ("ldobj", 0x71, Operand.TOKEN)
+    LDSTR = ("ldstr", 0x72, Operand.TOKEN)
+    NEWOBJ = ("newobj", 0x73, Operand.TOKEN)
+    LDFLD = ("ldfld", 0x7B, Operand.TOKEN)
+    STFLD = ("stfld", 0x7D, Operand.TOKEN)
+    LDSFLD = ("ldsfld", 0x7E, Operand.TOKEN)
+    STSFLD = ("stsfld", 0x80, Operand.TOKEN)
+    STOBJ = ("stobj", 0x81, Operand.TOKEN)
+    CEQ = ("ceq", 0xFE01, Operand.NONE)
+    CGT = ("cgt", 0xFE02, Operand.NONE)
+    CGT_UN = ("cgt.un", 0xFE03, Operand.NONE)
+    CLT = ("clt", 0xFE04, Operand.NONE)
+    CLT_UN = ("clt.un", 0xFE05, Operand.NONE)
+    LDARG = ("ldarg", 0xFE09, Operand.UINT16)
+    LDARGA = ("ldarga", 0xFE0A, Operand.UINT16)
+    STARG = ("starg", 0xFE0B, Operand.UINT16)
+    LDLOC = ("ldloc", 0xFE0C, Operand.UINT16)
+    LDLOCA = ("ldloca", 0xFE0D, Operand.UINT16)
+    STLOC = ("stloc", 0xFE0E, Operand.UINT16)
+
+    def __init__(self, mnemonic: str, code: Optional[int], operand: Operand):
+        self.mnemonic = mnemonic
+        self.code = code
+        self.operand = operand
+        self.size = 0 if code is None else (2 if code > 0xFF else 1) + operand.size
+        self.is_branch = operand in (Operand.BRANCH, Operand.SHORT_BRANCH)
+
+    # Члены - единственные экземпляры, а Enum.__hash__ написан на Python: проходы
+    # по коду постоянно ищут коды операций в множествах и словарях
+    __hash__ = object.__hash__
+
+OPCODES_BY_MNEMONIC: Dict[str, OpCode] = {op.mnemonic: op for op in OpCode if op is not OpCode.LABEL}
+_OPCODES_BY_CODE: Dict[int, OpCode] = {op.code: op for op in OpCode if op.code is not None}
+
+class MethodRef(NamedTuple):
+    """Ссылка на метод: call/callvirt/newobj"""
+    return_type: str
+    owner: str
+    name: str
+    params: Tuple[str, ...] = ()
+    instance: bool = False
+
+    def __str__(self) -> str:
+        target = f"{self.owner}::{self.name}" if self.owner else self.name
+        prefix = "instance " if self.instance else ""
+        return f"{prefix}{self.return_type} {target}({', '.join(self.params)})"
+
+class FieldRef(NamedTuple):
+    """Ссылка на поле: ldfld/stfld/ldsfld/stsfld"""
+    type: str
+    owner: str
+    name: str
+
+    def __str__(self) -> str:
+        return f"{self.type} {self.owner}::{self.name}"
+
+class Instruction(NamedTuple):
+    """
+    Одна инструкция. operand - число, строка (ldstr, тип для ldobj/stobj),
+    MethodRef или FieldRef; label - цель перехода, а у OpCode.LABEL - сама метка;
+    source - SourceInfo оператора, из которого получена инструкция.
+    """
+    opcode: OpCode
+    operand: Union[int, float, str, MethodRef, FieldRef, None] = None
+    label: Optional[str] = None
+    source: Optional[object] = None
+
+# Обращение к члену Enum через класс заметно дороже обычного атрибута, а render
+# вызывается для каждой инструкции
+_LABEL, _LDSTR, _TOKEN = OpCode.LABEL, OpCode.LDSTR, Operand.TOKEN
+
+@lru_cache(maxsize=4096)
+def _operand_text(operand) -> str:
+    return str(operand)
+
+def render(ins: Instruction) -> str:
+    """Текст инструкции в синтаксисе ilasm"""
+    opcode, operand, label, _ = ins
+    if label is not None:
+        return f"{label}:" if opcode is _LABEL else f"{opcode.mnemonic} {label}"
+    if operand is None:
+        return opcode.mnemonic
+    if opcode.operand is _TOKEN:
+        if opcode is _LDSTR:
+            return f'ldstr "{operand}"'
+        return f"{opcode.mnemonic} {_operand_text(operand)}"
+    return f"{opcode.mnemonic} {operand}"
+
+def code_size(instructions: Iterable[Instruction]) -> int:
+    """Размер тела метода в байтах (без заголовка и .locals)"""
+    return sum(ins.opcode.size for ins in instructions)
+
+# Переход -> (короткая форма, длинная форма)
+_BRANCH_FORMS: Dict[OpCode, Tuple[OpCode, OpCode]] = {}
+for _op in OpCode:
+    if _op.operand is Operand.BRANCH:
+        _BRANCH_FORMS[_op] = _BRANCH_FORMS[OpCode[_op.name + "_S"]] = (OpCode[_op.name + "_S"], _op)
+
+def relax_branches(instructions: List[Instruction]) -> int:
+    """
+    Выбирает для каждого перехода короткую форму (.s, смещение в байт), если цель
+    достаточно близко, иначе длинную; меняет список на месте и возвращает число
+    коротких переходов. Начинает со всех коротких: удлинение перехода только
+    раздвигает код, поэтому итерация сходится.
+    """
+    branches = [i for i, ins in enumerate(instructions) if ins.opcode in _BRANCH_FORMS]
+    short = set(branches)
+    while True:
+        offsets, ends, offset = {}, {}, 0
+        for i, ins in enumerate(instructions):
+            opcode = ins.opcode
+            if opcode is _LABEL:
+                offsets[ins.label] = offset
+                continue
+            forms = _BRANCH_FORMS.get(opcode)
+            offset += (forms[0] if i in short else forms[1]).size if forms else opcode.size
+            ends[i] = offset
+        too_far = {i for i in short if not -128 <= offsets[instructions[i].label] - ends[i] <= 127}
+        if not too_far:
+            break
+        short -= too_far
+    for i in branches:
+        forms = _BRANCH_FORMS[instructions[i].opcode]
+        instructions[i] = instructions[i]._replace(opcode=forms[0] if i in short else forms[1])
+    return len(short)
+
+_SCALARS = {
+    Operand.INT8: struct.Struct("<b"), Operand.UINT8: struct.Struct("<B"),
+    Operand.UINT16: struct.Struct("<H"), Operand.INT32: struct.Struct("<i"),
+    Operand.FLOAT64: struct.Struct("<d"), Operand.SHORT_BRANCH: struct.Struct("<b"),
+    Operand.BRANCH: struct.Struct("<i"), Operand.TOKEN: struct.Struct("<I"),
+}
+
+@dataclass(frozen=True, slots=True)
+class Bytecode:
+    """
+    Тело метода в кодировке ECMA-335: code - байты инструкций, refs - таблица
+    операндов-ссылок (токен инструкции - индекс в ней). Имена меток и позиции
+    в исходнике не сохраняются: decode() называет метки по смещению (IL_001a).
+    """
+    code: bytes
+    refs: Tuple[object, ...]
+
+    @classmethod
+    def encode(cls, instructions: List[Instruction]) -> 'Bytecode':
+        offsets, offset = {}, 0
+        for ins in instructions:
+            if ins.opcode is OpCode.LABEL:
+                offsets[ins.label] = offset
+            offset += ins.opcode.size
+
+        code, refs, ref_index = bytearray(), [], {}
+        offset = 0
+        for ins in instructions:
+            opcode = ins.opcode
+            if opcode is OpCode.LABEL:
+                continue
+            offset += opcode.size
+            code += opcode.code.to_bytes(2 if opcode.code > 0xFF else 1, "big")
+            kind = opcode.operand
+            if kind is Operand.NONE:
+                continue
+            if opcode.is_branch:
+                value = offsets[ins.label] - offset
+            elif kind is Operand.TOKEN:
+                value = ref_index.get(ins.operand)
+                if value is None:
+                    value = ref_index[ins.operand] = len(refs)
+                    refs.append(ins.operand)
+            else:
+                value = ins.operand
+            try:
+                code += _SCALARS[kind].pack(value)
+            except struct.error:
+                raise ValueError(f"{opcode.mnemonic}: operand {value} does not fit {kind.name}") from None
+        return cls(bytes(code), tuple(refs))
+
+    def decode(self) -> List[Instruction]:
+        code, pos, decoded, targets = self.code, 0, [], set()
+        while pos < len(code):
+            start = pos
+            value = code[pos]
+            if value == 0xFE:
+                value = 0xFE00 | code[pos + 1]
+                pos += 1
+            pos += 1
+            opcode = _OPCODES_BY_CODE[value]
+            kind = opcode.operand
+            operand = None
+            if kind is not Operand.NONE:
+                operand = _SCALARS[kind].unpack_from(code, pos)[0]
+                pos += kind.size
+            if opcode.is_branch:
+                targets.add(pos + operand)
+                decoded.append((start, Instruction(opcode, label=f"IL_{pos + operand:04x}")))
+            elif kind is Operand.TOKEN:
+                decoded.append((start, Instruction(opcode, self.refs[operand])))
+            else:
+                decoded.append((start, Instruction(opcode, operand)))
+
+        instructions = []
+        for start, ins in decoded:
+            if start in targets:
+                instructions.append(Instruction(OpCode.LABEL, label=f"IL_{start:04x}"))
+            instructions.append(ins)
+        if len(code) in targets:
+            instructions.append(Instruction(OpCode.LABEL, label=f"IL_{len(code):04x}"))
+        return instructions
+
+    @property
+    def size(self) -> int:
+        return len(self.code)
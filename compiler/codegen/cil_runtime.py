@@ -1,43 +1,60 @@
 from typing import List, Tuple
 from codegen.cil_emitter import CILEmitter
+from codegen.cil_instructions import MethodRef, OpCode
 from parser.ast import Type, TypeKind
 
 class RuntimeCodeGenerator:
     """Генератор вызовов runtime функций"""
     
     RUNTIME_CLASS = "[ImgLangRuntime]Runtime"
+    COLOR_CLASS = "[System.Drawing]System.Drawing.Color"
     
+    # effect - побочные эффекты вызова: "pure" (результат зависит только от аргументов),
+    # "reads_image" (читает пиксели), "writes_image" (меняет пиксели), "io" (ввод-вывод,
+    # новое изображение); throws - может ли вызов бросить исключение
     BUILTIN_FUNCTIONS = {
         "load_image": {
             "return_type": "class [System.Drawing]System.Drawing.Bitmap",
             "params": ["string"],
-            "method": "LoadImage"
+            "method": "LoadImage",
+            "effect": "io",
+            "throws": True
         },
         "save_image": {
             "return_type": "void",
             "params": ["class [System.Drawing]System.Drawing.Bitmap", "string"],
-            "method": "SaveImage"
+            "method": "SaveImage",
+            "effect": "io",
+            "throws": True
         },
         "create_image": {
             "return_type": "class [System.Drawing]System.Drawing.Bitmap",
             "params": ["int32", "int32"],
-            "method": "CreateImage"
+            "method": "CreateImage",
+            "effect": "io",
+            "throws": True
         },
         
         "get_width": {
             "return_type": "int32",
             "params": ["class [System.Drawing]System.Drawing.Bitmap"],
-            "method": "GetWidth"
+            "method": "GetWidth",
+            "effect": "pure",
+            "throws": False
         },
         "get_height": {
             "return_type": "int32",
             "params": ["class [System.Drawing]System.Drawing.Bitmap"],
-            "method": "GetHeight"
+            "method": "GetHeight",
+            "effect": "pure",
+            "throws": False
         },
         "get_pixel": {
             "return_type": "valuetype [System.Drawing]System.Drawing.Color",
             "params": ["class [System.Drawing]System.Drawing.Bitmap", "int32", "int32"],
-            "method": "GetPixel"
+            "method": "GetPixel",
+            "effect": "reads_image",
+            "throws": True
         },
         "set_pixel": {
             "return_type": "void",
@@ -47,35 +64,47 @@ class RuntimeCodeGenerator:
                 "int32", 
                 "valuetype [System.Drawing]System.Drawing.Color"
             ],
-            "method": "SetPixel"
+            "method": "SetPixel",
+            "effect": "writes_image",
+            "throws": True
         },
         
         "to_color": {
             "return_type": "valuetype [System.Drawing]System.Drawing.Color",
             "params": ["int32", "int32", "int32"],
-            "method": "ToColor"
+            "method": "ToColor",
+            "effect": "pure",
+            "throws": True
         },
         
         "clamp": {
             "return_type": "int32",
             "params": ["int32", "int32", "int32"],
-            "method": "Clamp"
+            "method": "Clamp",
+            "effect": "pure",
+            "throws": False
         },
         
         "write": {
             "return_type": "void",
             "params": [],
-            "method": "Write"
+            "method": "Write",
+            "effect": "io",
+            "throws": False
         },
         "read_int": {
             "return_type": "int32",
             "params": [],
-            "method": "ReadInt"
+            "method": "ReadInt",
+            "effect": "io",
+            "throws": True
         },
         "read_float": {
             "return_type": "float64",
             "params": [],
-            "method": "ReadFloat"
+            "method": "ReadFloat",
+            "effect": "io",
+            "throws": True
         },
     }
     
@@ -91,9 +120,8 @@ class RuntimeCodeGenerator:
         if not func_info:
             raise ValueError(f"Unknown builtin function: {func_name}")
         
-        params_str = ', '.join(func_info["params"])
-        method_call = f'call {func_info["return_type"]} {cls.RUNTIME_CLASS}::{func_info["method"]}({params_str})'
-        emitter.emit(method_call, f"call {func_name}")
+        emitter.emit(OpCode.CALL, MethodRef(func_info["return_type"], cls.RUNTIME_CLASS,
+                                            func_info["method"], tuple(func_info["params"])))
         
         return func_info["return_type"]
     
@@ -103,16 +131,9 @@ class RuntimeCodeGenerator:
             return "void"
         
         for arg_type in arg_types:
-            if arg_type == "int32":
-                emitter.emit(f"call void {cls.RUNTIME_CLASS}::Write(int32)")
-            elif arg_type == "float64":
-                emitter.emit(f"call void {cls.RUNTIME_CLASS}::Write(float64)")
-            elif arg_type == "string":
-                emitter.emit(f"call void {cls.RUNTIME_CLASS}::Write(string)")
-            elif arg_type == "bool":
-                emitter.emit(f"call void {cls.RUNTIME_CLASS}::Write(bool)")
-            else:
-                emitter.emit(f"call void {cls.RUNTIME_CLASS}::Write(object)")
+            if arg_type not in ("int32", "float64", "string", "bool"):
+                arg_type = "object"
+            emitter.emit(OpCode.CALL, MethodRef("void", cls.RUNTIME_CLASS, "Write", (arg_type,)))
         
         return "void"
     
@@ -121,13 +142,13 @@ class RuntimeCodeGenerator:
         """Генерирует доступ к компонентам цвета"""
         
         if member.lower() == 'r':
-            emitter.emit("call instance uint8 [System.Drawing]System.Drawing.Color::get_R()", "get R")
-            emitter.emit("conv.i4", "convert byte to int")
+            emitter.emit(OpCode.CALL, MethodRef("uint8", cls.COLOR_CLASS, "get_R", instance=True))
+            emitter.emit(OpCode.CONV_I4)
         elif member.lower() == 'g':
-            emitter.emit("call instance uint8 [System.Drawing]System.Drawing.Color::get_G()", "get G")
-            emitter.emit("conv.i4", "convert byte to int")
+            emitter.emit(OpCode.CALL, MethodRef("uint8", cls.COLOR_CLASS, "get_G", instance=True))
+            emitter.emit(OpCode.CONV_I4)
         elif member.lower() == 'b':
-            emitter.emit("call instance uint8 [System.Drawing]System.Drawing.Color::get_B()", "get B")
-            emitter.emit("conv.i4", "convert byte to int")
+            emitter.emit(OpCode.CALL, MethodRef("uint8", cls.COLOR_CLASS, "get_B", instance=True))
+            emitter.emit(OpCode.CONV_I4)
         else:
             raise ValueError(f"Unknown color member: {member}")
\ No newline at end of file
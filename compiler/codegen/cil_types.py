@@ -1,4 +1,5 @@
 from typing import Dict, Optional, Tuple
+from codegen.cil_instructions import MethodRef, OpCode
 from parser.ast import Type, TypeKind
 
 class CILTypeSystem:
@@ -41,79 +42,78 @@ class CILTypeSystem:
         return cil_type, net_type
     
     @classmethod
-    def get_ldarg_instruction(cls, index: int) -> str:
-        """Возвращает инструкцию загрузки аргумента"""
-        if index == 0:
-            return "ldarg.0"
-        elif index == 1:
-            return "ldarg.1"
-        elif index == 2:
-            return "ldarg.2"
-        elif index == 3:
-            return "ldarg.3"
-        else:
-            return f"ldarg {index}"
+    def get_ldarg_instruction(cls, index: int) -> Tuple[OpCode, Optional[int]]:
+        """Возвращает инструкцию загрузки аргумента: код операции и операнд"""
+        if index <= 3:
+            return (OpCode.LDARG_0, OpCode.LDARG_1, OpCode.LDARG_2, OpCode.LDARG_3)[index], None
+        return OpCode.LDARG, index
     
     @classmethod
-    def get_ldloc_instruction(cls, index: int) -> str:
-        """Возвращает инструкцию загрузки локальной переменной"""
-        if index == 0:
-            return "ldloc.0"
-        elif index == 1:
-            return "ldloc.1"
-        elif index == 2:
-            return "ldloc.2"
-        elif index == 3:
-            return "ldloc.3"
-        else:
-            return f"ldloc {index}"
+    def get_ldloc_instruction(cls, index: int) -> Tuple[OpCode, Optional[int]]:
+        """Возвращает инструкцию загрузки локальной переменной: код операции и операнд"""
+        if index <= 3:
+            return (OpCode.LDLOC_0, OpCode.LDLOC_1, OpCode.LDLOC_2, OpCode.LDLOC_3)[index], None
+        return OpCode.LDLOC, index
     
     @classmethod
-    def get_stloc_instruction(cls, index: int) -> str:
-        """Возвращает инструкцию сохранения в локальную переменную"""
-        if index == 0:
-            return "stloc.0"
-        elif index == 1:
-            return "stloc.1"
-        elif index == 2:
-            return "stloc.2"
-        elif index == 3:
-            return "stloc.3"
-        else:
-            return f"stloc {index}"
+    def get_stloc_instruction(cls, index: int) -> Tuple[OpCode, Optional[int]]:
+        """Возвращает инструкцию сохранения в локальную переменную: код операции и операнд"""
+        if index <= 3:
+            return (OpCode.STLOC_0, OpCode.STLOC_1, OpCode.STLOC_2, OpCode.STLOC_3)[index], None
+        return OpCode.STLOC, index
+    
+    ARITHMETIC_INSTRUCTIONS = {
+        '+': (OpCode.ADD,),
+        '-': (OpCode.SUB,),
+        '*': (OpCode.MUL,),
+        '/': (OpCode.DIV,),
+        '%': (OpCode.REM,),
+        '**': (OpCode.CALL, MethodRef("float64", "[mscorlib]System.Math", "Pow", ("float64", "float64"))),
+        '&': (OpCode.AND,),
+        '|': (OpCode.OR,),
+        '^': (OpCode.XOR,),
+        '<<': (OpCode.SHL,),
+        '>>': (OpCode.SHR,),
+        '&&': (OpCode.AND,),
+        '||': (OpCode.OR,),
+    }
+    
+    COMPARISON_INSTRUCTIONS = {
+        '==': (OpCode.CEQ,),
+        '!=': (OpCode.CEQ, OpCode.LDC_I4_0, OpCode.CEQ),
+        '>': (OpCode.CGT,),
+        '<': (OpCode.CLT,),
+        '>=': (OpCode.CLT, OpCode.LDC_I4_0, OpCode.CEQ),
+        '<=': (OpCode.CGT, OpCode.LDC_I4_0, OpCode.CEQ),
+    }
+
+    # Сравнение сразу с переходом: оператор -> ((если истинно, если ложно) для целых,
+    # (если истинно, если ложно) для float64). С NaN результат тот же, что у
+    # COMPARISON_INSTRUCTIONS: <, > и == ложны, а <=, >= и != (через ceq с нулём) истинны
+    BRANCH_INSTRUCTIONS = {
+        '==': ((OpCode.BEQ, OpCode.BNE_UN), (OpCode.BEQ, OpCode.BNE_UN)),
+        '!=': ((OpCode.BNE_UN, OpCode.BEQ), (OpCode.BNE_UN, OpCode.BEQ)),
+        '<': ((OpCode.BLT, OpCode.BGE), (OpCode.BLT, OpCode.BGE_UN)),
+        '>': ((OpCode.BGT, OpCode.BLE), (OpCode.BGT, OpCode.BLE_UN)),
+        '<=': ((OpCode.BLE, OpCode.BGT), (OpCode.BLE_UN, OpCode.BGT)),
+        '>=': ((OpCode.BGE, OpCode.BLT), (OpCode.BGE_UN, OpCode.BLT)),
+    }
     
     @classmethod
-    def get_arithmetic_instruction(cls, operator: str) -> Optional[str]:
-        """Возвращает арифметическую инструкцию CIL"""
-        instructions = {
-            '+': 'add',
-            '-': 'sub',
-            '*': 'mul',
-            '/': 'div',
-            '%': 'rem',
-            '**': 'call float64 [mscorlib]System.Math::Pow(float64, float64)',
-            '&': 'and',
-            '|': 'or',
-            '^': 'xor',
-            '<<': 'shl',
-            '>>': 'shr',
-            '&&': 'and',
-            '||': 'or',
-        }
-        return instructions.get(operator)
+    def get_arithmetic_instruction(cls, operator: str) -> Optional[Tuple]:
+        """Возвращает арифметическую инструкцию CIL: код операции и, для '**', операнд"""
+        return cls.ARITHMETIC_INSTRUCTIONS.get(operator)
     
     @classmethod
-    def get_comparison_instruction(cls, operator: str) -> Optional[str]:
-        """Возвращает инструкцию сравнения CIL"""
-        instructions = {
-            '==': 'ceq',
-            '!=': lambda: ['ceq', 'ldc.i4.0', 'ceq'],
-            '>': 'cgt',
-            '<': 'clt',
-            '>=': lambda: ['clt', 'ldc.i4.0', 'ceq'],
-            '<=': lambda: ['cgt', 'ldc.i4.0', 'ceq'],
-        }
-        return instructions.get(operator)
+    def get_comparison_instruction(cls, operator: str) -> Tuple[OpCode, ...]:
+        """Возвращает последовательность кодов операций сравнения CIL"""
+        return cls.COMPARISON_INSTRUCTIONS.get(operator, ())
+
+    @classmethod
+    def get_branch_instruction(cls, operator: str, jump_if: bool, is_float: bool) -> OpCode:
+        """Переход, если operator над двумя значениями на стеке дал jump_if"""
+        when_true, when_false = cls.BRANCH_INSTRUCTIONS[operator][is_float]
+        return when_true if jump_if else when_false
     
     @classmethod
     def is_floating_point(cls, type_kind: TypeKind) -> bool:
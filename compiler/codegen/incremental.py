@@ -0,0 +1,171 @@
+import dataclasses
+import hashlib
+from collections import OrderedDict
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Set
+
+from codegen.cil_emitter import CILMethod
+from parser.ast import CallExpr, ConstructorExpr, Type, TypeKind
+from semantic.symbols import SymbolTable
+
+_FIELDS: Dict[type, tuple] = {}
+
+def _fields(cls) -> tuple:
+    names = _FIELDS.get(cls)
+    if names is None:
+        names = tuple(f.name for f in dataclasses.fields(cls) if f.name != "source_info")
+        _FIELDS[cls] = names
+    return names
+
+def _walk(node, out: list, calls: Set[str], structs: Set[str]):
+    """
+    Каноническая запись поддерева AST без source_info (т.е. без позиций, пробелов и комментариев).
+    Попутно собирает имена вызываемых функций и используемых структур.
+    """
+    cls = node.__class__
+    if cls is list or cls is tuple:
+        out.append("[")
+        for item in node:
+            _walk(item, out, calls, structs)
+        out.append("]")
+    elif cls is Type:
+        out.append(node.kind.value)
+        if node.struct_name:
+            out.append(node.struct_name)
+            structs.add(node.struct_name)
+    elif dataclasses.is_dataclass(cls):
+        if cls is CallExpr:
+            calls.add(node.func_name)
+        elif cls is ConstructorExpr:
+            calls.add(node.struct_name)
+        out.append(cls.__name__)
+        for name in _fields(cls):
+            _walk(getattr(node, name), out, calls, structs)
+        out.append(")")
+    elif isinstance(node, Enum):
+        out.append(node.value)
+    else:
+        out.append(repr(node))
+
+class ProgramInterface:
+    """
+    То, от чего зависит код отдельного объявления помимо его собственного текста:
+    сигнатуры функций и методов (по короткому имени, как их ищет генератор) и раскладки структур.
+    """
+
+    def __init__(self, method_map: Dict[str, Dict], symbol_table: SymbolTable, struct_names: List[str]):
+        self.signatures: Dict[str, str] = {}
+        self.signature_structs: Dict[str, Set[str]] = {}
+        for name in sorted(method_map):
+            info = method_map[name]
+            out = [f"sig {name}:"]
+            structs: Set[str] = set()
+            _walk(info['return_type'], out, set(), structs)
+            _walk(info['params'], out, set(), structs)
+            short = name.rsplit("::", 1)[-1]
+            self.signatures[short] = self.signatures.get(short, "") + "\1".join(out)
+            self.signature_structs.setdefault(short, set()).update(structs)
+
+        self.layouts: Dict[str, str] = {}
+        self.layout_structs: Dict[str, Set[str]] = {}
+        for name in struct_names:
+            struct_sym = symbol_table.resolve_struct(name)
+            out = [f"struct {name}:"]
+            structs: Set[str] = set()
+            if struct_sym:
+                out.append(struct_sym.parent or "")
+                if struct_sym.parent:
+                    structs.add(struct_sym.parent)
+                for field_name, field_sym in struct_sym.fields.items():
+                    out.append(field_name)
+                    _walk(field_sym.type, out, set(), structs)
+            self.layouts[name] = "\1".join(out)
+            self.layout_structs[name] = structs
+
+    def dependencies(self, names: Iterable[str], owner: Optional[str] = None) -> List[str]:
+        """Сигнатуры упомянутых функций и раскладки всех достижимых через них структур"""
+        parts = []
+        structs = {name for name in names if name in self.layouts}
+        if owner:
+            structs.add(owner)
+
+        for name in sorted(set(names) & self.signatures.keys()):
+            parts.append(self.signatures[name])
+            structs |= self.signature_structs[name]
+
+        pending = list(structs)
+        while pending:
+            for dep in self.layout_structs.get(pending.pop(), ()):
+                if dep not in structs:
+                    structs.add(dep)
+                    pending.append(dep)
+
+        parts.extend(self.layouts.get(name, "") for name in sorted(structs))
+        return parts
+
+def declaration_key(unit: str, node, interface: ProgramInterface, owner: Optional[str] = None) -> str:
+    """
+    Ключ единицы генерации (функции, метода структуры или Main): отпечаток её текста
+    вместе с сигнатурами вызываемых функций и раскладками используемых структур.
+    Для функций берётся отпечаток токенов из парсера, иначе - каноническая запись поддерева AST.
+    """
+    digest = getattr(node, "source_digest", None)
+    if digest is not None:
+        out = [unit, digest.digest]
+        names = digest.names
+    else:
+        out = [unit]
+        calls: Set[str] = set()
+        structs: Set[str] = set()
+        _walk(node, out, calls, structs)
+        names = calls | structs
+
+    out.extend(interface.dependencies(names, owner))
+    return hashlib.sha256("\0".join(out).encode("utf-8")).hexdigest()
+
+def _copy_method(method: CILMethod) -> CILMethod:
+    return dataclasses.replace(
+        method,
+        parameters=list(method.parameters),
+        locals=list(method.locals),
+        instructions=list(method.instructions),
+        labels=dict(method.labels),
+        constants=dict(method.constants),
+    )
+
+class DeclarationCache:
+    """
+    Кэш сгенерированных методов CIL по ключу объявления (см. declaration_key).
+    Живёт дольше одной компиляции — в Toolchain сервера и пакетного режима,
+    поэтому после правки одной функции перегенерируется только она.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._methods: OrderedDict[str, CILMethod] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[CILMethod]:
+        method = self._methods.get(key)
+        if method is None:
+            self.misses += 1
+            return None
+        self._methods.move_to_end(key)
+        self.hits += 1
+        return _copy_method(method)
+
+    def put(self, key: str, method: CILMethod):
+        """
+        Запоминает копию метода без Instruction.source: позиции нужны только проверке
+        стека (max_stack уже пройдена), а SourceInfo держал бы весь текст старой ревизии
+        """
+        method = _copy_method(method)
+        method.instructions = [ins._replace(source=None) for ins in method.instructions]
+        self._methods[key] = method
+        self._methods.move_to_end(key)
+        while len(self._methods) > self.max_entries:
+            self._methods.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._methods)
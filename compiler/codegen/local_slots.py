@@ -0,0 +1,178 @@
+"""
+Распределение локальных переменных по слотам (-O1), после peephole.
+
+Генератор заводит новый слот на каждое объявление (в том числе внутри блоков и
+циклов) и на каждое чтение компоненты цвета (tmp_col_access) и никогда их не
+освобождает. Здесь для каждой локальной считается живучесть по инструкциям
+метода (блоки режутся метками и переходами, итерация до неподвижной точки), и
+локальные одного типа CIL, которые никогда не живы одновременно, получают общий
+слот. Так освобождаются и переменные закончившихся блоков, и временные.
+Локальные, которые только пишутся (копии параметров после peephole, переменные
+без чтений), удаляются вместе с записью.
+
+Чтение до первой записи полагается на .locals init (нули): такая переменная
+жива от входа в метод, и её слот не достанется тому, что пишется раньше.
+ldloca для геттера Color - обычное чтение; адрес, отданный процедуре
+(result-параметр), может быть записан когда угодно, поэтому такая локальная
+получает собственный слот.
+"""
+from typing import Dict, List
+
+from codegen.cil_emitter import CILMethod, CILVariable
+from codegen.cil_instructions import Instruction, MethodRef, OpCode
+from codegen.cil_runtime import RuntimeCodeGenerator
+from codegen.peephole import LDLOC, STLOC, LDLOCA, LDARG, LDC_I4, TERMINATORS, \
+    load_local, slot, store_local
+
+_LABEL = OpCode.LABEL
+# Кладут на стек одно значение и ничего больше не делают: такое значение можно
+# не вычислять вместо stloc в локальную без чтений
+_PURE_PUSH = LDLOC | LDARG | LDC_I4 | {OpCode.LDC_R8, OpCode.LDSTR, OpCode.LDNULL, OpCode.LDSFLD, OpCode.DUP}
+
+def _is_getter(ins: Instruction) -> bool:
+    ref = ins.operand
+    return (ins.opcode is OpCode.CALL and isinstance(ref, MethodRef) and ref.instance
+            and ref.owner == RuntimeCodeGenerator.COLOR_CLASS and ref.name.startswith("get_"))
+
+def allocate_locals(method: CILMethod) -> int:
+    """Переназначает слоты локальных метода на месте; возвращает, на сколько их стало меньше"""
+    code = method.instructions
+    before = len(method.locals)
+    if not before or not code:
+        return 0
+    while _drop_dead_stores(code):
+        pass
+
+    used, pinned = set(), set()
+    for i, ins in enumerate(code):
+        opcode = ins.opcode
+        if opcode in LDLOC or opcode in STLOC:
+            used.add(slot(ins)[1])
+        elif opcode in LDLOCA:
+            index = slot(ins)[1]
+            used.add(index)
+            if i + 1 >= len(code) or not _is_getter(code[i + 1]):
+                pinned.add(index)
+
+    conflicts = _interference(code, len(method.locals))
+    slots: List[CILVariable] = []
+    members: List[int] = []
+    mapping: Dict[int, int] = {}
+    for index in sorted(used):
+        var = method.locals[index]
+        target = None
+        if index not in pinned:
+            for n, shared in enumerate(slots):
+                if shared.cil_type == var.cil_type and members[n] >= 0 and not conflicts[index] & members[n]:
+                    target = n
+                    break
+        if target is None:
+            target = len(slots)
+            slots.append(CILVariable(var.name, var.cil_type, var.net_type, target,
+                                     is_reference=var.is_reference))
+            # В слот закреплённой локальной больше никто не попадает
+            members.append(-1 if index in pinned else 0)
+        if members[target] >= 0:
+            members[target] |= 1 << index
+        mapping[index] = target
+
+    for i, ins in enumerate(code):
+        opcode = ins.opcode
+        if opcode in LDLOC:
+            code[i] = load_local(mapping[slot(ins)[1]], ins.source)
+        elif opcode in STLOC:
+            code[i] = store_local(mapping[slot(ins)[1]], ins.source)
+        elif opcode in LDLOCA:
+            index = mapping[ins.operand]
+            code[i] = ins._replace(opcode=OpCode.LDLOCA_S if index <= 255 else OpCode.LDLOCA, operand=index)
+    method.locals = slots
+    return before - len(slots)
+
+def _drop_dead_stores(code: List[Instruction]) -> bool:
+    """stloc в локальную, которую никто не читает, становится pop (вместе с чистым значением - ничем)"""
+    read = {slot(ins)[1] for ins in code if ins.opcode in LDLOC or ins.opcode in LDLOCA}
+    kept, changed = [], False
+    for ins in code:
+        if ins.opcode in STLOC and slot(ins)[1] not in read:
+            changed = True
+            if kept and kept[-1].opcode in _PURE_PUSH:
+                kept.pop()
+            else:
+                kept.append(Instruction(OpCode.POP, source=ins.source))
+            continue
+        kept.append(ins)
+    code[:] = kept
+    return changed
+
+def _interference(code: List[Instruction], count: int) -> List[int]:
+    """
+    Для каждой локальной - битовая маска локальных, с которыми она не может делить
+    слот: одна пишется, пока другая жива
+    """
+    # Базовые блоки: [начало, конец) и переходы
+    starts, block_of_label = [0], {}
+    for i, ins in enumerate(code):
+        if ins.opcode is _LABEL:
+            if starts[-1] != i:
+                starts.append(i)
+            block_of_label[ins.label] = len(starts) - 1
+        elif ins.opcode.is_branch or ins.opcode in TERMINATORS:
+            if i + 1 < len(code):
+                starts.append(i + 1)
+    bounds = list(zip(starts, starts[1:] + [len(code)]))
+
+    successors, gen, kill = [], [], []
+    for n, (start, end) in enumerate(bounds):
+        used = defined = 0
+        for ins in code[start:end]:
+            opcode = ins.opcode
+            if opcode in LDLOC or opcode in LDLOCA:
+                bit = 1 << slot(ins)[1]
+                if not defined & bit:
+                    used |= bit
+            elif opcode in STLOC:
+                defined |= 1 << slot(ins)[1]
+        gen.append(used)
+        kill.append(defined)
+        last = code[end - 1].opcode
+        targets = [block_of_label[code[end - 1].label]] if last.is_branch else []
+        if n + 1 < len(bounds) and last not in TERMINATORS:
+            targets.append(n + 1)
+        successors.append(targets)
+
+    live_in = [0] * len(bounds)
+    live_out = [0] * len(bounds)
+    changed = True
+    while changed:
+        changed = False
+        for n in range(len(bounds) - 1, -1, -1):
+            out = 0
+            for s in successors[n]:
+                out |= live_in[s]
+            live_out[n] = out
+            new_in = gen[n] | (out & ~kill[n])
+            if new_in != live_in[n]:
+                live_in[n] = new_in
+                changed = True
+
+    conflicts = [0] * count
+    for n, (start, end) in enumerate(bounds):
+        live = live_out[n]
+        for ins in reversed(code[start:end]):
+            opcode = ins.opcode
+            if opcode in STLOC:
+                index = slot(ins)[1]
+                bit = 1 << index
+                _conflict(conflicts, index, live & ~bit)
+                live &= ~bit
+            elif opcode in LDLOC or opcode in LDLOCA:
+                live |= 1 << slot(ins)[1]
+    return conflicts
+
+def _conflict(conflicts: List[int], index: int, live: int):
+    conflicts[index] |= live
+    bit = 1 << index
+    while live:
+        low = live & -live
+        conflicts[low.bit_length() - 1] |= bit
+        live ^= low
@@ -0,0 +1,337 @@
+"""
+Оптимизация «через глазок» (-O1): метод переписывается до генерации текста IL.
+
+Проходы:
+  * параметры без копий - пролог копирует каждый аргумент в локальную; если ни
+    аргумент, ни копия больше не меняются, загрузки копии становятся ldarg,
+    а пара ldarg/stloc пролога удаляется;
+  * таблица замен RULES - короткие цепочки подряд идущих инструкций (метка
+    между ними разрывает цепочку);
+  * переходы - переход на br идёт сразу к его цели, br на следующую инструкцию
+    удаляется, недостижимый код после br/ret и метки без переходов выбрасываются.
+Проходы повторяются, пока что-то меняется. Условия замен, которым важно, как
+локальная используется во всём методе, смотрят счётчики Usage - они обновляются
+при каждой замене.
+"""
+from collections import Counter
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from codegen.cil_emitter import CILMethod
+from codegen.cil_instructions import Instruction, MethodRef, OpCode
+from codegen.cil_runtime import RuntimeCodeGenerator
+
+# (вид обращения, номер): номер None - в операнде
+_SLOTS = {
+    OpCode.LDLOC_0: ("ldloc", 0), OpCode.LDLOC_1: ("ldloc", 1), OpCode.LDLOC_2: ("ldloc", 2),
+    OpCode.LDLOC_3: ("ldloc", 3), OpCode.LDLOC_S: ("ldloc", None), OpCode.LDLOC: ("ldloc", None),
+    OpCode.STLOC_0: ("stloc", 0), OpCode.STLOC_1: ("stloc", 1), OpCode.STLOC_2: ("stloc", 2),
+    OpCode.STLOC_3: ("stloc", 3), OpCode.STLOC_S: ("stloc", None), OpCode.STLOC: ("stloc", None),
+    OpCode.LDLOCA_S: ("ldloca", None), OpCode.LDLOCA: ("ldloca", None),
+    OpCode.LDARG_0: ("ldarg", 0), OpCode.LDARG_1: ("ldarg", 1), OpCode.LDARG_2: ("ldarg", 2),
+    OpCode.LDARG_3: ("ldarg", 3), OpCode.LDARG_S: ("ldarg", None), OpCode.LDARG: ("ldarg", None),
+    OpCode.STARG_S: ("starg", None), OpCode.STARG: ("starg", None),
+    OpCode.LDARGA_S: ("ldarga", None), OpCode.LDARGA: ("ldarga", None),
+}
+
+def _of_kind(kind: str) -> FrozenSet[OpCode]:
+    return frozenset(op for op, (k, _) in _SLOTS.items() if k == kind)
+
+LDLOC, STLOC, LDLOCA = _of_kind("ldloc"), _of_kind("stloc"), _of_kind("ldloca")
+LDARG = _of_kind("ldarg")
+LDC_I4 = frozenset((OpCode.LDC_I4_M1, OpCode.LDC_I4_0, OpCode.LDC_I4_1, OpCode.LDC_I4_2, OpCode.LDC_I4_3,
+                    OpCode.LDC_I4_4, OpCode.LDC_I4_5, OpCode.LDC_I4_6, OpCode.LDC_I4_7, OpCode.LDC_I4_8,
+                    OpCode.LDC_I4_S, OpCode.LDC_I4))
+CALLS = frozenset((OpCode.CALL, OpCode.CALLVIRT))
+CONDITIONAL = frozenset((OpCode.BRFALSE, OpCode.BRTRUE, OpCode.BRFALSE_S, OpCode.BRTRUE_S))
+UNCONDITIONAL = frozenset((OpCode.BR, OpCode.BR_S))
+# После них управление дальше не идёт
+TERMINATORS = UNCONDITIONAL | {OpCode.RET}
+
+_NEGATED = {OpCode.BRFALSE: OpCode.BRTRUE, OpCode.BRTRUE: OpCode.BRFALSE,
+            OpCode.BRFALSE_S: OpCode.BRTRUE_S, OpCode.BRTRUE_S: OpCode.BRFALSE_S}
+
+# Типы, значение которых на стеке уже int32: conv.i4 после них ничего не делает
+INT32_TYPES = frozenset(("int32", "uint8", "int8", "uint16", "int16", "bool"))
+
+def slot(ins: Instruction) -> Tuple[str, int]:
+    kind, index = _SLOTS[ins.opcode]
+    return kind, ins.operand if index is None else index
+
+def _short_form(index: int, short: Sequence[OpCode], byte_form: OpCode, long_form: OpCode,
+                source) -> Instruction:
+    if index < len(short):
+        return Instruction(short[index], source=source)
+    return Instruction(byte_form if index <= 255 else long_form, index, source=source)
+
+def load_local(index: int, source=None) -> Instruction:
+    return _short_form(index, (OpCode.LDLOC_0, OpCode.LDLOC_1, OpCode.LDLOC_2, OpCode.LDLOC_3),
+                       OpCode.LDLOC_S, OpCode.LDLOC, source)
+
+def store_local(index: int, source=None) -> Instruction:
+    return _short_form(index, (OpCode.STLOC_0, OpCode.STLOC_1, OpCode.STLOC_2, OpCode.STLOC_3),
+                       OpCode.STLOC_S, OpCode.STLOC, source)
+
+def load_argument(index: int, source=None) -> Instruction:
+    return _short_form(index, (OpCode.LDARG_0, OpCode.LDARG_1, OpCode.LDARG_2, OpCode.LDARG_3),
+                       OpCode.LDARG_S, OpCode.LDARG, source)
+
+def address_of(ins: Instruction) -> Instruction:
+    """ldloca/ldarga для того же слота, что и загрузка ins"""
+    kind, index = slot(ins)
+    if kind == "ldloc":
+        opcode = OpCode.LDLOCA_S if index <= 255 else OpCode.LDLOCA
+    else:
+        opcode = OpCode.LDARGA_S if index <= 255 else OpCode.LDARGA
+    return Instruction(opcode, index, source=ins.source)
+
+class Usage(Counter):
+    """Сколько раз в методе встречается каждое обращение: ключ - slot(ins)"""
+
+    def add(self, instructions, sign: int = 1):
+        for ins in instructions:
+            if ins.opcode in _SLOTS:
+                self[slot(ins)] += sign
+
+def _argument_types(method: CILMethod) -> List[str]:
+    this = [] if method.is_static else [f"class Program/{method.owner_class}"]
+    return this + [cil_type for cil_type, _ in method.parameters]
+
+def _int32_result(ins: Instruction, method: CILMethod) -> bool:
+    opcode = ins.opcode
+    if opcode in LDC_I4 or opcode is OpCode.CONV_I4:
+        return True
+    if opcode in CALLS:
+        return ins.operand.return_type in INT32_TYPES
+    if opcode is OpCode.LDFLD:
+        return ins.operand.type in INT32_TYPES
+    if opcode in LDLOC:
+        return method.locals[slot(ins)[1]].cil_type in INT32_TYPES
+    if opcode in LDARG:
+        return _argument_types(method)[slot(ins)[1]] in INT32_TYPES
+    return False
+
+# Правила: образец - коды операций подряд, функция получает совпавшее окно и
+# возвращает замену или None, если условие не выполнено
+
+Rewrite = Callable[[List[Instruction], Usage, CILMethod], Optional[List[Instruction]]]
+
+def _store_load(window, usage, method):
+    """stloc N; ldloc N: значение не нужно хранить, если других чтений N нет"""
+    store, load = window
+    index = slot(store)[1]
+    if slot(load)[1] != index:
+        return None
+    if usage["ldloc", index] == 1 and usage["ldloca", index] == 0:
+        return []
+    return [Instruction(OpCode.DUP, source=store.source), store]
+
+def _getter_on_copy(store, address, call, usage) -> bool:
+    """stloc B; ldloca B; call getter - B ничем больше не используется, геттер Color не меняет значение"""
+    index = slot(store)[1]
+    ref = call.operand
+    if (slot(address)[1] != index or not isinstance(ref, MethodRef) or not ref.instance
+            or ref.owner != RuntimeCodeGenerator.COLOR_CLASS or not ref.name.startswith("get_")):
+        return False
+    return usage["stloc", index] == 1 and usage["ldloca", index] == 1 and usage["ldloc", index] == 0
+
+def _copy_for_address(window, usage, method):
+    """
+    ldloc A; stloc B; ldloca B; call getter: копия цвета (tmp_col_access) нужна
+    только ради адреса для геттера - подходит адрес самой A
+    """
+    load, store, address, call = window
+    if not _getter_on_copy(store, address, call, usage):
+        return None
+    return [address_of(load), call]
+
+def _dup_for_address(window, usage, method):
+    """dup; stloc A; stloc B; ldloca B; call getter - то же после замены stloc A; ldloc A"""
+    _, keep, store, address, call = window
+    if not _getter_on_copy(store, address, call, usage):
+        return None
+    return [keep, address_of(load_local(slot(keep)[1], keep.source)), call]
+
+def _negated_compare_branch(window, usage, method):
+    """ldc.i4.0; ceq; brfalse L (так выходят !=, <=, >=) - это brtrue L"""
+    branch = window[-1]
+    return [branch._replace(opcode=_NEGATED[branch.opcode])]
+
+def _redundant_conv(window, usage, method):
+    """conv.i4 после значения, которое уже int32 (get_R, get_width, константа)"""
+    value = window[0]
+    return [value] if _int32_result(value, method) else None
+
+def _branch_over_branch(window, usage, method):
+    """brfalse L; br M; L: - это brtrue M; L:"""
+    branch, jump, label = window
+    if branch.label != label.label:
+        return None
+    return [branch._replace(opcode=_NEGATED[branch.opcode], label=jump.label), label]
+
+LABEL = frozenset((OpCode.LABEL,))
+_LABEL = OpCode.LABEL
+
+RULES: List[Tuple[Tuple[FrozenSet[OpCode], ...], Rewrite]] = [
+    ((STLOC, LDLOC), _store_load),
+    ((LDLOC | LDARG, STLOC, LDLOCA, CALLS), _copy_for_address),
+    ((frozenset((OpCode.DUP,)), STLOC, STLOC, LDLOCA, CALLS), _dup_for_address),
+    ((frozenset((OpCode.LDC_I4_0,)), frozenset((OpCode.CEQ,)), CONDITIONAL), _negated_compare_branch),
+    ((LDC_I4 | CALLS | LDLOC | LDARG | {OpCode.LDFLD, OpCode.CONV_I4}, frozenset((OpCode.CONV_I4,))),
+     _redundant_conv),
+    ((CONDITIONAL, UNCONDITIONAL, LABEL), _branch_over_branch),
+]
+
+_RULES_BY_FIRST: Dict[OpCode, List] = {}
+for _pattern, _rewrite in RULES:
+    for _opcode in _pattern[0]:
+        _RULES_BY_FIRST.setdefault(_opcode, []).append((_pattern, _rewrite))
+_LONGEST = max(len(pattern) for pattern, _ in RULES)
+
+def _matches(code: List[Instruction], start: int, pattern) -> bool:
+    for offset in range(1, len(pattern)):
+        if code[start + offset].opcode not in pattern[offset]:
+            return False
+    return True
+
+def _apply_rules(code: List[Instruction], usage: Usage, method: CILMethod) -> bool:
+    changed, i = False, 0
+    while i < len(code):
+        rules = _RULES_BY_FIRST.get(code[i].opcode)
+        if rules is None:
+            i += 1
+            continue
+        for pattern, rewrite in rules:
+            end = i + len(pattern)
+            if end > len(code) or not _matches(code, i, pattern):
+                continue
+            window = code[i:end]
+            replacement = rewrite(window, usage, method)
+            if replacement is None:
+                continue
+            usage.add(window, -1)
+            usage.add(replacement)
+            code[i:end] = replacement
+            changed = True
+            # Замена могла достроить образец, начинающийся раньше
+            i = max(0, i - _LONGEST + 1)
+            break
+        else:
+            i += 1
+    return changed
+
+def _forward_parameters(code: List[Instruction], usage: Usage, method: CILMethod):
+    """Пролог ldarg K; stloc M для каждого параметра: копия заменяется самим аргументом"""
+    count = len(method.parameters) + (0 if method.is_static else 1)
+    if len(code) < 2 * count:
+        return
+    forwarded = {}
+    for n in range(count):
+        load, store = code[2 * n], code[2 * n + 1]
+        if load.opcode not in LDARG or store.opcode not in STLOC:
+            return
+        arg, local = slot(load)[1], slot(store)[1]
+        if (usage["stloc", local] == 1 and usage["ldloca", local] == 0
+                and usage["starg", arg] == 0 and usage["ldarga", arg] == 0):
+            forwarded[local] = arg
+
+    if not forwarded:
+        return
+    prologue = code[:2 * count]
+    kept = [ins for n in range(count) if slot(prologue[2 * n + 1])[1] not in forwarded
+            for ins in prologue[2 * n:2 * n + 2]]
+    body = []
+    for ins in code[2 * count:]:
+        if ins.opcode in LDLOC and slot(ins)[1] in forwarded:
+            ins = load_argument(forwarded[slot(ins)[1]], ins.source)
+        body.append(ins)
+    code[:] = kept + body
+    usage.clear()
+    usage.add(code)
+
+def _label_targets(code: List[Instruction]) -> Dict[str, int]:
+    """Метка -> индекс первой инструкции после неё (не метки)"""
+    targets, pending = {}, []
+    for i, ins in enumerate(code):
+        if ins.opcode is _LABEL:
+            pending.append(ins.label)
+        else:
+            for label in pending:
+                targets[label] = i
+            pending.clear()
+    for label in pending:
+        targets[label] = len(code)
+    return targets
+
+def _simplify_branches(code: List[Instruction], usage: Usage) -> bool:
+    changed = False
+    targets = _label_targets(code)
+
+    # Переход на br - сразу к цели br (цикл из br не разворачивается)
+    for i, ins in enumerate(code):
+        if not ins.opcode.is_branch:
+            continue
+        label, seen = ins.label, {ins.label}
+        while True:
+            target = targets.get(label)
+            if target is None or target >= len(code) or code[target].opcode not in UNCONDITIONAL:
+                break
+            label = code[target].label
+            if label in seen:
+                break
+            seen.add(label)
+        if label != ins.label:
+            code[i] = ins._replace(label=label)
+            changed = True
+
+    # br на следующую инструкцию
+    for i in range(len(code) - 1, -1, -1):
+        ins = code[i]
+        if ins.opcode in UNCONDITIONAL and targets.get(ins.label) == _next_instruction(code, i):
+            del code[i]
+            changed = True
+            targets = _label_targets(code)
+
+    # Недостижимый код и лишние метки
+    referenced = {ins.label for ins in code if ins.opcode.is_branch}
+    kept, reachable = [], True
+    for ins in code:
+        if ins.opcode is _LABEL:
+            if ins.label not in referenced:
+                changed = True
+                continue
+            reachable = True
+        elif not reachable:
+            usage.add((ins,), -1)
+            changed = True
+            continue
+        kept.append(ins)
+        if ins.opcode in TERMINATORS:
+            reachable = False
+    code[:] = kept
+    return changed
+
+def _next_instruction(code: List[Instruction], i: int) -> int:
+    i += 1
+    while i < len(code) and code[i].opcode is _LABEL:
+        i += 1
+    return i
+
+def optimize_method(method: CILMethod, max_rounds: int = 10) -> int:
+    """Оптимизирует тело метода на месте; возвращает, на сколько инструкций оно сократилось"""
+    code = method.instructions
+    before = count_instructions(code)
+    usage = Usage()
+    usage.add(code)
+
+    _forward_parameters(code, usage, method)
+    for _ in range(max_rounds):
+        changed = _apply_rules(code, usage, method)
+        changed |= _simplify_branches(code, usage)
+        if not changed:
+            break
+
+    method.labels = {ins.label: ins.label for ins in code if ins.opcode is _LABEL}
+    return before - count_instructions(code)
+
+def count_instructions(code: List[Instruction]) -> int:
+    return sum(ins.opcode is not _LABEL for ins in code)
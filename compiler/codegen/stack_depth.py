@@ -0,0 +1,119 @@
+"""
+Глубина стека вычислений метода: точный .maxstack и проверка баланса стека.
+
+Каждая инструкция снимает и кладёт известное число значений (call, callvirt
+и newobj - по сигнатуре MethodRef, ret - по типу результата метода). Обход идёт
+по путям исполнения от начала метода; на метке сходятся переход и проход сверху,
+и глубина по всем путям должна совпасть. Любое расхождение - снятие с пустого
+стека, разная глубина на метке, лишнее значение на стеке при ret, выход за
+конец метода без ret - ошибка
+генератора: компиляция прерывается InternalCompilerError с позицией оператора,
+из которого получена инструкция, до того как IL увидит ilasm.
+"""
+from typing import Dict, List, Tuple
+
+from codegen.cil_emitter import CILMethod
+from codegen.cil_instructions import Instruction, OpCode
+from errors.base import InternalCompilerError
+
+# (снимает, кладёт) для инструкций, у которых это не зависит от операнда
+_EFFECTS: Dict[OpCode, Tuple[int, int]] = {}
+
+def _effect(pops: int, pushes: int, *opcodes: OpCode):
+    for opcode in opcodes:
+        _EFFECTS[opcode] = (pops, pushes)
+
+_effect(0, 0, OpCode.NOP, OpCode.BR, OpCode.BR_S)
+_effect(0, 1, OpCode.LDARG_0, OpCode.LDARG_1, OpCode.LDARG_2, OpCode.LDARG_3, OpCode.LDARG_S, OpCode.LDARG,
+        OpCode.LDARGA_S, OpCode.LDARGA, OpCode.LDLOC_0, OpCode.LDLOC_1, OpCode.LDLOC_2, OpCode.LDLOC_3,
+        OpCode.LDLOC_S, OpCode.LDLOC, OpCode.LDLOCA_S, OpCode.LDLOCA, OpCode.LDNULL,
+        OpCode.LDC_I4_M1, OpCode.LDC_I4_0, OpCode.LDC_I4_1, OpCode.LDC_I4_2, OpCode.LDC_I4_3,
+        OpCode.LDC_I4_4, OpCode.LDC_I4_5, OpCode.LDC_I4_6, OpCode.LDC_I4_7, OpCode.LDC_I4_8,
+        OpCode.LDC_I4_S, OpCode.LDC_I4, OpCode.LDC_R8, OpCode.LDSTR, OpCode.LDSFLD)
+_effect(1, 0, OpCode.POP, OpCode.STARG_S, OpCode.STARG, OpCode.STLOC_0, OpCode.STLOC_1, OpCode.STLOC_2,
+        OpCode.STLOC_3, OpCode.STLOC_S, OpCode.STLOC, OpCode.STSFLD,
+        OpCode.BRFALSE, OpCode.BRFALSE_S, OpCode.BRTRUE, OpCode.BRTRUE_S)
+_effect(1, 1, OpCode.LDIND_I1, OpCode.LDIND_I4, OpCode.LDIND_R8, OpCode.LDIND_REF, OpCode.LDOBJ,
+        OpCode.NEG, OpCode.NOT, OpCode.CONV_I4, OpCode.CONV_R8, OpCode.LDFLD)
+_effect(1, 2, OpCode.DUP)
+_effect(2, 0, OpCode.STIND_REF, OpCode.STIND_I1, OpCode.STIND_I4, OpCode.STIND_R8, OpCode.STOBJ, OpCode.STFLD,
+        OpCode.BEQ, OpCode.BGE, OpCode.BGT, OpCode.BLE, OpCode.BLT, OpCode.BNE_UN,
+        OpCode.BGE_UN, OpCode.BGT_UN, OpCode.BLE_UN, OpCode.BLT_UN,
+        OpCode.BEQ_S, OpCode.BGE_S, OpCode.BGT_S, OpCode.BLE_S, OpCode.BLT_S, OpCode.BNE_UN_S,
+        OpCode.BGE_UN_S, OpCode.BGT_UN_S, OpCode.BLE_UN_S, OpCode.BLT_UN_S)
+_effect(2, 1, OpCode.ADD, OpCode.SUB, OpCode.MUL, OpCode.DIV, OpCode.REM, OpCode.AND, OpCode.OR, OpCode.XOR,
+        OpCode.SHL, OpCode.SHR, OpCode.CEQ, OpCode.CGT, OpCode.CGT_UN, OpCode.CLT, OpCode.CLT_UN)
+
+_CALLS = frozenset((OpCode.CALL, OpCode.CALLVIRT))
+_UNCONDITIONAL = frozenset((OpCode.BR, OpCode.BR_S))
+_LABEL, _RET, _NEWOBJ = OpCode.LABEL, OpCode.RET, OpCode.NEWOBJ
+
+def stack_effect(ins: Instruction, method: CILMethod) -> Tuple[int, int]:
+    """(сколько значений снимает, сколько кладёт) инструкция ins метода method"""
+    opcode = ins.opcode
+    effect = _EFFECTS.get(opcode)
+    if effect is not None:
+        return effect
+    if opcode in _CALLS:
+        ref = ins.operand
+        return len(ref.params) + ref.instance, 0 if ref.return_type == "void" else 1
+    if opcode is _NEWOBJ:
+        return len(ins.operand.params), 1
+    if opcode is _RET:
+        return (0 if method.return_type == "void" else 1), 0
+    raise _error(method, ins, "неизвестно, как инструкция меняет стек")
+
+def max_stack(method: CILMethod, instructions: List[Instruction] = None) -> int:
+    """
+    Наибольшая глубина стека в method (или в instructions - куске его тела, который
+    начинается с пустого стека). Бросает InternalCompilerError, если стек не сбалансирован.
+    Кусок, в отличие от метода, может кончаться без ret: за ним идёт продолжение тела.
+    """
+    code = method.instructions if instructions is None else instructions
+    targets = {ins.label: i for i, ins in enumerate(code) if ins.opcode is _LABEL}
+    depth_at: Dict[int, int] = {}
+    pending, peak = [(0, 0)], 0
+    while pending:
+        pc, depth = pending.pop()
+        while pc < len(code):
+            ins = code[pc]
+            opcode = ins.opcode
+            if opcode is _LABEL:
+                seen = depth_at.get(pc)
+                if seen is not None:
+                    if seen != depth:
+                        raise _error(method, ins, f"на метке {ins.label} сходятся глубины стека {seen} и {depth}")
+                    break
+                depth_at[pc] = depth
+                pc += 1
+                continue
+
+            pops, pushes = stack_effect(ins, method)
+            if pops > depth:
+                raise _error(method, ins, f"снимает {pops} значений со стека глубины {depth}")
+            depth += pushes - pops
+            if depth > peak:
+                peak = depth
+            if opcode is _RET:
+                if depth:
+                    raise _error(method, ins, f"при возврате на стеке остаётся значений: {depth}")
+                break
+            if opcode.is_branch:
+                target = targets.get(ins.label)
+                if target is None:
+                    raise _error(method, ins, f"переход на отсутствующую метку {ins.label}")
+                pending.append((target, depth))
+                if opcode in _UNCONDITIONAL:
+                    break
+            pc += 1
+        else:
+            if instructions is None:
+                last = code[-1] if code else Instruction(OpCode.NOP)
+                raise _error(method, last, f"исполнение доходит до конца метода без ret, на стеке значений: {depth}")
+    return peak
+
+def _error(method: CILMethod, ins: Instruction, message: str) -> InternalCompilerError:
+    name = f"{method.owner_class}::{method.name}" if method.owner_class else method.name
+    operand = ins.label if ins.label is not None else ins.operand
+    text = ins.opcode.mnemonic if operand is None else f"{ins.opcode.mnemonic} {operand}"
+    return InternalCompilerError(f"Стек IL в {name}, {text}: {message}", ins.source)
@@ -392,15 +392,24 @@ class Compiler(ImgLangVisitor):
         self.last_type = "int32" 
 
     def visitAndExpr(self, ctx):
+        # Ложный левый операнд - уже результат, правый не вычисляется
+        end_lbl = self.new_label()
         self.visit(ctx.expression(0))
+        self.emit("dup")
+        self.emit(f"brfalse {end_lbl}")
+        self.emit("pop")
         self.visit(ctx.expression(1))
-        self.emit("and")
+        self.emit(f"{end_lbl}:")
         self.last_type = "int32"
 
     def visitOrExpr(self, ctx):
+        end_lbl = self.new_label()
         self.visit(ctx.expression(0))
+        self.emit("dup")
+        self.emit(f"brtrue {end_lbl}")
+        self.emit("pop")
         self.visit(ctx.expression(1))
-        self.emit("or")
+        self.emit(f"{end_lbl}:")
         self.last_type = "int32"
 
     def visitCastExpr(self, ctx):
@@ -32,6 +32,33 @@ class CompilerError(Exception):
         if self.location:
             return f"[{self.location.line}:{self.location.column}] {self.message}"
         return self.message
+    
+    def to_dict(self) -> dict:
+        """Сериализуемое представление ошибки (для передачи между процессами)"""
+        data = {
+            "kind": type(self).__name__,
+            "message": self.message,
+            "severity": self.severity,
+        }
+        if self.location:
+            data["line"] = self.location.line
+            data["column"] = self.location.column
+            data["length"] = self.location.length
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CompilerError':
+        """Восстанавливает ошибку из to_dict() для форматирования"""
+        location = None
+        if "line" in data:
+            location = SourceLocation(
+                line=data["line"],
+                column=data["column"],
+                length=data.get("length", 1)
+            )
+        error = cls(data["message"], location, data.get("severity", "error"))
+        error.kind = data.get("kind", cls.__name__)
+        return error
 
 class SyntaxError(CompilerError):
     pass
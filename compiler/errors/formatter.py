@@ -1,6 +1,14 @@
 from typing import List
 from .base import CompilerError
 
+# Заголовки сообщений об ошибках по фазе компиляции
+STAGE_HEADERS = {
+    "lexer": "❌ Лексические ошибки:",
+    "parser": "❌ Синтаксические ошибки:",
+    "semantic": "❌ Семантические ошибки:",
+    "codegen": "❌ Критическая ошибка:",
+}
+
 class ErrorFormatter:
     def __init__(self, source_code: str = ""):
         self.source_code = source_code.splitlines() if source_code else []
@@ -0,0 +1,4 @@
+# antlr - сгенерированный ImgLangLexer; fast - табличный лексер на регулярных выражениях.
+# Константы живут здесь, чтобы main.py мог построить --help без загрузки ANTLR.
+LEXER_ENGINES = ("antlr", "fast")
+DEFAULT_LEXER_ENGINE = "fast"
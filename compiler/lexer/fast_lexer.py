@@ -0,0 +1,169 @@
+"""
+Табличный лексер ImgLang на регулярных выражениях - быстрая замена ImgLangLexer.
+
+Типы токенов читаются из antlr/ImgLangLexer.tokens, поэтому после перегенерации
+грамматики таблица остаётся согласованной с парсером. Поведение повторяет ANTLR:
+самое длинное совпадение, ключевые слова важнее ID, WS и комментарии пропускаются,
+а при ошибке пропускается тот же фрагмент и выдаётся то же сообщение
+"token recognition error at: '...'".
+"""
+import re
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from antlr4.Token import CommonToken, Token
+from antlr4.CommonTokenFactory import CommonTokenFactory
+from antlr4.Lexer import TokenSource
+
+TOKENS_FILE = Path(__file__).resolve().parent.parent / "antlr" / "ImgLangLexer.tokens"
+
+def load_token_types(path: Path = TOKENS_FILE) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """Возвращает (символьные имена -> тип, литералы -> тип) из .tokens файла ANTLR"""
+    symbolic, literals = {}, {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        name, _, value = line.rpartition("=")
+        if not name:
+            continue
+        if name.startswith("'") and name.endswith("'"):
+            literals[name[1:-1].replace("\\'", "'").replace("\\\\", "\\")] = int(value)
+        else:
+            symbolic[name] = int(value)
+    return symbolic, literals
+
+SYMBOLIC, LITERALS = load_token_types()
+KEYWORDS = {text: ttype for text, ttype in LITERALS.items() if text[0].isalpha() or text[0] == "_"}
+OPERATORS = {text: ttype for text, ttype in LITERALS.items() if text not in KEYWORDS}
+
+INT_TYPE = SYMBOLIC["INT"]
+FLOAT_TYPE = SYMBOLIC["FLOAT"]
+STRING_TYPE = SYMBOLIC["STRING"]
+ID_TYPE = SYMBOLIC["ID"]
+
+# Порядок альтернатив задаёт правило «самое длинное совпадение» ANTLR:
+# комментарии раньше '/', FLOAT раньше INT, длинные операторы раньше коротких.
+# Последние три альтернативы описывают, что ANTLR пропускает при ошибке:
+# незакрытую строку вместе с символом конца строки, одиночные '&'/'|' вместе
+# со следующим символом и любой другой неизвестный символ.
+_PATTERN = re.compile("|".join([
+    r"(?P<ws>[ \t\r\n]+)",
+    r"(?P<comment>//[^\r\n]*|/\*[\s\S]*?\*/)",
+    r"(?P<float>[0-9]+\.[0-9]+)",
+    r"(?P<int>[0-9]+)",
+    r'(?P<string>"[^"\r\n]*")',
+    r"(?P<id>[a-zA-Z_][a-zA-Z_0-9]*)",
+    "(?P<op>" + "|".join(re.escape(op) for op in sorted(OPERATORS, key=len, reverse=True)) + ")",
+    r'(?P<error>"[^"\r\n]*[\r\n]?|[&|][\s\S]?|[\s\S])',
+]))
+
+_ESCAPES = str.maketrans({"\n": "\\n", "\r": "\\r", "\t": "\\t"})
+
+def scan(text: str, source, report: Callable[[int, int, str], None],
+         pos: int = 0, line: int = 1, line_start: int = 0) -> Iterator[CommonToken]:
+    """
+    Токены text (без EOF) по одному, начиная со смещения pos, которое лежит
+    на строке line, начинающейся со смещения line_start. Ошибки лексера
+    передаются в report(line, column, text). tokenIndex считается от pos.
+    """
+    keywords, operators = KEYWORDS, OPERATORS
+    index = 0
+
+    for match in _PATTERN.finditer(text, pos):
+        kind = match.lastgroup
+        start, end = match.span()
+
+        if kind == "ws" or kind == "comment" or kind == "error":
+            if kind == "error":
+                report(line, start - line_start, match.group())
+            newlines = text.count("\n", start, end)
+            if newlines:
+                line += newlines
+                line_start = text.rindex("\n", start, end) + 1
+            continue
+
+        value = match.group()
+        if kind == "id":
+            ttype = keywords.get(value, ID_TYPE)
+        elif kind == "op":
+            ttype = operators[value]
+        elif kind == "int":
+            ttype = INT_TYPE
+        elif kind == "float":
+            ttype = FLOAT_TYPE
+        else:
+            ttype = STRING_TYPE
+
+        token = CommonToken.__new__(CommonToken)
+        token.source = source
+        token.type = ttype
+        token.channel = Token.DEFAULT_CHANNEL
+        token.start = start
+        token.stop = end - 1
+        token.tokenIndex = index
+        token.line = line
+        token.column = start - line_start
+        token._text = value
+        index += 1
+        yield token
+
+class FastImgLexer(TokenSource):
+    """
+    Источник токенов для CommonTokenStream: весь текст разбирается одним проходом
+    регулярного выражения, затем nextToken() отдаёт готовые CommonToken.
+    """
+
+    def __init__(self, input_stream, error_listener=None):
+        self.inputStream = input_stream
+        self.error_listener = error_listener
+        self._factory = CommonTokenFactory.DEFAULT
+        self._source = (self, input_stream)
+        self.line = 1
+        self.column = 0
+        self._tokens = self._scan(input_stream.strdata)
+        self._next = 0
+
+    def _scan(self, text: str) -> List[CommonToken]:
+        tokens = list(scan(text, self._source, self._report))
+        line = text.count("\n") + 1
+        line_start = text.rfind("\n") + 1
+
+        eof = CommonToken.__new__(CommonToken)
+        eof.source = self._source
+        eof.type = Token.EOF
+        eof.channel = Token.DEFAULT_CHANNEL
+        eof.start = len(text)
+        eof.stop = len(text) - 1
+        eof.tokenIndex = len(tokens)
+        eof.line = line
+        eof.column = len(text) - line_start
+        eof._text = "<EOF>"
+        tokens.append(eof)
+
+        self.line, self.column = line, len(text) - line_start
+        return tokens
+
+    def _report(self, line: int, column: int, text: str):
+        if self.error_listener is not None:
+            msg = f"token recognition error at: '{text.translate(_ESCAPES)}'"
+            self.error_listener.syntaxError(self, None, line, column, msg, None)
+
+    def fill(self, token_stream):
+        """Передаёт все токены в CommonTokenStream сразу, минуя поштучный nextToken()"""
+        token_stream.tokens = list(self._tokens)
+        token_stream.fetchedEOF = True
+        self._next = len(self._tokens) - 1
+        return token_stream
+
+    def nextToken(self) -> Token:
+        token = self._tokens[self._next]
+        if self._next < len(self._tokens) - 1:
+            self._next += 1
+        return token
+
+    def getInputStream(self):
+        return self.inputStream
+
+    def getSourceName(self) -> str:
+        return self.inputStream.getSourceName()
+
+    def getCharPositionInLine(self) -> int:
+        return self.column
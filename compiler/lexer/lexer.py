@@ -1,7 +1,8 @@
 # lexer/lexer.py
 from antlr4 import InputStream, CommonTokenStream
 from antlr4.error.ErrorListener import ErrorListener
-from antlr.ImgLangLexer import ImgLangLexer
+from lexer import LEXER_ENGINES, DEFAULT_LEXER_ENGINE
+from lexer.fast_lexer import FastImgLexer
 from errors.base import SourceLocation, SyntaxError
 
 class LexerErrorListener(ErrorListener):
@@ -20,14 +21,37 @@ class LexerErrorListener(ErrorListener):
 class ImgLexer:
     """Обёртка над ANTLR лексером"""
     
-    def __init__(self, source_code: str):
-        self.input_stream = InputStream(source_code)
-        self.antlr_lexer = ImgLangLexer(self.input_stream)
-        self.token_stream = CommonTokenStream(self.antlr_lexer)
-        
+    def __init__(self, source_code: str = "", engine: str = DEFAULT_LEXER_ENGINE):
+        if engine not in LEXER_ENGINES:
+            raise ValueError(f"Unknown lexer engine: {engine}")
+        self.engine = engine
         self.error_listener = LexerErrorListener()
-        self.antlr_lexer.removeErrorListeners()
-        self.antlr_lexer.addErrorListener(self.error_listener)
+        
+        self.input_stream = InputStream(source_code)
+        if engine == "antlr":
+            # Сгенерированный лексер (десериализация ATN) нужен только движку antlr
+            from antlr.ImgLangLexer import ImgLangLexer
+            self.antlr_lexer = ImgLangLexer(self.input_stream)
+            self.antlr_lexer.removeErrorListeners()
+            self.antlr_lexer.addErrorListener(self.error_listener)
+            self.token_stream = CommonTokenStream(self.antlr_lexer)
+        else:
+            self.antlr_lexer = None
+            self.token_stream = self._fast_token_stream()
+    
+    def reset(self, source_code: str):
+        """Подготавливает лексер к новому исходному коду, сохраняя прогретый ATN/DFA"""
+        self.error_listener.errors = []
+        self.input_stream = InputStream(source_code)
+        if self.antlr_lexer is not None:
+            self.antlr_lexer.inputStream = self.input_stream
+            self.token_stream = CommonTokenStream(self.antlr_lexer)
+        else:
+            self.token_stream = self._fast_token_stream()
+    
+    def _fast_token_stream(self) -> CommonTokenStream:
+        source = FastImgLexer(self.input_stream, self.error_listener)
+        return source.fill(CommonTokenStream(source))
     
     def tokenize(self):
         """Токенизирует исходный код"""
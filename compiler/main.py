@@ -1,108 +1,201 @@
 import sys
 import os
-import subprocess
-from pathlib import Path
+import argparse
+import contextlib
 
-from lexer.lexer import ImgLexer
-from parser.parser import ImgParser
-from semantic.analyzer import SemanticAnalyzer
-from codegen.cil_generator import CILGenerator
-from errors.formatter import ErrorFormatter
+# Фазы компилятора (ANTLR, AST, семантика, генерация) импортируются внутри функций:
+# --version, --help и попадание в кэш компиляции обходятся без них
+from lexer import LEXER_ENGINES, DEFAULT_LEXER_ENGINE
+from parser import PARSE_MODES, DEFAULT_PARSE_MODE, PARSER_ENGINES, DEFAULT_PARSER_ENGINE
+from codegen import OPT_LEVELS, DEFAULT_OPT_LEVEL
+from errors.base import CompilerError
+from version import __version__
+from errors.formatter import ErrorFormatter, STAGE_HEADERS
+from cache import CompilationCache, CacheEntry, make_backend
+from toolchain import output_paths, assemble_il
+from phases import PhaseRecorder, phase, is_enabled, count_ast_nodes
+from batch import compile_batch, resolve_jobs
 
-def compile_program(source_file: str, output_file: str = None) -> bool:
+def _assemble(il_file: str, exe_file: str, entry: CacheEntry,
+              cache: CompilationCache = None, cache_key: str = None) -> bool:
+    """Запускает ilasm и запоминает в кэше IL (и .exe, если сборка удалась)"""
+    print("⚡ Компиляция в .exe...")
     
     try:
-        with open(source_file, 'r', encoding='utf-8') as f:
-            source_code = f.read()
+        result = assemble_il(il_file, exe_file)
         
-        print("🔍 Лексический анализ...")
-        
-        lexer = ImgLexer(source_code)
+        if result.returncode == 0:
+            print(f"✅ Успешно скомпилировано: {exe_file}")
+            if cache:
+                with open(exe_file, 'rb') as f:
+                    entry.exe_bytes = f.read()
+                cache.put(cache_key, entry)
+            return True
+        else:
+            print("❌ Ошибка компиляции IL:")
+            print(result.stdout)
+            print(result.stderr)
+            print(f"IL файл сохранён: {il_file}")
+            
+    except FileNotFoundError:
+        print("❌ Не найден ilasm. Убедитесь, что .NET Framework SDK установлен")
+        print(f"IL файл сохранён: {il_file}")
+    
+    if cache:
+        cache.put(cache_key, entry)
+    return False
+
+def _replay_cached(entry: CacheEntry, source_code: str, source_file: str, output_file: str,
+                   cache: CompilationCache, cache_key: str) -> bool:
+    """Воспроизводит результат из кэша без лексического, синтаксического и семантического анализа"""
+    print("⚡ Результат найден в кэше компиляции")
+    
+    if entry.failed_stage:
+        print(STAGE_HEADERS[entry.failed_stage])
+        formatter = ErrorFormatter(source_code)
+        print(formatter.format_all([CompilerError.from_dict(d) for d in entry.diagnostics]))
+        return False
+    
+    il_file, exe_file = output_paths(source_file, output_file)
+    with phase("write") as record, open(il_file, 'w', encoding='utf-8') as f:
+        f.write(entry.il_code)
+        record.count(bytes=len(entry.il_code))
+    print(f"✓ Сгенерирован IL файл: {il_file}")
+    
+    if entry.exe_bytes is None:
+        # В кэше только IL (ilasm был недоступен) - пропускаем лишь фронтенд и генерацию
+        return _assemble(il_file, exe_file, entry, cache, cache_key)
+    
+    with open(exe_file, 'wb') as f:
+        f.write(entry.exe_bytes)
+    print(f"✅ Успешно скомпилировано: {exe_file}")
+    return True
+
+def _remember_failure(cache, cache_key, stage: str, errors, token_count: int = 0):
+    if cache:
+        cache.put(cache_key, CacheEntry(
+            diagnostics=[e.to_dict() for e in errors],
+            failed_stage=stage,
+            token_count=token_count
+        ))
+
+def _load_cached_ast(cache: CompilationCache, source_code: str):
+    """AST из кэша: лексический и синтаксический анализ не нужны"""
+    if not cache:
+        return None
+    cached = cache.get_ast(cache.ast_key(source_code))
+    if cached:
+        print("⚡ AST найден в кэше, лексический и синтаксический анализ пропущены")
+        print(f"   Токенов в исходнике: {cached[1]}")
+    return cached
+
+def _parse(source_code: str, cache: CompilationCache = None, cache_key: str = None,
+           options: dict = None):
+    """Лексический и синтаксический анализ; возвращает (AST, число токенов) или None"""
+    from lexer.lexer import ImgLexer
+    from parser.parser import ImgParser
+    
+    print("🔍 Лексический анализ...")
+    
+    options = options or {}
+    with phase("lex") as record:
+        lexer = ImgLexer(source_code, options.get("lexer", DEFAULT_LEXER_ENGINE))
         tokens, lex_errors = lexer.tokenize()
-        
-        if lex_errors:
-            print("❌ Лексические ошибки:")
-            formatter = ErrorFormatter(source_code)
-            print(formatter.format_all(lex_errors))
-            return False
-        
-        print("✅ Лексический анализ завершён")
-        print(f"   Найдено токенов: {len(tokens)}")
-        
-        print("🔍 Синтаксический анализ...")
-        parser = ImgParser(lexer.get_token_stream())
+        record.count(tokens=len(tokens))
+    
+    if lex_errors:
+        print("❌ Лексические ошибки:")
+        formatter = ErrorFormatter(source_code)
+        print(formatter.format_all(lex_errors))
+        _remember_failure(cache, cache_key, "lexer", lex_errors, len(tokens))
+        return None
+    
+    print("✅ Лексический анализ завершён")
+    print(f"   Найдено токенов: {len(tokens)}")
+    
+    print("🔍 Синтаксический анализ...")
+    with phase("parse") as record:
+        parser = ImgParser(lexer.get_token_stream(), options.get("parse_mode", DEFAULT_PARSE_MODE),
+                           options.get("parser", DEFAULT_PARSER_ENGINE))
         ast, parse_errors = parser.parse()
+        if ast is not None and is_enabled():
+            record.count(ast_nodes=count_ast_nodes(ast))
+    
+    if parse_errors:
+        print("❌ Синтаксические ошибки:")
+        formatter = ErrorFormatter(source_code)
+        print(formatter.format_all(parse_errors))
+        _remember_failure(cache, cache_key, "parser", parse_errors, len(tokens))
+        return None
+    
+    if ast is None:
+        print("❌ Не удалось построить AST")
+        return None
+    
+    print("✅ Синтаксический анализ завершён")
+    if cache:
+        cache.put_ast(cache.ast_key(source_code), ast, len(tokens))
+    return ast, len(tokens)
+
+def compile_program(source_file: str, output_file: str = None,
+                    cache: CompilationCache = None, options: dict = None) -> bool:
+    
+    try:
+        with open(source_file, 'r', encoding='utf-8') as f:
+            source_code = f.read()
         
-        if parse_errors:
-            print("❌ Синтаксические ошибки:")
-            formatter = ErrorFormatter(source_code)
-            print(formatter.format_all(parse_errors))
-            return False
+        cache_key = None
+        if cache:
+            cache_key = cache.key(source_code, options)
+            entry = cache.get(cache_key)
+            if entry:
+                return _replay_cached(entry, source_code, source_file, output_file, cache, cache_key)
         
-        if ast is None:
-            print("❌ Не удалось построить AST")
+        parsed = _load_cached_ast(cache, source_code) or _parse(source_code, cache, cache_key, options)
+        if parsed is None:
             return False
+        ast, token_count = parsed
+        
+        from semantic.analyzer import SemanticAnalyzer
+        from codegen.cil_generator import CILGenerator
         
-        print("✅ Синтаксический анализ завершён")
         print("🔍 Семантический анализ...")
         
-        analyzer = SemanticAnalyzer()
-        semantic_errors = analyzer.analyze(ast)
+        with phase("semantic"):
+            analyzer = SemanticAnalyzer()
+            semantic_errors = analyzer.analyze(ast)
         
         if semantic_errors:
             print("❌ Семантические ошибки:")
             formatter = ErrorFormatter(source_code)
             print(formatter.format_all(semantic_errors))
+            _remember_failure(cache, cache_key, "semantic", semantic_errors, token_count)
             return False
         
         print("✅ Семантический анализ завершён")
         print("⚡ Генерация CIL кода...")
         
-        generator = CILGenerator(analyzer.symbol_table)
-        cil_code = generator.generate(ast)
+        try:
+            with phase("codegen") as record:
+                generator = CILGenerator(analyzer.symbol_table,
+                                         opt_level=(options or {}).get("opt_level", DEFAULT_OPT_LEVEL))
+                cil_code = generator.generate(ast)
+                record.count(il_lines=cil_code.count("\n") + 1)
+        except CompilerError as e:
+            # InternalCompilerError генератора (например, несбалансированный стек IL)
+            print(STAGE_HEADERS["codegen"])
+            print(ErrorFormatter(source_code).format_all([e]))
+            return False
         
-        if output_file:
-            il_file = output_file.replace('.exe', '.il')
-            exe_file = output_file
-        else:
-            base_name = Path(source_file).stem
-            il_file = f"{base_name}.il"
-            exe_file = f"{base_name}.exe"
+        il_file, exe_file = output_paths(source_file, output_file)
         
-        with open(il_file, 'w', encoding='utf-8') as f:
+        with phase("write") as record, open(il_file, 'w', encoding='utf-8') as f:
             f.write(cil_code)
+            record.count(bytes=len(cil_code))
         print(f"✓ Сгенерирован IL файл: {il_file}")
         
-        print("⚡ Компиляция в .exe...")
-        
-        try:
-            result = subprocess.run([
-                'ilasm',
-                il_file,
-                f'/output={exe_file}',
-                '/quiet'
-            ], capture_output=True, text=True, shell=True)
-            
-            if result.returncode == 0:
-                print(f"✅ Успешно скомпилировано: {exe_file}")
-                
-                try:
-                    os.remove(f"{Path(il_file).stem}.pdb")
-                except:
-                    pass
-                
-                return True
-            else:
-                print("❌ Ошибка компиляции IL:")
-                print(result.stdout)
-                print(result.stderr)
-                print(f"IL файл сохранён: {il_file}")
-                return False
-                
-        except FileNotFoundError:
-            print("❌ Не найден ilasm. Убедитесь, что .NET Framework SDK установлен")
-            print(f"IL файл сохранён: {il_file}")
-            return False
+        return _assemble(il_file, exe_file, CacheEntry(il_code=cil_code, token_count=token_count),
+                         cache, cache_key)
             
     except Exception as e:
         print(f"❌ Критическая ошибка: {e}")
@@ -110,20 +203,133 @@ def compile_program(source_file: str, output_file: str = None) -> bool:
         traceback.print_exc()
         return False
 
+def compile_streaming_program(source_file: str, output_file: str = None,
+                              cache: CompilationCache = None, options: dict = None) -> bool:
+    """--stream: IL пишется по объявлениям, без AST и IL всей программы в памяти (streaming.py)"""
+    from streaming import StreamingFallback, compile_streaming
+    
+    il_file, exe_file = output_paths(source_file, output_file)
+    print("🌊 Потоковая компиляция...")
+    try:
+        compile_streaming(source_file, il_file, (options or {}).get("opt_level", DEFAULT_OPT_LEVEL))
+    except StreamingFallback as e:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(il_file)
+        print(f"⚠️  Поток прерван ({e}), повторяю обычную компиляцию")
+        return compile_program(source_file, output_file, cache, options)
+    
+    print(f"✓ Сгенерирован IL файл: {il_file}")
+    return _assemble(il_file, exe_file, CacheEntry())
+
+def _report_timings(recorder: PhaseRecorder, fmt: str, path: str = None):
+    report = recorder.render(fmt)
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(report)
+        print(f"✓ Замеры фаз сохранены: {path}")
+    else:
+        print("📊 Фазы компиляции:")
+        print(report)
+
+def _run_instrumented(args, compile_func) -> bool:
+    """Выполняет компиляцию под --timings и --profile"""
+    fmt = args.timings or ("json" if args.timings_file else None)
+    recorder = PhaseRecorder(trace_memory=not args.timings_no_memory) if fmt else None
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+    
+    with recorder or contextlib.nullcontext():
+        if profiler:
+            profiler.enable()
+        try:
+            success = compile_func()
+        finally:
+            if profiler:
+                profiler.disable()
+    
+    if profiler:
+        profiler.dump_stats(args.profile)
+        print(f"✓ Профиль cProfile сохранён: {args.profile} (python -m pstats {args.profile})")
+    if recorder:
+        if args.batch and resolve_jobs(args.jobs) > 1:
+            print("⚠️  С -j N фазы воркеров не замеряются: учтены только запись IL и ilasm")
+        _report_timings(recorder, fmt, args.timings_file)
+    return success
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python compiler.py <input_file> [output_file]")
-        sys.exit(1)
+    arg_parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Компилятор ImgLang в .NET CIL"
+    )
+    arg_parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    arg_parser.add_argument("input_file", nargs="?", help="исходный файл .imgl")
+    arg_parser.add_argument("output_file", nargs="?", help="имя выходного .exe")
+    arg_parser.add_argument("--batch", nargs="+", metavar="PATH",
+                            help="пакетная компиляция: каталоги, файлы или @список")
+    arg_parser.add_argument("-o", "--output-dir", default=".",
+                            help="каталог для результатов пакетной компиляции")
+    arg_parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N",
+                            help="число процессов для --batch (0 - по числу ядер)")
+    arg_parser.add_argument("--lexer", choices=LEXER_ENGINES, default=DEFAULT_LEXER_ENGINE,
+                            help="лексер: табличный на регулярных выражениях (по умолчанию) или ANTLR")
+    arg_parser.add_argument("--parser", choices=PARSER_ENGINES, default=DEFAULT_PARSER_ENGINE,
+                            help="парсер: рукописный однопроходный (по умолчанию) или ANTLR + ASTBuilder")
+    arg_parser.add_argument("--parse-mode", choices=PARSE_MODES, default=DEFAULT_PARSE_MODE,
+                            help="стратегия разбора ANTLR: SLL с откатом на LL (по умолчанию), только SLL или только LL")
+    arg_parser.add_argument("--dfa-cache", metavar="FILE",
+                            help="файл DFA предсказаний ANTLR: загрузить перед разбором и сохранить выученное")
+    arg_parser.add_argument("--cache-dir", metavar="DIR|URL",
+                            help="кэш компиляции: каталог (в т.ч. общий) или http://адрес")
+    arg_parser.add_argument("--cache-size-mb", type=int, default=256,
+                            help="предельный размер каталога кэша (LRU)")
+    arg_parser.add_argument("--stream", action="store_true",
+                            help="потоковая компиляция огромных программ: память не растёт с числом "
+                                 "объявлений, кэш не используется")
+    arg_parser.add_argument("-O", dest="opt_level", type=int, choices=OPT_LEVELS, default=DEFAULT_OPT_LEVEL,
+                            help="уровень оптимизации IL: 0 - без оптимизаций (по умолчанию), "
+                                 "1 - свёртка констант, удаление мёртвого кода, вынос инвариантов из циклов и проход «через глазок»")
+    arg_parser.add_argument("--timings", nargs="?", const="text", choices=("text", "json", "chrome"),
+                            help="время, пик памяти и счётчики по фазам: таблица, JSON или Chrome trace")
+    arg_parser.add_argument("--timings-file", metavar="FILE",
+                            help="записать замеры фаз в файл (по умолчанию JSON)")
+    arg_parser.add_argument("--timings-no-memory", action="store_true",
+                            help="не включать tracemalloc: точнее время, но без пиков памяти")
+    arg_parser.add_argument("--profile", metavar="FILE",
+                            help="записать профиль cProfile всей компиляции в FILE")
+    args = arg_parser.parse_args()
+
+    options = {"lexer": args.lexer, "parser": args.parser, "parse_mode": args.parse_mode,
+               "opt_level": args.opt_level}
+    if args.dfa_cache:
+        from parser import dfa_cache
+        dfa_cache.enable(args.dfa_cache)
     
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
+    cache = None
+    if args.cache_dir:
+        cache = CompilationCache(make_backend(args.cache_dir, args.cache_size_mb * 1024 * 1024))
+
+    if args.batch:
+        if args.stream:
+            print("⚠️  --stream действует только при компиляции одного файла")
+        success = _run_instrumented(
+            args, lambda: compile_batch(args.batch, args.output_dir, args.jobs, cache, options))
+        sys.exit(0 if success else 1)
+
+    if not args.input_file:
+        print("Usage: python main.py <input_file> [output_file]")
+        print("       python main.py --batch <dir|file|@list>... [-o output_dir] [-j N]")
+        sys.exit(1)
 
-    if not os.path.exists(input_file):
-        print(f"File not found: {input_file}")
+    if not os.path.exists(args.input_file):
+        print(f"File not found: {args.input_file}")
         sys.exit(1)
 
-    success = compile_program(input_file, output_file)
+    compile_func = compile_streaming_program if args.stream else compile_program
+    success = _run_instrumented(
+        args, lambda: compile_func(args.input_file, args.output_file, cache, options))
     sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
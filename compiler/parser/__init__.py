@@ -1,5 +1,30 @@
-from .ast import *
-from .ast_builder import ASTBuilder
-from .parser import ImgParser
+# Пакет импортируется лёгким: ANTLR и сгенерированный ImgLangParser загружаются только
+# при обращении к ASTBuilder/ImgParser (PEP 562), поэтому main.py может прочитать
+# PARSE_MODES для --help и обслужить попадание в кэш, не трогая ANTLR.
 
-__all__ = ['ASTBuilder', 'ImgParser', 'ast']
\ No newline at end of file
+# two-stage: быстрый SLL-разбор без восстановления после ошибок, при неудаче - полный LL
+#            с ParserErrorListener (точная диагностика);
+# sll:       только SLL (при ошибке повторный SLL-разбор с восстановлением ради диагностики);
+# ll:        только полный LL с восстановлением, как раньше
+PARSE_MODES = ("two-stage", "sll", "ll")
+DEFAULT_PARSE_MODE = "two-stage"
+
+# antlr:  дерево разбора ImgLangParser, затем обход ASTBuilder;
+# direct: рукописный однопроходный парсер (parser/direct_parser.py), при синтаксической
+#         ошибке разбор повторяется через ANTLR ради его диагностики
+PARSER_ENGINES = ("antlr", "direct")
+DEFAULT_PARSER_ENGINE = "direct"
+
+def __getattr__(name):
+    if name == "ASTBuilder":
+        from .ast_builder import ASTBuilder
+        return ASTBuilder
+    if name == "ImgParser":
+        from .parser import ImgParser
+        return ImgParser
+    if name == "ast":
+        from . import ast
+        return ast
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+__all__ = ['ASTBuilder', 'ImgParser', 'ast']
@@ -1,9 +1,13 @@
+"""
+Узлы AST. Все узлы - dataclass со __slots__: у больших сгенерированных программ
+десятки тысяч узлов, и словарь атрибутов у каждого стоил бы больше самих полей.
+Поэтому узлу нельзя дописать поле, которого нет в объявлении класса.
+"""
+from bisect import bisect_right
 from dataclasses import dataclass, field
 from typing import List, Optional, Union, Any
 from enum import Enum
 
-from errors.base import SourceLocation
-
 class AccessModifier(Enum):
     PUBLIC = "PUBLIC"
     PROTECTED = "PROTECTED"
@@ -20,170 +24,245 @@ class TypeKind(Enum):
     STRUCT = "struct"
     VOID = "void"
 
-@dataclass
+_TYPES = {}
+
+@dataclass(frozen=True, slots=True)
 class Type:
+    """Неизменяемый тип; Type(kind, struct_name) возвращает один экземпляр на каждую пару"""
     kind: TypeKind
     struct_name: Optional[str] = None
 
+    def __new__(cls, kind: TypeKind, struct_name: Optional[str] = None):
+        key = (kind, struct_name)
+        instance = _TYPES.get(key)
+        if instance is None:
+            instance = _TYPES[key] = object.__new__(cls)
+        return instance
+
+    def __reduce__(self):
+        return Type, (self.kind, self.struct_name)
+
     def __str__(self) -> str:
         if self.kind == TypeKind.STRUCT:
             return self.struct_name or "struct"
         return self.kind.value
 
-@dataclass
+class SourceLines:
+    """
+    Начала строк исходного текста. Строится по тексту при первом обращении (то есть
+    только когда нужна диагностика) или сразу из готового списка (ast_codec).
+    """
+    __slots__ = ("_text", "_starts")
+
+    def __init__(self, text: Optional[str] = None, starts: Optional[List[int]] = None):
+        self._text = text
+        self._starts = starts
+
+    @property
+    def starts(self) -> List[int]:
+        if self._starts is None:
+            text, starts = self._text, [0]
+            index = text.find("\n")
+            while index >= 0:
+                starts.append(index + 1)
+                index = text.find("\n", index + 1)
+            self._starts, self._text = starts, None
+        return self._starts
+
+    def position(self, offset: int):
+        """(строка, столбец) символа с данным смещением; оба с единицы"""
+        starts = self.starts
+        line = bisect_right(starts, offset)
+        return line, offset - starts[line - 1] + 1
+
+@dataclass(slots=True)
 class SourceInfo:
-    line: int
-    column: int
-    end_line: Optional[int] = None
-    end_column: Optional[int] = None
+    """
+    Позиция узла: смещения в тексте первого и последнего токена. Строка и столбец
+    вычисляются по SourceLines при обращении, поэтому узел можно передавать как
+    location в CompilerError вместо SourceLocation.
+    """
+    first: int
+    last: int
+    lines: SourceLines = field(compare=False, repr=False)
+
+    length = 1
+
+    @property
+    def line(self) -> int:
+        return self.lines.position(self.first)[0]
+
+    @property
+    def column(self) -> int:
+        return self.lines.position(self.first)[1]
+
+    @property
+    def end_line(self) -> int:
+        return self.lines.position(self.last)[0]
 
-@dataclass(kw_only=True)
+    @property
+    def end_column(self) -> int:
+        return self.lines.position(self.last)[1]
+
+    def __str__(self) -> str:
+        return f"{self.line}:{self.column}"
+
+@dataclass(frozen=True, slots=True)
+class SourceDigest:
+    """Отпечаток текста объявления: хэш его токенов (без пробелов и комментариев) и все встреченные имена"""
+    digest: str
+    names: frozenset
+
+@dataclass(kw_only=True, slots=True)
 class ASTNode:
     source_info: Optional[Any] = None
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Expression(ASTNode):
     pass
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class LiteralExpr(Expression):
-    value: Union[int, float, bool, str]
+    # (r, g, b) - литерал цвета; появляется только при свёртке констант
+    value: Union[int, float, bool, str, tuple]
     type: Any
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class CastExpr(Expression):
     target_type: Type
     expr: Expression
+    type: Optional[Type] = None
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class VariableExpr(Expression):
     name: str
     type: Optional[Any] = None
 
-@dataclass
+@dataclass(slots=True)
 class BinaryExpr(Expression):
     left: Expression
     op: str
     right: Expression
     type: Optional[Type] = None
 
-@dataclass
+@dataclass(slots=True)
 class UnaryExpr(Expression):
     op: str
     expr: Expression
     type: Optional[Type] = None
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class CallExpr(Expression):
     func_name: str
     args: List[Expression]
     receiver: Optional[Expression] = None
     type: Optional[Type] = None
 
-@dataclass
+@dataclass(slots=True)
 class MemberAccessExpr(Expression):
     obj: Expression
     member: str
     type: Optional[Type] = None
 
-@dataclass
+@dataclass(slots=True)
 class ConstructorExpr(Expression):
     struct_name: str
     args: List[Expression]
     type: Optional[Type] = None
 
 class Statement(ASTNode):
-    pass
+    __slots__ = ()
 
-@dataclass
+@dataclass(slots=True)
 class VariableDecl(Statement):
     var_type: Type
     variables: List['VariableEntry']
 
-@dataclass
+@dataclass(slots=True)
 class VariableEntry:
     name: str
     initializer: Optional[Expression] = None
 
-@dataclass
+@dataclass(slots=True)
 class Assignment(Statement):
     target: Union[VariableExpr, MemberAccessExpr]
     value: Expression
 
-@dataclass
+@dataclass(slots=True)
 class IfStatement(Statement):
     condition: Expression
     then_block: 'Block'
     else_block: Optional['Block'] = None
 
-@dataclass
+@dataclass(slots=True)
 class WhileLoop(Statement):
     condition: Expression
     body: 'Block'
 
-@dataclass
+@dataclass(slots=True)
 class ForLoop(Statement):
     init: Optional[VariableDecl]
     condition: Optional[Expression]
     update: Optional[Assignment]
     body: 'Block'
 
-@dataclass
+@dataclass(slots=True)
 class DoUntilLoop(Statement):
     body: 'Block'
     condition: Expression
 
-@dataclass
+@dataclass(slots=True)
 class ReturnStatement(Statement):
     value: Optional[Expression] = None
 
-@dataclass
+@dataclass(slots=True)
 class ExpressionStatement(Statement):
     expr: Expression
 
 class Declaration(ASTNode):
-    pass
+    __slots__ = ()
 
-@dataclass
+@dataclass(slots=True)
 class FunctionDecl(Declaration):
     name: str
     params: List['Parameter']
     return_type: Type
     body: 'Block'
     modifiers: List[str] = field(default_factory=list)
+    source_digest: Optional[SourceDigest] = None
 
-@dataclass
+@dataclass(slots=True)
 class StructDecl(Declaration):
     name: str
     parent: Optional[str]
     members: List['MemberDecl']
     access_modifier: AccessModifier = AccessModifier.PUBLIC
 
-@dataclass
+@dataclass(slots=True)
 class MemberDecl(ASTNode):
     access: AccessModifier = field(default=AccessModifier.PUBLIC)
     decl: Union['FieldDecl', 'MethodDecl'] = field(default=None)
 
-@dataclass
+@dataclass(slots=True)
 class FieldDecl(ASTNode):
     field_type: Type = field(default=None)
     name: str = field(default="")
 
-@dataclass
+@dataclass(slots=True)
 class MethodDecl(FunctionDecl):
     pass
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class Parameter(ASTNode):
     param_type: Any
     name: str
     kind: str = "value"
 
-@dataclass
+@dataclass(slots=True)
 class Block(ASTNode):
     statements: List[Statement]
 
-@dataclass
+@dataclass(slots=True)
 class Program(ASTNode):
     declarations: List[Declaration]
     statements: List[Statement]
\ No newline at end of file
@@ -1,19 +1,42 @@
+import hashlib
+import sys
+
 from antlr.ImgLangVisitor import ImgLangVisitor
 from antlr.ImgLangParser import ImgLangParser
 from .ast import *
 
 class ASTBuilder(ImgLangVisitor):
+    def __init__(self):
+        super().__init__()
+        self._input_stream = None
+        self._lines = None
+
+    def _source_lines(self, token) -> SourceLines:
+        """Одна таблица строк на исходный текст: её разделяют все позиции AST"""
+        stream = token.getInputStream()
+        if stream is not self._input_stream:
+            self._input_stream = stream
+            self._lines = SourceLines(stream.strdata)
+        return self._lines
+
     def _get_source_info(self, ctx):
         if ctx and hasattr(ctx, 'start') and ctx.start:
             stop = ctx.stop if ctx.stop else ctx.start
-            return SourceLocation(
-                line=ctx.start.line,
-                column=ctx.start.column + 1,
-                end_line=stop.line,
-                end_column=stop.column + 1
-            )
+            return SourceInfo(ctx.start.start, stop.start, self._source_lines(ctx.start))
         return None
 
+    @staticmethod
+    def _name(node) -> str:
+        """Текст идентификатора; одинаковые имена в AST - один объект строки"""
+        return sys.intern(node.getText())
+
+    def _source_digest(self, ctx) -> SourceDigest:
+        """Отпечаток токенов правила для инкрементальной генерации кода"""
+        tokens = ctx.parser.getTokenStream().tokens[ctx.start.tokenIndex:ctx.stop.tokenIndex + 1]
+        texts = [token.text for token in tokens]
+        digest = hashlib.sha1("\x1f".join(texts).encode("utf-8")).hexdigest()
+        return SourceDigest(digest=digest, names=frozenset(texts))
+
     def visitStatement(self, ctx: ImgLangParser.StatementContext):
         if ctx.functionCall() or ctx.expression():
             expr_ctx = ctx.functionCall() if ctx.functionCall() else ctx.expression()
@@ -29,7 +52,7 @@ class ASTBuilder(ImgLangVisitor):
         return None
     
     def visitFunctionDecl(self, ctx: ImgLangParser.FunctionDeclContext):
-        name = ctx.ID().getText()
+        name = self._name(ctx.ID())
         params = ctx.parameterList().accept(self) if ctx.parameterList() else []
         
         if ctx.type_():
@@ -42,7 +65,8 @@ class ASTBuilder(ImgLangVisitor):
                 ret_type = Type(kind=TypeKind.VOID)
             
         body = ctx.block().accept(self)
-        return FunctionDecl(name=name, params=params, return_type=ret_type, body=body)
+        return FunctionDecl(name=name, params=params, return_type=ret_type, body=body,
+                            source_digest=self._source_digest(ctx))
     
     def visitDoUntilLoop(self, ctx: ImgLangParser.DoUntilLoopContext):
         body = ctx.block().accept(self)
@@ -59,7 +83,7 @@ class ASTBuilder(ImgLangVisitor):
         
         type_str = ctx.type_().getText()
         param_type = self._map_type(type_str)
-        name = ctx.ID().getText()
+        name = self._name(ctx.ID())
         
         return Parameter(
             param_type=param_type,
@@ -85,14 +109,14 @@ class ASTBuilder(ImgLangVisitor):
     def visitForInit(self, ctx: ImgLangParser.ForInitContext):
         if ctx.type_():
             var_type = self._map_type(ctx.type_().getText())
-            entry = VariableEntry(name=ctx.ID().getText(), initializer=ctx.expression().accept(self))
+            entry = VariableEntry(name=self._name(ctx.ID()), initializer=ctx.expression().accept(self))
             return VariableDecl(var_type=var_type, variables=[entry], source_info=self._get_source_info(ctx))
         else:
-            target = VariableExpr(name=ctx.ID().getText(), source_info=self._get_source_info(ctx))
+            target = VariableExpr(name=self._name(ctx.ID()), source_info=self._get_source_info(ctx))
             return Assignment(target=target, value=ctx.expression().accept(self), source_info=self._get_source_info(ctx))
 
     def visitForUpdate(self, ctx: ImgLangParser.ForUpdateContext):
-        target = VariableExpr(name=ctx.ID().getText(), source_info=self._get_source_info(ctx))
+        target = VariableExpr(name=self._name(ctx.ID()), source_info=self._get_source_info(ctx))
         return Assignment(target=target, value=ctx.expression().accept(self), source_info=self._get_source_info(ctx))
     
     def visitVariableDecl(self, ctx: ImgLangParser.VariableDeclContext):
@@ -105,7 +129,7 @@ class ASTBuilder(ImgLangVisitor):
         return VariableDecl(var_type=var_type, variables=variables, source_info=self._get_source_info(ctx))
 
     def visitVariableEntry(self, ctx: ImgLangParser.VariableEntryContext):
-        name = ctx.ID().getText()
+        name = self._name(ctx.ID())
         initializer = None
         if ctx.expression():
             initializer = ctx.expression().accept(self)
@@ -129,7 +153,7 @@ class ASTBuilder(ImgLangVisitor):
         return ctx.literal().accept(self)
 
     def visitIdPrimary(self, ctx: ImgLangParser.IdPrimaryContext):
-        return VariableExpr(name=ctx.ID().getText(), source_info=self._get_source_info(ctx))
+        return VariableExpr(name=self._name(ctx.ID()), source_info=self._get_source_info(ctx))
 
     def visitParenPrimary(self, ctx: ImgLangParser.ParenPrimaryContext):
         return ctx.expression().accept(self)
@@ -144,11 +168,11 @@ class ASTBuilder(ImgLangVisitor):
 
     def visitMemberAccessPrimary(self, ctx: ImgLangParser.MemberAccessPrimaryContext):
         obj = ctx.primary().accept(self)
-        member = ctx.ID().getText()
+        member = self._name(ctx.ID())
         return MemberAccessExpr(obj=obj, member=member, source_info=self._get_source_info(ctx))
 
     def visitConstructorPrimary(self, ctx: ImgLangParser.ConstructorPrimaryContext):
-        struct_name = ctx.ID().getText()
+        struct_name = self._name(ctx.ID())
         args = []
         if ctx.argumentList():
             for arg_ctx in ctx.argumentList().expression():
@@ -159,7 +183,7 @@ class ASTBuilder(ImgLangVisitor):
         if ctx.primary():
             return ctx.primary().accept(self)
         
-        op = ctx.getChild(0).getText()
+        op = sys.intern(ctx.getChild(0).getText())
         expr_ctx = ctx.unary()
         if expr_ctx:
             expr = expr_ctx.accept(self)
@@ -178,7 +202,7 @@ class ASTBuilder(ImgLangVisitor):
         if not ctx.power(0): return None
         left = ctx.power(0).accept(self)
         for i in range(1, len(ctx.power())):
-            op = ctx.getChild(i * 2 - 1).getText()
+            op = sys.intern(ctx.getChild(i * 2 - 1).getText())
             right = ctx.power(i).accept(self)
             left = BinaryExpr(left=left, op=op, right=right, source_info=self._get_source_info(ctx))
         return left
@@ -189,7 +213,7 @@ class ASTBuilder(ImgLangVisitor):
         
         left = ctx.multiplication(0).accept(self)
         for i in range(1, len(ctx.multiplication())):
-            op = ctx.getChild(i * 2 - 1).getText()
+            op = sys.intern(ctx.getChild(i * 2 - 1).getText())
             right = ctx.multiplication(i).accept(self)
             left = BinaryExpr(left=left, op=op, right=right, source_info=self._get_source_info(ctx))
         return left
@@ -205,7 +229,7 @@ class ASTBuilder(ImgLangVisitor):
             return self.visitMultiAssign(ctx.MultiAssign())
 
     def visitSingleAssign(self, ctx: ImgLangParser.SingleAssignContext):
-        target = VariableExpr(name=ctx.ID().getText(), source_info=self._get_source_info(ctx))
+        target = VariableExpr(name=self._name(ctx.ID()), source_info=self._get_source_info(ctx))
         value_ctx = ctx.expression()
         if value_ctx:
             value = value_ctx.accept(self)
@@ -249,7 +273,7 @@ class ASTBuilder(ImgLangVisitor):
         
         left = ctx.addition(0).accept(self)
         for i in range(1, len(ctx.addition())):
-            op = ctx.getChild(i * 2 - 1).getText()
+            op = sys.intern(ctx.getChild(i * 2 - 1).getText())
             right = ctx.addition(i).accept(self)
             left = BinaryExpr(left=left, op=op, right=right, source_info=self._get_source_info(ctx))
         return left
@@ -260,7 +284,7 @@ class ASTBuilder(ImgLangVisitor):
         
         left = ctx.comparison(0).accept(self)
         for i in range(1, len(ctx.comparison())):
-            op = ctx.getChild(i * 2 - 1).getText()
+            op = sys.intern(ctx.getChild(i * 2 - 1).getText())
             right = ctx.comparison(i).accept(self)
             left = BinaryExpr(left=left, op=op, right=right, source_info=self._get_source_info(ctx))
         return left
@@ -297,7 +321,7 @@ class ASTBuilder(ImgLangVisitor):
         return None
     
     def visitNormalCall(self, ctx: ImgLangParser.NormalCallContext):
-        func_name = ctx.funcName().getText()
+        func_name = self._name(ctx.funcName())
         args = [arg.accept(self) for arg in (ctx.argumentList().expression() if ctx.argumentList() else [])]
         
         return CallExpr(
@@ -308,11 +332,11 @@ class ASTBuilder(ImgLangVisitor):
         )
     
     def visitStructDecl(self, ctx: ImgLangParser.StructDeclContext):
-        name = ctx.ID(0).getText()
+        name = self._name(ctx.ID(0))
         parent = None
         
         if ctx.EXTENDS() and len(ctx.ID()) > 1:
-            parent = ctx.ID(1).getText()
+            parent = self._name(ctx.ID(1))
         
         members = []
         for member in ctx.memberDecl():
@@ -350,7 +374,7 @@ class ASTBuilder(ImgLangVisitor):
 
     def visitFieldDecl(self, ctx: ImgLangParser.FieldDeclContext):
         field_type = self._map_type(ctx.type_().getText())
-        name = ctx.ID().getText()
+        name = self._name(ctx.ID())
         return FieldDecl(
             field_type=field_type,
             name=name,
@@ -358,7 +382,7 @@ class ASTBuilder(ImgLangVisitor):
         )
 
     def visitMethodDecl(self, ctx: ImgLangParser.MethodDeclContext):
-        name = ctx.ID().getText()
+        name = self._name(ctx.ID())
         params = ctx.parameterList().accept(self) if ctx.parameterList() else []
         return_type = self._map_type(ctx.type_().getText()) if ctx.type_() else Type(kind=TypeKind.VOID)
         body = ctx.block().accept(self)
@@ -377,6 +401,7 @@ class ASTBuilder(ImgLangVisitor):
             return_type=return_type,
             body=body,
             modifiers=modifiers,
+            source_digest=self._source_digest(ctx),
             source_info=self._get_source_info(ctx)
         )
 
@@ -412,7 +437,7 @@ class ASTBuilder(ImgLangVisitor):
 
     def visitStructFieldAssign(self, ctx: ImgLangParser.StructFieldAssignContext):
         obj = ctx.expression(0).accept(self)
-        member = ctx.ID().getText()
+        member = self._name(ctx.ID())
         value = ctx.expression(1).accept(self)
         
         target = MemberAccessExpr(
@@ -430,7 +455,7 @@ class ASTBuilder(ImgLangVisitor):
     def visitThisFieldAssign(self, ctx: ImgLangParser.ThisFieldAssignContext):
         target = MemberAccessExpr(
             obj=VariableExpr(name='this', source_info=self._get_source_info(ctx)),
-            member=ctx.ID().getText(),
+            member=self._name(ctx.ID()),
             source_info=self._get_source_info(ctx)
         )
         
@@ -439,7 +464,7 @@ class ASTBuilder(ImgLangVisitor):
 
     def visitMethodCallPrimary(self, ctx: ImgLangParser.MethodCallPrimaryContext):
         obj = ctx.primary().accept(self)
-        method_name = ctx.ID().getText()
+        method_name = self._name(ctx.ID())
         args = [arg.accept(self) for arg in (ctx.argumentList().expression() if ctx.argumentList() else [])]
         
         return CallExpr(
@@ -0,0 +1,248 @@
+"""
+Компактная версионированная двоичная запись AST.
+
+Формат: b"IMGA", версия формата (u8), таблица строк (varint-количество, затем
+varint-длина + UTF-8 каждой строки) и корневое значение. Значение начинается
+с байта-тега; узлы AST записываются номером класса из NODE_CLASSES и своими
+полями в порядке объявления dataclass. Сохраняются позиции (SourceInfo: смещения
+токенов, а таблица начал строк SourceLines - один раз при первой встрече) и
+типы, проставленные семантическим анализом.
+
+При любом изменении NODE_CLASSES или полей узлов нужно увеличить FORMAT_VERSION.
+"""
+import dataclasses
+import struct
+import sys
+
+from parser.ast import *
+
+MAGIC = b"IMGA"
+FORMAT_VERSION = 2
+
+NODE_CLASSES = (
+    Program, FunctionDecl, MethodDecl, StructDecl, MemberDecl, FieldDecl, Parameter,
+    Block, VariableDecl, VariableEntry, Assignment, IfStatement, WhileLoop, ForLoop,
+    DoUntilLoop, ReturnStatement, ExpressionStatement,
+    LiteralExpr, CastExpr, VariableExpr, BinaryExpr, UnaryExpr, CallExpr,
+    MemberAccessExpr, ConstructorExpr, SourceDigest,
+)
+
+TAG_NONE, TAG_FALSE, TAG_TRUE, TAG_INT, TAG_FLOAT, TAG_STR, TAG_LIST = range(7)
+TAG_TYPE, TAG_LOCATION, TAG_ACCESS, TAG_FROZENSET = range(7, 11)
+TAG_NODE = 16
+
+_TYPE_KINDS = tuple(TypeKind)
+_TYPE_KIND_CODES = {kind: i for i, kind in enumerate(_TYPE_KINDS)}
+_ACCESS = tuple(AccessModifier)
+_ACCESS_CODES = {access: i for i, access in enumerate(_ACCESS)}
+_NODE_FIELDS = tuple(tuple(f.name for f in dataclasses.fields(cls)) for cls in NODE_CLASSES)
+_NODE_TAGS = {cls: TAG_NODE + i for i, cls in enumerate(NODE_CLASSES)}
+_DOUBLE = struct.Struct("<d")
+
+class ASTDecodeError(ValueError):
+    """Повреждённые данные или запись другой версии формата"""
+
+class _Encoder:
+    def __init__(self):
+        self.out = bytearray()
+        self.strings = {}
+        self.lines = {}
+
+    def varint(self, value: int):
+        out = self.out
+        while value > 0x7F:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+    def string(self, value: str):
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        self.varint(index)
+
+    def value(self, value):
+        out = self.out
+        cls = value.__class__
+        tag = _NODE_TAGS.get(cls)
+        if tag is not None:
+            out.append(tag)
+            for name in _NODE_FIELDS[tag - TAG_NODE]:
+                self.value(getattr(value, name))
+        elif value is None:
+            out.append(TAG_NONE)
+        elif cls is bool:
+            out.append(TAG_TRUE if value else TAG_FALSE)
+        elif cls is str:
+            out.append(TAG_STR)
+            self.string(value)
+        elif cls is list:
+            out.append(TAG_LIST)
+            self.varint(len(value))
+            for item in value:
+                self.value(item)
+        elif cls is Type:
+            out.append(TAG_TYPE)
+            out.append(_TYPE_KIND_CODES[value.kind])
+            self.value(value.struct_name)
+        elif cls is SourceInfo:
+            out.append(TAG_LOCATION)
+            self.source_lines(value.lines)
+            self.varint(value.first)
+            self.varint(value.last)
+        elif cls is int:
+            out.append(TAG_INT)
+            self.varint((value << 1) if value >= 0 else ((-value << 1) - 1))
+        elif cls is float:
+            out.append(TAG_FLOAT)
+            out += _DOUBLE.pack(value)
+        elif cls is AccessModifier:
+            out.append(TAG_ACCESS)
+            out.append(_ACCESS_CODES[value])
+        elif cls is frozenset:
+            out.append(TAG_FROZENSET)
+            self.varint(len(value))
+            for item in sorted(value):
+                self.value(item)
+        else:
+            raise TypeError(f"Cannot encode AST value of type {cls.__name__}")
+
+    def source_lines(self, lines: SourceLines):
+        """Номер таблицы строк; новая таблица записывается сразу за номером"""
+        index = self.lines.get(id(lines))
+        if index is not None:
+            self.varint(index)
+            return
+        index = self.lines[id(lines)] = len(self.lines)
+        self.varint(index)
+        starts = lines.starts
+        self.varint(len(starts))
+        previous = 0
+        for start in starts:
+            self.varint(start - previous)
+            previous = start
+
+    def finish(self) -> bytes:
+        header = bytearray(MAGIC)
+        header.append(FORMAT_VERSION)
+        body, self.out = self.out, header
+        self.varint(len(self.strings))
+        for s in self.strings:
+            data = s.encode("utf-8")
+            self.varint(len(data))
+            self.out += data
+        return bytes(self.out + body)
+
+class _Decoder:
+    def __init__(self, data: bytes):
+        if data[:4] != MAGIC:
+            raise ASTDecodeError("Not an encoded AST")
+        if len(data) < 5 or data[4] != FORMAT_VERSION:
+            raise ASTDecodeError(f"Unsupported AST format version: {data[4] if len(data) > 4 else None}")
+        self.data = data
+        self.pos = 5
+        count = self.varint()
+        strings = []
+        for _ in range(count):
+            length = self.varint()
+            if self.pos + length > len(data):
+                raise ASTDecodeError("Truncated AST string table")
+            strings.append(sys.intern(data[self.pos:self.pos + length].decode("utf-8")))
+            self.pos += length
+        self.strings = strings
+        self.lines = []
+
+    def varint(self) -> int:
+        data = self.data
+        pos = self.pos
+        byte = data[pos]
+        pos += 1
+        if byte < 0x80:
+            self.pos = pos
+            return byte
+        result = byte & 0x7F
+        shift = 7
+        while True:
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                self.pos = pos
+                return result
+            shift += 7
+
+    def source_lines(self) -> SourceLines:
+        index = self.varint()
+        if index < len(self.lines):
+            return self.lines[index]
+        starts, previous = [], 0
+        for _ in range(self.varint()):
+            previous += self.varint()
+            starts.append(previous)
+        lines = SourceLines(starts=starts)
+        self.lines.append(lines)
+        return lines
+
+    def signed(self) -> int:
+        n = self.varint()
+        return (n >> 1) ^ -(n & 1)
+
+    def value(self):
+        tag = self.data[self.pos]
+        self.pos += 1
+        if tag >= TAG_NODE:
+            index = tag - TAG_NODE
+            cls = NODE_CLASSES[index]
+            node = cls.__new__(cls)
+            # object.__setattr__: SourceDigest - frozen dataclass
+            for name in _NODE_FIELDS[index]:
+                object.__setattr__(node, name, self.value())
+            return node
+        if tag == TAG_NONE:
+            return None
+        if tag == TAG_STR:
+            return self.strings[self.varint()]
+        if tag == TAG_LIST:
+            return [self.value() for _ in range(self.varint())]
+        if tag == TAG_TYPE:
+            kind = _TYPE_KINDS[self.data[self.pos]]
+            self.pos += 1
+            return Type(kind, self.value())
+        if tag == TAG_LOCATION:
+            lines = self.source_lines()
+            first = self.varint()
+            return SourceInfo(first, self.varint(), lines)
+        if tag == TAG_INT:
+            return self.signed()
+        if tag == TAG_FALSE:
+            return False
+        if tag == TAG_TRUE:
+            return True
+        if tag == TAG_FLOAT:
+            (value,) = _DOUBLE.unpack_from(self.data, self.pos)
+            self.pos += 8
+            return value
+        if tag == TAG_ACCESS:
+            access = _ACCESS[self.data[self.pos]]
+            self.pos += 1
+            return access
+        if tag == TAG_FROZENSET:
+            return frozenset(self.value() for _ in range(self.varint()))
+        raise ASTDecodeError(f"Unknown tag {tag} at offset {self.pos - 1}")
+
+def encode_ast(node) -> bytes:
+    """Кодирует AST (обычно Program) в байты"""
+    encoder = _Encoder()
+    encoder.value(node)
+    return encoder.finish()
+
+def decode_ast(data: bytes):
+    """Восстанавливает AST, записанный encode_ast; данные должны кончаться вместе с корневым значением"""
+    try:
+        decoder = _Decoder(data)
+        node = decoder.value()
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise ASTDecodeError(f"Truncated or corrupted AST: {e}") from e
+    if decoder.pos != len(data):
+        raise ASTDecodeError(f"Trailing data after AST at offset {decoder.pos}")
+    return node
@@ -0,0 +1,251 @@
+"""
+Сохранение выученного DFA предсказаний ImgLangParser на диск.
+
+ANTLR строит DFA решений (decisionsToDFA) заново в каждом процессе, и первые файлы
+разбираются медленно, пока DFA не наполнится. Файл DFA позволяет начать с тёплым кэшем:
+enable(path) загружает его при первом создании ANTLR-парсера и сохраняет при выходе,
+если за время работы DFA вырос.
+
+Формат: b"IMGD", версия формата (u8), затем pickle с отпечатком ATN и состояниями DFA.
+Состояния ATN записываются номерами, одиночки ANTLR (PredictionContext.EMPTY,
+SemanticContext.NONE, ATNSimulator.ERROR) - ссылками на живые объекты; при загрузке
+разрешены только классы DFA/ATN из antlr4. Хэши контекстов зависят от процесса
+(hash строк, id объектов), поэтому после загрузки они пересчитываются.
+
+Сам модуль ANTLR не импортирует: enable() можно вызвать до того, как станет
+известно, понадобится ли ANTLR вообще (при попадании в кэш - нет).
+"""
+import atexit
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+
+MAGIC = b"IMGD"
+FORMAT_VERSION = 1
+
+# Классы, которые встречаются в состояниях DFA парсера
+_ALLOWED_CLASSES = {
+    ("antlr4.dfa.DFAState", "DFAState"), ("antlr4.dfa.DFAState", "PredPrediction"),
+    ("antlr4.atn.ATNConfigSet", "ATNConfigSet"), ("antlr4.atn.ATNConfig", "ATNConfig"),
+    ("antlr4.PredictionContext", "SingletonPredictionContext"),
+    ("antlr4.PredictionContext", "ArrayPredictionContext"),
+    ("antlr4.atn.SemanticContext", "Predicate"), ("antlr4.atn.SemanticContext", "PrecedencePredicate"),
+    ("antlr4.atn.SemanticContext", "AND"), ("antlr4.atn.SemanticContext", "OR"),
+}
+
+_NO_EDGE, _ERROR_EDGE = -1, -2
+
+def _parser_class():
+    from antlr.ImgLangParser import ImgLangParser
+    return ImgLangParser
+
+@lru_cache(maxsize=None)
+def atn_fingerprint() -> str:
+    """
+    Отпечаток грамматики (сериализованный ATN) и раскладки классов рантайма, которые
+    попадают в файл: DFA от другой версии ATN бесполезен и опасен
+    """
+    from antlr4.atn.ATNConfig import ATNConfig
+    from antlr4.atn.ATNConfigSet import ATNConfigSet
+    from antlr4.dfa.DFAState import DFAState
+    from antlr.ImgLangParser import serializedATN
+    layout = [cls.__slots__ for cls in (DFAState, ATNConfigSet, ATNConfig)]
+    data = f"{layout}\0{','.join(map(str, serializedATN()))}"
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+def _singletons() -> dict:
+    from antlr4.PredictionContext import PredictionContext
+    from antlr4.atn.SemanticContext import SemanticContext
+    return {"empty": PredictionContext.EMPTY, "none": SemanticContext.NONE}
+
+class _DFAPickler(pickle.Pickler):
+    def __init__(self, file, protocol):
+        from antlr4.atn.ATNState import ATNState
+        super().__init__(file, protocol)
+        self.state_class = ATNState
+        self.singletons = {id(obj): (name,) for name, obj in _singletons().items()}
+
+    def persistent_id(self, obj):
+        if isinstance(obj, self.state_class):
+            return ("state", obj.stateNumber)
+        return self.singletons.get(id(obj))
+
+class _DFAUnpickler(pickle.Unpickler):
+    def __init__(self, file, atn):
+        super().__init__(file)
+        self.atn = atn
+        self.singletons = _singletons()
+
+    def persistent_load(self, pid):
+        if pid[0] == "state":
+            return self.atn.states[pid[1]]
+        if pid[0] in self.singletons:
+            return self.singletons[pid[0]]
+        raise pickle.UnpicklingError(f"Unknown persistent id: {pid!r}")
+
+    def find_class(self, module, name):
+        if (module, name) not in _ALLOWED_CLASSES:
+            raise pickle.UnpicklingError(f"Class {module}.{name} is not allowed in a DFA file")
+        return super().find_class(module, name)
+
+def _flatten(dfa):
+    """Состояния DFA списком; переходы - индексами в этом списке, а не ссылками (без глубокой рекурсии pickle)"""
+    from antlr4.atn.ATNSimulator import ATNSimulator
+    states = list(dfa.states)
+    if dfa.precedenceDfa:
+        states.insert(0, dfa.s0)
+    index = {id(state): i for i, state in enumerate(states)}
+    records = []
+    i = 0
+    while i < len(states):
+        state = states[i]
+        edges = None
+        if state.edges is not None:
+            edges = []
+            for target in state.edges:
+                if target is None:
+                    edges.append(_NO_EDGE)
+                elif target is ATNSimulator.ERROR:
+                    edges.append(_ERROR_EDGE)
+                else:
+                    if id(target) not in index:
+                        index[id(target)] = len(states)
+                        states.append(target)
+                    edges.append(index[id(target)])
+        records.append((state.stateNumber, state.configs, state.isAcceptState, state.prediction,
+                        state.requiresFullContext, state.predicates, edges))
+        i += 1
+    s0 = index[id(dfa.s0)] if dfa.s0 is not None else _NO_EDGE
+    return dfa.decision, dfa.precedenceDfa, s0, records
+
+def _rehash_context(context, seen: set):
+    from antlr4.PredictionContext import (PredictionContext, SingletonPredictionContext, ArrayPredictionContext,
+                                          calculateHashCode, calculateListsHashCode)
+    if context is None or context is PredictionContext.EMPTY or id(context) in seen:
+        return
+    seen.add(id(context))
+    if isinstance(context, SingletonPredictionContext):
+        _rehash_context(context.parentCtx, seen)
+        context.cachedHashCode = calculateHashCode(context.parentCtx, context.returnState)
+    elif isinstance(context, ArrayPredictionContext):
+        for parent in context.parents:
+            _rehash_context(parent, seen)
+        context.cachedHashCode = calculateListsHashCode(context.parents, context.returnStates)
+
+def _restore(dfa, precedence: bool, s0: int, records: list, seen: set):
+    from antlr4.atn.ATNSimulator import ATNSimulator
+    from antlr4.dfa.DFAState import DFAState
+    states = []
+    for number, configs, accept, prediction, full_context, predicates, _ in records:
+        for config in configs:
+            _rehash_context(config.context, seen)
+        configs.cachedHashCode = -1
+        state = DFAState(number, configs)
+        state.isAcceptState = accept
+        state.prediction = prediction
+        state.requiresFullContext = full_context
+        state.predicates = predicates
+        states.append(state)
+    for state, record in zip(states, records):
+        edges = record[-1]
+        if edges is not None:
+            state.edges = [None if e == _NO_EDGE else ATNSimulator.ERROR if e == _ERROR_EDGE else states[e]
+                           for e in edges]
+
+    dfa.precedenceDfa = precedence
+    dfa.s0 = states[s0] if s0 != _NO_EDGE else None
+    members = states[1:] if precedence else states
+    dfa._states = {state: state for state in members}
+
+def dfa_size() -> int:
+    """Общее число состояний во всех DFA решений ImgLangParser"""
+    return sum(len(dfa.states) for dfa in _parser_class().decisionsToDFA)
+
+def save(path) -> int:
+    """Записывает DFA всех решений в файл (атомарно); возвращает число состояний"""
+    parser_class = _parser_class()
+    payload = {
+        "fingerprint": atn_fingerprint(),
+        "dfas": [_flatten(dfa) for dfa in parser_class.decisionsToDFA if dfa.states],
+    }
+    buffer = io.BytesIO()
+    buffer.write(MAGIC + bytes([FORMAT_VERSION]))
+    _DFAPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(payload)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".dfa-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return sum(len(records) for _, _, _, records in payload["dfas"])
+
+def load(path) -> int:
+    """
+    Загружает DFA из файла в ImgLangParser.decisionsToDFA; возвращает число загруженных
+    состояний (0, если файла нет, он повреждён или записан для другой грамматики).
+    Уже выученные в этом процессе решения не перезаписываются.
+    """
+    try:
+        data = Path(path).read_bytes()
+    except OSError:
+        return 0
+    if data[:4] != MAGIC or data[4:5] != bytes([FORMAT_VERSION]):
+        return 0
+
+    parser_class = _parser_class()
+    try:
+        payload = _DFAUnpickler(io.BytesIO(data[5:]), parser_class.atn).load()
+    except (pickle.UnpicklingError, EOFError, AttributeError, IndexError, TypeError, ValueError):
+        return 0
+    if not isinstance(payload, dict) or payload.get("fingerprint") != atn_fingerprint():
+        return 0
+
+    loaded, seen = 0, set()
+    for decision, precedence, s0, records in payload["dfas"]:
+        dfa = parser_class.decisionsToDFA[decision]
+        if dfa.states:
+            continue
+        _restore(dfa, precedence, s0, records, seen)
+        loaded += len(records)
+    return loaded
+
+_path: Optional[Path] = None
+_loaded = False
+_size_after_load = 0
+
+def enable(path):
+    """Включает файл DFA для процесса: загрузка при первом ANTLR-разборе, сохранение при выходе"""
+    global _path
+    if _path is None:
+        atexit.register(_save_at_exit)
+    _path = Path(path)
+
+def on_parser_created():
+    """Вызывается ImgParser при создании ANTLR-парсера"""
+    global _loaded, _size_after_load
+    if _path is None or _loaded:
+        return
+    _loaded = True
+    load(_path)
+    _size_after_load = dfa_size()
+
+def _save_at_exit():
+    # ANTLR-парсер в этом процессе не создавался - DFA не менялся
+    if _path is None or not _loaded:
+        return
+    if dfa_size() > _size_after_load:
+        try:
+            save(_path)
+        except OSError:
+            pass
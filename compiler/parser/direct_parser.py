@@ -0,0 +1,548 @@
+"""
+Рукописный парсер ImgLang: строит AST (parser/ast.py) за один проход по токенам,
+без дерева разбора ANTLR и без второго обхода ASTBuilder.
+
+Операторы разбираются подъёмом по приоритетам (precedence climbing) вместо девяти
+вложенных правил logicalOr → ... → primary. Результат совпадает с ASTBuilder узел
+в узел, включая позиции (SourceInfo): все BinaryExpr одной цепочки одного приоритета
+получают позицию всей цепочки, как контекст правила в ANTLR.
+
+Парсер не восстанавливается после ошибок: на первом же несовпадении он бросает
+DirectParseError, и ImgParser повторяет разбор через ANTLR, чтобы диагностика
+(SyntaxError с сообщениями и позициями ANTLR) осталась прежней.
+"""
+import hashlib
+import sys
+from typing import List, Optional
+
+from lexer.fast_lexer import SYMBOLIC, LITERALS
+from .ast import *
+
+EOF = -1
+PROC, STRUCT, EXTENDS = LITERALS["proc"], LITERALS["struct"], LITERALS["extends"]
+VALUE, RESULT = LITERALS["value"], LITERALS["result"]
+VIRTUAL, OVERRIDE = LITERALS["virtual"], LITERALS["override"]
+FOR, IF, THEN, ELSE = LITERALS["for"], LITERALS["if"], LITERALS["then"], LITERALS["else"]
+WHILE, DO, UNTIL, RETURN = LITERALS["while"], LITERALS["do"], LITERALS["until"], LITERALS["return"]
+BEGIN, END = LITERALS["begin"], LITERALS["end"]
+TRUE, FALSE = LITERALS["true"], LITERALS["false"]
+THIS, SUPER, NEW = LITERALS["this"], LITERALS["super"], LITERALS["new"]
+INT, FLOAT, STRING, ID = SYMBOLIC["INT"], SYMBOLIC["FLOAT"], SYMBOLIC["STRING"], SYMBOLIC["ID"]
+ASSIGN, ARROW, DOT = LITERALS["="], LITERALS["->"], LITERALS["."]
+COMMA, SEMI = LITERALS[","], LITERALS[";"]
+LPAREN, RPAREN, LBRACE, RBRACE = LITERALS["("], LITERALS[")"], LITERALS["{"], LITERALS["}"]
+MINUS, NOT = LITERALS["-"], LITERALS["!"]
+
+ACCESS_MODIFIERS = {LITERALS[name]: AccessModifier(name.upper()) for name in ("public", "protected", "private")}
+
+TYPE_KINDS = {
+    LITERALS["int"]: TypeKind.INT, LITERALS["float"]: TypeKind.FLOAT, LITERALS["bool"]: TypeKind.BOOL,
+    LITERALS["image"]: TypeKind.IMAGE, LITERALS["color"]: TypeKind.COLOR, LITERALS["pixel"]: TypeKind.PIXEL,
+    LITERALS["string"]: TypeKind.STRING,
+}
+
+# Правило builtInFunction: встроенные функции - отдельные ключевые слова лексера
+BUILTIN_FUNCTIONS = frozenset(SYMBOLIC[name] for name in (
+    "LOAD_IMAGE", "SAVE_IMAGE", "CREATE_IMAGE", "GET_WIDTH", "GET_HEIGHT", "GET_PIXEL",
+    "SET_PIXEL", "TO_COLOR", "CLAMP", "WRITE", "READ_INT", "READ_FLOAT",
+))
+
+# Приоритеты бинарных операторов (больше - сильнее связывает); все левоассоциативны, включая '**'
+BINARY_PRECEDENCE = {
+    LITERALS["||"]: 1,
+    LITERALS["&&"]: 2,
+    LITERALS["=="]: 3, LITERALS["!="]: 3,
+    LITERALS["<"]: 4, LITERALS[">"]: 4, LITERALS["<="]: 4, LITERALS[">="]: 4,
+    LITERALS["+"]: 5, LITERALS["-"]: 5,
+    LITERALS["*"]: 6, LITERALS["/"]: 6, LITERALS["%"]: 6,
+    LITERALS["**"]: 7,
+}
+POWER_PRECEDENCE = 7
+
+LITERAL_TOKENS = frozenset((INT, FLOAT, STRING, TRUE, FALSE))
+
+# После '(' ID ')' эти токены могут только начинать выражение, но не продолжать его,
+# поэтому ANTLR выбирает CastPrimary. Перед остальными (в том числе '-') скобки
+# читаются как ParenPrimary: при неоднозначности ANTLR берёт первую альтернативу.
+CAST_FOLLOW = LITERAL_TOKENS | BUILTIN_FUNCTIONS | {ID, THIS, SUPER, NEW, LPAREN, NOT}
+
+class DirectParseError(Exception):
+    """Вход не соответствует грамматике; диагностику строит ANTLR"""
+
+class DirectParser:
+    """Рекурсивный спуск по списку токенов с EOF в конце (CommonTokenStream.tokens)"""
+
+    def __init__(self, tokens: List, lines: Optional[SourceLines] = None):
+        self.tokens = tokens
+        self.types = [token.type for token in tokens]
+        self.pos = 0
+        self.lines = lines if lines is not None else SourceLines(tokens[-1].getInputStream().strdata)
+
+    def _fail(self):
+        token = self.tokens[self.pos]
+        raise DirectParseError(f"unexpected {token.text!r} at {token.line}:{token.column + 1}")
+
+    def _expect(self, ttype: int):
+        if self.types[self.pos] != ttype:
+            self._fail()
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _identifier(self) -> str:
+        """ID; одинаковые имена в AST - один объект строки"""
+        return sys.intern(self._expect(ID).text)
+
+    def _location(self, start: int) -> SourceInfo:
+        """Позиция от токена start до последнего прочитанного, как _get_source_info в ASTBuilder"""
+        first = self.tokens[start].start
+        last = self.tokens[self.pos - 1].start if self.pos > start else first
+        return SourceInfo(first, last, self.lines)
+
+    def _source_digest(self, start: int) -> SourceDigest:
+        texts = [token.text for token in self.tokens[start:self.pos]]
+        digest = hashlib.sha1("\x1f".join(texts).encode("utf-8")).hexdigest()
+        return SourceDigest(digest=digest, names=frozenset(texts))
+
+    # ---------- объявления ----------
+
+    def parse_program(self) -> Program:
+        types = self.types
+        declarations, statements = [], []
+        while types[self.pos] != EOF:
+            item = self.parse_item()
+            if isinstance(item, Declaration):
+                declarations.append(item)
+            elif item is not None:
+                statements.append(item)
+        return Program(declarations=declarations, statements=statements, source_info=self._location(0))
+
+    def parse_item(self):
+        """Один элемент верхнего уровня: объявление процедуры или структуры либо оператор"""
+        ttype = self.types[self.pos]
+        if ttype == PROC:
+            return self._function_decl()
+        if ttype == STRUCT:
+            return self._struct_decl()
+        return self._statement()
+
+    def _function_decl(self) -> FunctionDecl:
+        start = self.pos
+        self._expect(PROC)
+        name = self._identifier()
+        params = self._parameters()
+        if self.types[self.pos] == ARROW:
+            self.pos += 1
+            ret_type = self._type()
+            body = self._block()
+        else:
+            body_start = self.pos
+            body = self._block()
+            # Та же эвристика, что в ASTBuilder: "res" где-либо в тексте тела - функция возвращает int
+            body_text = "".join(token.text for token in self.tokens[body_start:self.pos])
+            ret_type = Type(kind=TypeKind.INT) if "res" in body_text else Type(kind=TypeKind.VOID)
+        return FunctionDecl(name=name, params=params, return_type=ret_type, body=body,
+                            source_digest=self._source_digest(start))
+
+    def _struct_decl(self) -> StructDecl:
+        start = self.pos
+        self._expect(STRUCT)
+        name = self._identifier()
+        parent = None
+        if self.types[self.pos] == EXTENDS:
+            self.pos += 1
+            parent = self._identifier()
+        self._expect(LBRACE)
+        members = []
+        while self.types[self.pos] != RBRACE:
+            members.append(self._member_decl())
+        self.pos += 1
+        if self.types[self.pos] == SEMI:
+            self.pos += 1
+        return StructDecl(name=name, parent=parent, members=members,
+                          access_modifier=AccessModifier.PUBLIC, source_info=self._location(start))
+
+    def _member_decl(self) -> MemberDecl:
+        start = self.pos
+        access = ACCESS_MODIFIERS.get(self.types[self.pos])
+        if access is None:
+            self._fail()
+        self.pos += 1
+        if self.types[self.pos] in (PROC, VIRTUAL, OVERRIDE):
+            decl = self._method_decl()
+        else:
+            field_start = self.pos
+            field_type = self._type()
+            name = self._identifier()
+            self._expect(SEMI)
+            decl = FieldDecl(field_type=field_type, name=name, source_info=self._location(field_start))
+        return MemberDecl(access=access, decl=decl, source_info=self._location(start))
+
+    def _method_decl(self) -> MethodDecl:
+        start = self.pos
+        modifiers = []
+        if self.types[self.pos] in (VIRTUAL, OVERRIDE):
+            modifiers.append(self.tokens[self.pos].text)
+            self.pos += 1
+        self._expect(PROC)
+        name = self._identifier()
+        params = self._parameters()
+        return_type = Type(kind=TypeKind.VOID)
+        if self.types[self.pos] == ARROW:
+            self.pos += 1
+            return_type = self._type()
+        body = self._block()
+        return MethodDecl(name=name, params=params, return_type=return_type, body=body,
+                          modifiers=modifiers, source_digest=self._source_digest(start),
+                          source_info=self._location(start))
+
+    def _parameters(self) -> List[Parameter]:
+        self._expect(LPAREN)
+        params = []
+        if self.types[self.pos] != RPAREN:
+            params.append(self._parameter())
+            while self.types[self.pos] == COMMA:
+                self.pos += 1
+                params.append(self._parameter())
+        self._expect(RPAREN)
+        return params
+
+    def _parameter(self) -> Parameter:
+        start = self.pos
+        kind = "value"
+        if self.types[self.pos] in (VALUE, RESULT):
+            kind = self.tokens[self.pos].text
+            self.pos += 1
+        param_type = self._type()
+        name = self._identifier()
+        return Parameter(param_type=param_type, name=name, kind=kind, source_info=self._location(start))
+
+    def _type(self) -> Type:
+        token = self.tokens[self.pos]
+        kind = TYPE_KINDS.get(token.type)
+        if kind is not None:
+            self.pos += 1
+            return Type(kind=kind)
+        if token.type == ID:
+            self.pos += 1
+            return Type(kind=TypeKind.STRUCT, struct_name=sys.intern(token.text))
+        self._fail()
+
+    def _is_type_start(self) -> bool:
+        """Начинается ли с текущего токена 'type ID' (объявление переменной)"""
+        ttype = self.types[self.pos]
+        return ttype in TYPE_KINDS or (ttype == ID and self.types[self.pos + 1] == ID)
+
+    # ---------- операторы ----------
+
+    def _block(self) -> Block:
+        start = self.pos
+        ttype = self.types[self.pos]
+        if ttype == LBRACE:
+            closing = RBRACE
+        elif ttype == BEGIN:
+            closing = END
+        else:
+            self._fail()
+        self.pos += 1
+        statements = []
+        types = self.types
+        while types[self.pos] != closing:
+            if types[self.pos] == EOF:
+                self._fail()
+            statement = self._statement()
+            if statement is not None:
+                statements.append(statement)
+        self.pos += 1
+        return Block(statements=statements, source_info=self._location(start))
+
+    def _statement(self):
+        types = self.types
+        ttype = types[self.pos]
+        if ttype in TYPE_KINDS:
+            return self._variable_decl()
+        if ttype == ID:
+            following = types[self.pos + 1]
+            if following == ID:
+                return self._variable_decl()
+            if following == ASSIGN or following == COMMA:
+                return self._assignment()
+        elif ttype == IF:
+            return self._if_statement()
+        elif ttype == FOR:
+            return self._for_loop()
+        elif ttype == WHILE:
+            return self._while_loop()
+        elif ttype == DO:
+            return self._do_until_loop()
+        elif ttype == RETURN:
+            return self._return_statement()
+
+        # expression ';' или StructFieldAssign: expression '.' ID '=' expression ';'
+        start = self.pos
+        expr = self._expression()
+        if types[self.pos] == DOT:
+            self.pos += 1
+            member = self._identifier()
+            self._expect(ASSIGN)
+            value = self._expression()
+            self._expect(SEMI)
+            location = self._location(start)
+            target = MemberAccessExpr(obj=expr, member=member, source_info=location)
+            return Assignment(target=target, value=value, source_info=location)
+        self._expect(SEMI)
+        return ExpressionStatement(expr=expr, source_info=self._location(start))
+
+    def _variable_decl(self) -> VariableDecl:
+        start = self.pos
+        var_type = self._type()
+        variables = [self._variable_entry()]
+        while self.types[self.pos] == COMMA:
+            self.pos += 1
+            variables.append(self._variable_entry())
+        self._expect(SEMI)
+        return VariableDecl(var_type=var_type, variables=variables, source_info=self._location(start))
+
+    def _variable_entry(self) -> VariableEntry:
+        name = self._identifier()
+        initializer = None
+        if self.types[self.pos] == ASSIGN:
+            self.pos += 1
+            initializer = self._expression()
+        return VariableEntry(name=name, initializer=initializer)
+
+    def _assignment(self):
+        start = self.pos
+        name = sys.intern(self.tokens[self.pos].text)
+        if self.types[self.pos + 1] == ASSIGN:
+            self.pos += 2
+            value = self._expression()
+            if self.types[self.pos] == SEMI:
+                self.pos += 1
+                location = self._location(start)
+                target = VariableExpr(name=name, source_info=location)
+                return Assignment(target=target, value=value, source_info=location)
+        else:
+            self.pos += 1
+            while self.types[self.pos] == COMMA:
+                self.pos += 1
+                self._expect(ID)
+            self._expect(ASSIGN)
+            self._expression()
+        # MultiAssign (x, y = 1, 2;): у ASTBuilder нет visitMultiAssign, такой оператор не попадает в AST
+        while self.types[self.pos] == COMMA:
+            self.pos += 1
+            self._expression()
+        self._expect(SEMI)
+        return None
+
+    def _if_statement(self) -> IfStatement:
+        start = self.pos
+        self.pos += 1
+        condition = self._parenthesized()
+        if self.types[self.pos] == THEN:
+            self.pos += 1
+        then_block = self._block()
+        else_block = None
+        if self.types[self.pos] == ELSE:
+            self.pos += 1
+            else_block = self._block()
+        if self.types[self.pos] == SEMI:
+            self.pos += 1
+        return IfStatement(condition=condition, then_block=then_block, else_block=else_block,
+                           source_info=self._location(start))
+
+    def _while_loop(self) -> WhileLoop:
+        start = self.pos
+        self.pos += 1
+        condition = self._parenthesized()
+        body = self._block()
+        return WhileLoop(condition=condition, body=body, source_info=self._location(start))
+
+    def _do_until_loop(self) -> DoUntilLoop:
+        start = self.pos
+        self.pos += 1
+        body = self._block()
+        self._expect(UNTIL)
+        condition = self._parenthesized()
+        if self.types[self.pos] == SEMI:
+            self.pos += 1
+        return DoUntilLoop(body=body, condition=condition, source_info=self._location(start))
+
+    def _for_loop(self) -> ForLoop:
+        start = self.pos
+        self.pos += 1
+        self._expect(LPAREN)
+        init_start = self.pos
+        if self._is_type_start():
+            var_type = self._type()
+            name = self._identifier()
+            self._expect(ASSIGN)
+            entry = VariableEntry(name=name, initializer=self._expression())
+            init = VariableDecl(var_type=var_type, variables=[entry], source_info=self._location(init_start))
+        else:
+            init = self._simple_assignment()
+        self._expect(SEMI)
+        condition = self._expression()
+        self._expect(SEMI)
+        update = self._simple_assignment()
+        self._expect(RPAREN)
+        body = self._block()
+        return ForLoop(init=init, condition=condition, update=update, body=body,
+                       source_info=self._location(start))
+
+    def _simple_assignment(self) -> Assignment:
+        """forInit/forUpdate вида ID '=' expression"""
+        start = self.pos
+        name = self._identifier()
+        self._expect(ASSIGN)
+        value = self._expression()
+        location = self._location(start)
+        target = VariableExpr(name=name, source_info=location)
+        return Assignment(target=target, value=value, source_info=location)
+
+    def _return_statement(self) -> ReturnStatement:
+        start = self.pos
+        self.pos += 1
+        value = None
+        if self.types[self.pos] != SEMI:
+            value = self._expression()
+        self._expect(SEMI)
+        return ReturnStatement(value=value, source_info=self._location(start))
+
+    def _parenthesized(self) -> Expression:
+        self._expect(LPAREN)
+        expr = self._expression()
+        self._expect(RPAREN)
+        return expr
+
+    # ---------- выражения ----------
+
+    def _expression(self, min_precedence: int = 1) -> Expression:
+        types, tokens = self.types, self.tokens
+        start = self.pos
+        left = self._unary()
+        chain, chain_precedence = [], 0
+        while True:
+            precedence = BINARY_PRECEDENCE.get(types[self.pos])
+            if precedence is None or precedence < min_precedence:
+                break
+            if precedence != chain_precedence:
+                self._close_chain(chain, start)
+                chain, chain_precedence = [], precedence
+            op = sys.intern(tokens[self.pos].text)
+            self.pos += 1
+            if precedence == POWER_PRECEDENCE:
+                right = self._unary()
+            else:
+                right = self._expression(precedence + 1)
+            left = BinaryExpr(left=left, op=op, right=right)
+            chain.append(left)
+        self._close_chain(chain, start)
+        return left
+
+    def _close_chain(self, chain: List[BinaryExpr], start: int):
+        """Всем узлам цепочки одного приоритета - позиция всей цепочки (контекст правила в ANTLR)"""
+        location = self._location(start)
+        for node in chain:
+            node.source_info = location
+
+    def _unary(self) -> Expression:
+        ttype = self.types[self.pos]
+        if ttype == MINUS or ttype == NOT:
+            start = self.pos
+            op = sys.intern(self.tokens[self.pos].text)
+            self.pos += 1
+            expr = self._unary()
+            return UnaryExpr(op=op, expr=expr, source_info=self._location(start))
+        return self._primary()
+
+    def _primary(self) -> Expression:
+        types, tokens = self.types, self.tokens
+        start = self.pos
+        token = tokens[start]
+        ttype = token.type
+
+        if ttype == ID or ttype in BUILTIN_FUNCTIONS:
+            if types[start + 1] == LPAREN:
+                self.pos += 1
+                args = self._arguments()
+                node = CallExpr(func_name=sys.intern(token.text), args=args, receiver=None, source_info=self._location(start))
+            elif ttype == ID:
+                self.pos += 1
+                node = VariableExpr(name=sys.intern(token.text), source_info=self._location(start))
+            else:
+                self._fail()
+        elif ttype in LITERAL_TOKENS:
+            self.pos += 1
+            node = self._literal(token)
+        elif ttype == LPAREN:
+            following = types[start + 1]
+            if following in TYPE_KINDS or (following == ID and types[start + 2] == RPAREN
+                                           and types[start + 3] in CAST_FOLLOW):
+                self.pos += 1
+                target_type = self._type()
+                self._expect(RPAREN)
+                expr = self._expression()
+                node = CastExpr(target_type=target_type, expr=expr, source_info=self._location(start))
+            else:
+                node = self._parenthesized()
+        elif ttype == THIS:
+            self.pos += 1
+            node = VariableExpr(name="this", source_info=self._location(start))
+        elif ttype == SUPER:
+            self.pos += 1
+            if types[self.pos] == LPAREN:
+                args = self._arguments()
+                node = CallExpr(func_name="super", args=args, source_info=self._location(start))
+            else:
+                node = VariableExpr(name="super", source_info=self._location(start))
+        elif ttype == NEW:
+            self.pos += 1
+            struct_name = self._identifier()
+            args = self._arguments()
+            node = ConstructorExpr(struct_name=struct_name, args=args, source_info=self._location(start))
+        else:
+            self._fail()
+
+        # primary '.' ID и primary '.' ID '(' ... ')'; '.' ID '=' остаётся для StructFieldAssign
+        while types[self.pos] == DOT:
+            if types[self.pos + 1] != ID:
+                self.pos += 1
+                self._fail()
+            if types[self.pos + 2] == ASSIGN:
+                break
+            member = sys.intern(tokens[self.pos + 1].text)
+            self.pos += 2
+            if types[self.pos] == LPAREN:
+                args = self._arguments()
+                node = CallExpr(func_name=member, args=args, receiver=node, source_info=self._location(start))
+            else:
+                node = MemberAccessExpr(obj=node, member=member, source_info=self._location(start))
+        return node
+
+    def _arguments(self) -> List[Expression]:
+        self._expect(LPAREN)
+        args = []
+        if self.types[self.pos] != RPAREN:
+            args.append(self._expression())
+            while self.types[self.pos] == COMMA:
+                self.pos += 1
+                args.append(self._expression())
+        self._expect(RPAREN)
+        return args
+
+    def _literal(self, token) -> LiteralExpr:
+        ttype = token.type
+        location = SourceInfo(token.start, token.start, self.lines)
+        if ttype == INT:
+            return LiteralExpr(value=int(token.text), type=Type(kind=TypeKind.INT), source_info=location)
+        if ttype == FLOAT:
+            return LiteralExpr(value=float(token.text), type=Type(kind=TypeKind.FLOAT), source_info=location)
+        if ttype == STRING:
+            return LiteralExpr(value=token.text[1:-1], type=Type(kind=TypeKind.STRING), source_info=location)
+        return LiteralExpr(value=(ttype == TRUE), type=Type(kind=TypeKind.BOOL), source_info=location)
+
+def parse_tokens(tokens: List) -> Program:
+    """Строит AST по токенам; при синтаксической ошибке бросает DirectParseError"""
+    return DirectParser(tokens).parse_program()
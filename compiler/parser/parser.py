@@ -1,8 +1,14 @@
 from antlr4 import ParserRuleContext
+from antlr4.atn.ATNState import ATNState
+from antlr4.atn.PredictionMode import PredictionMode
 from antlr4.error.ErrorListener import ErrorListener
-from antlr.ImgLangParser import ImgLangParser
+from antlr4.error.ErrorStrategy import BailErrorStrategy, DefaultErrorStrategy
+from antlr4.error.Errors import ParseCancellationException
 from errors.base import SourceLocation, SyntaxError
-from .ast_builder import ASTBuilder
+from phases import phase
+from parser import PARSE_MODES, DEFAULT_PARSE_MODE, PARSER_ENGINES, DEFAULT_PARSER_ENGINE
+from . import dfa_cache
+from .direct_parser import DirectParseError, parse_tokens
 
 class ParserErrorListener(ErrorListener):
     """Слушатель ошибок для парсера"""
@@ -17,30 +23,115 @@ class ParserErrorListener(ErrorListener):
             severity="error"
         ))
 
+class RecoveryErrorStrategy(DefaultErrorStrategy):
+    """
+    DefaultErrorStrategy, который не портит кэш ATN. В рантайме Python sync() на петле
+    '*' или '+' дописывает множество восстановления прямо в закэшированный
+    atn.nextTokens(s), и сообщения о следующих ошибках зависят от того, какие файлы
+    процесс разбирал раньше
+    """
+
+    def sync(self, recognizer):
+        state = recognizer.atn.states[recognizer.state]
+        if state.stateType not in (ATNState.PLUS_LOOP_BACK, ATNState.STAR_LOOP_BACK):
+            return super().sync(recognizer)
+        cached = recognizer.atn.nextTokens(state)
+        intervals = list(cached.intervals)
+        try:
+            super().sync(recognizer)
+        finally:
+            cached.intervals = intervals
+
 class ImgParser:
     """Обёртка над ANTLR парсером"""
     
-    def __init__(self, token_stream):
-        self.antlr_parser = ImgLangParser(token_stream)
-        
+    def __init__(self, token_stream, mode: str = DEFAULT_PARSE_MODE, engine: str = DEFAULT_PARSER_ENGINE):
+        if mode not in PARSE_MODES:
+            raise ValueError(f"Unknown parse mode: {mode}")
+        if engine not in PARSER_ENGINES:
+            raise ValueError(f"Unknown parser engine: {engine}")
+        self.mode = mode
+        self.engine = engine
+        self.token_stream = token_stream
         self.error_listener = ParserErrorListener()
-        self.antlr_parser.removeErrorListeners()
-        self.antlr_parser.addErrorListener(self.error_listener)
+        # Сгенерированный ImgLangParser (десериализация ATN) и ASTBuilder загружаются
+        # при первом ANTLR-разборе: рукописному парсеру они нужны только для диагностики
+        self._antlr_parser = None
+        self._ast_builder = None
+        self.fallbacks = 0
+        self.direct_fallbacks = 0
+    
+    @property
+    def antlr_parser(self):
+        if self._antlr_parser is None:
+            from antlr.ImgLangParser import ImgLangParser
+            dfa_cache.on_parser_created()
+            self._antlr_parser = ImgLangParser(self.token_stream)
+            self._antlr_parser.removeErrorListeners()
+            self._antlr_parser.addErrorListener(self.error_listener)
+        return self._antlr_parser
+    
+    @property
+    def ast_builder(self):
+        if self._ast_builder is None:
+            from .ast_builder import ASTBuilder
+            self._ast_builder = ASTBuilder()
+        return self._ast_builder
+    
+    def reset(self, token_stream):
+        """Переключает парсер на новый поток токенов (кэш DFA общий для всех файлов)"""
+        self.token_stream = token_stream
+        if self._antlr_parser is not None:
+            self._antlr_parser.setTokenStream(token_stream)
+        self.error_listener.errors = []
+    
+    def _run(self, prediction_mode, error_strategy, report_errors: bool):
+        parser = self.antlr_parser
+        parser._interp.predictionMode = prediction_mode
+        parser._errHandler = error_strategy
+        parser.removeErrorListeners()
+        if report_errors:
+            parser.addErrorListener(self.error_listener)
+        return parser.program()
+    
+    def _parse_tree(self):
+        if self.mode == "ll":
+            return self._run(PredictionMode.LL, RecoveryErrorStrategy(), report_errors=True)
         
-        self.ast_builder = ASTBuilder()
+        try:
+            return self._run(PredictionMode.SLL, BailErrorStrategy(), report_errors=False)
+        except ParseCancellationException:
+            # Ошибка синтаксиса или конфликт, неразрешимый в SLL: разбираем заново
+            self.fallbacks += 1
+            self.antlr_parser.reset()
+            self.error_listener.errors = []
+            prediction_mode = PredictionMode.LL if self.mode == "two-stage" else PredictionMode.SLL
+            return self._run(prediction_mode, RecoveryErrorStrategy(), report_errors=True)
+    
+    def _parse_direct(self):
+        """AST рукописным парсером или None, если вход содержит синтаксическую ошибку"""
+        self.token_stream.fill()
+        try:
+            return parse_tokens(self.token_stream.tokens)
+        except (DirectParseError, RecursionError):
+            self.direct_fallbacks += 1
+            return None
     
     def parse(self):
         """Парсит поток токенов и возвращает AST"""
+        if self.engine == "direct":
+            ast = self._parse_direct()
+            if ast is not None:
+                return ast, []
+        
         try:
-            parse_tree = self.antlr_parser.program()
-            
-            print(f"Parse tree: {parse_tree}")
-            print(f"Parse errors: {self.error_listener.errors}")
+            parse_tree = self._parse_tree()
             
             if self.error_listener.errors:
                 return None, self.error_listener.errors
             
-            ast = self.ast_builder.visit(parse_tree) if parse_tree else None
+            with phase("ast"):
+                ast = self.ast_builder.visit(parse_tree) if parse_tree else None
             return ast, []
             
         except Exception as e:
@@ -0,0 +1,245 @@
+"""
+Замеры фаз компиляции: время, пик памяти (tracemalloc) и счётчики по каждой фазе.
+
+Фазы отмечаются вызовами phase(name) в main.py, Toolchain и ImgParser. Пока нет ни
+активного PhaseRecorder, ни хуков, phase() ничего не измеряет. Внешний код может
+подписаться на начало и конец фаз:
+
+    handle = add_phase_hook(on_end=lambda record: metrics.observe(record.name, record.duration))
+    ...
+    remove_phase_hook(handle)
+
+Фазы могут быть вложенными (построение AST внутри синтаксического анализа);
+в отчёте вложенная фаза входит во время родительской.
+"""
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+# Фазы в порядке выполнения
+PHASES = ("lex", "parse", "ast", "signatures", "stream", "semantic", "codegen", "write", "ilasm")
+
+PHASE_TITLES = {
+    "lex": "лексический анализ",
+    "parse": "синтаксический анализ",
+    "ast": "построение AST",
+    "signatures": "сбор сигнатур (поток)",
+    "stream": "потоковая генерация",
+    "semantic": "семантический анализ",
+    "codegen": "генерация CIL",
+    "write": "запись IL",
+    "ilasm": "ilasm",
+}
+
+@dataclass
+class PhaseRecord:
+    """Один проход фазы: время от начала записи, длительность, память и счётчики"""
+    name: str
+    start: float = 0.0
+    duration: float = 0.0
+    depth: int = 0
+    memory_peak: Optional[int] = None
+    counts: Dict[str, int] = field(default_factory=dict)
+    _peak_seen: int = field(default=0, repr=False)
+    _memory_base: int = field(default=0, repr=False)
+
+    def count(self, **counts: int):
+        """Добавляет счётчики фазы (число токенов, узлов AST, строк IL...)"""
+        self.counts.update(counts)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "depth": self.depth,
+            "memory_peak": self.memory_peak,
+            "counts": dict(self.counts),
+        }
+
+PhaseHook = Callable[[PhaseRecord], None]
+
+_hooks: List[tuple] = []
+_recorder: Optional['PhaseRecorder'] = None
+
+def add_phase_hook(on_start: PhaseHook = None, on_end: PhaseHook = None):
+    """Подписывает функции на начало и конец каждой фазы; возвращает handle для remove_phase_hook"""
+    handle = (on_start, on_end)
+    _hooks.append(handle)
+    return handle
+
+def remove_phase_hook(handle):
+    _hooks.remove(handle)
+
+def active_recorder() -> Optional['PhaseRecorder']:
+    return _recorder
+
+class PhaseRecorder:
+    """
+    Собирает PhaseRecord всех фаз, пока активен (with recorder: ...).
+    С trace_memory=True включает tracemalloc: пики памяти точные, но фазы
+    выполняются заметно медленнее.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.records: List[PhaseRecord] = []
+        self._stack: List[PhaseRecord] = []
+        self._origin = time.perf_counter()
+        self._started_tracemalloc = False
+        self._previous = None
+
+    def __enter__(self):
+        global _recorder
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._previous, _recorder = _recorder, self
+        return self
+
+    def __exit__(self, *exc):
+        global _recorder
+        _recorder = self._previous
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        return False
+
+    def _begin(self, record: PhaseRecord):
+        record.start = time.perf_counter() - self._origin
+        record.depth = len(self._stack)
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # reset_peak сбрасывает и пик родительской фазы: сохраняем его до сброса
+            if self._stack:
+                parent = self._stack[-1]
+                parent._peak_seen = max(parent._peak_seen, peak)
+            tracemalloc.reset_peak()
+            record._memory_base = current
+            record._peak_seen = current
+        self._stack.append(record)
+        self.records.append(record)
+
+    def _end(self, record: PhaseRecord):
+        self._stack.pop()
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak = max(record._peak_seen, tracemalloc.get_traced_memory()[1])
+            record.memory_peak = peak - record._memory_base
+            if self._stack:
+                parent = self._stack[-1]
+                parent._peak_seen = max(parent._peak_seen, peak)
+
+    def summary(self) -> List[dict]:
+        """Сводка по именам фаз (в пакетном режиме фаза повторяется для каждого файла)"""
+        rows: Dict[str, dict] = {}
+        for record in self.records:
+            row = rows.setdefault(record.name, {"name": record.name, "depth": record.depth, "calls": 0,
+                                                "duration": 0.0, "memory_peak": None, "counts": {}})
+            row["calls"] += 1
+            row["duration"] += record.duration
+            if record.memory_peak is not None:
+                row["memory_peak"] = max(row["memory_peak"] or 0, record.memory_peak)
+            for key, value in record.counts.items():
+                row["counts"][key] = row["counts"].get(key, 0) + value
+        order = {name: i for i, name in enumerate(PHASES)}
+        return sorted(rows.values(), key=lambda row: order.get(row["name"], len(order)))
+
+    def total(self) -> float:
+        """Суммарное время фаз верхнего уровня"""
+        return sum(record.duration for record in self.records if record.depth == 0)
+
+    def format_table(self) -> str:
+        lines = [f"{'фаза':<26} {'вызовов':>7} {'время, мс':>10} {'пик памяти':>11}  счётчики"]
+        for row in self.summary():
+            title = "  " * row["depth"] + PHASE_TITLES.get(row["name"], row["name"])
+            peak = "-" if row["memory_peak"] is None else f"{row['memory_peak'] / 1024:.0f} КБ"
+            counts = ", ".join(f"{key}={value}" for key, value in row["counts"].items())
+            lines.append(f"{title:<26} {row['calls']:>7} {row['duration'] * 1000:>10.2f} {peak:>11}  {counts}")
+        lines.append(f"{'итого':<26} {'':>7} {self.total() * 1000:>10.2f}")
+        return "\n".join(lines)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "total": self.total(),
+            "phases": self.summary(),
+            "records": [record.to_dict() for record in self.records],
+        }, ensure_ascii=False, indent=2)
+
+    def to_chrome_trace(self) -> str:
+        """Формат trace event (chrome://tracing, Perfetto): события 'X' в микросекундах"""
+        events = []
+        for record in self.records:
+            args = dict(record.counts)
+            if record.memory_peak is not None:
+                args["memory_peak"] = record.memory_peak
+            events.append({
+                "name": record.name, "cat": "phase", "ph": "X", "pid": 1, "tid": 1,
+                "ts": round(record.start * 1e6, 3), "dur": round(record.duration * 1e6, 3),
+                "args": args,
+            })
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, ensure_ascii=False)
+
+    def render(self, fmt: str) -> str:
+        if fmt == "json":
+            return self.to_json()
+        if fmt == "chrome":
+            return self.to_chrome_trace()
+        return self.format_table()
+
+class _NullRecord:
+    """Заглушка, когда фазы никто не слушает: count() ничего не стоит"""
+    __slots__ = ()
+
+    def count(self, **counts: int):
+        pass
+
+_NULL_RECORD = _NullRecord()
+
+@contextmanager
+def _measure(name: str, recorder: Optional[PhaseRecorder]):
+    record = PhaseRecord(name)
+    if recorder is not None:
+        recorder._begin(record)
+    for on_start, _ in list(_hooks):
+        if on_start is not None:
+            on_start(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.duration = time.perf_counter() - started
+        if recorder is not None:
+            recorder._end(record)
+        for _, on_end in list(_hooks):
+            if on_end is not None:
+                on_end(record)
+
+@contextmanager
+def _disabled():
+    yield _NULL_RECORD
+
+def phase(name: str):
+    """Контекстный менеджер фазы; возвращает запись, в которую можно добавить счётчики"""
+    if _recorder is None and not _hooks:
+        return _disabled()
+    return _measure(name, _recorder)
+
+def is_enabled() -> bool:
+    """Слушает ли кто-нибудь фазы (счётчики, которые дорого считать, нужны только тогда)"""
+    return _recorder is not None or bool(_hooks)
+
+def count_ast_nodes(node) -> int:
+    """Число узлов AST (обход по полям dataclass)"""
+    from parser.ast import ASTNode
+    total, stack = 0, [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, ASTNode):
+            total += 1
+            stack.extend(getattr(item, name) for name in item.__dataclass_fields__)
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return total
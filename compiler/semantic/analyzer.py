@@ -7,8 +7,12 @@ from semantic.types import TypeSystem, TypeCompatibility
 
 class SemanticAnalyzer:
     def __init__(self):
-        self.symbol_table = SymbolTable()
         self.type_system = TypeSystem()
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает состояние анализатора перед проверкой новой программы"""
+        self.symbol_table = SymbolTable()
         self.errors: List[SemanticError] = []
         self.current_struct: Optional[Symbol] = None
         self.current_method: Optional[Symbol] = None
@@ -76,15 +80,29 @@ class SemanticAnalyzer:
     
     def analyze(self, program: Program) -> List[SemanticError]:
         self.errors = []
+        if self._guarded(self._collect_declarations, program):
+            self._guarded(self._check_program, program)
+        return self.errors
+
+    def declare(self, program: Program) -> List[SemanticError]:
+        """Только сигнатуры объявлений program (первый проход streaming.py)"""
+        self.errors = []
+        self._guarded(self._collect_declarations, program)
+        return self.errors
+
+    def check(self, program: Program) -> List[SemanticError]:
+        """Проверка program, сигнатуры которой уже собраны declare()"""
+        self.errors = []
+        self._guarded(self._check_program, program)
+        return self.errors
+
+    def _guarded(self, step, program: Program) -> bool:
         try:
-            self._collect_declarations(program)
-            
-            self._check_program(program)
-            
+            step(program)
+            return True
         except Exception as e:
             self.errors.append(SemanticError(f"Internal error: {str(e)}", SourceLocation(1,1)))
-        
-        return self.errors
+            return False
     
     def _collect_declarations(self, program: Program):
         for decl in program.declarations:
@@ -0,0 +1,327 @@
+"""
+Свёртка и распространение констант на типизированном AST (после SemanticAnalyzer).
+
+Выражения из одних литералов вычисляются при компиляции так, как их вычислил бы
+сгенерированный CIL: типы результатов берутся из TypeSystem.operation_table,
+int32 переполняется по модулю 2**32, деление целых отсекает дробную часть.
+Не сворачиваются выражения, у которых в CIL нет определённого результата или есть
+исключение (деление на ноль, (int) от float вне диапазона int32, нечисловые
+результаты), а также '**' и унарный минус - их код генератор выдаёт особо.
+
+Вызов to_color с литеральными компонентами 0..255 становится литералом цвета
+(LiteralExpr со значением (r, g, b)): генератор читает его из статического поля,
+которое один раз заполняет .cctor.
+
+Локальная переменная, объявленная в теле ровно один раз с литералом того же типа
+и больше нигде не присваиваемая и не передаваемая по имени в процедуру (возможный
+result-параметр), заменяется этим литералом во всех чтениях. Объявление и запись
+остаются.
+"""
+from typing import Dict, List, Set
+
+from parser.ast import *
+from semantic.types import TypeSystem
+
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+_COMPARISONS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    "<": lambda a, b: a < b,
+    ">=": lambda a, b: not a < b,
+    "<=": lambda a, b: not a > b,
+}
+
+# Встроенные функции принимают аргументы только по значению
+BUILTINS = frozenset(("load_image", "save_image", "create_image", "get_width", "get_height",
+                       "get_pixel", "set_pixel", "to_color", "clamp", "write", "read_int", "read_float"))
+
+_NUMERIC = (TypeKind.INT, TypeKind.FLOAT, TypeKind.BOOL)
+_COLORS = (TypeKind.COLOR, TypeKind.PIXEL)
+
+def i4(value: int) -> int:
+    return ((value + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+def _finite(value: float) -> bool:
+    return value - value == 0.0
+
+class ConstantFolder:
+    """Свёртка выражений и распространение констант в одном теле (процедуры, метода или Main)"""
+
+    def __init__(self):
+        self.type_system = TypeSystem()
+        self.constants: Dict[str, LiteralExpr] = {}
+        self.candidates: Set[str] = set()
+
+    def fold_function(self, func: FunctionDecl):
+        self._begin(func.body.statements, [param.name for param in func.params])
+        self._fold_block(func.body)
+
+    def fold_statements(self, statements: List[Statement]) -> List[Statement]:
+        """Операторы верхнего уровня целиком: с распространением констант"""
+        self._begin(statements, [])
+        for stmt in statements:
+            self._fold_statement(stmt)
+        return statements
+
+    def fold_statement(self, stmt: Statement) -> Statement:
+        """Отдельный оператор (потоковый Main): только свёртка, без распространения"""
+        self.constants, self.candidates = {}, set()
+        self._fold_statement(stmt)
+        return stmt
+
+    # Кандидаты на распространение
+
+    def _begin(self, statements: List[Statement], params: List[str]):
+        declared: Dict[str, int] = dict.fromkeys(params, 1)
+        written: Set[str] = set()
+        for stmt in statements:
+            self._scan_statement(stmt, declared, written)
+        self.candidates = {name for name, count in declared.items() if count == 1 and name not in written}
+        self.candidates.difference_update(params)
+        self.constants = {}
+
+    def _scan_statement(self, stmt: Statement, declared: Dict[str, int], written: Set[str]):
+        if isinstance(stmt, VariableDecl):
+            for entry in stmt.variables:
+                declared[entry.name] = declared.get(entry.name, 0) + 1
+                if entry.initializer is None:
+                    written.add(entry.name)
+                else:
+                    self._scan_expression(entry.initializer, written)
+        elif isinstance(stmt, Assignment):
+            if isinstance(stmt.target, VariableExpr):
+                written.add(stmt.target.name)
+            else:
+                self._scan_expression(stmt.target, written)
+            self._scan_expression(stmt.value, written)
+        elif isinstance(stmt, IfStatement):
+            self._scan_expression(stmt.condition, written)
+            self._scan_statement(stmt.then_block, declared, written)
+            if stmt.else_block:
+                self._scan_statement(stmt.else_block, declared, written)
+        elif isinstance(stmt, (WhileLoop, DoUntilLoop)):
+            self._scan_expression(stmt.condition, written)
+            self._scan_statement(stmt.body, declared, written)
+        elif isinstance(stmt, ForLoop):
+            if stmt.init:
+                self._scan_statement(stmt.init, declared, written)
+            if stmt.condition:
+                self._scan_expression(stmt.condition, written)
+            if stmt.update:
+                self._scan_statement(stmt.update, declared, written)
+            self._scan_statement(stmt.body, declared, written)
+        elif isinstance(stmt, Block):
+            for inner in stmt.statements:
+                self._scan_statement(inner, declared, written)
+        elif isinstance(stmt, ReturnStatement):
+            if stmt.value:
+                self._scan_expression(stmt.value, written)
+        elif isinstance(stmt, ExpressionStatement):
+            self._scan_expression(stmt.expr, written)
+
+    def _scan_expression(self, expr: Expression, written: Set[str]):
+        """Имена, переданные в процедуру или конструктор как есть, считаются записанными"""
+        if isinstance(expr, BinaryExpr):
+            self._scan_expression(expr.left, written)
+            self._scan_expression(expr.right, written)
+        elif isinstance(expr, (UnaryExpr, CastExpr)):
+            self._scan_expression(expr.expr, written)
+        elif isinstance(expr, MemberAccessExpr):
+            self._scan_expression(expr.obj, written)
+        elif isinstance(expr, (CallExpr, ConstructorExpr)):
+            builtin = isinstance(expr, CallExpr) and expr.func_name in BUILTINS
+            if isinstance(expr, CallExpr) and expr.receiver:
+                self._scan_expression(expr.receiver, written)
+            for arg in expr.args:
+                if isinstance(arg, VariableExpr) and not builtin:
+                    written.add(arg.name)
+                else:
+                    self._scan_expression(arg, written)
+
+    # Свёртка
+
+    def _fold_block(self, block: Block):
+        for stmt in block.statements:
+            self._fold_statement(stmt)
+
+    def _fold_statement(self, stmt: Statement):
+        if isinstance(stmt, VariableDecl):
+            for entry in stmt.variables:
+                if entry.initializer is None:
+                    continue
+                entry.initializer = self._fold_expression(entry.initializer)
+                value = entry.initializer
+                if (entry.name in self.candidates and isinstance(value, LiteralExpr)
+                        and value.type == stmt.var_type):
+                    self.constants[entry.name] = value
+        elif isinstance(stmt, Assignment):
+            stmt.value = self._fold_expression(stmt.value)
+        elif isinstance(stmt, IfStatement):
+            stmt.condition = self._fold_expression(stmt.condition)
+            self._fold_block(stmt.then_block)
+            if stmt.else_block:
+                self._fold_block(stmt.else_block)
+        elif isinstance(stmt, WhileLoop):
+            stmt.condition = self._fold_expression(stmt.condition)
+            self._fold_block(stmt.body)
+        elif isinstance(stmt, DoUntilLoop):
+            self._fold_block(stmt.body)
+            stmt.condition = self._fold_expression(stmt.condition)
+        elif isinstance(stmt, ForLoop):
+            if stmt.init:
+                self._fold_statement(stmt.init)
+            if stmt.condition:
+                stmt.condition = self._fold_expression(stmt.condition)
+            self._fold_block(stmt.body)
+            if stmt.update:
+                self._fold_statement(stmt.update)
+        elif isinstance(stmt, Block):
+            self._fold_block(stmt)
+        elif isinstance(stmt, ReturnStatement):
+            if stmt.value:
+                stmt.value = self._fold_expression(stmt.value)
+        elif isinstance(stmt, ExpressionStatement):
+            stmt.expr = self._fold_expression(stmt.expr)
+
+    def _fold_expression(self, expr: Expression) -> Expression:
+        """Возвращает свёрнутое выражение (литерал или тот же узел с свёрнутыми частями)"""
+        if isinstance(expr, LiteralExpr):
+            return expr
+
+        if isinstance(expr, VariableExpr):
+            constant = self.constants.get(expr.name)
+            if constant is None:
+                return expr
+            return LiteralExpr(value=constant.value, type=constant.type, source_info=expr.source_info)
+
+        if isinstance(expr, BinaryExpr):
+            expr.left = self._fold_expression(expr.left)
+            expr.right = self._fold_expression(expr.right)
+            if isinstance(expr.left, LiteralExpr) and isinstance(expr.right, LiteralExpr):
+                return self._binary(expr)
+            if expr.op in ('&&', '||') and isinstance(expr.left, LiteralExpr):
+                # Правый операнд вычисляется, только если левый не решил исход
+                if bool(expr.left.value) == (expr.op == '||'):
+                    return self._literal(expr, expr.op == '||')
+                return expr.right
+            return expr
+
+        if isinstance(expr, UnaryExpr):
+            expr.expr = self._fold_expression(expr.expr)
+            inner = expr.expr
+            # Унарный минус не сворачивается: генератор выдаёт для него 'x; ldc.i4.0; sub'
+            if expr.op == '!' and isinstance(inner, LiteralExpr) and inner.type.kind == TypeKind.BOOL:
+                return self._literal(expr, not inner.value)
+            return expr
+
+        if isinstance(expr, CastExpr):
+            expr.expr = self._fold_expression(expr.expr)
+            if isinstance(expr.expr, LiteralExpr):
+                return self._literal(expr, self._cast(expr.target_type.kind, expr.expr))
+            return expr
+
+        if isinstance(expr, CallExpr):
+            if expr.receiver:
+                expr.receiver = self._fold_expression(expr.receiver)
+            expr.args = [self._fold_expression(arg) for arg in expr.args]
+            if expr.func_name == "to_color":
+                return self._literal(expr, self._color(expr.args))
+            return expr
+
+        if isinstance(expr, MemberAccessExpr):
+            expr.obj = self._fold_expression(expr.obj)
+            obj = expr.obj
+            if (isinstance(obj, LiteralExpr) and obj.type.kind in _COLORS
+                    and expr.member.lower() in ('r', 'g', 'b')):
+                value = obj.value["rgb".index(expr.member.lower())]
+                return LiteralExpr(value=value, type=Type(TypeKind.INT), source_info=expr.source_info)
+            return expr
+
+        if isinstance(expr, ConstructorExpr):
+            expr.args = [self._fold_expression(arg) for arg in expr.args]
+        return expr
+
+    def _literal(self, expr: Expression, value) -> Expression:
+        if value is None or expr.type is None:
+            return expr
+        return LiteralExpr(value=value, type=expr.type, source_info=expr.source_info)
+
+    def _binary(self, expr: BinaryExpr) -> Expression:
+        # Тип берётся из таблицы операций: у операнда вроде c.r анализатор тип не ставит
+        left_kind, right_kind = expr.left.type.kind, expr.right.type.kind
+        if left_kind not in _NUMERIC or right_kind not in _NUMERIC:
+            return expr
+        result = self.type_system.get_operation_result_type(expr.op, left_kind.value, right_kind.value)
+        value = self._evaluate(expr.op, result, expr.left.value, expr.right.value,
+                               TypeKind.FLOAT in (left_kind, right_kind))
+        if value is None:
+            return expr
+        return LiteralExpr(value=value, type=Type(TypeKind(result)), source_info=expr.source_info)
+
+    def _evaluate(self, op: str, result: str, a, b, is_float: bool):
+        """Значение a op b с типом результата result или None, если сворачивать нельзя"""
+        if result is None:
+            return None
+
+        if is_float:
+            a, b = float(a), float(b)
+        if op in _COMPARISONS:
+            return _COMPARISONS[op](a, b)
+        if op == '&&':
+            return bool(a and b)
+        if op == '||':
+            return bool(a or b)
+
+        if result == "int":
+            if op == '+':
+                return i4(a + b)
+            if op == '-':
+                return i4(a - b)
+            if op == '*':
+                return i4(a * b)
+            if op == '/' and b != 0 and not (a == INT_MIN and b == -1):
+                quotient = abs(a) // abs(b)
+                return quotient if (a < 0) == (b < 0) else -quotient
+            return None
+
+        if result == "float":
+            if op == '+':
+                value = a + b
+            elif op == '-':
+                value = a - b
+            elif op == '*':
+                value = a * b
+            elif op == '/' and b != 0:
+                value = a / b
+            else:
+                return None
+            return value if _finite(value) else None
+        return None
+
+    def _cast(self, target: TypeKind, literal: LiteralExpr):
+        kind, value = literal.type.kind, literal.value
+        if kind in _COLORS:
+            return value if target in _COLORS else None
+        if kind not in _NUMERIC:
+            return None
+        if target == TypeKind.FLOAT:
+            return float(value)
+        if target == TypeKind.INT:
+            if kind != TypeKind.FLOAT:
+                return int(value)
+            # conv.i4 вне диапазона int32 в CLR не определён
+            return int(value) if INT_MIN <= value < INT_MAX + 1 else None
+        return None
+
+    def _color(self, args: List[Expression]):
+        """(r, g, b) для to_color с литералами 0..255 (иначе ToColor бросает исключение)"""
+        if len(args) != 3:
+            return None
+        components = []
+        for arg in args:
+            if not (isinstance(arg, LiteralExpr) and arg.type.kind == TypeKind.INT and 0 <= arg.value <= 255):
+                return None
+            components.append(arg.value)
+        return tuple(components)
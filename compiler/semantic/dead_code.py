@@ -0,0 +1,210 @@
+"""
+Удаление мёртвого кода на типизированном AST (после свёртки констант).
+
+В теле процедуры, метода или Main удаляются ветви с литеральным условием
+(if (true)/if (false), while (false), for с условием false), операторы после return
+в том же блоке и локальные переменные, имя которых больше нигде не встречается,
+если у инициализатора нет побочных эффектов (вызовов, деления на переменную,
+обращения к полю структуры).
+
+CallGraph находит процедуры и методы, достижимые из Main: вызов метода по имени
+достигает всех одноимённых методов в иерархии статического типа получателя
+(виртуальная диспетчеризация), new S(...) - конструктора S. Недостижимые
+процедуры и методы генератор не выдаёт.
+"""
+import dataclasses
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Set
+
+from parser.ast import *
+from semantic.constant_folding import BUILTINS
+
+_FIELDS: Dict[type, tuple] = {}
+_NODES = (ASTNode, VariableEntry)
+
+def _children(node) -> Iterator:
+    cls = node.__class__
+    names = _FIELDS.get(cls)
+    if names is None:
+        names = _FIELDS[cls] = tuple(f.name for f in dataclasses.fields(cls) if f.name != "source_info")
+    for name in names:
+        value = getattr(node, name)
+        if value.__class__ is list:
+            for item in value:
+                if isinstance(item, _NODES):
+                    yield item
+        elif isinstance(value, _NODES):
+            yield value
+
+def walk(node) -> Iterator:
+    """Все узлы поддерева (операторы, выражения, VariableEntry), включая сам node"""
+    stack = list(node) if node.__class__ is list else [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(_children(node))
+
+def is_pure(expr: Expression) -> bool:
+    """Вычисление expr не бросает исключений и ничего не меняет"""
+    if isinstance(expr, (LiteralExpr, VariableExpr)):
+        return True
+    if isinstance(expr, BinaryExpr):
+        # div и rem бросают исключение при делителе 0 и при INT_MIN / -1
+        if expr.op in ('/', '%') and not (isinstance(expr.right, LiteralExpr) and expr.right.value not in (0, -1)):
+            return False
+        return is_pure(expr.left) and is_pure(expr.right)
+    if isinstance(expr, (UnaryExpr, CastExpr)):
+        return is_pure(expr.expr)
+    if isinstance(expr, MemberAccessExpr):
+        # ldfld от null бросает исключение, компоненты цвета - нет
+        return expr.obj.type is not None and expr.obj.type.kind in (TypeKind.COLOR, TypeKind.PIXEL) \
+            and is_pure(expr.obj)
+    return False
+
+def eliminate_dead_code(statements: List[Statement], keep: Iterable[str] = ()) -> bool:
+    """Удаляет мёртвый код из statements на месте; keep - имена, которые читаются неявно"""
+    changed = _prune(statements)
+    keep = set(keep)
+    while True:
+        referenced = {node.name for node in walk(statements) if isinstance(node, VariableExpr)}
+        if not _drop_unused(statements, referenced | keep):
+            return changed
+        changed = True
+
+def _literal_condition(condition: Expression):
+    if isinstance(condition, LiteralExpr) and condition.type.kind == TypeKind.BOOL:
+        return bool(condition.value)
+    return None
+
+def _prune(statements: List[Statement]) -> bool:
+    result, changed = [], False
+    for index, stmt in enumerate(statements):
+        if isinstance(stmt, IfStatement):
+            condition = _literal_condition(stmt.condition)
+            if condition is not None:
+                # Блоки генератору не нужны: их операторы встают на место if
+                block = stmt.then_block if condition else stmt.else_block
+                if block is not None:
+                    _prune(block.statements)
+                    result.extend(block.statements)
+                changed = True
+                continue
+            changed |= _prune(stmt.then_block.statements)
+            if stmt.else_block:
+                changed |= _prune(stmt.else_block.statements)
+        elif isinstance(stmt, WhileLoop):
+            if _literal_condition(stmt.condition) is False:
+                changed = True
+                continue
+            changed |= _prune(stmt.body.statements)
+        elif isinstance(stmt, ForLoop):
+            if stmt.condition is not None and _literal_condition(stmt.condition) is False:
+                if stmt.init:
+                    result.append(stmt.init)
+                changed = True
+                continue
+            changed |= _prune(stmt.body.statements)
+        elif isinstance(stmt, DoUntilLoop):
+            changed |= _prune(stmt.body.statements)
+
+        result.append(stmt)
+        if isinstance(stmt, ReturnStatement):
+            changed |= index < len(statements) - 1
+            break
+    statements[:] = result
+    return changed
+
+def _drop_unused(statements: List[Statement], referenced: Set[str]) -> bool:
+    result, changed = [], False
+    for stmt in statements:
+        if isinstance(stmt, VariableDecl):
+            entries = [entry for entry in stmt.variables
+                       if entry.name in referenced or entry.initializer is not None and not is_pure(entry.initializer)]
+            if len(entries) < len(stmt.variables):
+                changed = True
+                if not entries:
+                    continue
+                stmt.variables = entries
+        elif isinstance(stmt, IfStatement):
+            changed |= _drop_unused(stmt.then_block.statements, referenced)
+            if stmt.else_block:
+                changed |= _drop_unused(stmt.else_block.statements, referenced)
+        elif isinstance(stmt, (WhileLoop, ForLoop, DoUntilLoop)):
+            changed |= _drop_unused(stmt.body.statements, referenced)
+        result.append(stmt)
+    statements[:] = result
+    return changed
+
+class CallGraph:
+    """
+    Процедуры ("имя") и методы ("Структура::имя") программы и рёбра вызовов между ними.
+    Узел Main - список операторов верхнего уровня.
+    """
+
+    def __init__(self, program: Program):
+        self.units: Dict[str, object] = {"Main": program.statements}
+        self.methods: Dict[str, List[str]] = defaultdict(list)
+        self.parents: Dict[str, str] = {}
+        self.children: Dict[str, List[str]] = defaultdict(list)
+        for decl in program.declarations:
+            if isinstance(decl, StructDecl):
+                if decl.parent:
+                    self.parents[decl.name] = decl.parent
+                    self.children[decl.parent].append(decl.name)
+                for member in decl.members:
+                    if isinstance(member.decl, MethodDecl):
+                        unit = f"{decl.name}::{member.decl.name}"
+                        self.units[unit] = member.decl
+                        self.methods[member.decl.name].append(unit)
+            elif isinstance(decl, FunctionDecl):
+                self.units[decl.name] = decl
+
+    def _hierarchy(self, struct_name: str) -> Set[str]:
+        """Структура, её предки и все потомки"""
+        family = set()
+        name = struct_name
+        while name and name not in family:
+            family.add(name)
+            name = self.parents.get(name)
+        pending = [struct_name]
+        while pending:
+            for child in self.children.get(pending.pop(), ()):
+                if child not in family:
+                    family.add(child)
+                    pending.append(child)
+        return family
+
+    def callees(self, node) -> Set[str]:
+        """Единицы, которые может вызвать тело node"""
+        found = set()
+        for expr in walk(node):
+            if isinstance(expr, ConstructorExpr):
+                found.add(f"{expr.struct_name}::{expr.struct_name}")
+            elif isinstance(expr, CallExpr) and expr.func_name not in BUILTINS:
+                name = expr.func_name
+                # Генератор ищет "Структура::имя", затем процедуру с этим именем
+                found.add(name)
+                receiver = expr.receiver.type if expr.receiver is not None else None
+                if receiver is not None and receiver.kind == TypeKind.STRUCT:
+                    family = self._hierarchy(receiver.struct_name)
+                    found.update(unit for unit in self.methods.get(name, ())
+                                 if unit.split("::", 1)[0] in family)
+                else:
+                    found.update(self.methods.get(name, ()))
+        return found & self.units.keys()
+
+    def reachable(self, prepare: Callable[[object], None] = None) -> Set[str]:
+        """
+        Единицы, достижимые из Main. prepare(узел) вызывается для каждой перед
+        поиском её вызовов, так что вызовы из удалённого им кода не учитываются.
+        """
+        live, pending = {"Main"}, ["Main"]
+        while pending:
+            node = self.units[pending.pop()]
+            if prepare is not None:
+                prepare(node)
+            for unit in self.callees(node):
+                if unit not in live:
+                    live.add(unit)
+                    pending.append(unit)
+        return live
@@ -0,0 +1,223 @@
+"""
+Вынос инвариантов из циклов while и for (-O1, после удаления мёртвого кода).
+
+Подвыражение условия, тела или шага цикла инвариантно, если цикл не пишет ни одну
+переменную, которую оно читает (присваиванием, объявлением, передачей в процедуру),
+ни одно поле структуры, которое оно читает, и встроенные функции в нём без побочных
+эффектов (поле "effect" в RuntimeCodeGenerator.BUILTIN_FUNCTIONS). Вызов процедуры,
+метода или конструктора в цикле может поменять любые поля и пиксели. get_pixel
+инвариантен, только если в цикле нет set_pixel ни в какое изображение: две переменные
+могут ссылаться на одно изображение. Запись в result-параметр считается записью во все
+result-параметры: вызывающий мог передать в них одну и ту же переменную.
+
+Наибольшие инвариантные подвыражения (кроме переменных и литералов) вычисляются один
+раз в новую локальную перед циклом, одинаковые - в одну. Цикл может не выполниться ни
+разу, поэтому то, что может бросить исключение (get_pixel, to_color, деление целых на
+переменную, поле структуры не через this), выносится, только если условие вычисляет
+его раньше всего, что бросает исключения или имеет побочные эффекты.
+"""
+from typing import Dict, List, Set
+
+from codegen.cil_runtime import RuntimeCodeGenerator
+from parser.ast import *
+from semantic.dead_code import is_pure, walk
+
+_BUILTINS = RuntimeCodeGenerator.BUILTIN_FUNCTIONS
+_READS = ("pure", "reads_image")
+_COLORS = (TypeKind.COLOR, TypeKind.PIXEL)
+# Условие (bool) сравнивает и переходит одной инструкцией: из сравнения выносятся операнды
+_HOISTED_TYPES = (TypeKind.INT, TypeKind.FLOAT, TypeKind.COLOR, TypeKind.PIXEL, TypeKind.IMAGE, TypeKind.STRUCT)
+
+def _acts(expr: Expression) -> bool:
+    """Сам узел expr (без подвыражений) может бросить исключение или имеет побочный эффект"""
+    if isinstance(expr, BinaryExpr):
+        # div и rem над целыми бросают исключение при делителе 0 и при INT_MIN / -1
+        return (expr.op in ('/', '%') and (expr.type is None or expr.type.kind == TypeKind.INT)
+                and not (isinstance(expr.right, LiteralExpr) and expr.right.value not in (0, -1)))
+    if isinstance(expr, MemberAccessExpr):
+        obj = expr.obj
+        if obj.type is not None and obj.type.kind in _COLORS:
+            return False
+        # this не бывает null: callvirt проверяет получателя до входа в метод
+        return not (isinstance(obj, VariableExpr) and obj.name == "this")
+    if isinstance(expr, CallExpr):
+        info = _BUILTINS.get(expr.func_name)
+        return info is None or info["throws"] or info["effect"] not in _READS
+    return isinstance(expr, ConstructorExpr)
+
+def _key(expr: Expression) -> tuple:
+    """Ключ выражения без позиций в исходнике: одинаковые выражения выносятся в одну локальную"""
+    if isinstance(expr, LiteralExpr):
+        return ("literal", expr.type.kind, repr(expr.value))
+    if isinstance(expr, VariableExpr):
+        return ("variable", expr.name)
+    if isinstance(expr, BinaryExpr):
+        return ("binary", expr.op, _key(expr.left), _key(expr.right))
+    if isinstance(expr, UnaryExpr):
+        return ("unary", expr.op, _key(expr.expr))
+    if isinstance(expr, CastExpr):
+        return ("cast", expr.target_type.kind, expr.target_type.struct_name, _key(expr.expr))
+    if isinstance(expr, MemberAccessExpr):
+        return ("member", expr.member, _key(expr.obj))
+    return ("call", expr.func_name) + tuple(map(_key, expr.args))
+
+class _LoopEffects:
+    """Что меняет цикл: переменные, поля структур (по имени), пиксели; вызывает ли процедуры и методы"""
+
+    def __init__(self, loop: Statement, references: Set[str]):
+        self.variables: Set[str] = set()
+        self.fields: Set[str] = set()
+        self.pixels = self.calls = False
+        for node in walk(loop):
+            if isinstance(node, VariableEntry):
+                self.variables.add(node.name)
+            elif isinstance(node, Assignment):
+                if isinstance(node.target, VariableExpr):
+                    self.variables.add(node.target.name)
+                else:
+                    self.fields.add(node.target.member)
+            elif isinstance(node, (CallExpr, ConstructorExpr)):
+                info = _BUILTINS.get(node.func_name) if isinstance(node, CallExpr) else None
+                if info is None:
+                    # Переменная в аргументе может попасть в result-параметр
+                    self.calls = True
+                    self.variables.update(arg.name for arg in node.args if isinstance(arg, VariableExpr))
+                elif info["effect"] == "writes_image":
+                    self.pixels = True
+        if self.variables & references:
+            self.variables |= references
+
+    def invariant(self, expr: Expression) -> bool:
+        if isinstance(expr, LiteralExpr):
+            return True
+        if isinstance(expr, VariableExpr):
+            return expr.name not in self.variables
+        if isinstance(expr, BinaryExpr):
+            return self.invariant(expr.left) and self.invariant(expr.right)
+        if isinstance(expr, (UnaryExpr, CastExpr)):
+            return self.invariant(expr.expr)
+        if isinstance(expr, MemberAccessExpr):
+            if expr.obj.type is None:
+                return False
+            if expr.obj.type.kind not in _COLORS and (self.calls or expr.member in self.fields):
+                return False
+            return self.invariant(expr.obj)
+        if isinstance(expr, CallExpr):
+            info = _BUILTINS.get(expr.func_name)
+            if info is None or info["effect"] not in _READS:
+                return False
+            if info["effect"] == "reads_image" and (self.pixels or self.calls):
+                return False
+            return all(map(self.invariant, expr.args))
+        return False
+
+class LoopInvariantMotion:
+    """Вынос инвариантов из циклов одного тела (процедуры, метода или Main)"""
+
+    def __init__(self, params: List[Parameter] = ()):
+        self.references = {param.name for param in params if param.kind == "result"}
+        self.count = 0
+
+    def run(self, statements: List[Statement]) -> List[Statement]:
+        """Выносит инварианты из всех циклов statements на месте; объявления встают перед циклом"""
+        result = []
+        for stmt in statements:
+            if isinstance(stmt, (WhileLoop, ForLoop)):
+                result.extend(self._hoist_from(stmt))
+            # Внешний цикл первым: его инварианты уходят сразу за пределы всех вложенных
+            if isinstance(stmt, IfStatement):
+                self.run(stmt.then_block.statements)
+                if stmt.else_block:
+                    self.run(stmt.else_block.statements)
+            elif isinstance(stmt, (WhileLoop, ForLoop, DoUntilLoop)):
+                self.run(stmt.body.statements)
+            result.append(stmt)
+        statements[:] = result
+        return statements
+
+    def _hoist_from(self, loop: Statement) -> List[VariableDecl]:
+        self.effects = _LoopEffects(loop, self.references)
+        self.decls: List[VariableDecl] = []
+        self.names: Dict[tuple, str] = {}
+        # Инициализатор for вычисляется до условия: вынесенное окажется перед ним
+        self.clean = not isinstance(loop, ForLoop) or loop.init is None or all(
+            entry.initializer is None or is_pure(entry.initializer) for entry in loop.init.variables)
+        if loop.condition is not None:
+            loop.condition = self._visit(loop.condition, False)
+        self.clean = False
+        self._block(loop.body)
+        if isinstance(loop, ForLoop) and loop.update is not None:
+            self._statement(loop.update)
+        return self.decls
+
+    def _block(self, block: Block):
+        for stmt in block.statements:
+            self._statement(stmt)
+
+    def _statement(self, stmt: Statement):
+        if isinstance(stmt, VariableDecl):
+            for entry in stmt.variables:
+                if entry.initializer is not None:
+                    entry.initializer = self._visit(entry.initializer, False)
+        elif isinstance(stmt, Assignment):
+            if isinstance(stmt.target, MemberAccessExpr):
+                stmt.target.obj = self._visit(stmt.target.obj, False)
+            stmt.value = self._visit(stmt.value, False)
+        elif isinstance(stmt, (IfStatement, WhileLoop, DoUntilLoop)):
+            stmt.condition = self._visit(stmt.condition, False)
+            if isinstance(stmt, IfStatement):
+                self._block(stmt.then_block)
+                if stmt.else_block:
+                    self._block(stmt.else_block)
+            else:
+                self._block(stmt.body)
+        elif isinstance(stmt, ForLoop):
+            if stmt.init is not None:
+                self._statement(stmt.init)
+            if stmt.condition is not None:
+                stmt.condition = self._visit(stmt.condition, False)
+            self._block(stmt.body)
+            if stmt.update is not None:
+                self._statement(stmt.update)
+        elif isinstance(stmt, ReturnStatement):
+            if stmt.value is not None:
+                stmt.value = self._visit(stmt.value, False)
+        elif isinstance(stmt, ExpressionStatement):
+            stmt.expr = self._visit(stmt.expr, False)
+
+    def _visit(self, expr: Expression, conditional: bool) -> Expression:
+        """
+        expr или переменная, в которую вынесено его значение. Обход в порядке вычисления:
+        clean - до сих пор ничто не могло бросить исключение или иметь побочный эффект
+        """
+        if isinstance(expr, (LiteralExpr, VariableExpr)):
+            return expr
+        if (expr.type is not None and expr.type.kind in _HOISTED_TYPES and self.effects.invariant(expr)
+                and (self.clean and not conditional or not any(map(_acts, walk(expr))))):
+            return self._hoist(expr)
+
+        if isinstance(expr, BinaryExpr):
+            expr.left = self._visit(expr.left, conditional)
+            expr.right = self._visit(expr.right, conditional or expr.op in ('&&', '||'))
+        elif isinstance(expr, (UnaryExpr, CastExpr)):
+            expr.expr = self._visit(expr.expr, conditional)
+        elif isinstance(expr, MemberAccessExpr):
+            expr.obj = self._visit(expr.obj, conditional)
+        elif isinstance(expr, (CallExpr, ConstructorExpr)):
+            if isinstance(expr, CallExpr) and expr.receiver is not None:
+                expr.receiver = self._visit(expr.receiver, conditional)
+            expr.args = [self._visit(arg, conditional) for arg in expr.args]
+        if _acts(expr):
+            self.clean = False
+        return expr
+
+    def _hoist(self, expr: Expression) -> VariableExpr:
+        key = _key(expr)
+        name = self.names.get(key)
+        if name is None:
+            # $ не встречается в идентификаторах ImgLang
+            name = self.names[key] = f"$inv{self.count}"
+            self.count += 1
+            self.decls.append(VariableDecl(var_type=expr.type, variables=[VariableEntry(name, expr)],
+                                           source_info=expr.source_info))
+        return VariableExpr(name=name, type=expr.type, source_info=expr.source_info)
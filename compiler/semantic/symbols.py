@@ -11,6 +11,11 @@ class SymbolKind(Enum):
     PARAMETER = "parameter"
 
 class Symbol:
+    # Сигнатуры всех объявлений живут до конца компиляции (в том числе потоковой)
+    __slots__ = ("name", "kind", "type", "scope_level", "source_info", "references", "params",
+                 "return_type", "is_virtual", "is_override", "parent", "fields", "methods",
+                 "access", "access_modifier")
+
     def __init__(self, 
                  name: str, 
                  kind: SymbolKind,
@@ -0,0 +1,172 @@
+"""
+Долгоживущий сервер компиляции ImgLang.
+
+Загружает ANTLR лексер/парсер, ASTBuilder и генератор кода один раз и обслуживает
+запросы compile/check по Unix domain socket. Протокол: по одному JSON-объекту
+на строку в обе стороны, в одном соединении можно отправить несколько запросов.
+
+    {"command": "compile", "source_file": "/abs/a.imgl", "output_file": null, "cwd": "/abs"}
+    {"command": "check", "source_file": "/abs/a.imgl", "source": "...необязательно..."}
+    {"command": "stats"}
+    {"command": "shutdown"}
+"""
+import argparse
+import json
+import os
+import socketserver
+import time
+from collections import deque
+from typing import List
+
+from client import default_socket_path
+from codegen import OPT_LEVELS, DEFAULT_OPT_LEVEL
+from lexer import LEXER_ENGINES, DEFAULT_LEXER_ENGINE
+from parser import PARSE_MODES, DEFAULT_PARSE_MODE, PARSER_ENGINES, DEFAULT_PARSER_ENGINE, dfa_cache
+from toolchain import Toolchain, output_paths, assemble_il
+
+def percentile(samples: List[float], p: float) -> float:
+    """Перцентиль по методу ближайшего ранга"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, round(p / 100 * len(ordered) + 0.5))
+    return ordered[min(rank, len(ordered)) - 1]
+
+class CompileService:
+    """Обработка запросов на прогретом тулчейне"""
+
+    def __init__(self, history: int = 10000, options: dict = None):
+        self.toolchain = Toolchain(options=options)
+        self.toolchain.warm_up()
+        self.latencies = deque(maxlen=history)
+        self.requests = 0
+
+    def handle(self, request: dict) -> dict:
+        start = time.perf_counter()
+        command = request.get("command")
+
+        if command in ("compile", "check"):
+            response = self._compile(request, assemble=(command == "compile"))
+        elif command == "stats":
+            response = self._stats()
+        elif command == "shutdown":
+            response = {"ok": True}
+        else:
+            response = {"ok": False, "error": f"Unknown command: {command}"}
+
+        elapsed = (time.perf_counter() - start) * 1000
+        if command in ("compile", "check"):
+            self.requests += 1
+            self.latencies.append(elapsed)
+        response["latency_ms"] = elapsed
+        return response
+
+    def _compile(self, request: dict, assemble: bool) -> dict:
+        cwd = request.get("cwd") or os.getcwd()
+        source_file = os.path.join(cwd, request["source_file"])
+        source_code = request.get("source")
+        if source_code is None:
+            try:
+                with open(source_file, 'r', encoding='utf-8') as f:
+                    source_code = f.read()
+            except OSError as e:
+                return {"ok": False, "error": f"File not found: {e.filename}"}
+
+        result = self.toolchain.compile_source(source_code)
+        response = result.to_dict()
+        response["ok"] = result.success
+        del response["il_code"]
+
+        if not result.success or not assemble:
+            return response
+
+        output_file = request.get("output_file")
+        il_file, exe_file = output_paths(source_file, output_file)
+        il_file, exe_file = os.path.join(cwd, il_file), os.path.join(cwd, exe_file)
+        with open(il_file, 'w', encoding='utf-8') as f:
+            f.write(result.il_code)
+        response["il_file"] = il_file
+
+        try:
+            asm = assemble_il(il_file, exe_file)
+        except FileNotFoundError:
+            asm = None
+
+        if asm is not None and asm.returncode == 0:
+            response["exe_file"] = exe_file
+        else:
+            response["ok"] = False
+            response["failed_stage"] = "ilasm"
+            response["ilasm_output"] = (asm.stdout + asm.stderr) if asm else ""
+        return response
+
+    def _stats(self) -> dict:
+        samples = list(self.latencies)
+        return {
+            "ok": True,
+            "requests": self.requests,
+            "p50_ms": percentile(samples, 50),
+            "p99_ms": percentile(samples, 99),
+            "decl_cache_hits": self.toolchain.decl_cache.hits,
+            "decl_cache_misses": self.toolchain.decl_cache.misses,
+        }
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                response = self.server.service.handle(request)
+            except Exception as e:
+                request, response = {}, {"ok": False, "error": f"Internal error: {e}"}
+
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+            if request.get("command") == "shutdown":
+                self.server.shutdown_requested = True
+                break
+
+class CompileServer(socketserver.UnixStreamServer):
+    """Однопоточный сервер: тулчейн не рассчитан на конкурентный доступ"""
+
+    def __init__(self, socket_path: str, options: dict = None):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.service = CompileService(options=options)
+        self.shutdown_requested = False
+        super().__init__(socket_path, _RequestHandler)
+
+    def serve_until_shutdown(self):
+        try:
+            while not self.shutdown_requested:
+                self.handle_request()
+        finally:
+            self.server_close()
+            os.unlink(self.server_address)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Сервер компиляции ImgLang")
+    arg_parser.add_argument("--socket", default=default_socket_path(),
+                            help="путь к Unix domain socket")
+    arg_parser.add_argument("--lexer", choices=LEXER_ENGINES, default=DEFAULT_LEXER_ENGINE)
+    arg_parser.add_argument("--parser", choices=PARSER_ENGINES, default=DEFAULT_PARSER_ENGINE)
+    arg_parser.add_argument("--parse-mode", choices=PARSE_MODES, default=DEFAULT_PARSE_MODE)
+    arg_parser.add_argument("-O", dest="opt_level", type=int, choices=OPT_LEVELS, default=DEFAULT_OPT_LEVEL,
+                            help="уровень оптимизации IL (-O1 - свёртка констант, удаление мёртвого кода, вынос инвариантов из циклов и проход «через глазок»)")
+    arg_parser.add_argument("--dfa-cache", metavar="FILE",
+                            help="файл DFA предсказаний ANTLR: загрузить при старте и сохранить при остановке")
+    args = arg_parser.parse_args()
+
+    if args.dfa_cache:
+        dfa_cache.enable(args.dfa_cache)
+
+    server = CompileServer(args.socket, {"lexer": args.lexer, "parser": args.parser,
+                                         "parse_mode": args.parse_mode, "opt_level": args.opt_level})
+    print(f"🚀 Сервер компиляции слушает {args.socket}")
+    server.serve_until_shutdown()
+
+if __name__ == "__main__":
+    main()
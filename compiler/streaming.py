@@ -0,0 +1,246 @@
+"""
+Потоковая компиляция (main.py --stream): память не растёт с числом объявлений.
+
+Обычная компиляция держит в памяти всё сразу: токены, AST программы и IL всех
+методов. Здесь исходник читается трижды, и в каждый момент в памяти разобран
+только один элемент верхнего уровня:
+
+1. сигнатуры - объявления по одному разбираются, анализатор и генератор
+   запоминают сигнатуры процедур и методов и поля структур, AST выбрасывается;
+   от операторов верхнего уровня остаются только позиции начала их серий;
+2. объявления - каждое разбирается заново, проверяется, генерируется и сразу
+   пишется в IL файл;
+3. Main - операторы верхнего уровня проверяются и генерируются по одному,
+   инструкции сбрасываются во временный файл: .locals известен только в конце.
+   Поэтому -O1 не оптимизирует Main и не распространяет в нём константы (только
+   сворачивает выражения и выносит инварианты из циклов внутри одного оператора) -
+   его тела целиком в памяти не бывает. По той же
+   причине не строится граф вызовов: недостижимые процедуры и методы остаются,
+   мёртвый код удаляется только внутри каждого объявления.
+
+Остаются текст исходника, таблица символов и сигнатуры. Разбор всегда идёт
+табличным лексером и рукописным парсером - только они читают с любого места
+текста. Любая ошибка (лексическая, синтаксическая, семантическая, внутренняя)
+прерывает поток исключением StreamingFallback: main.py удаляет недописанный IL
+и компилирует программу обычным способом, чтобы диагностика была прежней.
+
+IL совпадает с обычным режимом с точностью до порядка методов (при -O1 - ещё
+Main и недостижимых методов):
+вложенные классы структур идут вперемешку с процедурами, как в исходнике, а поля
+констант и .cctor - в конце класса Program.
+"""
+import tempfile
+from itertools import chain
+from typing import Iterator, List, NamedTuple, Tuple
+
+from antlr4.Token import CommonToken, Token
+
+from lexer.fast_lexer import scan
+from parser.ast import Declaration, Program, SourceLines, StructDecl
+from parser.direct_parser import (DirectParseError, DirectParser, BEGIN, END, LBRACE, RBRACE,
+                                  LPAREN, RPAREN, SEMI)
+from phases import phase
+
+_OPENING = frozenset((LBRACE, BEGIN, LPAREN))
+_CLOSING = frozenset((RBRACE, END, RPAREN))
+_BOUNDARIES = frozenset((SEMI, RBRACE, END))
+
+class StreamingFallback(Exception):
+    """Поток прерван: программу нужно скомпилировать обычным способом"""
+
+class _Start(NamedTuple):
+    """Первый токен элемента: смещение, номер строки и смещение начала строки"""
+    offset: int
+    line: int
+    line_start: int
+
+class _ItemReader:
+    """
+    Элементы верхнего уровня по одному, начиная с позиции start. Токены читаются
+    до ближайшей границы (';', '}' или 'end' вне скобок) и ещё одного токена за ней.
+    Если элемент на этой границе не кончается (else после блока, until после do),
+    буфер дочитывается до следующей.
+    """
+
+    def __init__(self, text: str, lines: SourceLines, start: _Start):
+        self.lines = lines
+        self.tokens = scan(text, (None, None), self._lexer_error, *start)
+        self.buffer: List[CommonToken] = []
+        self.boundaries: List[int] = []
+        self.depth = 0
+        self.exhausted = False
+
+        self.eof = CommonToken(type=Token.EOF)
+        self.eof.text = "<EOF>"
+        self.eof.start = len(text)
+        self.eof.line, self.eof.column = 0, 0
+
+    @staticmethod
+    def _lexer_error(line: int, column: int, text: str):
+        raise StreamingFallback(f"лексическая ошибка в строке {line}")
+
+    def _ready(self, wanted: int) -> bool:
+        return len(self.boundaries) >= wanted and self.boundaries[wanted - 1] + 1 < len(self.buffer)
+
+    def _pull(self):
+        token = next(self.tokens, None)
+        if token is None:
+            self.exhausted = True
+            return
+        ttype = token.type
+        if ttype in _OPENING:
+            self.depth += 1
+        elif ttype in _CLOSING:
+            self.depth -= 1
+        if ttype in _BOUNDARIES and self.depth == 0:
+            self.boundaries.append(len(self.buffer))
+        self.buffer.append(token)
+
+    def __iter__(self) -> Iterator[Tuple[object, _Start]]:
+        wanted = 1
+        while True:
+            while not self.exhausted and not self._ready(wanted):
+                self._pull()
+            if not self.buffer:
+                return
+
+            parser = DirectParser(self.buffer + [self.eof], self.lines)
+            try:
+                item = parser.parse_item()
+                complete = self.exhausted or parser.pos < len(self.buffer)
+            except (DirectParseError, RecursionError):
+                if self.exhausted:
+                    raise StreamingFallback("синтаксическая ошибка")
+                complete = False
+            if not complete:
+                wanted += 1
+                continue
+
+            first = self.buffer[0]
+            consumed = parser.pos
+            del self.buffer[:consumed]
+            self.boundaries = [index - consumed for index in self.boundaries if index >= consumed]
+            wanted = 1
+            yield item, _Start(first.start, first.line, first.start - first.column)
+
+def _require(errors):
+    if errors:
+        raise StreamingFallback("семантическая ошибка")
+
+def _write_lines(out, lines):
+    for line in lines:
+        out.write(line)
+        out.write("\n")
+
+def compile_streaming(source_file: str, il_file: str, opt_level: int = 0) -> int:
+    """Компилирует source_file в il_file потоком; возвращает число строк IL"""
+    try:
+        return _compile(source_file, il_file, opt_level)
+    except StreamingFallback:
+        raise
+    except Exception as e:
+        raise StreamingFallback(f"внутренняя ошибка: {e}") from e
+
+def _compile(source_file: str, il_file: str, opt_level: int) -> int:
+    from semantic.analyzer import SemanticAnalyzer
+    from codegen.cil_generator import CILGenerator
+    from codegen.cil_instructions import relax_branches, render
+    from codegen.stack_depth import max_stack
+
+    with open(source_file, 'r', encoding='utf-8') as f:
+        text = f.read()
+    lines = SourceLines(text)
+    analyzer = SemanticAnalyzer()
+    generator = CILGenerator(analyzer.symbol_table, opt_level=opt_level)
+    emitter = generator.emitter
+
+    # Серии подряд идущих объявлений и операторов: второй и третий проходы
+    # начинают чтение с их начала и останавливаются на элементе другого вида
+    declaration_runs: List[_Start] = []
+    statement_runs: List[_Start] = []
+
+    with phase("signatures") as record:
+        previous, declarations = None, 0
+        for item, start in _ItemReader(text, lines, _Start(0, 1, 0)):
+            is_declaration = isinstance(item, Declaration)
+            if is_declaration is not previous:
+                (declaration_runs if is_declaration else statement_runs).append(start)
+                previous = is_declaration
+            if is_declaration:
+                program = Program(declarations=[item], statements=[])
+                _require(analyzer.declare(program))
+                generator.declare(program)
+                declarations += 1
+        record.count(declarations=declarations)
+
+    def declarations_in(run: _Start) -> Iterator[Declaration]:
+        for item, _ in _ItemReader(text, lines, run):
+            if not isinstance(item, Declaration):
+                return
+            yield item
+
+    def statements_in(run: _Start):
+        for item, _ in _ItemReader(text, lines, run):
+            if isinstance(item, Declaration):
+                return
+            if item is not None:
+                yield item
+
+    with phase("stream") as record, open(il_file, 'w', encoding='utf-8') as out, \
+            tempfile.TemporaryFile('w+', encoding='utf-8') as spill:
+        il_lines = emitter.header_lines()
+        _write_lines(out, il_lines)
+        written = len(il_lines)
+        constants = {}
+
+        for run in declaration_runs:
+            for decl in declarations_in(run):
+                _require(analyzer.check(Program(declarations=[decl], statements=[])))
+                generator.generate_declaration(decl)
+                if isinstance(decl, StructDecl):
+                    il_lines = emitter.struct_lines(decl.name, emitter.methods)
+                else:
+                    il_lines = [line for method in emitter.methods for line in emitter.method_lines(method)]
+                _write_lines(out, il_lines)
+                written += len(il_lines)
+                for method in emitter.methods:
+                    constants.update(method.constants)
+                emitter.methods.clear()
+
+        # Между операторами стек пуст, поэтому .maxstack Main - наибольший по кускам
+        main_depths = []
+
+        def main_statements():
+            for run in statement_runs:
+                for stmt in statements_in(run):
+                    _require(analyzer.check(Program(declarations=[], statements=[stmt])))
+                    yield stmt
+                    instructions = emitter.current_method.instructions
+                    # Переходы не выходят за пределы оператора: короткие формы выбираются по куску
+                    relax_branches(instructions)
+                    main_depths.append(max_stack(emitter.current_method, instructions))
+                    _write_lines(spill, map(render, instructions))
+                    instructions.clear()
+
+        generator.generate_entry_point(main_statements())
+        main = emitter.methods.pop()
+        main.max_stack = max(main_depths + [max_stack(main)])
+        spill.seek(0)
+        spilled = (line.rstrip("\n") for line in spill)
+        for line in emitter.method_lines(main, instructions=chain(spilled, map(render, main.instructions))):
+            out.write(line)
+            out.write("\n")
+            written += 1
+
+        # Поля констант и .cctor известны только после всех методов: они в конце класса
+        constants.update(main.constants)
+        generator.generate_static_constructor(constants)
+        il_lines = emitter.static_field_lines()
+        for method in emitter.methods:
+            il_lines.extend(emitter.method_lines(method))
+        _write_lines(out, il_lines)
+        written += len(il_lines)
+        out.write("}\n")
+        written += 1
+        record.count(il_lines=written)
+    return written
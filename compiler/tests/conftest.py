@@ -0,0 +1,8 @@
+"""
+Проверки компилятора: python -m pytest tests (из каталога compiler/).
+Модули компилятора импортируются так же, как из main.py, - от каталога compiler/.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
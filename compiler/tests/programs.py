@@ -0,0 +1,16 @@
+"""Программы для проверок: файлы из examples/ и сгенерированные bench.generator"""
+from pathlib import Path
+from typing import List, Tuple
+
+from bench.generator import generate_program
+
+EXAMPLES_DIR = Path(__file__).resolve().parent.parent.parent / "examples"
+
+def example_sources(kind: str = "") -> List[Tuple[str, str]]:
+    """(имя, текст) файлов examples/; kind - начало пути, например "correct_examples" """
+    return [(str(path.relative_to(EXAMPLES_DIR)), path.read_text(encoding="utf-8"))
+            for path in sorted(EXAMPLES_DIR.rglob("*.imgl"))
+            if str(path.relative_to(EXAMPLES_DIR)).startswith(kind)]
+
+def generated_sources(count: int = 4, **knobs) -> List[Tuple[str, str]]:
+    return [(f"generated seed={seed}", generate_program(seed=seed, **knobs)) for seed in range(count)]
@@ -0,0 +1,85 @@
+"""Круговая запись AST (parser.ast_codec) и записи AST в кэше компиляции"""
+import pytest
+
+from cache.backends import DirectoryBackend
+from cache.store import CompilationCache
+from parser.ast import SourceInfo
+from parser.ast_codec import ASTDecodeError, FORMAT_VERSION, decode_ast, encode_ast
+from semantic.dead_code import walk
+from toolchain import Toolchain
+from programs import example_sources, generated_sources
+
+PROGRAMS = example_sources("correct_examples") + generated_sources(3, procs=6, structs=2)
+
+@pytest.fixture(scope="module")
+def toolchain():
+    return Toolchain()
+
+def parse(toolchain: Toolchain, source: str):
+    toolchain.lexer.reset(source)
+    toolchain.lexer.tokenize()
+    toolchain.parser.reset(toolchain.lexer.get_token_stream())
+    ast, errors = toolchain.parser.parse()
+    assert not errors
+    return ast
+
+def assert_same_positions(decoded, original):
+    """SourceInfo сравнивается по смещениям; начала строк (SourceLines) проверяются отдельно"""
+    for copy, node in zip(walk(decoded), walk(original), strict=True):
+        info = getattr(node, "source_info", None)
+        copied = getattr(copy, "source_info", None)
+        assert (copied is None) == (info is None)
+        if isinstance(info, SourceInfo):
+            assert (copied.first, copied.last) == (info.first, info.last)
+            assert copied.lines.starts == info.lines.starts
+
+def assert_round_trip(ast):
+    decoded = decode_ast(encode_ast(ast))
+    assert decoded == ast
+    assert_same_positions(decoded, ast)
+
+@pytest.mark.parametrize("name, source", PROGRAMS, ids=[name for name, _ in PROGRAMS])
+def test_round_trip_before_and_after_analysis(toolchain, name, source):
+    ast = parse(toolchain, source)
+    assert_round_trip(ast)
+    toolchain.analyzer.reset()
+    toolchain.analyzer.analyze(ast)
+    assert_round_trip(ast)
+
+@pytest.fixture(scope="module")
+def blob(toolchain):
+    return encode_ast(parse(toolchain, example_sources("correct_examples")[0][1]))
+
+def test_other_format_version_is_rejected(blob):
+    data = bytearray(blob)
+    data[4] = FORMAT_VERSION + 1
+    with pytest.raises(ASTDecodeError, match="version"):
+        decode_ast(bytes(data))
+    with pytest.raises(ASTDecodeError):
+        decode_ast(b"XXXX" + blob[4:])
+
+def test_truncated_blob_is_rejected(blob):
+    for length in range(len(blob)):
+        with pytest.raises(ASTDecodeError):
+            decode_ast(blob[:length])
+
+def test_trailing_data_is_rejected(blob):
+    with pytest.raises(ASTDecodeError, match="Trailing"):
+        decode_ast(blob + b"\0")
+
+def test_cache_rejects_truncated_and_foreign_entries(toolchain, tmp_path):
+    source = example_sources("correct_examples")[0][1]
+    backend = DirectoryBackend(str(tmp_path))
+    cache = CompilationCache(backend)
+    key = cache.ast_key(source)
+    ast = parse(toolchain, source)
+    cache.put_ast(key, ast, 42)
+    assert cache.get_ast(key) == (ast, 42)
+
+    data = backend.get(key)
+    backend.put(key, data[:len(data) // 2])
+    assert cache.get_ast(key) is None
+
+    # Заголовок записи кэша другой версии
+    backend.put(key, data[:4] + bytes([data[4] + 1]) + data[5:])
+    assert cache.get_ast(key) is None
@@ -0,0 +1,78 @@
+"""
+Сравнение, слитое с переходом (CILTypeSystem.BRANCH_INSTRUCTIONS), ведёт себя как
+значение сравнения: условие if, while, for и do-until с NaN и с операндами из int,
+приведёнными к float, даёт тот же вывод, что и условие через bool-переменную, при -O0 и -O1.
+"""
+import re
+
+import pytest
+
+from bench.cil_sim import simulate_il
+from bench.sim_runtime import Runtime
+from toolchain import Toolchain
+
+def compile_il(source: str, opt_level: int) -> str:
+    result = Toolchain(incremental=False, options={"opt_level": opt_level}).compile_source(source)
+    assert not result.errors, result.errors
+    return result.il_code
+
+def run(il: str) -> str:
+    return simulate_il(il, Runtime(default_size=(4, 4)), max_steps=1_000_000).output
+
+OPERATORS = {"eq": "==", "ne": "!=", "lt": "<", "gt": ">", "le": "<=", "ge": ">="}
+
+# Тело процедуры; {cond} - условие: само сравнение или bool-переменная с его значением
+CONSTRUCTS = {
+    "if": """
+    if ({cond}) then {{ n = 1; }} else {{ n = 2; }}
+    if (!({cond})) then {{ n = n + 10; }}""",
+    "while": """
+    while (n < 3 && {cond}) {{ n = n + 1; }}
+    while (!({cond}) && n < 5) {{ n = n + 1; }}""",
+    "for": """
+    for (int i = 0; {cond} && i < 3; i = i + 1) {{ n = n + 1; }}
+    for (int j = 0; (j < 2 || {cond}) && n < 40; j = j + 1) {{ n = n + 10; }}""",
+    "do-until": """
+    do {{ n = n + 1; }} until (n >= 3 || {cond});
+    do {{ n = n + 10; }} until ({cond} || n > 40);""",
+}
+
+# (типы параметров, операнды сравнения, пары аргументов): NaN с каждой стороны, равные,
+# меньше, больше. Сравнение int с float язык не допускает - int становится float в a + 0.0
+OPERANDS = {
+    "float float": (("float", "float"), ("a", "b"),
+                    ["nan, 1.0", "1.0, nan", "nan, nan", "1.0, 2.0", "2.0, 2.0", "2.5, 1.0"]),
+    "int float": (("int", "float"), ("a + 0.0", "b"), ["1, nan", "2, 2.5", "3, 2.5", "2, 2.0"]),
+    "float int": (("float", "int"), ("a", "b * 1.0"), ["nan, 1", "2.5, 2", "2.5, 3", "2.0, 2"]),
+}
+
+def program(construct: str, operands: str, fused: bool) -> str:
+    (left, right), (x, y), calls = OPERANDS[operands]
+    lines = ["float nan = 0.0 / 0.0;"]
+    for name, operator in OPERATORS.items():
+        comparison = f"{x} {operator} {y}"
+        body = CONSTRUCTS[construct].format(cond=comparison if fused else "c")
+        value = "" if fused else f"\n    bool c = {comparison};"
+        lines.append(f"proc {name}(value {left} a, value {right} b) -> int {{\n    int n = 0;{value}{body}\n    return n;\n}}")
+        lines.extend(f'write({name}({arguments}));\nwrite(" ");' for arguments in calls)
+    return "\n".join(lines)
+
+@pytest.mark.parametrize("operands", OPERANDS)
+@pytest.mark.parametrize("construct", CONSTRUCTS)
+def test_fused_branch_matches_value_form(construct, operands):
+    expected = run(compile_il(program(construct, operands, fused=False), 0))
+    for opt_level in (0, 1):
+        assert run(compile_il(program(construct, operands, fused=True), opt_level)) == expected
+        assert run(compile_il(program(construct, operands, fused=False), opt_level)) == expected
+
+def branches(il: str):
+    return set(re.findall(r"^\s+(b(?:eq|ne|lt|gt|le|ge)(?:\.un)?(?:\.s)?) ", il, re.MULTILINE))
+
+@pytest.mark.parametrize("opt_level", [0, 1])
+def test_float_branches_are_short_and_unordered(opt_level):
+    used = set()
+    for construct in CONSTRUCTS:
+        used |= branches(compile_il(program(construct, "float float", fused=True), opt_level))
+    # Процедуры короткие: relax_branches выбирает только формы .s
+    assert all(mnemonic.endswith(".s") for mnemonic in used)
+    assert {"ble.un.s", "bge.un.s", "bne.un.s", "blt.s", "bgt.s", "beq.s"} <= used
@@ -0,0 +1,46 @@
+"""Кэш компиляции: ключ и вытеснение из каталога"""
+from cache.backends import DirectoryBackend
+from cache.store import CompilationCache
+from version import COMPILER_ROOT, compiler_sources
+
+SOURCE = "int x = 1;\nwrite(x);\n"
+
+def test_key_ignores_frontend_engines():
+    antlr = CompilationCache.key(SOURCE, {"lexer": "antlr", "parser": "antlr", "parse_mode": "ll", "opt_level": 0})
+    fast = CompilationCache.key(SOURCE, {"lexer": "fast", "parser": "direct", "parse_mode": "sll", "opt_level": 0})
+    assert antlr == fast
+    assert CompilationCache.key(SOURCE) == CompilationCache.key(SOURCE, {"opt_level": 0})
+
+def test_key_depends_on_output_options_and_source():
+    assert CompilationCache.key(SOURCE, {"opt_level": 0}) != CompilationCache.key(SOURCE, {"opt_level": 1})
+    assert CompilationCache.key(SOURCE) != CompilationCache.key(SOURCE + "\n")
+
+def test_eviction_keeps_size_without_scanning_every_put(tmp_path):
+    backend = DirectoryBackend(str(tmp_path), max_size=10_000)
+    scans = 0
+    evict = backend.evict
+
+    def counted():
+        nonlocal scans
+        scans += 1
+        evict()
+
+    backend.evict = counted
+    for i in range(1000):
+        backend.put(f"{i:064x}", b"x" * 100)
+    size = sum(path.stat().st_size for path in tmp_path.glob("*/*"))
+    assert size <= backend.max_size
+    assert scans < 100
+    # Самые свежие записи остаются
+    assert backend.get(f"{999:064x}") == b"x" * 100
+
+def test_overwrite_does_not_inflate_total(tmp_path):
+    backend = DirectoryBackend(str(tmp_path), max_size=1_000)
+    for _ in range(50):
+        backend.put("a" * 64, b"x" * 100)
+    assert backend._total == 100
+
+def test_fingerprint_ignores_tests_and_benches():
+    parts = {path.relative_to(COMPILER_ROOT).parts[0] for path in compiler_sources()}
+    assert "codegen" in parts and "parser" in parts
+    assert not parts & {"tests", "bench"}
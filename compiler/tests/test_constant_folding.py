@@ -0,0 +1,118 @@
+"""
+Свёртка констант (semantic.constant_folding) даёт те же значения, что и CIL: свёрнутый
+литерал сравнивается с результатом выполнения того же выражения без оптимизаций
+(bench.cil_sim), а деление на ноль и переменные, переданные в result-параметр, не трогаются.
+"""
+import re
+
+import pytest
+
+from bench.cil_sim import simulate_il
+from bench.sim_runtime import Runtime, RuntimeFault
+from parser.ast import BinaryExpr, ExpressionStatement, LiteralExpr, TypeKind
+from semantic.constant_folding import ConstantFolder, i4
+from toolchain import Toolchain
+
+def compile_il(source: str, opt_level: int) -> str:
+    result = Toolchain(incremental=False, options={"opt_level": opt_level}).compile_source(source)
+    assert not result.errors, result.errors
+    return result.il_code
+
+def run(source: str, opt_level: int) -> str:
+    return simulate_il(compile_il(source, opt_level), Runtime(default_size=(4, 4)), max_steps=100_000).output
+
+def folded(source: str):
+    """Аргументы write(...) программы source после анализа и свёртки"""
+    toolchain = Toolchain(incremental=False)
+    toolchain.lexer.reset(source)
+    toolchain.lexer.tokenize()
+    toolchain.parser.reset(toolchain.lexer.get_token_stream())
+    ast, errors = toolchain.parser.parse()
+    assert not errors
+    toolchain.analyzer.reset()
+    toolchain.analyzer.analyze(ast)
+    ConstantFolder().fold_statements(ast.statements)
+    return [stmt.expr.args[0] for stmt in ast.statements
+            if isinstance(stmt, ExpressionStatement) and getattr(stmt.expr, "func_name", None) == "write"]
+
+# (выражение, значение int32 в CIL)
+INT_CASES = [
+    ("2147483647 + 1", -2147483648),
+    ("0 - 2147483647 - 2", 2147483647),
+    ("65536 * 65536", 0),
+    ("46341 * 46341", -2147479015),
+    ("2147483647 * 2147483647", 1),
+    ("(0 - 7) / 2", -3),
+    ("7 / (0 - 2)", -3),
+    ("(0 - 7) / (0 - 2)", 3),
+    ("(0 - 1) / 2", 0),
+    ("(0 - 2147483647 - 1) / 2", -1073741824),
+]
+
+@pytest.mark.parametrize("expr, expected", INT_CASES, ids=[expr for expr, _ in INT_CASES])
+def test_folded_int_matches_cil(expr, expected):
+    [value] = folded(f"write({expr});")
+    assert isinstance(value, LiteralExpr) and value.type.kind == TypeKind.INT
+    assert value.value == expected == i4(expected)
+    # Без оптимизаций то же значение вычисляет сам CIL
+    assert run(f"write({expr});", 0) == run(f"write({expr});", 1) == str(expected)
+
+@pytest.mark.parametrize("expr", ["x / 0", "1 / 0", "(0 - 2147483647 - 1) / (0 - 1)"])
+def test_throwing_division_is_not_folded(expr):
+    source = f"int x = 5;\nwrite(1);\nwrite({expr});"
+    [_, value] = folded(source)
+    assert isinstance(value, BinaryExpr)
+    for opt_level in (0, 1):
+        assert re.search(r"^\s*div$", compile_il(source, opt_level), re.M)
+        with pytest.raises(RuntimeFault, match="DivideByZeroException|overflow"):
+            run(source, opt_level)
+
+def test_remainder_is_never_folded():
+    # '%' анализатор над int не пропускает, но свёртка не должна вычислять его и сама
+    for divisor in (0, 2, -1):
+        assert ConstantFolder()._evaluate('%', "int", 7, divisor, False) is None
+    assert ConstantFolder()._evaluate('/', "int", 7, 0, False) is None
+    assert ConstantFolder()._evaluate('/', "float", 7, 0, True) is None
+
+COLOR_PROGRAM = """
+image img = create_image(2, 2);
+set_pixel(img, 0, 0, to_color(10, 20, 30));
+set_pixel(img, 1, 0, to_color(10, 20, 30));
+color c = get_pixel(img, 1, 0);
+write(c.r, c.g, c.b);
+write(to_color(1, 2, 3).g);
+"""
+
+def test_color_literal_is_read_from_static_field():
+    il = compile_il(COLOR_PROGRAM, 1)
+    field = "color_10_20_30"
+    assert re.search(rf"\.field private static initonly .* {field}$", il, re.M)
+    # Поле заполняет только .cctor, сам Main его лишь читает
+    cctor = il[il.index(".cctor()"):]
+    cctor = cctor[:cctor.index("\n  }")]
+    assert "stsfld" in cctor and field in cctor
+    main = il[il.index("void Main()"):]
+    main = main[:main.index("\n  }")]
+    assert main.count("ldsfld") == 2 and "stsfld" not in main
+    assert "ToColor" not in main
+    # .g у литерала цвета сворачивается в int
+    value = folded(COLOR_PROGRAM)[-1]
+    assert isinstance(value, LiteralExpr) and value.value == 2
+    assert run(COLOR_PROGRAM, 0) == run(COLOR_PROGRAM, 1)
+
+RESULT_PARAMETER_PROGRAM = """
+proc set_to(result int r) {
+    r = 42;
+}
+int v = 5;
+int w = 7;
+set_to(v);
+write(v + 1);
+write(w + 1);
+"""
+
+def test_variable_passed_to_result_parameter_is_not_propagated():
+    passed, untouched = folded(RESULT_PARAMETER_PROGRAM)
+    assert isinstance(passed, BinaryExpr)
+    assert isinstance(untouched, LiteralExpr) and untouched.value == 8
+    assert run(RESULT_PARAMETER_PROGRAM, 0) == run(RESULT_PARAMETER_PROGRAM, 1) == "438"
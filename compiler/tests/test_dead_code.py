@@ -0,0 +1,144 @@
+"""
+Удаление мёртвого кода (semantic.dead_code) не меняет поведение: программа
+компилируется с -O0 и -O1 и выполняется в bench.cil_sim, вывод должен совпасть.
+Программы - случаи, где CallGraph или _prune могли бы удалить живой код.
+"""
+import re
+
+import pytest
+
+from bench.cil_sim import simulate_source
+from bench.sim_runtime import Runtime, RuntimeFault
+from toolchain import Toolchain
+
+def compile_il(source: str, opt_level: int) -> str:
+    result = Toolchain(incremental=False, options={"opt_level": opt_level}).compile_source(source)
+    assert not result.errors, result.errors
+    return result.il_code
+
+def outcome(source: str, opt_level: int) -> str:
+    """Вывод программы; исключение дописывается в конец"""
+    toolchain = Toolchain(incremental=False, options={"opt_level": opt_level})
+    runtime = Runtime(default_size=(4, 4))
+    try:
+        result, simulation = simulate_source(source, toolchain, runtime, max_steps=1_000_000)
+    except RuntimeFault as e:
+        return f"{runtime.text}fault: {e}"
+    assert not result.errors, result.errors
+    return simulation.output
+
+# Square::area вызывается только через получатель статического типа Shape
+OVERRIDE_VIA_BASE = """
+struct Shape {
+    public int size;
+    public proc resize(int v) { this.size = v; }
+    public virtual proc area() -> int { return this.size; }
+}
+struct Square extends Shape {
+    public override proc area() -> int { return 9; }
+}
+proc unused_proc(value int v) -> int { return v * 3; }
+Shape s = new Square();
+s.resize(4);
+write(s.area());
+"""
+
+# Метод родителя на объекте-потомке: describe есть только у Shape, а this.area()
+# внутри него попадает в Square::area
+PARENT_METHOD_ON_CHILD = """
+struct Shape {
+    public int size;
+    public proc resize(int v) { this.size = v; }
+    public virtual proc area() -> int { return this.size; }
+    public proc describe() -> int { return this.area() * 10 + this.size; }
+}
+struct Square extends Shape {
+    public override proc area() -> int { return 9; }
+}
+Shape child = new Square();
+child.resize(2);
+write(child.describe());
+write(" ");
+Shape base = new Shape();
+base.resize(3);
+write(base.describe());
+"""
+
+# norm и offset вызывает только конструктор
+REACHED_VIA_CONSTRUCTOR = """
+struct Helper {
+    public int v;
+    public proc Helper(int v) { this.v = this.norm(v) + offset(v); }
+    public proc norm(int v) -> int { return v * 2; }
+}
+proc offset(value int v) -> int { return v + 100; }
+Helper h = new Helper(1);
+write(h.v);
+"""
+
+LITERAL_IF = """
+int x = 1;
+if (true) then { x = x + 10; } else { x = x + 100; }
+if (false) then { x = x + 1000; } else { x = x + 5; }
+if (1 > 2) then { write("never"); }
+write(x);
+"""
+
+# Условие for ложно, но инициализатор выполняется ровно один раз
+FALSE_FOR_WITH_INIT = """
+int calls = 0;
+proc tick(result int n) -> int {
+    n = n + 1;
+    return n;
+}
+for (int i = tick(calls); false; i = i + 1) {
+    write("never");
+}
+for (int j = tick(calls); 1 > 2; j = j + 1) {
+    write("never");
+}
+write(calls);
+"""
+
+CODE_AFTER_RETURN = """
+proc early(value int v) -> int {
+    write("a");
+    if (v > 0) then {
+        return v + 1;
+        write("b");
+    }
+    return 0 - v;
+    write("c");
+}
+write(early(1));
+write(early(0 - 3));
+"""
+
+CASES = {
+    "override via base receiver": (OVERRIDE_VIA_BASE, "9"),
+    "parent method on child": (PARENT_METHOD_ON_CHILD, "92 33"),
+    "reached via constructor": (REACHED_VIA_CONSTRUCTOR, "103"),
+    "literal if with else": (LITERAL_IF, "16"),
+    "false for with init": (FALSE_FOR_WITH_INIT, "2"),
+    "code after return": (CODE_AFTER_RETURN, "a2a3"),
+}
+
+@pytest.mark.parametrize("name", CASES)
+def test_dead_code_removal_keeps_behaviour(name):
+    source, expected = CASES[name]
+    assert outcome(source, 0) == outcome(source, 1) == expected
+
+def methods_of(il: str, struct: str):
+    body = il[il.index(f"beforefieldinit {struct} "):]
+    body = body[:body.index("\n  }")]
+    return re.findall(r"\.method .* (\w+)\(", body)
+
+def test_unreachable_proc_is_dropped_and_override_kept():
+    o0, o1 = compile_il(OVERRIDE_VIA_BASE, 0), compile_il(OVERRIDE_VIA_BASE, 1)
+    assert "unused_proc" in o0 and "unused_proc" not in o1
+    assert "area" in methods_of(o1, "Square") and "area" in methods_of(o1, "Shape")
+
+def test_statements_after_return_are_dropped():
+    o0, o1 = compile_il(CODE_AFTER_RETURN, 0), compile_il(CODE_AFTER_RETURN, 1)
+    assert '"b"' in o0 and '"c"' in o0
+    assert '"b"' not in o1 and '"c"' not in o1
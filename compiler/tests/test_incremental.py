@@ -0,0 +1,28 @@
+"""Кэш объявлений (codegen.incremental) в долгоживущем Toolchain: правки исходника подряд"""
+import gc
+
+from bench.generator import generate_program
+from parser.ast import SourceLines
+from toolchain import Toolchain
+
+def revisions(count: int):
+    base = generate_program(seed=3, procs=8)
+    return [f"{base}\nwrite({i});\n" for i in range(count)]
+
+def test_cache_does_not_pin_old_revisions():
+    toolchain = Toolchain(options={"opt_level": 1})
+    sources = revisions(5)
+    for source in sources:
+        assert not toolchain.compile_source(source).errors
+    assert toolchain.decl_cache.hits > 0
+    gc.collect()
+    alive = [lines for lines in gc.get_objects() if isinstance(lines, SourceLines) and lines._text in sources]
+    # Живы только позиции последней ревизии (её AST ещё у Toolchain)
+    assert {sources.index(lines._text) for lines in alive} <= {len(sources) - 1}
+
+def test_cached_methods_give_same_il():
+    toolchain = Toolchain(options={"opt_level": 1})
+    for source in revisions(3):
+        incremental = toolchain.compile_source(source).il_code
+        fresh = Toolchain(incremental=False, options={"opt_level": 1}).compile_source(source).il_code
+        assert incremental == fresh
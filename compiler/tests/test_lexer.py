@@ -0,0 +1,73 @@
+"""
+Дифференциальная проверка табличного лексера (lexer/fast_lexer.py) против ImgLangLexer:
+у каждого токена совпадают тип, текст, строка, столбец, смещения, индекс и канал,
+у каждой ошибки - позиция и сообщение.
+"""
+import random
+
+import pytest
+
+from lexer.lexer import ImgLexer
+from programs import example_sources, generated_sources
+
+FRAGMENTS = list('abz_09 \t\r\n"/*&|<>=!-+.,;(){}%é@#\\\'') + [
+    "proc", "while", "read_float", "/*", "*/", "//", "&&", "||", '"x"', "1.5", "->", "**", "<=", "!=",
+]
+
+EDGE_CASES = [
+    # Незакрытый /* - не комментарий, а '/' и '*'
+    "/* open", "a /* x */ b /* y", "/*", "x = 1; /* never\nclosed", "*/ a */",
+    # Идентификаторы, начинающиеся с ключевого слова
+    "procx whileLoop read_floaty int_ truex iff for1 image2 structure",
+    "proc while read_float if for image struct true",
+    # Ошибки: пропущенные символы и незакрытые строки
+    "a @# b", '"abc', "x = 'c'; é", "a\r\nb\t@", '"one\ntwo"', "#\n#\n  @@",
+    # Числа, операторы и комментарии
+    "1.5.3 ..", "1. .5 007", "a->b**c<=d!=e&&f||g", "// comment only", "x // tail\ny",
+    "", "\n\n", " \t\r\n",
+]
+
+def lex(source: str, engine: str):
+    tokens, errors = ImgLexer(source, engine).tokenize()
+    return (
+        [(t.type, t.text, t.line, t.column, t.start, t.stop, t.tokenIndex, t.channel) for t in tokens],
+        [(e.location.line, e.location.column, e.message) for e in errors],
+    )
+
+def fuzz_sources(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    originals = [source for _, source in example_sources()]
+    sources = []
+    for _ in range(count // 10):
+        chars = list(rng.choice(originals))
+        for _ in range(5):
+            chars[rng.randrange(len(chars))] = rng.choice(FRAGMENTS)
+        sources.append("".join(chars))
+    for _ in range(count):
+        sources.append("".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 40))))
+    return sources
+
+PROGRAMS = example_sources() + generated_sources(4, procs=4, structs=2)
+
+@pytest.mark.parametrize("name, source", PROGRAMS, ids=[name for name, _ in PROGRAMS])
+def test_programs(name, source):
+    assert lex(source, "fast") == lex(source, "antlr")
+
+@pytest.mark.parametrize("source", EDGE_CASES)
+def test_edge_cases(source):
+    assert lex(source, "fast") == lex(source, "antlr")
+
+def test_edge_cases_cover_claimed_behaviour():
+    tokens, errors = lex("/* open", "fast")
+    assert [text for _, text, *_ in tokens] == ["/", "*", "open", "<EOF>"]
+    tokens, _ = lex("procx whileLoop", "fast")
+    assert [text for _, text, *_ in tokens[:2]] == ["procx", "whileLoop"]
+    assert tokens[0][0] == tokens[1][0] == lex("x", "antlr")[0][0][0]
+    _, errors = lex("a @# b", "fast")
+    assert errors == [(1, 3, "token recognition error at: '@'"), (1, 4, "token recognition error at: '#'")]
+    _, errors = lex('x "abc', "fast")
+    assert errors == [(1, 3, "token recognition error at: '\"abc'")]
+
+def test_fuzz():
+    mismatches = [source for source in fuzz_sources(600) if lex(source, "fast") != lex(source, "antlr")]
+    assert not mismatches, mismatches[:3]
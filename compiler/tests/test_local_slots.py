@@ -0,0 +1,148 @@
+"""
+Распределение локальных по слотам (codegen.local_slots): программы дают тот же вывод
+при -O0 и -O1, а на собранных вручную методах проверяются закреплённые ldloca слоты и
+удаление записей без чтений.
+"""
+import re
+
+import pytest
+
+from bench.cil_sim import simulate_il
+from bench.sim_runtime import Runtime
+from codegen.cil_emitter import CILMethod, CILVariable
+from codegen.cil_instructions import Instruction, MethodRef, OpCode
+from codegen.local_slots import allocate_locals
+from programs import EXAMPLES_DIR
+from toolchain import Toolchain
+
+def compile_il(source: str, opt_level: int) -> str:
+    result = Toolchain(incremental=False, options={"opt_level": opt_level}).compile_source(source)
+    assert not result.errors, result.errors
+    return result.il_code
+
+def run(source: str, opt_level: int) -> str:
+    return simulate_il(compile_il(source, opt_level), Runtime(default_size=(4, 4)), max_steps=1_000_000).output
+
+def locals_count(il: str, method: str) -> int:
+    body = il[il.index(f" {method}("):]
+    declared = re.search(r"\.locals init \(([^)]*)\)", body[:body.index("\n  }")])
+    return len(declared.group(1).split(",")) if declared else 0
+
+# Каждое чтение компоненты цвета заводит временную: их слоты общие, пока цвета разные
+COLOR_COMPONENTS = """
+image img = create_image(2, 2);
+set_pixel(img, 0, 0, to_color(10, 20, 30));
+set_pixel(img, 1, 0, to_color(1, 2, 3));
+int total = 0;
+for (int x = 0; x < 2; x = x + 1) {
+    color c = (color) get_pixel(img, x, 0);
+    color d = (color) get_pixel(img, 1 - x, 0);
+    total = total + c.r * 100 + c.g * 10 + c.b - d.r - d.g - d.b;
+}
+write(total);
+"""
+
+# a и b живут одновременно и не могут делить слот; s и t из разных блоков - могут
+LIVE_RANGES = """
+proc mix(value int n) -> int {
+    int a = n + 1;
+    int b = n + 2;
+    int acc = a * 10 + b;
+    a = b + acc;
+    acc = acc + a;
+    if (n > 0) then {
+        int s = acc + 1;
+        acc = s * 2;
+    } else {
+        int t = acc - 1;
+        acc = t * 3;
+    }
+    for (int i = 0; i < 2; i = i + 1) {
+        int u = i + acc;
+        acc = u;
+    }
+    for (int j = 0; j < 2; j = j + 1) {
+        int v = acc - j;
+        acc = v + b;
+    }
+    return acc;
+}
+write(mix(1));
+write(" ");
+write(mix(0));
+"""
+
+# r и q получают адрес (result-параметр): их слоты ни с кем не делятся, даже если
+# между записью и чтением они кажутся мёртвыми
+RESULT_ARGUMENTS = """
+proc set_to(value int v, result int r) {
+    r = v;
+}
+proc pair() -> int {
+    int first = 5;
+    write(first);
+    int r;
+    set_to(7, r);
+    int second = 9;
+    write(second);
+    int q;
+    set_to(second + 1, q);
+    int third = r + q;
+    write(third);
+    return r * 100 + q;
+}
+write(" ");
+write(pair());
+"""
+
+# (программа, метод, в котором слоты должны стать общими, вывод)
+CASES = {
+    "color components": (COLOR_COMPONENTS, "Main", "1287"),
+    "live ranges": (LIVE_RANGES, "mix", "106 79"),
+    "result arguments": (RESULT_ARGUMENTS, "pair", " 5917710"),
+}
+
+@pytest.mark.parametrize("name", CASES)
+def test_slot_sharing_keeps_behaviour(name):
+    source, shared_in, expected = CASES[name]
+    assert run(source, 0) == run(source, 1) == expected
+    assert locals_count(compile_il(source, 1), shared_in) < locals_count(compile_il(source, 0), shared_in)
+
+def test_brighten_loop_shares_slots():
+    source = (EXAMPLES_DIR / "correct_examples" / "correct_Brighten.imgl").read_text(encoding="utf-8")
+    assert locals_count(compile_il(source, 0), "brighten") == 20
+    assert locals_count(compile_il(source, 1), "brighten") == 8
+
+WRITE = MethodRef("void", "[ImgLangRuntime]Runtime", "Write", ("int32",))
+SET_TO = MethodRef("void", "", "set_to", ("int32&",))
+
+def method(code, count):
+    return CILMethod("M", "void", [], locals=[CILVariable(f"v{i}", "int32", "int", i) for i in range(count)],
+                     instructions=list(code))
+
+def test_address_taken_local_keeps_own_slot():
+    # v0 пишется процедурой по адресу, v1 живёт после последнего чтения v0 - но слот не общий
+    code = [Instruction(OpCode.LDLOCA_S, 0), Instruction(OpCode.CALL, SET_TO),
+            Instruction(OpCode.LDLOC_0), Instruction(OpCode.CALL, WRITE),
+            Instruction(OpCode.LDC_I4_1), Instruction(OpCode.STLOC_1),
+            Instruction(OpCode.LDLOC_1), Instruction(OpCode.CALL, WRITE),
+            Instruction(OpCode.LDC_I4_2), Instruction(OpCode.STLOC_2),
+            Instruction(OpCode.LDLOC_2), Instruction(OpCode.CALL, WRITE), Instruction(OpCode.RET)]
+    m = method(code, 3)
+    assert allocate_locals(m) == 1
+    assert [ins.opcode for ins in m.instructions[:3]] == [OpCode.LDLOCA_S, OpCode.CALL, OpCode.LDLOC_0]
+    # v1 и v2 делят слот 1, слот 0 остаётся за v0
+    assert {ins.opcode for ins in m.instructions[4:]} & {OpCode.STLOC_0, OpCode.LDLOC_0} == set()
+
+def test_dead_store_becomes_pop():
+    code = [Instruction(OpCode.CALL, MethodRef("int32", "", "f")), Instruction(OpCode.STLOC_0),
+            Instruction(OpCode.LDC_I4_5), Instruction(OpCode.STLOC_1),
+            Instruction(OpCode.LDC_I4_1), Instruction(OpCode.STLOC_2),
+            Instruction(OpCode.LDLOC_2), Instruction(OpCode.CALL, WRITE), Instruction(OpCode.RET)]
+    m = method(code, 3)
+    allocate_locals(m)
+    # Результат вызова снимается pop, чистая константа пропадает вместе с записью
+    assert m.instructions == [Instruction(OpCode.CALL, MethodRef("int32", "", "f")), Instruction(OpCode.POP),
+                              Instruction(OpCode.LDC_I4_1), Instruction(OpCode.STLOC_0),
+                              Instruction(OpCode.LDLOC_0), Instruction(OpCode.CALL, WRITE), Instruction(OpCode.RET)]
+    assert len(m.locals) == 1
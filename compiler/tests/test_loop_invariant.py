@@ -0,0 +1,140 @@
+"""
+Вынос инвариантов из циклов (semantic.loop_invariant) не меняет поведение: каждая
+программа компилируется с -O0 и -O1 и выполняется в bench.cil_sim, вывод (или
+исключение) должен совпасть. Программы - случаи, где вынос был бы ошибкой.
+"""
+import pytest
+
+from bench.cil_sim import simulate_il
+from bench.sim_runtime import Runtime, RuntimeFault
+from toolchain import Toolchain
+
+def outcome(source: str, opt_level: int) -> str:
+    """Вывод программы; исключение дописывается в конец"""
+    result = Toolchain(incremental=False, options={"opt_level": opt_level}).compile_source(source)
+    assert not result.errors, result.errors
+    runtime = Runtime(default_size=(4, 4))
+    try:
+        return simulate_il(result.il_code, runtime, max_steps=1_000_000).output
+    except RuntimeFault as e:
+        return f"{runtime.text}fault: {e}"
+
+# get_pixel из одного изображения, set_pixel в другое: по именам не видно, что это разные изображения
+DIFFERENT_IMAGE = """
+proc sum00(value image a, value image b, value int n) -> int {
+    int s = 0;
+    for (int i = 0; i < n; i = i + 1) {
+        color c = (color) get_pixel(a, 0, 0);
+        s = s + c.r;
+        set_pixel(b, 0, 0, (pixel) to_color(i * 10, i, i));
+    }
+    return s;
+}
+image img = create_image(2, 2);
+image out = create_image(2, 2);
+set_pixel(img, 0, 0, (pixel) to_color(7, 0, 0));
+write(sum00(img, out, 4));
+write(" ");
+color last = (color) get_pixel(out, 0, 0);
+write(last.r);
+"""
+
+# Та же процедура, но оба параметра - одно изображение: get_pixel в цикле не инвариантен
+ALIASED_IMAGE = """
+proc sum00(value image a, value image b, value int n) -> int {
+    int s = 0;
+    for (int i = 0; i < n; i = i + 1) {
+        color c = (color) get_pixel(a, 0, 0);
+        s = s + c.r;
+        set_pixel(b, 0, 0, (pixel) to_color(i * 10, i, i));
+    }
+    return s;
+}
+image img = create_image(2, 2);
+image alias = img;
+set_pixel(img, 0, 0, (pixel) to_color(7, 0, 0));
+write(sum00(img, alias, 4));
+write(" ");
+write(sum00(img, img, 4));
+"""
+
+# Запись в b меняет a, если вызывающий передал одну переменную в оба result-параметра
+ALIASED_RESULT_PARAMETERS = """
+proc both(result int a, result int b) {
+    int i = 0;
+    while (i < 3) {
+        b = a * 2 + 1;
+        i = i + 1;
+    }
+}
+int p = 1;
+int q = 1;
+int r = 1;
+both(p, p);
+write(p);
+write(" ");
+both(q, r);
+write(q, r);
+"""
+
+# Поле меняет метод, вызванный в цикле: this.k и c.k не инвариантны
+FIELD_WRITTEN_BY_METHOD = """
+struct Counter {
+    public int k;
+    public proc Counter(int k) { this.k = k; }
+    public proc bump() { this.k = this.k + 1; }
+    public proc grow(int n) -> int {
+        int s = 0;
+        int i = 0;
+        while (i < n) {
+            s = s + this.k * 10;
+            this.bump();
+            i = i + 1;
+        }
+        return s;
+    }
+}
+Counter c = new Counter(3);
+write(c.grow(3));
+write(" ");
+int t = 0;
+for (int i = 0; i < 3; i = i + 1) {
+    t = t + c.k * 2;
+    c.bump();
+}
+write(t);
+"""
+
+# Деление на d инвариантно, но цикл с n = 0 не выполняется ни разу и не должен бросать
+ZERO_TRIP_DIVISION = """
+proc quotient(value int d, value int n) -> int {
+    int s = 0;
+    int i = 0;
+    while (i < n) {
+        s = s + 100 / d;
+        i = i + 1;
+    }
+    for (int j = 0; j < n; j = j + 1) {
+        s = s + 1000 / d;
+    }
+    return s;
+}
+write(quotient(0, 0));
+write(" ");
+write(quotient(5, 3));
+write(" ");
+write(quotient(0, 1));
+"""
+
+CASES = {
+    "different image": (DIFFERENT_IMAGE, "28 30"),
+    "aliased image": (ALIASED_IMAGE, "37 60"),
+    "aliased result parameters": (ALIASED_RESULT_PARAMETERS, "15 13"),
+    "field written by method": (FIELD_WRITTEN_BY_METHOD, "120 42"),
+    "zero-trip division": (ZERO_TRIP_DIVISION, "0 660 fault: DivideByZeroException"),
+}
+
+@pytest.mark.parametrize("name", CASES)
+def test_hoisting_keeps_behaviour(name):
+    source, expected = CASES[name]
+    assert outcome(source, 0) == outcome(source, 1) == expected
@@ -0,0 +1,152 @@
+"""
+Эквивалентность рукописного парсера (parser/direct_parser.py) и ANTLR + ASTBuilder:
+AST совпадают вместе с SourceInfo и SourceDigest, а на входе с синтаксической ошибкой
+рукописный парсер отказывается от разбора и ImgParser выдаёт ровно те же SyntaxError
+(сообщение, строка, столбец), что и путь через ANTLR.
+"""
+import random
+
+import pytest
+
+from antlr.ImgLangParser import ImgLangParser
+from lexer.lexer import ImgLexer
+from parser.ast import Assignment, BinaryExpr, CastExpr
+from parser.direct_parser import DirectParseError, parse_tokens
+from parser.parser import ImgParser
+from programs import example_sources, generated_sources
+
+# Места, где выбор альтернативы ANTLR неочевиден
+EDGE_CASES = [
+    "x = 1;", "x = 1, 2;", "x, y = 1, 2;", "x, y = 1;",
+    "this.x = 5;", "a.b = 5;", "a.b.c = 5;", "a.m(1).c = 5;", "a + b.x = 5;", "(a).x = 1;",
+    "(int) a.b = 5;", "super(1, 2);", "super.m(1);", "foo(1);", "foo(1).x;", "write(\"a\");",
+    "y = (x) - z;", "y = (x) -z * 2;", "y = (x) !z;", "y = (x)(z);", "y = (x) z + 1;",
+    "y = (x) 5;", "y = (int) a + b * c;", "y = a * (float) b + c;", "y = (a + b) * c;",
+    "y = -a ** 2 ** b;", "y = !a && b || c == d != e < f;", "y = a - - b;",
+    "y = a < b < c;", "y = new P(1, 2).x;", "y = (x).m();", "y = read_float();",
+    "Foo f = new Foo();", "int a, b = 2, c;", "if (a) then { } else { };", "if (a) begin end",
+    "do { x = 1; } until (x > 2);", "for (int i = 0; i < 10; i = i + 1) { }",
+    "for (i = 0; i < 10; i = i + 1) begin end", "return;", "proc f() { res = 1; }",
+    "proc f() -> int { return 1; }", "proc g(value int a, result float b, Foo c) { }",
+    "struct A { public int x; private proc m() { } }",
+    "struct B extends A { protected virtual proc m() -> int { return this.x; } public override proc n(int a) { super.n(a); } };",
+    "", "x", "x = ;", "(x) = 1;", "y = (x);", "a.b;", "this;", "super;",
+]
+
+FRAGMENTS = [
+    "(", ")", "{", "}", ";", ",", ".", "=", "-", "!", "+", "*", "**", "&&", "||", "==", "<",
+    "x", "Foo", "1", "2.5", '"s"', "true", "this", "super", "new", "int", "proc", "return",
+    "if", "else", "then", "begin", "end", "struct", "public", "virtual", "write", "->",
+]
+
+BINARY_OPS = ["||", "&&", "==", "!=", "<", ">", "<=", ">=", "+", "-", "*", "/", "%", "**"]
+ATOMS = ["x", "y", "1", "2.5", '"s"', "true", "this", "super", "f()", "new P(1)", "clamp(x, 0, 1)"]
+
+def random_expression(rng: random.Random, depth: int) -> str:
+    """Случайное выражение: проверка приоритетов, приведений типа и цепочек '.'"""
+    choice = rng.random()
+    if depth <= 0 or choice < 0.2:
+        return rng.choice(ATOMS)
+    if choice < 0.55:
+        return f"{random_expression(rng, depth - 1)} {rng.choice(BINARY_OPS)} {random_expression(rng, depth - 1)}"
+    if choice < 0.65:
+        return f"{rng.choice(['-', '!'])}{random_expression(rng, depth - 1)}"
+    if choice < 0.75:
+        return f"({random_expression(rng, depth - 1)})"
+    if choice < 0.85:
+        return f"({rng.choice(['int', 'float', 'x', 'Foo'])}) {random_expression(rng, depth - 1)}"
+    if choice < 0.95:
+        return f"{random_expression(rng, depth - 1)}.{rng.choice(['a', 'm(1)', 'n()'])}"
+    return f"g({random_expression(rng, depth - 1)}, {random_expression(rng, depth - 1)})"
+
+def mutate(rng: random.Random, source: str) -> str:
+    """Вставляет, заменяет или удаляет 1-3 токена"""
+    texts = [t.text for t in ImgLexer(source).tokenize()[0][:-1]]
+    for _ in range(rng.randint(1, 3)):
+        i = rng.randrange(len(texts) + 1)
+        choice = rng.random()
+        if choice < 0.3 and i < len(texts):
+            del texts[i]
+        elif choice < 0.6 and i < len(texts):
+            texts[i] = rng.choice(FRAGMENTS)
+        else:
+            texts.insert(i, rng.choice(FRAGMENTS))
+    return " ".join(texts)
+
+def parse(source: str, engine: str):
+    """(AST, [(строка, столбец, сообщение)]) через ImgParser с выбранным движком"""
+    lexer = ImgLexer(source)
+    tokens, errors = lexer.tokenize()
+    assert not errors, source
+    ast, errors = ImgParser(lexer.get_token_stream(), engine=engine).parse()
+    return ast, [(e.location.line, e.location.column, e.message) for e in errors]
+
+def parse_direct(source: str):
+    """AST рукописного парсера или None, если он отказался от разбора"""
+    try:
+        return parse_tokens(ImgLexer(source).tokenize()[0])
+    except DirectParseError:
+        return None
+
+def check(source: str):
+    expected, expected_errors = parse(source, "antlr")
+    actual, actual_errors = parse(source, "direct")
+    assert actual == expected, source
+    assert actual_errors == expected_errors, source
+    assert (parse_direct(source) is None) == bool(expected_errors), source
+    return expected_errors
+
+PROGRAMS = example_sources("correct_examples") + generated_sources(5, procs=3)
+SYNTAX_ERRORS = example_sources("syntax_erorr_examples")
+
+@pytest.mark.parametrize("name, source", PROGRAMS, ids=[name for name, _ in PROGRAMS])
+def test_programs(name, source):
+    assert not check(source)
+
+@pytest.mark.parametrize("source", EDGE_CASES)
+def test_edge_cases(source):
+    check(source)
+
+def test_ambiguous_cases_keep_antlr_choice():
+    # (x) - y - вычитание из выражения в скобках, а не приведение -y к типу x
+    value = parse_direct("y = (x) - z;").statements[0].value
+    assert isinstance(value, BinaryExpr) and value.op == "-"
+    # Приведение захватывает всё выражение справа, а не только первый операнд
+    value = parse_direct("y = (int) a + b * c;").statements[0].value
+    assert isinstance(value, CastExpr) and isinstance(value.expr, BinaryExpr) and value.expr.op == "+"
+    # Множественное присваивание молча отбрасывается
+    assert parse_direct("x = 1, 2;").statements == []
+    assert parse_direct("x, y = 1, 2;").statements == []
+    assert isinstance(parse_direct("x = 1;").statements[0], Assignment)
+
+@pytest.mark.parametrize("name, source", SYNTAX_ERRORS, ids=[name for name, _ in SYNTAX_ERRORS])
+def test_syntax_errors_match_antlr(name, source):
+    assert check(source)
+
+def test_random_expressions():
+    rng = random.Random(1)
+    for _ in range(300):
+        check(f"z = {random_expression(rng, 4)};")
+
+def test_mutations():
+    rng = random.Random(1)
+    # Сгенерированные программы длинные: ANTLR разбирал бы каждую мутацию дважды
+    originals = [source for _, source in example_sources()] + [s for s in EDGE_CASES if s]
+    rejected = 0
+    for _ in range(300):
+        source = mutate(rng, rng.choice(originals))
+        if not ImgLexer(source).tokenize()[1]:
+            rejected += bool(check(source))
+    # Мутации должны проверять и путь с откатом на ANTLR
+    assert rejected > 50
+
+def test_error_recovery_keeps_atn_cache():
+    # sync() рантайма ANTLR дописывал множество восстановления в закэшированный
+    # atn.nextTokens(s), и сообщения зависели от ранее разобранных файлов
+    for _, source in SYNTAX_ERRORS:
+        parse(source, "antlr")
+    atn = ImgLangParser.atn
+    cached = [s for s in atn.states if s is not None and s.nextTokenWithinRule is not None]
+    assert cached
+    for state in cached:
+        assert state.nextTokenWithinRule.intervals == atn.nextTokensInContext(state, None).intervals
@@ -0,0 +1,87 @@
+"""Правила codegen.peephole на собранных вручную списках инструкций"""
+from codegen.cil_emitter import CILMethod, CILVariable
+from codegen.cil_instructions import Instruction, MethodRef, OpCode
+from codegen.peephole import optimize_method
+
+WRITE = MethodRef("void", "[ImgLangRuntime]Runtime", "Write", ("int32",))
+
+def op(opcode: OpCode, operand=None, label=None) -> Instruction:
+    return Instruction(opcode, operand, label)
+
+def label(name: str) -> Instruction:
+    return Instruction(OpCode.LABEL, label=name)
+
+def optimized(code, parameters=(), locals_count=2):
+    method = CILMethod("M", "void", [("int32", name) for name in parameters],
+                       locals=[CILVariable(f"v{i}", "int32", "int", i) for i in range(locals_count)],
+                       instructions=list(code))
+    optimize_method(method)
+    return method.instructions
+
+def test_parameter_copy_is_replaced_by_argument():
+    code = [op(OpCode.LDARG_0), op(OpCode.STLOC_0),
+            op(OpCode.LDLOC_0), op(OpCode.LDLOC_0), op(OpCode.ADD), op(OpCode.CALL, WRITE), op(OpCode.RET)]
+    assert optimized(code, ["a"]) == [op(OpCode.LDARG_0), op(OpCode.LDARG_0), op(OpCode.ADD),
+                                      op(OpCode.CALL, WRITE), op(OpCode.RET)]
+
+def test_parameter_copy_written_later_is_kept():
+    code = [op(OpCode.LDARG_0), op(OpCode.STLOC_0),
+            op(OpCode.LDC_I4_1), op(OpCode.STLOC_0), op(OpCode.LDLOC_1), op(OpCode.CALL, WRITE),
+            op(OpCode.LDLOC_0), op(OpCode.CALL, WRITE), op(OpCode.RET)]
+    assert optimized(code, ["a"]) == code
+
+def test_store_load_becomes_dup_store():
+    code = [op(OpCode.LDC_I4_5), op(OpCode.STLOC_0), op(OpCode.LDLOC_0), op(OpCode.CALL, WRITE),
+            op(OpCode.LDLOC_0), op(OpCode.CALL, WRITE), op(OpCode.RET)]
+    assert optimized(code) == [op(OpCode.LDC_I4_5), op(OpCode.DUP), op(OpCode.STLOC_0), op(OpCode.CALL, WRITE),
+                               op(OpCode.LDLOC_0), op(OpCode.CALL, WRITE), op(OpCode.RET)]
+
+def test_store_load_of_single_use_local_disappears():
+    code = [op(OpCode.LDC_I4_5), op(OpCode.STLOC_0), op(OpCode.LDLOC_0), op(OpCode.CALL, WRITE), op(OpCode.RET)]
+    assert optimized(code) == [op(OpCode.LDC_I4_5), op(OpCode.CALL, WRITE), op(OpCode.RET)]
+
+def test_store_load_across_label_is_kept():
+    # На метку L приходят и по переходу: ldloc.0 там читает не только что записанное значение
+    code = [op(OpCode.LDC_I4_1), op(OpCode.STLOC_0), label("L"),
+            op(OpCode.LDLOC_0), op(OpCode.CALL, WRITE), op(OpCode.LDLOC_1), op(OpCode.BRTRUE, label="L"),
+            op(OpCode.RET)]
+    assert optimized(code) == code
+
+def test_negated_compare_branch():
+    code = [op(OpCode.LDLOC_0), op(OpCode.LDLOC_1), op(OpCode.CEQ), op(OpCode.LDC_I4_0), op(OpCode.CEQ),
+            op(OpCode.BRFALSE, label="L"), op(OpCode.LDC_I4_1), op(OpCode.CALL, WRITE), label("L"), op(OpCode.RET)]
+    assert optimized(code) == [op(OpCode.LDLOC_0), op(OpCode.LDLOC_1), op(OpCode.CEQ),
+                               op(OpCode.BRTRUE, label="L"), op(OpCode.LDC_I4_1), op(OpCode.CALL, WRITE),
+                               label("L"), op(OpCode.RET)]
+
+def test_negated_compare_branch_across_label_is_kept():
+    code = [op(OpCode.LDLOC_0), op(OpCode.LDC_I4_0), op(OpCode.CEQ), label("M"),
+            op(OpCode.BRFALSE, label="L"), op(OpCode.LDC_I4_1), op(OpCode.BR, label="M"),
+            label("L"), op(OpCode.RET)]
+    assert optimized(code) == code
+
+def test_branch_over_branch():
+    code = [op(OpCode.LDLOC_0), op(OpCode.BRFALSE, label="L"), op(OpCode.BR, label="M"),
+            label("L"), op(OpCode.LDC_I4_1), op(OpCode.CALL, WRITE), label("M"), op(OpCode.RET)]
+    assert optimized(code) == [op(OpCode.LDLOC_0), op(OpCode.BRTRUE, label="M"),
+                               op(OpCode.LDC_I4_1), op(OpCode.CALL, WRITE), label("M"), op(OpCode.RET)]
+
+def test_jump_to_jump_is_threaded():
+    code = [op(OpCode.LDLOC_0), op(OpCode.BRTRUE, label="A"), op(OpCode.LDC_I4_1), op(OpCode.CALL, WRITE),
+            op(OpCode.RET), label("A"), op(OpCode.BR, label="B"), label("B2"), op(OpCode.RET),
+            label("B"), op(OpCode.LDC_I4_2), op(OpCode.CALL, WRITE), op(OpCode.BR, label="B2")]
+    result = optimized(code)
+    assert result[1] == op(OpCode.BRTRUE, label="B")
+    # Метка A больше никому не нужна, br B за ней недостижим
+    assert label("A") not in result and op(OpCode.BR, label="B") not in result
+
+def test_branch_to_next_instruction_is_removed():
+    code = [op(OpCode.LDLOC_0), op(OpCode.CALL, WRITE), op(OpCode.BR, label="L"), label("L"), op(OpCode.RET)]
+    assert optimized(code) == [op(OpCode.LDLOC_0), op(OpCode.CALL, WRITE), op(OpCode.RET)]
+
+def test_unreachable_code_is_removed():
+    code = [op(OpCode.LDLOC_0), op(OpCode.BRTRUE, label="L"), op(OpCode.RET),
+            op(OpCode.LDC_I4_1), op(OpCode.CALL, WRITE), label("Dead"), op(OpCode.LDC_I4_2), op(OpCode.CALL, WRITE),
+            label("L"), op(OpCode.LDC_I4_3), op(OpCode.CALL, WRITE), op(OpCode.RET)]
+    assert optimized(code) == [op(OpCode.LDLOC_0), op(OpCode.BRTRUE, label="L"), op(OpCode.RET),
+                               label("L"), op(OpCode.LDC_I4_3), op(OpCode.CALL, WRITE), op(OpCode.RET)]
@@ -0,0 +1,80 @@
+"""
+Короткое вычисление && и ||: правый операнд с наблюдаемым эффектом (печать, запись в
+result-параметр) не выполняется, если результат решил левый, - в условиях и в значениях,
+при -O0 и -O1.
+"""
+import pytest
+
+from bench.cil_sim import simulate_il
+from bench.sim_runtime import Runtime
+from toolchain import Toolchain
+
+def run(source: str, opt_level: int):
+    result = Toolchain(incremental=False, options={"opt_level": opt_level}).compile_source(source)
+    assert not result.errors, result.errors
+    return simulate_il(result.il_code, Runtime(default_size=(4, 4)), max_steps=1_000_000)
+
+SIDE_EFFECTS = """
+int calls = 0;
+proc probe(value int v) -> bool {
+    write(v);
+    return v > 2;
+}
+proc bump(result int n) -> bool {
+    n = n + 1;
+    return true;
+}
+bool a = probe(1) && probe(5);
+bool b = probe(3) || probe(6);
+bool c = false && probe(7);
+bool d = true || probe(8);
+write(a, b, c, d);
+write("|");
+bool e = calls > 0 && bump(calls);
+bool f = calls == 0 || bump(calls);
+write(calls);
+bool g = calls == 0 && bump(calls);
+write(calls);
+write("|");
+if (probe(0) && probe(9)) then { write("no"); }
+if (probe(4) || probe(9)) then { write("yes"); }
+int i = 0;
+while (i < 3 && probe(i)) {
+    i = i + 1;
+}
+int k = 0;
+do {
+    k = k + 1;
+} until (k >= 2 || probe(k + 10));
+write("|");
+write(probe(1) || probe(2) && probe(3));
+"""
+
+# Правые операнды 5, 6, 7, 8, 9, 3 и оба bump, кроме последнего, не выполняются
+EXPECTED = "13FalseTrueFalseTrue|01|04yes011|12False"
+
+@pytest.mark.parametrize("opt_level", [0, 1])
+def test_right_operand_runs_only_when_needed(opt_level):
+    assert run(SIDE_EFFECTS, opt_level).output == EXPECTED
+
+SHORT_CIRCUIT_HEAVY = """
+int w = 64;
+int h = 32;
+int hits = 0;
+proc big(value int v) -> bool {
+    return v > 100;
+}
+for (int i = 0; i < 300; i = i + 1) {
+    if (i > 10 && i < 290 || i == 5) then { hits = hits + 1; }
+    if (w > 2 * h && big(i)) then { hits = hits + 100; }
+    if (w >= h || big(i)) then { hits = hits + 2; }
+    bool both = i > 150 && big(i);
+    if (both || i == 0) then { hits = hits + 3; }
+}
+write(hits);
+"""
+
+def test_optimized_short_circuit_takes_fewer_steps():
+    o0, o1 = run(SHORT_CIRCUIT_HEAVY, 0), run(SHORT_CIRCUIT_HEAVY, 1)
+    assert o0.output == o1.output == "1330"
+    assert o1.steps < o0.steps
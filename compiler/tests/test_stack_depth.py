@@ -0,0 +1,98 @@
+"""
+Глубина стека (codegen.stack_depth): точный .maxstack и InternalCompilerError при
+несбалансированном стеке - и на собранных вручную методах, и из Toolchain.
+"""
+import re
+
+import pytest
+
+import codegen.cil_generator as cil_generator
+from codegen.cil_emitter import CILMethod
+from codegen.cil_instructions import Instruction, MethodRef, OpCode
+from codegen.stack_depth import max_stack
+from errors.base import InternalCompilerError
+from toolchain import Toolchain
+
+WRITE = MethodRef("void", "[ImgLangRuntime]Runtime", "Write", ("int32",))
+
+def op(opcode: OpCode, operand=None, label=None) -> Instruction:
+    return Instruction(opcode, operand, label)
+
+def label(name: str) -> Instruction:
+    return Instruction(OpCode.LABEL, label=name)
+
+def method(code, return_type="void") -> CILMethod:
+    return CILMethod("M", return_type, [("int32", "a")], instructions=list(code))
+
+def test_branches_merge_at_label():
+    # Обе ветви кладут значение, на метке End глубина 1 с обеих сторон
+    code = [op(OpCode.LDARG_0), op(OpCode.BRTRUE_S, label="Else"),
+            op(OpCode.LDC_I4_1), op(OpCode.LDC_I4_2), op(OpCode.ADD), op(OpCode.BR_S, label="End"),
+            label("Else"), op(OpCode.LDARG_0), label("End"), op(OpCode.RET)]
+    assert max_stack(method(code, "int32")) == 2
+
+def test_call_uses_signature():
+    pair = MethodRef("int32", "", "pair", ("int32", "int32", "int32"))
+    code = [op(OpCode.LDARG_0), op(OpCode.LDC_I4_1), op(OpCode.LDC_I4_2), op(OpCode.CALL, pair),
+            op(OpCode.CALL, WRITE), op(OpCode.RET)]
+    assert max_stack(method(code)) == 3
+
+def test_statement_chunk_may_end_without_ret():
+    m = method([])
+    assert max_stack(m, [op(OpCode.LDARG_0), op(OpCode.CALL, WRITE)]) == 1
+
+UNBALANCED = {
+    "pop from empty stack": ([op(OpCode.POP), op(OpCode.RET)], "снимает 1"),
+    "label depth mismatch": ([op(OpCode.LDARG_0), op(OpCode.BRTRUE, label="L"), op(OpCode.LDC_I4_1),
+                              label("L"), op(OpCode.POP), op(OpCode.RET)], "на метке L"),
+    "value left at ret": ([op(OpCode.LDARG_0), op(OpCode.RET)], "при возврате"),
+    "falls off the end": ([op(OpCode.LDARG_0), op(OpCode.CALL, WRITE)], "без ret"),
+    "branch falls off the end": ([op(OpCode.LDARG_0), op(OpCode.BRTRUE, label="L"), op(OpCode.RET),
+                                  label("L"), op(OpCode.NOP)], "без ret"),
+}
+
+@pytest.mark.parametrize("name", UNBALANCED)
+def test_unbalanced_stack_is_internal_error(name):
+    code, message = UNBALANCED[name]
+    with pytest.raises(InternalCompilerError, match=message):
+        max_stack(method(code))
+
+SOURCE = """
+proc add3(value int a, value int b, value int c) -> int { return a + b + c; }
+proc nest(value int a) -> int { return a * (a + (a - (a * 2))); }
+write(add3(1, 2, 3));
+write(nest(4));
+"""
+
+def max_stacks(il: str):
+    return dict(re.findall(r"\.method .* (\w+)\([^)]*\) cil managed \{\s*(?:\.entrypoint\s*)?\.maxstack (\d+)", il))
+
+@pytest.mark.parametrize("opt_level", [0, 1])
+def test_exact_maxstack(opt_level):
+    result = Toolchain(incremental=False, options={"opt_level": opt_level}).compile_source(SOURCE)
+    assert not result.errors, result.errors
+    assert max_stacks(result.il_code) == {"add3": "2", "nest": "5", "Main": "3"}
+
+# Поломки генератора, внесённые после всех его проходов - перед выбором коротких переходов
+BREAKAGES = {
+    "pop from empty stack": (lambda code: [op(OpCode.POP)] + code, "снимает 1"),
+    "label depth mismatch": (lambda code: [op(OpCode.LDC_I4_0), op(OpCode.BRTRUE, label="X"), op(OpCode.LDC_I4_1),
+                                           label("X"), op(OpCode.POP)] + code, "на метке X"),
+    "value left at ret": (lambda code: [op(OpCode.LDC_I4_1)] + code, "при возврате"),
+    "falls off the end": (lambda code: code[:-1], "без ret"),
+}
+
+@pytest.mark.parametrize("name", BREAKAGES)
+def test_unbalanced_stack_fails_codegen(name, monkeypatch):
+    breakage, message = BREAKAGES[name]
+    relax_branches = cil_generator.relax_branches
+
+    def broken(instructions):
+        instructions[:] = breakage(instructions)
+        relax_branches(instructions)
+
+    monkeypatch.setattr(cil_generator, "relax_branches", broken)
+    result = Toolchain(incremental=False, options={"opt_level": 1}).compile_source(SOURCE)
+    assert result.failed_stage == "codegen"
+    assert len(result.errors) == 1 and isinstance(result.errors[0], InternalCompilerError)
+    assert "Стек IL в add3" in str(result.errors[0]) and message in str(result.errors[0])
@@ -0,0 +1,171 @@
+import os
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+from codegen import DEFAULT_OPT_LEVEL
+from lexer import DEFAULT_LEXER_ENGINE
+from parser import DEFAULT_PARSE_MODE, DEFAULT_PARSER_ENGINE
+from errors.base import CompilerError, InternalCompilerError
+from phases import phase, is_enabled, count_ast_nodes
+
+@dataclass
+class CompileResult:
+    """Результат компиляции одного исходного текста"""
+    il_code: Optional[str] = None
+    errors: List[CompilerError] = field(default_factory=list)
+    failed_stage: Optional[str] = None
+    token_count: int = 0
+
+    @property
+    def success(self) -> bool:
+        return self.il_code is not None and not self.errors
+
+    def to_dict(self) -> dict:
+        """Представление результата, пригодное для pickle/JSON"""
+        return {
+            "il_code": self.il_code,
+            "diagnostics": [e.to_dict() for e in self.errors],
+            "failed_stage": self.failed_stage,
+            "token_count": self.token_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CompileResult':
+        return cls(
+            il_code=data["il_code"],
+            errors=[CompilerError.from_dict(d) for d in data["diagnostics"]],
+            failed_stage=data["failed_stage"],
+            token_count=data["token_count"],
+        )
+
+WARMUP_SOURCE = """
+struct Point {
+    public int x;
+    public proc Point(int v) { this.x = v; }
+    public virtual proc get() -> int { return this.x; }
+}
+
+proc scale(value image src, value float k, result image dst) {
+    int w = get_width(src);
+    int h = get_height(src);
+    dst = create_image(w, h);
+    for (int x = 0; x < w; x = x + 1) {
+        int y = 0;
+        while (y < h && x >= 0) {
+            color c = (color) get_pixel(src, x, y);
+            int r = clamp((int)((float) c.r * k), 0, 255);
+            set_pixel(dst, x, y, (pixel) to_color(r, c.g, c.b));
+            y = y + 1;
+        }
+    }
+}
+
+image img = load_image("in.png");
+image out;
+Point p = new Point(2);
+scale(img, 0.5, out);
+if (p.get() != 2 || false) then { write("bad"); } else { write(1); }
+do { save_image(out, "out.png"); } until (true);
+"""
+
+class Toolchain:
+    """
+    Прогретый набор компонентов компилятора.
+    Лексер, парсер, анализатор и генератор создаются один раз и переиспользуются
+    для всех файлов, поэтому ATN и DFA-кэш ANTLR прогреваются только однажды за процесс.
+    Кэш объявлений позволяет после правки одной функции перегенерировать только её.
+    """
+
+    def __init__(self, incremental: bool = True, options: dict = None):
+        # Фазы компилятора загружаются здесь, а не при импорте модуля: main.py берёт из него
+        # только output_paths/assemble_il и не должен платить за них при попадании в кэш
+        from lexer.lexer import ImgLexer
+        from parser.parser import ImgParser
+        from semantic.analyzer import SemanticAnalyzer
+        from codegen.cil_generator import CILGenerator
+        from codegen.incremental import DeclarationCache
+        
+        self.options = options or {}
+        self.lexer = ImgLexer(engine=self.options.get("lexer", DEFAULT_LEXER_ENGINE))
+        self.parser = ImgParser(self.lexer.get_token_stream(),
+                                self.options.get("parse_mode", DEFAULT_PARSE_MODE),
+                                self.options.get("parser", DEFAULT_PARSER_ENGINE))
+        self.analyzer = SemanticAnalyzer()
+        self.decl_cache = DeclarationCache() if incremental else None
+        self.generator = CILGenerator(self.analyzer.symbol_table, self.decl_cache,
+                                      self.options.get("opt_level", DEFAULT_OPT_LEVEL))
+
+    def warm_up(self):
+        """Компилирует небольшую программу, чтобы заполнить DFA-кэш до первого реального файла"""
+        self.compile_source(WARMUP_SOURCE)
+
+    def compile_source(self, source_code: str) -> CompileResult:
+        """Прогоняет исходный код через все фазы и возвращает IL или ошибки"""
+        with phase("lex") as record:
+            self.lexer.reset(source_code)
+            tokens, lex_errors = self.lexer.tokenize()
+            record.count(tokens=len(tokens))
+        result = CompileResult(token_count=len(tokens))
+
+        if lex_errors:
+            result.errors, result.failed_stage = lex_errors, "lexer"
+            return result
+
+        with phase("parse") as record:
+            self.parser.reset(self.lexer.get_token_stream())
+            ast, parse_errors = self.parser.parse()
+            if ast is not None and is_enabled():
+                record.count(ast_nodes=count_ast_nodes(ast))
+
+        if parse_errors or ast is None:
+            result.errors, result.failed_stage = parse_errors, "parser"
+            return result
+
+        with phase("semantic"):
+            self.analyzer.reset()
+            semantic_errors = self.analyzer.analyze(ast)
+
+        if semantic_errors:
+            result.errors, result.failed_stage = semantic_errors, "semantic"
+            return result
+
+        try:
+            with phase("codegen") as record:
+                self.generator.reset(self.analyzer.symbol_table)
+                result.il_code = self.generator.generate(ast)
+                record.count(il_lines=result.il_code.count("\n") + 1)
+        except CompilerError as e:
+            result.errors, result.failed_stage = [e], "codegen"
+        except Exception as e:
+            result.errors = [InternalCompilerError(f"Code generation failed: {e}")]
+            result.failed_stage = "codegen"
+
+        return result
+
+def output_paths(source_file: str, output_file: str = None):
+    """Возвращает пути .il и .exe для исходного файла"""
+    if output_file:
+        return output_file.replace('.exe', '.il'), output_file
+
+    base_name = Path(source_file).stem
+    return f"{base_name}.il", f"{base_name}.exe"
+
+def assemble_il(il_file: str, exe_file: str) -> subprocess.CompletedProcess:
+    """Собирает IL файл в .exe с помощью ilasm"""
+    with phase("ilasm"):
+        result = subprocess.run([
+            'ilasm',
+            il_file,
+            f'/output={exe_file}',
+            '/quiet'
+        ], capture_output=True, text=True, shell=True)
+
+    if result.returncode == 0:
+        try:
+            os.remove(f"{Path(il_file).stem}.pdb")
+        except:
+            pass
+
+    return result
@@ -0,0 +1,39 @@
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
+__version__ = "0.1.0"
+
+COMPILER_ROOT = Path(__file__).resolve().parent
+
+# Каталоги, не влияющие на результат компиляции
+_NOT_COMPILER_SOURCES = {"bench", "tests", "__pycache__"}
+
+# Исходники, от которых зависит AST: лексер, парсер, ASTBuilder, узлы и SourceLocation
+_FRONTEND_SOURCES = ("antlr", "lexer", "parser", "errors/base.py")
+
+def _sources_digest(paths) -> str:
+    digest = hashlib.sha256(__version__.encode("utf-8"))
+    for path in paths:
+        digest.update(str(path.relative_to(COMPILER_ROOT).as_posix()).encode("utf-8"))
+        digest.update(path.read_bytes())
+    return f"{__version__}+{digest.hexdigest()[:16]}"
+
+def compiler_sources():
+    """Исходники компилятора, которые входят в compiler_fingerprint()"""
+    return [path for path in sorted(COMPILER_ROOT.rglob("*.py"))
+            if not _NOT_COMPILER_SOURCES.intersection(path.relative_to(COMPILER_ROOT).parts)]
+
+@lru_cache(maxsize=1)
+def compiler_fingerprint() -> str:
+    """Версия компилятора плюс хэш его исходников: любая правка компилятора меняет отпечаток"""
+    return _sources_digest(compiler_sources())
+
+@lru_cache(maxsize=1)
+def frontend_fingerprint() -> str:
+    """Отпечаток только фронтенда: правки анализатора и генератора кода не сбрасывают кэш AST"""
+    paths = []
+    for part in _FRONTEND_SOURCES:
+        path = COMPILER_ROOT / part
+        paths.extend(sorted(path.rglob("*.py")) if path.is_dir() else [path])
+    return _sources_digest(paths)